@@ -0,0 +1,24 @@
+-- Per-id-range checksums for `python migrate_to_supabase.py --verify`
+-- Run this in Supabase SQL Editor (safe to re-run, read-only function)
+--
+-- For each bucket of `bucket_size` ids: the row count and the md5 of
+-- "id<TAB>col" lines joined with newlines in id order. The migration script
+-- hashes the same text from SQLite, so verifying a table transfers one row
+-- per bucket instead of the whole table.
+
+CREATE OR REPLACE FUNCTION migration_checksums(tbl TEXT, col TEXT, bucket_size BIGINT DEFAULT 10000)
+RETURNS TABLE (bucket BIGINT, rows BIGINT, digest TEXT) AS $$
+BEGIN
+    IF tbl NOT IN ('videos', 'clips', 'visual_frames') THEN
+        RAISE EXCEPTION 'migration_checksums: unsupported table %', tbl;
+    END IF;
+    RETURN QUERY EXECUTE format(
+        'SELECT id / $1 AS bucket, COUNT(*) AS rows,
+                md5(string_agg(id::text || E''\t'' || COALESCE(%I::text, ''''), E''\n'' ORDER BY id)) AS digest
+         FROM %I GROUP BY 1 ORDER BY 1', col, tbl)
+    USING bucket_size;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Verify
+SELECT * FROM migration_checksums('videos', 'filename');
@@ -0,0 +1,59 @@
+-- Store categorised tags, genres and custom tags as text[] (preserves existing data)
+-- Run this in Supabase SQL Editor, then redeploy app_supabase.py
+--
+-- Comma-joined strings are split, trimmed and emptied values dropped. GIN
+-- indexes answer tag filters (&& overlap / @> contains) without scanning
+-- every frame, and custom-tag edits become single-statement RPCs.
+
+CREATE OR REPLACE FUNCTION pg_temp.split_tags(value TEXT) RETURNS TEXT[] AS $$
+    SELECT COALESCE(array_agg(t) FILTER (WHERE t <> ''), '{}')
+    FROM unnest(string_to_array(COALESCE(value, ''), ',')) AS raw(tag), LATERAL trim(raw.tag) AS t
+$$ LANGUAGE sql IMMUTABLE;
+
+DO $$
+DECLARE
+    col TEXT;
+BEGIN
+    FOREACH col IN ARRAY ARRAY['emotion_tags', 'laugh_tags', 'contextual_tags', 'character_tags', 'semantic_tags', 'genres'] LOOP
+        IF (SELECT data_type FROM information_schema.columns
+            WHERE table_name = 'visual_frames' AND column_name = col) = 'text' THEN
+            EXECUTE format('ALTER TABLE visual_frames ALTER COLUMN %I TYPE TEXT[] USING pg_temp.split_tags(%I)', col, col);
+        END IF;
+        EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON visual_frames USING GIN (%I)', 'idx_visual_frames_' || col, col);
+    END LOOP;
+
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'videos' AND column_name = 'custom_tags') = 'text' THEN
+        ALTER TABLE videos ALTER COLUMN custom_tags TYPE TEXT[] USING pg_temp.split_tags(custom_tags);
+    END IF;
+    ALTER TABLE videos ALTER COLUMN custom_tags SET DEFAULT '{}';
+    CREATE INDEX IF NOT EXISTS idx_videos_custom_tags ON videos USING GIN (custom_tags);
+END $$;
+
+-- Custom tag edits: one atomic UPDATE each, case-insensitive like the old Python check.
+-- Both return the video's tags afterwards (NULL if the video does not exist).
+CREATE OR REPLACE FUNCTION add_custom_tag(p_video_id BIGINT, p_tag TEXT)
+RETURNS TABLE (added BOOLEAN, custom_tags TEXT[]) AS $$
+    WITH upd AS (
+        UPDATE videos v SET custom_tags = array_append(COALESCE(v.custom_tags, '{}'), p_tag)
+        WHERE v.id = p_video_id
+          AND NOT EXISTS (SELECT 1 FROM unnest(COALESCE(v.custom_tags, '{}')) t WHERE lower(t) = lower(p_tag))
+        RETURNING v.custom_tags
+    )
+    SELECT TRUE, custom_tags FROM upd
+    UNION ALL
+    SELECT FALSE, v.custom_tags FROM videos v WHERE v.id = p_video_id AND NOT EXISTS (SELECT 1 FROM upd)
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION remove_custom_tag(p_video_id BIGINT, p_tag TEXT)
+RETURNS TABLE (custom_tags TEXT[]) AS $$
+    UPDATE videos v SET custom_tags = ARRAY(
+        SELECT t FROM unnest(COALESCE(v.custom_tags, '{}')) t WHERE lower(t) <> lower(p_tag)
+    )
+    WHERE v.id = p_video_id
+    RETURNING v.custom_tags
+$$ LANGUAGE sql;
+
+-- Verify
+SELECT id, genres, emotion_tags FROM visual_frames ORDER BY id LIMIT 5;
+SELECT id, custom_tags FROM videos ORDER BY id LIMIT 5;
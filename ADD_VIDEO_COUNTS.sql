@@ -0,0 +1,73 @@
+-- Precomputed clip / frame counts and a library version for GET /videos
+-- Run this in Supabase SQL Editor (safe to re-run, preserves existing data)
+--
+-- * videos.clip_count / videos.frame_count are maintained by triggers on
+--   clips and visual_frames, so listing no longer reads every clip row.
+-- * library_state.version is bumped by any write to videos / clips /
+--   visual_frames; app_supabase.py derives the /videos ETag from it.
+
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS clip_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS frame_count INTEGER NOT NULL DEFAULT 0;
+
+-- Backfill
+UPDATE videos v SET
+    clip_count  = (SELECT COUNT(*) FROM clips c WHERE c.video_id = v.id),
+    frame_count = (SELECT COUNT(*) FROM visual_frames f WHERE f.video_id = v.id);
+
+-- Count maintenance (row level, one UPDATE per inserted / deleted row)
+CREATE OR REPLACE FUNCTION maintain_video_counts() RETURNS trigger AS $$
+DECLARE
+    col TEXT := CASE WHEN TG_TABLE_NAME = 'clips' THEN 'clip_count' ELSE 'frame_count' END;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        EXECUTE format('UPDATE videos SET %I = %I + 1 WHERE id = $1', col, col) USING NEW.video_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        EXECUTE format('UPDATE videos SET %I = GREATEST(%I - 1, 0) WHERE id = $1', col, col) USING OLD.video_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS clips_video_count ON clips;
+CREATE TRIGGER clips_video_count AFTER INSERT OR DELETE ON clips
+    FOR EACH ROW EXECUTE FUNCTION maintain_video_counts();
+
+DROP TRIGGER IF EXISTS visual_frames_video_count ON visual_frames;
+CREATE TRIGGER visual_frames_video_count AFTER INSERT OR DELETE ON visual_frames
+    FOR EACH ROW EXECUTE FUNCTION maintain_video_counts();
+
+-- Library version (statement level, one bump per write request)
+CREATE TABLE IF NOT EXISTS library_state (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO library_state (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_library_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE library_state SET version = version + 1 WHERE id = 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS videos_library_version ON videos;
+CREATE TRIGGER videos_library_version AFTER INSERT OR UPDATE OR DELETE ON videos
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_library_version();
+
+DROP TRIGGER IF EXISTS clips_library_version ON clips;
+CREATE TRIGGER clips_library_version AFTER INSERT OR DELETE ON clips
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_library_version();
+
+DROP TRIGGER IF EXISTS visual_frames_library_version ON visual_frames;
+CREATE TRIGGER visual_frames_library_version AFTER INSERT OR DELETE ON visual_frames
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_library_version();
+
+-- Keyset pagination on (sort field, id), optionally filtered by category / status
+CREATE INDEX IF NOT EXISTS idx_videos_upload_date_id ON videos (upload_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_videos_category_upload_date_id ON videos (category, upload_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_videos_status_upload_date_id ON videos (status, upload_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_videos_filename_id ON videos (filename, id);
+
+-- Verify
+SELECT id, filename, clip_count, frame_count FROM videos ORDER BY upload_date DESC LIMIT 10;
+SELECT version FROM library_state;
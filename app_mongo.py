@@ -14,15 +14,29 @@ import base64
 import tempfile
 import json
 import threading
-import shutil
+import time
 from datetime import datetime, timezone
 
-from flask import Flask, request, jsonify, send_from_directory, redirect
+from flask import Flask, request, jsonify, send_from_directory, redirect, g, Response
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-from openai import OpenAI
+from model_providers import make_openai_client
+import applog
+import metrics
+from metrics import timer, StageClock
 from dotenv import load_dotenv
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo import MongoClient, ASCENDING, DESCENDING, UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError
+import mongo_migrations
+import listing
+import facets
+import tags as taglib
+import ranking
+import media
+import previews
+import blobstore
+import resumable
+import objectstore
 
 load_dotenv()
 
@@ -39,37 +53,54 @@ videos_col   = db['videos']
 clips_col    = db['clips']
 frames_col   = db['visual_frames']
 counters_col = db['counters']
-
-_indexes_created = False
-
-def ensure_indexes():
-    """Create indexes on first request — not at import time."""
-    global _indexes_created
-    if _indexes_created:
+facets_col   = db['facets']
+search_cache_col = db['search_cache']
+
+# Schema (indexes etc.) is versioned in mongo_migrations.py and normally applied
+# ahead of a deploy with `python migrate.py mongo`. Each worker only compares the
+# stored version once; SCHEMA_AUTO_MIGRATE=0 turns off applying it from here.
+SCHEMA_AUTO_MIGRATE = os.getenv('SCHEMA_AUTO_MIGRATE', '1') != '0'
+SCHEMA_RETRY_SECONDS = 30
+_schema_ok = False
+_schema_version = 0
+_schema_next_check = 0.0
+_schema_lock = threading.Lock()
+
+def ensure_schema():
+    """Check the schema version once per worker (not at import time - see connect=False)."""
+    global _schema_ok, _schema_version, _schema_next_check
+    if _schema_ok or time.monotonic() < _schema_next_check:
         return
-    try:
-        videos_col.create_index([('id', ASCENDING)], unique=True)
-        videos_col.create_index([('filename', ASCENDING)])
-        videos_col.create_index([('category', ASCENDING)])
-        videos_col.create_index([('upload_date', DESCENDING)])
-        clips_col.create_index([('id', ASCENDING)], unique=True)
-        clips_col.create_index([('video_id', ASCENDING)])
-        clips_col.create_index([('start_time', ASCENDING)])
-        frames_col.create_index([('id', ASCENDING)], unique=True)
-        frames_col.create_index([('video_id', ASCENDING)])
-        frames_col.create_index([('timestamp', ASCENDING)])
-        _indexes_created = True
-    except Exception as e:
-        print(f"⚠️  Index creation warning (non-fatal): {e}")
+    with _schema_lock:
+        if _schema_ok:
+            return
+        try:
+            version = mongo_migrations.current_version(db)
+            if version < mongo_migrations.LATEST_VERSION:
+                if SCHEMA_AUTO_MIGRATE:
+                    applied = mongo_migrations.migrate(db)
+                    version = max([version] + applied)
+                    log.info("🔄 Applied schema migrations: %s", applied)
+                else:
+                    log.warning("⚠️  MongoDB schema v%s is behind v%s - run `python migrate.py mongo`",
+                                version, mongo_migrations.LATEST_VERSION)
+            _schema_version = version
+            _schema_ok = True
+        except Exception as e:
+            _schema_next_check = time.monotonic() + SCHEMA_RETRY_SECONDS
+            log.warning("⚠️  Schema check warning (non-fatal, retrying in %ss): %s", SCHEMA_RETRY_SECONDS, e)
 
 app = Flask(__name__, static_folder='.')
+applog.init_app(app)
+log = applog.get_logger('mongo')
 
 CORS(app,
      resources={r"/*": {
          "origins": "*",
-         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-         "allow_headers": ["Content-Type", "Authorization"],
-         "expose_headers": ["Content-Length", "X-Upload-Progress"],
+         "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+         "allow_headers": ["Content-Type", "Authorization", "If-None-Match", "Range", "If-Range", "Upload-Offset"],
+         "expose_headers": ["Content-Length", "X-Upload-Progress", "ETag", "Accept-Ranges", "Content-Range",
+                            "Upload-Offset", "Upload-Length", "Location"],
          "max_age": 3600
      }})
 
@@ -83,6 +114,8 @@ _STORAGE_BASE     = os.getenv('STORAGE_BASE', '.')
 UPLOADS_FOLDER    = os.path.join(_STORAGE_BASE, 'uploads')
 THUMBNAILS_FOLDER = os.path.join(_STORAGE_BASE, 'thumbnails')
 FRAMES_FOLDER     = os.path.join(_STORAGE_BASE, 'frames')
+PREVIEWS_FOLDER   = os.path.join(_STORAGE_BASE, 'previews')
+BLOBS_FOLDER      = os.path.join(_STORAGE_BASE, 'blobs')
 ALLOWED_EXTENSIONS = {'mp4', 'mov', 'avi', 'mkv', 'webm', 'gif', 'jpg', 'jpeg', 'png', 'heic'}
 CHUNK_DURATION = 15
 FRAME_INTERVAL = 10
@@ -90,23 +123,189 @@ FRAME_INTERVAL = 10
 os.makedirs(UPLOADS_FOLDER, exist_ok=True)
 os.makedirs(THUMBNAILS_FOLDER, exist_ok=True)
 os.makedirs(FRAMES_FOLDER, exist_ok=True)
+os.makedirs(PREVIEWS_FOLDER, exist_ok=True)
+
+# filename -> path for the media routes (see media.py); keeps /uploads off the DB
+uploads_index    = media.MediaIndex(UPLOADS_FOLDER, '/uploads')
+thumbnails_index = media.MediaIndex(THUMBNAILS_FOLDER, '/thumbnails')
+previews_index   = media.MediaIndex(PREVIEWS_FOLDER, '/previews')
+
+# Where media is kept (see objectstore.py). uploads/, thumbnails/ and previews/
+# always hold the working copies ffmpeg reads; with STORAGE_DRIVER=s3|supabase
+# every saved file is also put in the bucket, and the media routes redirect
+# there when the local copy is missing (new instance, replaced volume).
+local_media = objectstore.LocalStore({'videos': UPLOADS_FOLDER, 'thumbnails': THUMBNAILS_FOLDER,
+                                      'previews': PREVIEWS_FOLDER})
+media_store = objectstore.from_env(local_media)
 
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# Upload bodies are parsed straight into content-addressed blobs (see blobstore.py)
+# and hard-linked into uploads/, so each upload is written to disk exactly once.
+blob_store = blobstore.BlobStore(BLOBS_FOLDER)
+app.request_class = blobstore.request_class(blob_store)
+# Chunked uploads assemble next to the staging blobs (same volume, so completing is a rename)
+upload_sessions = resumable.SessionStore(os.path.join(blob_store.staging, 'sessions'))
+
+client = make_openai_client()
 
 
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
+# IDs are reserved from the counters collection in blocks, so a worker pays one
+# round trip per ID_BLOCK_SIZE documents instead of one per document. Unused IDs
+# left in a block when a worker exits are simply skipped (IDs stay unique, not dense).
+ID_BLOCK_SIZE = int(os.getenv('ID_BLOCK_SIZE', '100'))
+
+
+class IdAllocator:
+    """Thread-safe integer ID allocator backed by block reservations on `counters`."""
+
+    def __init__(self, counters, block_size=ID_BLOCK_SIZE):
+        self.counters   = counters
+        self.block_size = max(1, block_size)
+        self._lock      = threading.Lock()
+        self._pools     = {}  # collection_name -> [next_id, last_id]
+
+    def _reserve(self, collection_name, count):
+        result = self.counters.find_one_and_update(
+            {'_id': collection_name},
+            {'$inc': {'seq': count}},
+            upsert=True,
+            return_document=True
+        )
+        last = result['seq']
+        return [last - count + 1, last]
+
+    def take(self, collection_name, count=1):
+        """Return `count` unused IDs for collection_name (one $inc at most per call)."""
+        if count <= 0:
+            return []
+        with self._lock:
+            pool = self._pools.get(collection_name) or [1, 0]
+            ids = list(range(pool[0], min(pool[1], pool[0] + count - 1) + 1))
+            pool[0] += len(ids)
+            missing = count - len(ids)
+            if missing:
+                pool = self._reserve(collection_name, max(self.block_size, missing))
+                ids.extend(range(pool[0], pool[0] + missing))
+                pool[0] += missing
+            self._pools[collection_name] = pool
+            return ids
+
+
+id_allocator = IdAllocator(counters_col)
+
+
 def get_next_id(collection_name: str) -> int:
-    """Auto-increment integer ID using a counters collection."""
-    result = counters_col.find_one_and_update(
-        {'_id': collection_name},
-        {'$inc': {'seq': 1}},
-        upsert=True,
-        return_document=True
-    )
-    return result['seq']
+    """Next auto-increment integer ID (served from the allocator's reserved block)."""
+    return id_allocator.take(collection_name, 1)[0]
+
+
+# Every write that changes what /videos returns bumps this counter; the listing
+# ETag is derived from it, so polling clients get a 304 after one find_one.
+LIBRARY_VERSION_ID = 'library_version'
+
+
+def library_version():
+    doc = counters_col.find_one({'_id': LIBRARY_VERSION_ID}, {'seq': 1})
+    return doc['seq'] if doc else 0
+
+
+def bump_library_version():
+    counters_col.update_one({'_id': LIBRARY_VERSION_ID}, {'$inc': {'seq': 1}}, upsert=True)
+
+
+# Full rankings of recent queries, keyed by library version, so paging through
+# a result set slices the stored ranking instead of re-scoring the corpus. Only
+# (score, kind, row_id) entries are stored - a page's result dicts are rebuilt
+# from its rows. Any write bumps the version, which retires every entry; a TTL
+# index drops them.
+SEARCH_CACHE_ENABLED = os.getenv('SEARCH_CACHE_ENABLED', '1') != '0'
+
+
+def cached_ranking(version, key):
+    if not SEARCH_CACHE_ENABLED:
+        return None
+    doc = search_cache_col.find_one({'_id': f'{version}:{key}'}, {'ranking': 1})
+    hit = bool(doc and 'ranking' in doc)
+    metrics.CACHE_LOOKUPS.labels(cache='search', result='hit' if hit else 'miss').inc()
+    return doc['ranking'] if hit else None
+
+
+def store_ranking(version, key, entries):
+    if not SEARCH_CACHE_ENABLED:
+        return
+    try:
+        search_cache_col.replace_one(
+            {'_id': f'{version}:{key}'},
+            {'ranking': entries, 'created_at': datetime.now(timezone.utc)},
+            upsert=True
+        )
+    except Exception as e:
+        # the next page re-scores
+        log.warning("⚠️ Search cache write failed: %s", e)
+
+
+def update_video_facets(video_id, old_facets, new_facets):
+    """Apply a video's facet change to the `facets` counts (new_facets=None: video removed)."""
+    deltas = facets.facet_deltas(old_facets, new_facets)
+    if deltas:
+        facets_col.bulk_write([
+            UpdateOne({'_id': f'{facet}:{value}'},
+                      {'$inc': {'count': delta}, '$setOnInsert': {'facet': facet, 'value': value}},
+                      upsert=True)
+            for facet, value, delta in deltas
+        ], ordered=False)
+        facets_col.delete_many({'count': {'$lte': 0}})
+    if new_facets is not None:
+        videos_col.update_one({'id': video_id}, {'$set': {'facets': new_facets}})
+
+
+def insert_docs(collection, docs, embedding_field):
+    """insert_many in one round trip; documents the server rejects are retried without their embedding.
+
+    Returns the documents actually written.
+    """
+    if not docs:
+        return []
+    try:
+        collection.insert_many(docs, ordered=False)
+        return list(docs)
+    except BulkWriteError as e:
+        rejected = {err['index'] for err in e.details.get('writeErrors', [])}
+        written = [doc for i, doc in enumerate(docs) if i not in rejected]
+        for i in sorted(rejected):
+            doc = docs[i]
+            doc.pop(embedding_field, None)
+            doc.pop('_id', None)
+            try:
+                collection.insert_one(doc)
+                written.append(doc)
+            except Exception as retry_error:
+                log.warning("⚠️  Could not store %s document %s: %s", collection.name, doc.get('id'), retry_error)
+        return written
+
+
+# Clips are written in batches of this size while a transcript is embedded, so an
+# embedding failure part-way keeps the clips done before it
+CLIP_INSERT_BATCH = 50
+
+
+def store_clips(pending):
+    """Give the clip docs in `pending` ids and insert them; empties `pending`, returns the docs written."""
+    docs = list(pending)
+    pending.clear()
+    for clip_doc, clip_id in zip(docs, id_allocator.take('clips', len(docs))):
+        clip_doc['id'] = clip_id
+    return insert_docs(clips_col, docs, 'embedding')
+
+
+def nearby_transcript(clip_docs, timestamp, window=10, limit=3):
+    """Transcript of up to `limit` clips overlapping timestamp ± window (clip_docs sorted by start_time)."""
+    near = [c for c in clip_docs
+            if c['start_time'] <= timestamp + window and c['end_time'] >= timestamp - window]
+    return ' '.join(c.get('transcript_text') or '' for c in near[:limit])
 
 
 def allowed_file(filename):
@@ -127,7 +326,8 @@ def get_video_duration(video_path):
 
         cmd = [ffprobe, '-v', 'error', '-show_entries', 'format=duration',
                '-of', 'default=noprint_wrappers=1:nokey=1', video_path]
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        with timer(metrics.FFMPEG_SECONDS, op='probe'):
+            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
         return float(result.stdout.strip())
     except Exception as e:
         print(f"❌ Error getting video duration: {e}")
@@ -147,7 +347,8 @@ def generate_thumbnail(video_path, thumbnail_path, timestamp=1.0):
             ffmpeg = 'ffmpeg'
 
         cmd = [ffmpeg, '-i', video_path, '-ss', str(timestamp), '-vframes', '1', '-q:v', '2', '-y', thumbnail_path]
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        with timer(metrics.FFMPEG_SECONDS, op='thumbnail'):
+            result = subprocess.run(cmd, capture_output=True, text=True)
         if result.returncode != 0:
             raise Exception("Thumbnail generation failed")
         return thumbnail_path
@@ -186,7 +387,8 @@ def extract_frames_for_analysis(video_path, video_duration, filename):
             frame_filename = f"{video_base}_frame_{int(timestamp)}s.jpg"
             frame_path = os.path.join(FRAMES_FOLDER, frame_filename)
             cmd = [ffmpeg, '-ss', str(timestamp), '-i', video_path, '-vframes', '1', '-q:v', '2', '-y', frame_path]
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            with timer(metrics.FFMPEG_SECONDS, op='frame_extract'):
+                result = subprocess.run(cmd, capture_output=True, text=True)
             if result.returncode == 0:
                 frames.append({'timestamp': timestamp, 'path': frame_path, 'filename': frame_filename})
         return frames
@@ -442,18 +644,19 @@ Return ONLY valid JSON:
 
 Return ONLY JSON, no other text."""
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_data}", "detail": "low"}}
-                ]
-            }],
-            max_tokens=3000,
-            temperature=0.3
-        )
+        with timer(metrics.OPENAI_REQUEST_SECONDS, errors=metrics.OPENAI_ERRORS, endpoint='chat'):
+            response = client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[{
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt},
+                        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_data}", "detail": "low"}}
+                    ]
+                }],
+                max_tokens=3000,
+                temperature=0.3
+            )
 
         result_text = response.choices[0].message.content.strip()
         if result_text.startswith('```'):
@@ -529,13 +732,15 @@ def extract_audio(video_path):
 
         probe_cmd = [ffprobe, '-v', 'error', '-select_streams', 'a:0', '-show_entries', 'stream=codec_type',
                      '-of', 'default=noprint_wrappers=1:nokey=1', video_path]
-        probe_result = subprocess.run(probe_cmd, capture_output=True, text=True)
+        with timer(metrics.FFMPEG_SECONDS, op='audio_probe'):
+            probe_result = subprocess.run(probe_cmd, capture_output=True, text=True)
         if not probe_result.stdout.strip():
             return None
 
         audio_path = tempfile.NamedTemporaryFile(delete=False, suffix='.mp3').name
         cmd = [ffmpeg, '-i', video_path, '-vn', '-acodec', 'libmp3lame', '-q:a', '2', '-y', audio_path]
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        with timer(metrics.FFMPEG_SECONDS, op='audio_extract'):
+            result = subprocess.run(cmd, capture_output=True, text=True)
         if result.returncode != 0:
             raise Exception("FFmpeg failed")
         return audio_path
@@ -546,14 +751,16 @@ def extract_audio(video_path):
 
 def transcribe_audio(audio_path):
     """Transcribe audio using OpenAI Whisper API."""
-    with open(audio_path, 'rb') as audio_file:
+    with open(audio_path, 'rb') as audio_file, \
+            timer(metrics.OPENAI_REQUEST_SECONDS, errors=metrics.OPENAI_ERRORS, endpoint='transcriptions'):
         transcript = client.audio.transcriptions.create(model="whisper-1", file=audio_file, response_format="verbose_json")
     return transcript
 
 
 def create_embedding(text):
     """Create embedding using OpenAI embeddings API."""
-    response = client.embeddings.create(model='text-embedding-3-small', input=text)
+    with timer(metrics.OPENAI_REQUEST_SECONDS, errors=metrics.OPENAI_ERRORS, endpoint='embeddings'):
+        response = client.embeddings.create(model='text-embedding-3-small', input=text)
     embedding = response.data[0].embedding
     return json.dumps(embedding).encode('utf-8')
 
@@ -573,37 +780,98 @@ def cosine_similarity(embedding1_blob, embedding2_blob):
         return 0.0
 
 
-def save_video_locally(src_path, filename):
-    """Copy video to uploads folder and return its serving URL."""
-    dest = os.path.join(UPLOADS_FOLDER, filename)
-    if os.path.abspath(src_path) != os.path.abspath(dest):
+def save_media(key, src_path):
+    """Put a file in its local folder and, with a remote driver, in media_store.
+
+    Returns the URL to record: the bucket's public URL, or the app's own route
+    (which redirects to a presigned URL when the file is only in the bucket).
+    """
+    try:
+        local_media.put_file(key, src_path)
+    except OSError as e:
+        if e.errno == 28:
+            raise RuntimeError(
+                f"Storage volume is full ({_STORAGE_BASE}). "
+                "Please increase the Railway Volume size or delete unused videos."
+            ) from e
+        raise
+    if media_store is not local_media:
+        media_store.put_file(key, src_path)
+    return media_store.url(key) or local_media.url(key)
+
+
+def save_video(src_path, filename):
+    """Store video under videos/ and return its serving URL."""
+    url = save_media(f'videos/{filename}', src_path)
+    uploads_index.add(filename)
+    return url
+
+
+def save_thumbnail(src_path, filename):
+    """Store thumbnail under thumbnails/ and return its serving URL."""
+    url = save_media(f'thumbnails/{filename}', src_path)
+    thumbnails_index.add(filename)
+    return url
+
+
+def generate_previews(video_path, filename, duration):
+    """360p preview + sprite sheet/VTT into the previews folder (see previews.py)."""
+    rendition = previews.generate(video_path, filename, duration, PREVIEWS_FOLDER)
+    for name in rendition.values():
+        if media_store is not local_media:
+            media_store.put_file(f'previews/{name}', os.path.join(PREVIEWS_FOLDER, name))
+        previews_index.add(name)
+    return rendition
+
+
+def delete_media(keys):
+    """Remove media files locally and from a remote media_store; returns local files removed."""
+    removed = local_media.delete_many(keys)
+    if media_store is not local_media and keys:
         try:
-            shutil.copy2(src_path, dest)
-        except OSError as e:
-            if e.errno == 28:
-                raise RuntimeError(
-                    f"Storage volume is full ({_STORAGE_BASE}). "
-                    "Please increase the Railway Volume size or delete unused videos."
-                ) from e
-            raise
-    return f"/uploads/{filename}"
+            media_store.delete_many(keys)
+        except Exception as e:
+            log.warning("⚠️ Could not delete %d objects from %s storage: %s", len(keys), media_store.driver, e)
+    return removed
 
 
-def save_thumbnail_locally(src_path, filename):
-    """Copy thumbnail to thumbnails folder and return its serving URL."""
-    dest = os.path.join(THUMBNAILS_FOLDER, filename)
-    if os.path.abspath(src_path) != os.path.abspath(dest):
-        shutil.copy2(src_path, dest)
-    return f"/thumbnails/{filename}"
+def fetch_video(filename, video_url):
+    """Local path to process a stored video from, as (path, is_temp); (None, False) if it is nowhere."""
+    local_path = os.path.join(UPLOADS_FOLDER, filename)
+    if os.path.exists(local_path):
+        return local_path, False
+    suffix = os.path.splitext(filename)[1]
+    if video_url.startswith('http'):
+        import urllib.request
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+            urllib.request.urlretrieve(video_url, tmp.name)
+            return tmp.name, True
+    key = f'videos/{filename}'
+    if media_store is not local_media and media_store.exists(key):
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+            media_store.download(key, tmp.name)
+            return tmp.name, True
+    return None, False
+
+
+def redirect_to_store(key):
+    """Redirect to `key` in a remote media_store, or None (local driver / not there)."""
+    if media_store is local_media:
+        return None
+    try:
+        return redirect(media_store.url(key) or media_store.presign(key))
+    except objectstore.StorageError:
+        return None
 
 
 # ---------------------------------------------------------------------------
 # Core video processing
 # ---------------------------------------------------------------------------
 
-def process_video(video_path, filename, category='Videos'):
+def process_video(video_path, filename, category='Videos', content_hash=None):
     """Process video/image: save locally, transcribe (videos only), visual analysis."""
-    print(f"\n{'='*60}\n🎬 PROCESSING: {filename} (Category: {category})\n{'='*60}")
+    log.info("🎬 PROCESSING: %s (Category: %s)", filename, category)
+    clock = StageClock(metrics.INGEST_STAGE_SECONDS)
 
     is_heic = filename.lower().endswith('.heic')
     is_image = filename.lower().endswith(('.jpg', '.jpeg', '.png', '.heic'))
@@ -618,25 +886,30 @@ def process_video(video_path, filename, category='Videos'):
             jpg_path = os.path.join(os.path.dirname(video_path), jpg_filename)
             img = PILImage.open(video_path)
             img.save(jpg_path, 'JPEG', quality=92)
+            if os.path.dirname(os.path.abspath(video_path)) == os.path.abspath(UPLOADS_FOLDER):
+                os.remove(video_path)          # streamed upload: the library keeps the JPEG only
+                blob_store.release(content_hash)
+                content_hash = None
             video_path = jpg_path
             filename = jpg_filename
-            print(f"🔄 Converted HEIC → JPEG: {filename}")
+            log.info("🔄 Converted HEIC → JPEG: %s", filename)
         except Exception as e:
-            print(f"⚠️  HEIC conversion failed, trying as-is: {e}")
+            log.warning("⚠️  HEIC conversion failed, trying as-is: %s", e)
 
     if is_image:
         video_duration = 0
         thumbnail_path = video_path
         thumbnail_filename = filename
-        print(f"📸 Processing static image: {filename}")
+        log.info("📸 Processing static image: %s", filename)
     else:
         video_duration = get_video_duration(video_path)
-        print(f"⏱️  Video duration: {video_duration:.2f}s")
+        log.info("⏱️  Video duration: %.2fs", video_duration)
 
         thumbnail_time = min(1.0, video_duration * 0.1)
         thumbnail_filename = f"thumb_{os.path.splitext(filename)[0]}.jpg"
         thumbnail_path = os.path.join(THUMBNAILS_FOLDER, thumbnail_filename)
         generate_thumbnail(video_path, thumbnail_path, thumbnail_time)
+    clock.mark('prepare')
 
     clean_title = os.path.splitext(filename)[0].replace('-', ' ').replace('_', ' ')
     if clean_title.startswith("Copy of "):
@@ -653,22 +926,36 @@ def process_video(video_path, filename, category='Videos'):
         'duration':    video_duration,
         'status':      'processing',
         'thumbnail':   thumbnail_filename,
-        'custom_tags': '',
+        'custom_tags': [],
         'video_url':   f'/uploads/{filename}',
-        'category':    category
+        'category':    category,
+        'clip_count':  0,
+        'frame_count': 0
     }
+    if content_hash:
+        video_doc['sha256'] = content_hash
     videos_col.insert_one(video_doc)
-    print(f"✅ Video record created (ID: {video_id})")
+    bump_library_version()
+    log.info("✅ Video record created (ID: %s)", video_id)
 
-    print("💾 Saving video to local storage...")
-    video_url = save_video_locally(video_path, filename)
-    print(f"✅ Video saved: {video_url}")
+    video_url = save_video(video_path, filename)
+    log.info("💾 Video saved: %s", video_url)
+    if video_url != video_doc['video_url']:
+        videos_col.update_one({'id': video_id}, {'$set': {'video_url': video_url}})
 
     if os.path.exists(thumbnail_path):
-        save_thumbnail_locally(thumbnail_path, thumbnail_filename)
+        save_thumbnail(thumbnail_path, thumbnail_filename)
+    clock.mark('save')
+
+    if not is_image and not filename.lower().endswith('.gif'):
+        rendition = generate_previews(video_path, filename, video_duration)
+        if rendition:
+            videos_col.update_one({'id': video_id}, {'$set': rendition})
+        clock.mark('previews')
 
     audio_path = None if is_image else extract_audio(video_path)
-    segment_count = 0
+    clip_docs = []      # clips stored in the clips collection
+    pending = []        # embedded, not yet stored
 
     if audio_path:
         try:
@@ -679,53 +966,46 @@ def process_video(video_path, filename, category='Videos'):
                 text       = segment.text.strip()
                 if not text:
                     continue
-                segment_count += 1
                 combined_text  = f"Title: {clean_title}. Transcript: {text}"
                 embedding_blob = create_embedding(combined_text)
                 embedding_list = json.loads(embedding_blob.decode('utf-8'))
 
-                clip_id = get_next_id('clips')
-                clip_doc = {
-                    'id':              clip_id,
+                pending.append({
                     'video_id':        video_id,
+                    'category':        category,
                     'start_time':      start_time,
                     'end_time':        end_time,
                     'transcript_text': text,
                     'embedding':       embedding_list
-                }
-                try:
-                    clips_col.insert_one(clip_doc)
-                except Exception:
-                    clip_doc.pop('embedding', None)
-                    clips_col.insert_one(clip_doc)
-
+                })
+                if len(pending) >= CLIP_INSERT_BATCH:
+                    clip_docs.extend(store_clips(pending))
+        except Exception as e:
+            log.warning("⚠️  Audio transcription error: %s", e)
+        finally:
+            try:
+                clip_docs.extend(store_clips(pending))
+            except Exception as e:
+                log.warning("⚠️  Could not store clips: %s", e)
             if os.path.exists(audio_path):
                 os.remove(audio_path)
-        except Exception as e:
-            print(f"⚠️  Audio transcription error: {e}")
+    segment_count = len(clip_docs)
+    clock.mark('audio_clips')
 
     if is_image:
         frames = [{'timestamp': 0, 'path': video_path, 'filename': filename}]
-        print(f"📸 Analyzing static image")
+        log.debug("📸 Analyzing static image")
     else:
         frames = extract_frames_for_analysis(video_path, video_duration, filename)
+    clock.mark('frame_extract')
 
-    full_transcript = ' '.join(
-        r['transcript_text'] or ''
-        for r in clips_col.find({'video_id': video_id}, {'transcript_text': 1}).sort('start_time', ASCENDING)
-    )
+    # This video's clips were built above, so transcript context comes from memory
+    # rather than one clips query per frame.
+    clip_docs.sort(key=lambda c: c['start_time'])
 
-    visual_count = 0
+    frame_docs = []
     for frame_data in frames:
-        nearby_cursor = clips_col.find(
-            {
-                'video_id':   video_id,
-                'start_time': {'$lte': frame_data['timestamp'] + 10},
-                'end_time':   {'$gte': frame_data['timestamp'] - 10}
-            },
-            {'transcript_text': 1}
-        ).sort('start_time', ASCENDING).limit(3)
-        context_transcript = ' '.join(r['transcript_text'] or '' for r in nearby_cursor)
+        context_transcript = nearby_transcript(clip_docs, frame_data['timestamp'])
 
         analysis = analyze_frame_with_vision(
             frame_data['path'],
@@ -794,16 +1074,15 @@ def process_video(video_path, filename, category='Videos'):
         visual_embedding = create_embedding(combined_text)
         embedding_list   = json.loads(visual_embedding.decode('utf-8'))
 
-        frame_id  = get_next_id('visual_frames')
-        frame_doc = {
-            'id':                frame_id,
+        frame_docs.append({
             'video_id':          video_id,
+            'category':          category,
             'timestamp':         frame_data['timestamp'],
             'visual_description':description,
             'emotion':           emotion,
             'ocr_text':          ocr_text,
             'tags':              tags,
-            'genres':            genres,
+            'genres':            taglib.to_list(genres),
             'deep_emotions':     deep_emotions,
             'scene_context':     scene_context,
             'people_description':people_description,
@@ -814,22 +1093,32 @@ def process_video(video_path, filename, category='Videos'):
             'scene_type':        scene_type,
             'actors':            actors,
             'media_type':        media_type,
-            'emotion_tags':      emotion_tags,
-            'laugh_tags':        laugh_tags,
-            'contextual_tags':   contextual_tags,
-            'character_tags':    character_tags,
-            'semantic_tags':     semantic_tags,
+            'emotion_tags':      taglib.to_list(emotion_tags),
+            'laugh_tags':        taglib.to_list(laugh_tags),
+            'contextual_tags':   taglib.to_list(contextual_tags),
+            'character_tags':    taglib.to_list(character_tags),
+            'semantic_tags':     taglib.to_list(semantic_tags),
             'visual_embedding':  embedding_list
-        }
-        try:
-            frames_col.insert_one(frame_doc)
-        except Exception:
-            frame_doc.pop('visual_embedding', None)
-            frames_col.insert_one(frame_doc)
-        visual_count += 1
-
-    videos_col.update_one({'id': video_id}, {'$set': {'status': 'complete'}})
-    print(f"✅ VIDEO PROCESSING COMPLETE! {segment_count} clips, {visual_count} visual frames")
+        })
+        frame_docs[-1].update(facets.filter_keys(frame_docs[-1]))
+
+    for frame_doc, frame_id in zip(frame_docs, id_allocator.take('visual_frames', len(frame_docs))):
+        frame_doc['id'] = frame_id
+    frame_docs = insert_docs(frames_col, frame_docs, 'visual_embedding')
+    visual_count = len(frame_docs)
+    clock.mark('visual_frames')
+
+    videos_col.update_one({'id': video_id}, {'$set': {
+        'status':      'complete',
+        'clip_count':  len(clip_docs),
+        'frame_count': visual_count
+    }})
+    update_video_facets(video_id, None, facets.video_facets(frame_docs, category))
+    bump_library_version()
+    clock.finish()
+    log.info("✅ VIDEO PROCESSING COMPLETE! %d clips, %d visual frames (%s)",
+             segment_count, visual_count, clock.server_timing(),
+             extra={'video_id': video_id, 'clips': segment_count, 'frames': visual_count})
 
 
 # ---------------------------------------------------------------------------
@@ -838,7 +1127,26 @@ def process_video(video_path, filename, category='Videos'):
 
 @app.before_request
 def before_request():
-    ensure_indexes()
+    g.request_start = time.perf_counter()
+    metrics.start_flusher()
+    ensure_schema()
+
+
+@app.after_request
+def after_request(response):
+    start = g.get('request_start')
+    if start is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.HTTP_REQUEST_SECONDS.labels(
+            endpoint=endpoint, method=request.method, status=response.status_code
+        ).observe(time.perf_counter() - start)
+    return response
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint (merged across gunicorn workers)."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/')
@@ -858,59 +1166,119 @@ def process_video_endpoint(video_id):
         if not video:
             return jsonify({'error': 'Video not found'}), 404
 
-        filename  = video['filename']
-        video_url = video.get('video_url', '')
-
-        if video_url.startswith('http'):
-            import urllib.request
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]) as tmp:
-                urllib.request.urlretrieve(video_url, tmp.name)
-                tmp_path = tmp.name
-        else:
-            local_path = os.path.join(UPLOADS_FOLDER, filename)
-            if not os.path.exists(local_path):
-                return jsonify({'error': 'Video file not found locally'}), 404
-            tmp_path = local_path
+        filename = video['filename']
+        tmp_path, is_temp = fetch_video(filename, video.get('video_url', ''))
+        if not tmp_path:
+            return jsonify({'error': 'Video file not found locally'}), 404
 
         try:
             process_video(tmp_path, filename)
             return jsonify({'success': True, 'message': 'Video processed successfully'})
         finally:
-            if video_url.startswith('http') and os.path.exists(tmp_path):
+            if is_temp and os.path.exists(tmp_path):
                 os.remove(tmp_path)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-def process_video_async(tmp_path, filename, category):
-    """Background thread to process video."""
+def process_video_async(video_path, filename, category, content_hash=None):
+    """Background thread to process an upload already in place under uploads/."""
     try:
-        print(f"🎬 [BACKGROUND] Processing: {filename} (Category: {category})")
-        process_video(tmp_path, filename, category)
-        print(f"✅ [BACKGROUND] Completed: {filename}")
+        log.info("🎬 [BACKGROUND] Processing: %s (Category: %s)", filename, category)
+        process_video(video_path, filename, category, content_hash)
+        metrics.INGEST_TOTAL.labels(status='complete').inc()
+        log.info("✅ [BACKGROUND] Completed: %s", filename)
     except Exception as e:
-        import traceback
-        print(f"❌ [BACKGROUND] Error processing {filename}: {str(e)}")
-        print(traceback.format_exc())
+        metrics.INGEST_TOTAL.labels(status='failed').inc()
+        log.exception("❌ [BACKGROUND] Error processing %s: %s", filename, e)
         # Mark the record as failed if it was already inserted
         try:
             videos_col.update_one(
                 {'filename': filename, 'status': 'processing'},
                 {'$set': {'status': 'failed', 'error': str(e)}}
             )
+            bump_library_version()
         except Exception:
             pass
     finally:
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
-            print(f"🗑️ [BACKGROUND] Cleaned up temp file: {tmp_path}")
+        metrics.INGEST_QUEUE_DEPTH.dec()
+
+
+UPLOAD_CATEGORIES = ['Videos', 'GIFs', 'PS', 'Intro',
+                     'Intro-Animation', 'Intro-Location', 'Intro-Vlog',
+                     'Intro-ColdOpen', 'Intro-Narration', 'Photo']
+
+
+def accept_upload(blob_path, content_hash, size, filename, category):
+    """Put a committed blob at uploads/<filename> and restore or start processing it.
+
+    Shared by the multipart /upload and the resumable /upload/sessions paths.
+    """
+    video_path = os.path.join(UPLOADS_FOLDER, filename)
+    blob_store.link(blob_path, video_path)
+    uploads_index.add(filename)
+    file_size_mb = size / 1024 / 1024
+
+    # If this file already exists in MongoDB with complete analysis,
+    # just restore the file to disk and keep all existing AI data.
+    try:
+        existing = videos_col.find_one({'filename': filename, 'status': 'complete'})
+        if existing and clips_col.count_documents({'video_id': existing['id']}) > 0:
+            video_id = existing['id']
+            log.info("♻️  Restoring file for existing video (ID: %s) — keeping all AI data", video_id)
+            # Regenerate thumbnail
+            is_img = filename.lower().endswith(('.jpg', '.jpeg', '.png', '.heic'))
+            if not is_img:
+                thumb_name = f"thumb_{os.path.splitext(filename)[0]}.jpg"
+                thumb_path = os.path.join(THUMBNAILS_FOLDER, thumb_name)
+                generate_thumbnail(video_path, thumb_path, 1.0)
+                if os.path.exists(thumb_path):
+                    save_thumbnail(thumb_path, thumb_name)
+            if existing.get('sha256') not in (None, content_hash):
+                blob_store.release(existing['sha256'])
+            videos_col.update_one(
+                {'id': video_id},
+                {'$set': {'video_url': save_video(video_path, filename), 'sha256': content_hash}}
+            )
+            bump_library_version()
+            metrics.CACHE_LOOKUPS.labels(cache='analysis', result='hit').inc()
+            return jsonify({
+                'success': True,
+                'filename': filename,
+                'message': f'File restored for "{filename}" — all existing analysis kept.',
+                'category': existing.get('category', 'Videos'),
+                'file_size_mb': round(file_size_mb, 2),
+                'restored': True
+            })
+    except Exception as db_error:
+        log.warning("⚠️ Restore check error (non-fatal): %s", db_error)
+
+    log.info("✅ Stored upload: %s (%.1fMB, sha256 %s)", video_path, file_size_mb, content_hash[:12])
+    metrics.CACHE_LOOKUPS.labels(cache='analysis', result='miss').inc()
+
+    metrics.INGEST_QUEUE_DEPTH.inc()
+    thread = threading.Thread(
+        target=applog.propagate(process_video_async),
+        args=(video_path, filename, category, content_hash),
+        daemon=True
+    )
+    thread.start()
+    log.info("⚡ Processing %s in background", filename)
+
+    return jsonify({
+        'success':      True,
+        'filename':     filename,
+        'message':      f'Upload successful! AI analyzing {filename} in background...',
+        'category':     category,
+        'file_size_mb': round(file_size_mb, 2)
+    })
 
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
     try:
-        print(f"\n{'='*60}\n📥 UPLOAD REQUEST RECEIVED\n{'='*60}")
+        log.info("📥 UPLOAD REQUEST RECEIVED")
 
         if 'file' not in request.files:
             return jsonify({'error': 'No file part'}), 400
@@ -920,69 +1288,15 @@ def upload_file():
             return jsonify({'error': 'No selected file'}), 400
 
         category = request.form.get('category', 'Videos')
-        VALID_CATEGORIES = ['Videos', 'GIFs', 'PS', 'Intro',
-                            'Intro-Animation', 'Intro-Location', 'Intro-Vlog',
-                            'Intro-ColdOpen', 'Intro-Narration', 'Photo']
-        if category not in VALID_CATEGORIES:
+        if category not in UPLOAD_CATEGORIES:
             category = 'Videos'
 
         if file and allowed_file(file.filename):
             filename = secure_filename(file.filename)
-
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]) as tmp:
-                file.save(tmp.name)
-                tmp_path = tmp.name
-
-            # If this file already exists in MongoDB with complete analysis,
-            # just restore the file to disk and keep all existing AI data.
-            try:
-                existing = videos_col.find_one({'filename': filename, 'status': 'complete'})
-                if existing and clips_col.count_documents({'video_id': existing['id']}) > 0:
-                    video_id = existing['id']
-                    print(f"♻️  Restoring file for existing video (ID: {video_id}) — keeping all AI data")
-                    dest = os.path.join(UPLOADS_FOLDER, filename)
-                    shutil.copy2(tmp_path, dest)
-                    os.remove(tmp_path)
-                    # Regenerate thumbnail
-                    is_img = filename.lower().endswith(('.jpg', '.jpeg', '.png', '.heic'))
-                    if not is_img:
-                        thumb_name = f"thumb_{os.path.splitext(filename)[0]}.jpg"
-                        thumb_path = os.path.join(THUMBNAILS_FOLDER, thumb_name)
-                        generate_thumbnail(dest, thumb_path, 1.0)
-                    videos_col.update_one(
-                        {'id': video_id},
-                        {'$set': {'video_url': f'/uploads/{filename}'}}
-                    )
-                    file_size_mb = os.path.getsize(dest) / 1024 / 1024
-                    return jsonify({
-                        'success': True,
-                        'filename': filename,
-                        'message': f'File restored for "{filename}" — all existing analysis kept.',
-                        'category': existing.get('category', 'Videos'),
-                        'file_size_mb': round(file_size_mb, 2),
-                        'restored': True
-                    })
-            except Exception as db_error:
-                print(f"⚠️ Restore check error (non-fatal): {str(db_error)}")
-
-            file_size_mb = os.path.getsize(tmp_path) / 1024 / 1024
-            print(f"✅ Saved to temp: {tmp_path} ({file_size_mb:.1f}MB)")
-
-            thread = threading.Thread(
-                target=process_video_async,
-                args=(tmp_path, filename, category),
-                daemon=True
-            )
-            thread.start()
-            print(f"⚡ RETURNING SUCCESS IMMEDIATELY - Processing in background\n{'='*60}\n")
-
-            return jsonify({
-                'success':      True,
-                'filename':     filename,
-                'message':      f'Upload successful! AI analyzing {filename} in background...',
-                'category':     category,
-                'file_size_mb': round(file_size_mb, 2)
-            })
+            # The body was hashed into a staged blob while it was parsed; commit it
+            # and hard-link it into place instead of copying through temp files.
+            blob_path, content_hash, size = blobstore.commit_upload(blob_store, file)
+            return accept_upload(blob_path, content_hash, size, filename, category)
         else:
             return jsonify({'error': 'Invalid file type. Allowed: mp4, mov, avi, mkv, webm, gif'}), 400
 
@@ -992,8 +1306,264 @@ def upload_file():
         return jsonify({'error': f'Upload failed: {str(e)}'}), 500
 
 
-def _run_search(query, query_embedding, emotions_filter, genres_filter, categories_filter=None):
-    """Core search logic - fetches from MongoDB and computes similarity."""
+# ---------------------------------------------------------------------------
+# Resumable uploads - protocol in resumable.py
+# ---------------------------------------------------------------------------
+
+def _session_error(e):
+    response = jsonify({'error': str(e)})
+    response.status_code = e.status
+    if e.offset is not None:
+        response.headers['Upload-Offset'] = str(e.offset)
+    return response
+
+
+@app.route('/upload/sessions', methods=['POST'])
+def create_upload_session():
+    try:
+        data     = request.get_json(silent=True) or {}
+        filename = secure_filename(str(data.get('filename') or ''))
+        if not filename or not allowed_file(filename):
+            return jsonify({'error': 'Invalid file type. Allowed: mp4, mov, avi, mkv, webm, gif'}), 400
+        try:
+            size = int(data.get('size'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'size must be a non-negative integer'}), 400
+        if size > app.config['MAX_CONTENT_LENGTH']:
+            return jsonify({'error': 'File is larger than the upload limit'}), 413
+        category = data.get('category', 'Videos')
+        if category not in UPLOAD_CATEGORIES:
+            category = 'Videos'
+
+        session = upload_sessions.create(filename, size, category)
+        log.info("📥 Upload session %s: %s (%.1fMB)", session['upload_id'], filename, size / 1024 / 1024)
+        response = jsonify({
+            'upload_id':  session['upload_id'],
+            'filename':   filename,
+            'size':       size,
+            'offset':     0,
+            'chunk_size': resumable.CHUNK_SIZE,
+        })
+        response.status_code = 201
+        response.headers['Location'] = f"/upload/sessions/{session['upload_id']}"
+        return response
+    except resumable.SessionError as e:
+        return _session_error(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/upload/sessions/<upload_id>', methods=['GET', 'HEAD', 'PATCH', 'DELETE'])
+def upload_session(upload_id):
+    try:
+        if request.method == 'DELETE':
+            upload_sessions.discard(upload_id)
+            return '', 204
+
+        if request.method == 'PATCH':
+            try:
+                offset = int(request.headers.get('Upload-Offset', ''))
+            except ValueError:
+                return jsonify({'error': 'Upload-Offset header is required'}), 400
+            new_offset = upload_sessions.append(upload_id, offset, request.stream)
+            return '', 204, {'Upload-Offset': str(new_offset)}
+
+        session = upload_sessions.get(upload_id)
+        response = jsonify({'upload_id': upload_id, 'filename': session['filename'],
+                            'size': session['size'], 'offset': session['offset']})
+        response.headers['Upload-Offset'] = str(session['offset'])
+        response.headers['Upload-Length'] = str(session['size'])
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    except resumable.SessionError as e:
+        return _session_error(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/upload/sessions/<upload_id>/complete', methods=['POST'])
+def complete_upload_session(upload_id):
+    try:
+        session, part_path = upload_sessions.finish(upload_id)
+        blob_path = None
+        try:
+            # One read pass to hash the assembled file, then a rename into the blob store
+            blob_path, content_hash, size = blob_store.commit_file(part_path)
+            response = accept_upload(blob_path, content_hash, size, session['filename'], session['category'])
+        except Exception:
+            # Put the file back and reopen the session, so the client can retry complete
+            if blob_path and not os.path.exists(part_path):
+                blob_store.link(blob_path, part_path)
+            upload_sessions.reopen(upload_id)
+            raise
+        upload_sessions.close(upload_id)
+        return response
+    except resumable.SessionError as e:
+        return _session_error(e)
+    except Exception as e:
+        log.exception("❌ Completing upload %s failed", upload_id)
+        return jsonify({'error': f'Upload failed: {str(e)}'}), 500
+
+
+INTRO_CATEGORIES = ['Intro', 'Intro-Animation', 'Intro-Location', 'Intro-Vlog', 'Intro-ColdOpen', 'Intro-Narration']
+SEARCH_PAGE_SIZE = 50
+# Deepest result a query keeps (and a client can page to); candidates beyond it
+# are dropped during scoring by a bounded heap instead of a full sort.
+SEARCH_MAX_RESULTS = int(os.getenv('SEARCH_MAX_RESULTS', '500'))
+
+
+# Migration that stored lowercased emotion / genres on frames (facets.filter_keys)
+FILTER_KEYS_SCHEMA_VERSION = 9
+
+
+def _case_variants(values):
+    """Spellings an exact, index-backed $in should accept for case-insensitive facet values.
+
+    Only used until migration 9 has run: it misses mixed-case values such as
+    "dark Comedy", which the lowercased copies match.
+    """
+    out = set()
+    for v in values:
+        v = str(v).strip()
+        out.update((v, v.lower(), v.title(), v.capitalize(), v.upper()))
+    return sorted(out)
+
+
+def search_filter_query(emotions_filter=None, genres_filter=None, categories_filter=None):
+    """Frame predicate for the /search facet filters (category is denormalised onto frames and clips)."""
+    clauses = []
+    if categories_filter:
+        expanded = []
+        for cat in categories_filter:
+            expanded.extend(INTRO_CATEGORIES if cat == 'Intro' else [cat])
+        clauses.append({'category': {'$in': expanded}})
+    if _schema_version >= FILTER_KEYS_SCHEMA_VERSION:
+        if emotions_filter:
+            emotions = sorted({str(e).strip().lower() for e in emotions_filter})
+            if 'neutral' in emotions:
+                emotions.append('')  # frames without an emotion are shown as neutral
+            clauses.append({'emotion_lc': {'$in': emotions}})
+        if genres_filter:
+            clauses.append({'genres_lc': {'$in': sorted({str(g).strip().lower() for g in genres_filter})}})
+        return clauses
+    if emotions_filter:
+        emotions = _case_variants(emotions_filter)
+        if 'neutral' in emotions:
+            emotions += [None, '']  # frames without an emotion are shown as neutral
+        clauses.append({'emotion': {'$in': emotions}})
+    if genres_filter:
+        clauses.append({'genres': {'$in': _case_variants(genres_filter)}})
+    return clauses
+
+
+def _and(clauses):
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+
+
+def load_result_videos(video_ids):
+    """Filename / tags / category / duration for just the videos in the result set."""
+    docs = videos_col.find({'id': {'$in': list(video_ids)}},
+                           {'_id': 0, 'id': 1, 'filename': 1, 'custom_tags': 1, 'category': 1, 'duration': 1})
+    v_map = {v['id']: v for v in docs}
+    return v_map, {vid: taglib.to_text(v.get('custom_tags')) for vid, v in v_map.items()}
+
+
+CLIP_RESULT_FIELDS = {'_id': 0, 'id': 1, 'video_id': 1, 'start_time': 1, 'end_time': 1,
+                      'duration': 1, 'transcript_text': 1}
+FRAME_RESULT_FIELDS = {'_id': 0, 'id': 1, 'video_id': 1, 'timestamp': 1, 'visual_description': 1,
+                       'emotion': 1, 'ocr_text': 1, 'tags': 1, 'genres': 1, 'emotion_tags': 1,
+                       'laugh_tags': 1, 'contextual_tags': 1, 'character_tags': 1, 'semantic_tags': 1}
+
+
+def build_search_results(hits, v_map, v_tags):
+    """Result dicts for ranked hits [(score, kind, row_id, row)], in the given order."""
+    results = []
+    for sim, kind, _, doc in hits:
+        video = v_map.get(doc['video_id']) or {}
+        if kind == 'audio':
+            results.append({
+                'id':         f"audio_{doc['id']}",
+                'video_id':   doc['video_id'],
+                'filename':   video.get('filename', ''),
+                'timestamp':  doc['start_time'],
+                'start_time': doc['start_time'],
+                'end_time':   doc['end_time'],
+                'duration':   doc.get('duration', doc['end_time'] - doc['start_time']),
+                'text':       doc.get('transcript_text', ''),
+                'similarity': sim,
+                'source':     'audio',
+                'category':   video.get('category', 'Videos')
+            })
+            continue
+        emo      = doc.get('emotion') or 'neutral'
+        desc     = doc.get('visual_description', '')
+        ocr_text = doc.get('ocr_text', '')
+        display  = f"[Visual - {emo.title()}] {desc}" if emo != 'neutral' else f"[Visual] {desc}"
+        if ocr_text:
+            display += f" | Text: \"{ocr_text}\""
+        results.append({
+            'id':              f"visual_{doc['id']}",
+            'video_id':        doc['video_id'],
+            'filename':        video.get('filename', ''),
+            'timestamp':       doc['timestamp'],
+            'start_time':      doc['timestamp'],
+            'end_time':        doc['timestamp'] + 10,
+            'duration':        10.0,
+            'text':            display,
+            'similarity':      sim,
+            'source':          'visual',
+            'emotion':         emo,
+            'ocr_text':        ocr_text or '',
+            'tags':            doc.get('tags') or '',
+            'genres':          taglib.to_text(doc.get('genres')),
+            'custom_tags':     v_tags.get(doc['video_id'], ''),
+            'emotion_tags':    taglib.to_text(doc.get('emotion_tags')),
+            'laugh_tags':      taglib.to_text(doc.get('laugh_tags')),
+            'contextual_tags': taglib.to_text(doc.get('contextual_tags')),
+            'character_tags':  taglib.to_text(doc.get('character_tags')),
+            'semantic_tags':   taglib.to_text(doc.get('semantic_tags')),
+            'category':        video.get('category', 'Videos')
+        })
+
+    return results
+
+
+def rebuild_search_page(entries):
+    """Result dicts for a page of a cached ranking [(score, kind, row_id)].
+
+    Only the page's clips / frames and videos are read. A row deleted since the
+    ranking was stored is left out (any write also retires the cached ranking).
+    """
+    ids = {'audio': [], 'visual': []}
+    for _, kind, row_id in entries:
+        ids[kind].append(row_id)
+    rows = {}
+    if ids['audio']:
+        rows.update((('audio', d['id']), d) for d in clips_col.find({'id': {'$in': ids['audio']}}, CLIP_RESULT_FIELDS))
+    if ids['visual']:
+        rows.update((('visual', d['id']), d) for d in frames_col.find({'id': {'$in': ids['visual']}}, FRAME_RESULT_FIELDS))
+    hits = [(score, kind, row_id, rows[(kind, row_id)]) for score, kind, row_id in entries
+            if (kind, row_id) in rows]
+    v_map, v_tags = load_result_videos({row['video_id'] for _, _, _, row in hits})
+    return build_search_results(hits, v_map, v_tags)
+
+
+def _run_search(query, query_embedding, emotions_filter, genres_filter, categories_filter=None, clock=None,
+                tags_filter=None, tag_prefix=None, limit=SEARCH_PAGE_SIZE, after_id=None):
+    """Core search logic - fetches from MongoDB and computes similarity.
+
+    Category, emotion and genre filters become part of the clip / frame queries,
+    so a filtered search only reads the matching subset. tags_filter / tag_prefix
+    restrict visual results to frames carrying one of the tags (or a tag starting
+    with the prefix) in any categorised tag field, genres, or the video's custom
+    tags; they are answered from the multikey indexes.
+
+    Filter-only searches (no query) are paged by frame id: up to limit + 1 frames
+    after `after_id` are returned so the caller can tell whether there is more.
+    """
+    clock = clock or StageClock(metrics.SEARCH_STAGE_SECONDS)
     results = []
     detected_series = None
     detected_actor  = None
@@ -1012,34 +1582,34 @@ def _run_search(query, query_embedding, emotions_filter, genres_filter, categori
                 detected_actor = v
                 break
 
-    if not query and not emotions_filter and not genres_filter:
+    tag_filtered = bool(tags_filter or tag_prefix)
+    if not query and not emotions_filter and not genres_filter and not tag_filtered:
         return []
 
-    # Build videos filter
-    v_filter = {}
-    if categories_filter and len(categories_filter) > 0:
-        expanded_categories = []
-        for cat in categories_filter:
-            if cat == 'Intro':
-                expanded_categories.extend(['Intro', 'Intro-Animation', 'Intro-Location', 'Intro-Vlog', 'Intro-ColdOpen', 'Intro-Narration'])
-            else:
-                expanded_categories.append(cat)
-        v_filter['category'] = {'$in': expanded_categories}
-
-    v_docs = list(videos_col.find(v_filter, {'_id': 0, 'id': 1, 'filename': 1, 'custom_tags': 1, 'category': 1, 'duration': 1}))
-    v_map  = {v['id']: v for v in v_docs}
-    v_tags = {v['id']: v.get('custom_tags') or '' for v in v_docs}
-
-    allowed_video_ids = set(v_map.keys()) if categories_filter else None
-
-    if not query and (emotions_filter or genres_filter):
-        vf_docs = list(frames_col.find({}, {
+    filter_clauses = search_filter_query(emotions_filter, genres_filter, categories_filter)
+    frame_clauses  = list(filter_clauses)
+    if tag_filtered:
+        tag_query = taglib.mongo_filter(taglib.FRAME_TAG_FIELDS, tags_filter, tag_prefix)
+        custom_query = taglib.mongo_filter(('custom_tags',), tags_filter, tag_prefix)
+        tagged_video_ids = [v['id'] for v in videos_col.find(custom_query, {'_id': 0, 'id': 1})]
+        if tagged_video_ids:
+            tag_query = {'$or': [tag_query, {'video_id': {'$in': tagged_video_ids}}]}
+        frame_clauses.append(tag_query)
+    clock.mark('db_videos')
+
+    if not query and (emotions_filter or genres_filter or tag_filtered):
+        if after_id is not None:
+            frame_clauses.append({'id': {'$gt': after_id}})
+        vf_docs = list(frames_col.find(_and(frame_clauses), {
             '_id': 0, 'id': 1, 'video_id': 1, 'timestamp': 1, 'visual_description': 1,
             'emotion': 1, 'ocr_text': 1, 'tags': 1, 'genres': 1, 'deep_emotions': 1,
             'scene_context': 1, 'people_description': 1, 'environment': 1, 'series_movie': 1,
             'actors': 1, 'emotion_tags': 1, 'laugh_tags': 1, 'contextual_tags': 1,
             'character_tags': 1, 'semantic_tags': 1
-        }))
+        }).sort('id', ASCENDING).limit(limit + 1))
+        v_map, v_tags = load_result_videos({vf.get('video_id') for vf in vf_docs})
+        clock.mark('db_fetch')
+        metrics.ITEMS_SCANNED.labels(kind='frame').inc(len(vf_docs))
         for vf in vf_docs:
             vid         = vf.get('video_id')
             custom_tags = v_tags.get(vid, '')
@@ -1063,34 +1633,43 @@ def _run_search(query, query_embedding, emotions_filter, genres_filter, categori
                 'emotion':         emo,
                 'ocr_text':        vf.get('ocr_text') or '',
                 'tags':            vf.get('tags') or '',
-                'genres':          vf.get('genres') or '',
+                'genres':          taglib.to_text(vf.get('genres')),
                 'custom_tags':     custom_tags,
-                'emotion_tags':    vf.get('emotion_tags') or '',
-                'laugh_tags':      vf.get('laugh_tags') or '',
-                'contextual_tags': vf.get('contextual_tags') or '',
-                'character_tags':  vf.get('character_tags') or '',
-                'semantic_tags':   vf.get('semantic_tags') or ''
+                'emotion_tags':    taglib.to_text(vf.get('emotion_tags')),
+                'laugh_tags':      taglib.to_text(vf.get('laugh_tags')),
+                'contextual_tags': taglib.to_text(vf.get('contextual_tags')),
+                'character_tags':  taglib.to_text(vf.get('character_tags')),
+                'semantic_tags':   taglib.to_text(vf.get('semantic_tags'))
             })
+        clock.mark('build')
         return results
 
     query_lower = query.lower() if query else ''
 
-    clips_docs = list(clips_col.find({}, {
+    # Transcript clips carry no tags or genres and count as "neutral" for emotion
+    # filters, so those filters leave only visual results
+    skip_clips = tag_filtered or genres_filter or (
+        emotions_filter and 'neutral' not in [e.lower() for e in emotions_filter])
+    clip_clauses = [c for c in filter_clauses if 'category' in c]
+    clips_docs = [] if skip_clips else list(clips_col.find(_and(clip_clauses), {
         '_id': 0, 'id': 1, 'video_id': 1, 'start_time': 1, 'end_time': 1,
         'transcript_text': 1, 'embedding': 1
     }).limit(500))
 
-    vf_docs = list(frames_col.find({}, {
+    vf_docs = list(frames_col.find(_and(frame_clauses), {
         '_id': 0, 'id': 1, 'video_id': 1, 'timestamp': 1, 'visual_description': 1,
         'emotion': 1, 'ocr_text': 1, 'tags': 1, 'genres': 1, 'actors': 1, 'series_movie': 1,
         'emotion_tags': 1, 'laugh_tags': 1, 'contextual_tags': 1, 'character_tags': 1,
         'semantic_tags': 1, 'visual_embedding': 1
     }).limit(500))
+    v_map, v_tags = load_result_videos({d.get('video_id') for d in clips_docs} | {d.get('video_id') for d in vf_docs})
+    clock.mark('db_fetch')
+    metrics.ITEMS_SCANNED.labels(kind='clip').inc(len(clips_docs))
+    metrics.ITEMS_SCANNED.labels(kind='frame').inc(len(vf_docs))
 
-    for clip in clips_docs:
-        if allowed_video_ids is not None and clip['video_id'] not in allowed_video_ids:
-            continue
+    top = ranking.TopK(SEARCH_MAX_RESULTS)
 
+    for clip in clips_docs:
         emb = clip.get('embedding')
         if not emb:
             continue
@@ -1102,28 +1681,12 @@ def _run_search(query, query_embedding, emotions_filter, genres_filter, categori
         if sim > 0.40:
             if text.strip() in ['♪', '♪♪', '[Music]', '(Music)'] and 'music' not in query.lower():
                 continue
-            clip_fname     = (v_map.get(clip['video_id']) or {}).get('filename', '')
-            video_category = (v_map.get(clip['video_id']) or {}).get('category', 'Videos')
-            results.append({
-                'id':         f"audio_{clip['id']}",
-                'video_id':   clip['video_id'],
-                'filename':   clip_fname,
-                'timestamp':  clip['start_time'],
-                'start_time': clip['start_time'],
-                'end_time':   clip['end_time'],
-                'duration':   clip.get('duration', clip['end_time'] - clip['start_time']),
-                'text':       text,
-                'similarity': float(sim),
-                'source':     'audio',
-                'category':   video_category
-            })
+            top.push(float(sim), 'audio', clip['id'], clip)
 
+    clock.mark('score_clips')
     video_best_frames = {}
 
     for vf in vf_docs:
-        if allowed_video_ids is not None and vf['video_id'] not in allowed_video_ids:
-            continue
-
         emb = vf.get('visual_embedding')
         if not emb:
             continue
@@ -1134,13 +1697,6 @@ def _run_search(query, query_embedding, emotions_filter, genres_filter, categori
         desc             = vf.get('visual_description', '')
         actors           = vf.get('actors', '')
         series_movie     = vf.get('series_movie', '')
-        ocr_text         = vf.get('ocr_text', '')
-        tags             = vf.get('tags', '')
-        emotion_tags     = vf.get('emotion_tags', '')
-        laugh_tags       = vf.get('laugh_tags', '')
-        contextual_tags  = vf.get('contextual_tags', '')
-        character_tags   = vf.get('character_tags', '')
-        semantic_tags    = vf.get('semantic_tags', '')
 
         exact_boost = 0.0
         if query and len(query_lower) > 2:
@@ -1152,7 +1708,8 @@ def _run_search(query, query_embedding, emotions_filter, genres_filter, categori
                 exact_boost = max(exact_boost, 0.40)
             if desc and query_lower in desc.lower():
                 exact_boost = max(exact_boost, 0.35)
-            for tag_fld in [emotion_tags, laugh_tags, contextual_tags, character_tags, semantic_tags]:
+            for field in ('emotion_tags', 'laugh_tags', 'contextual_tags', 'character_tags', 'semantic_tags'):
+                tag_fld = taglib.to_text(vf.get(field))
                 if tag_fld and query_lower.replace('-', ' ').replace('_', ' ') in tag_fld.lower().replace('-', ' ').replace('_', ' '):
                     exact_boost = max(exact_boost, 0.40)
                     break
@@ -1175,14 +1732,8 @@ def _run_search(query, query_embedding, emotions_filter, genres_filter, categori
         video_duration = video_info.get('duration', 999)
 
         if video_duration < 30:
-            if video_id not in video_best_frames or sim > video_best_frames[video_id]['similarity']:
-                video_best_frames[video_id] = {
-                    'vf': vf, 'similarity': sim, 'custom_tags': custom_tags,
-                    'desc': desc, 'ocr_text': ocr_text, 'tags': tags,
-                    'emotion_tags': emotion_tags, 'laugh_tags': laugh_tags,
-                    'contextual_tags': contextual_tags, 'character_tags': character_tags,
-                    'semantic_tags': semantic_tags
-                }
+            if video_id not in video_best_frames or sim > video_best_frames[video_id][0]:
+                video_best_frames[video_id] = (sim, vf)
             continue
 
         if detected_series and series_movie and detected_series not in (series_movie or '').lower():
@@ -1192,40 +1743,11 @@ def _run_search(query, query_embedding, emotions_filter, genres_filter, categori
                 continue
 
         if sim > 0.30:
-            emo    = vf.get('emotion') or 'neutral'
-            display = f"[Visual - {emo.title()}] {desc}" if emo != 'neutral' else f"[Visual] {desc}"
-            if ocr_text:
-                display += f" | Text: \"{ocr_text}\""
-            vf_fname       = (v_map.get(vf['video_id']) or {}).get('filename', '')
-            video_category = (v_map.get(vf['video_id']) or {}).get('category', 'Videos')
-            results.append({
-                'id':              f"visual_{vf['id']}",
-                'video_id':        vf['video_id'],
-                'filename':        vf_fname,
-                'timestamp':       vf['timestamp'],
-                'start_time':      vf['timestamp'],
-                'end_time':        vf['timestamp'] + 10,
-                'duration':        10.0,
-                'text':            display,
-                'similarity':      float(sim),
-                'source':          'visual',
-                'emotion':         emo,
-                'ocr_text':        ocr_text or '',
-                'tags':            tags or '',
-                'genres':          vf.get('genres') or '',
-                'custom_tags':     custom_tags or '',
-                'emotion_tags':    emotion_tags or '',
-                'laugh_tags':      laugh_tags or '',
-                'contextual_tags': contextual_tags or '',
-                'character_tags':  character_tags or '',
-                'semantic_tags':   semantic_tags or '',
-                'category':        video_category
-            })
+            top.push(float(sim), 'visual', vf['id'], vf)
 
-    for video_id, best in video_best_frames.items():
-        vf  = best['vf']
-        sim = best['similarity']
+    clock.mark('score_frames')
 
+    for video_id, (sim, vf) in video_best_frames.items():
         if detected_series and vf.get('series_movie') and detected_series not in (vf.get('series_movie') or '').lower():
             continue
         if detected_actor and vf.get('actors'):
@@ -1233,53 +1755,11 @@ def _run_search(query, query_embedding, emotions_filter, genres_filter, categori
                 continue
 
         if sim > 0.30:
-            emo      = vf.get('emotion') or 'neutral'
-            desc     = best['desc']
-            ocr_text = best['ocr_text']
-            display  = f"[Visual - {emo.title()}] {desc}" if emo != 'neutral' else f"[Visual] {desc}"
-            if ocr_text:
-                display += f" | Text: \"{ocr_text}\""
-            vf_fname       = (v_map.get(vf['video_id']) or {}).get('filename', '')
-            video_category = (v_map.get(vf['video_id']) or {}).get('category', 'Videos')
-            results.append({
-                'id':              f"visual_{vf['id']}",
-                'video_id':        vf['video_id'],
-                'filename':        vf_fname,
-                'timestamp':       vf['timestamp'],
-                'start_time':      vf['timestamp'],
-                'end_time':        vf['timestamp'] + 10,
-                'duration':        10.0,
-                'text':            display,
-                'similarity':      float(sim),
-                'source':          'visual',
-                'emotion':         emo,
-                'ocr_text':        ocr_text or '',
-                'tags':            best['tags'] or '',
-                'genres':          vf.get('genres') or '',
-                'custom_tags':     best['custom_tags'] or '',
-                'emotion_tags':    best['emotion_tags'] or '',
-                'laugh_tags':      best['laugh_tags'] or '',
-                'contextual_tags': best['contextual_tags'] or '',
-                'character_tags':  best['character_tags'] or '',
-                'semantic_tags':   best['semantic_tags'] or '',
-                'category':        video_category
-            })
+            top.push(float(sim), 'visual', vf['id'], vf)
 
-    if emotions_filter or genres_filter:
-        filtered = []
-        for r in results:
-            em_match = not emotions_filter or (r.get('emotion', 'neutral').lower() in [e.lower() for e in emotions_filter])
-            genre_match = True
-            if genres_filter and r.get('source') == 'visual':
-                rg = (r.get('genres') or '').lower().split(', ')
-                genre_match = any(g.lower() in rg for g in genres_filter)
-            elif genres_filter and r.get('source') == 'audio':
-                genre_match = False
-            if em_match and genre_match:
-                filtered.append(r)
-        results = filtered
-
-    results.sort(key=lambda x: x['similarity'], reverse=True)
+    # Result dicts only for the survivors
+    results = build_search_results(top.best(), v_map, v_tags)
+    clock.mark('build')
     return results
 
 
@@ -1290,62 +1770,180 @@ def search():
     emotions_filter  = data.get('emotions', [])
     genres_filter    = data.get('genres', [])
     categories_filter= data.get('categories', [])
+    tags_filter      = taglib.to_list(data.get('tags'))
+    tag_prefix       = (data.get('tag_prefix') or '').strip()
 
-    if not query and not emotions_filter and not genres_filter:
+    if not query and not emotions_filter and not genres_filter and not tags_filter and not tag_prefix:
         return jsonify({'results': []})
 
+    # Paging (limit / cursor), projection (fields) and NDJSON (stream) - see ranking.py.
+    # Filter-only searches are keyset-paged by frame id straight from the database.
     try:
-        query_embedding = None
-        if query:
-            query_embedding = create_embedding(query)
-
-        results = _run_search(query, query_embedding, emotions_filter, genres_filter, categories_filter)
+        args   = ranking.parse_search_args(data)
+        cursor = args['cursor']
+        after_id = None
+        if not query and cursor:
+            if cursor.get('s') != 'filter':
+                raise listing.ListArgsError('cursor was issued for a different search')
+            after_id = int(cursor['id'])
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    limit = args['limit']
 
-        if not results and query:
-            return jsonify({
+    try:
+        clock = StageClock(metrics.SEARCH_STAGE_SECONDS)
+        if query:
+            key = ranking.query_key(query, emotions_filter, genres_filter, categories_filter, tags_filter, tag_prefix)
+            version = library_version()
+            entries = cached_ranking(version, key)
+            by_id = None
+            if entries is None:
+                query_embedding = create_embedding(query)
+                clock.mark('embed')
+                ranked = ranking.rank(_run_search(query, query_embedding, emotions_filter, genres_filter,
+                                                  categories_filter, clock=clock,
+                                                  tags_filter=tags_filter, tag_prefix=tag_prefix))
+                entries = ranking.compact(ranked)
+                by_id = {r['id']: r for r in ranked}
+                store_ranking(version, key, entries)
+            page_entries, next_cursor = ranking.page(entries, key, cursor, limit)
+            if by_id is not None:
+                results = [by_id[f'{kind}_{row_id}'] for _, kind, row_id in page_entries]
+            else:
+                results = rebuild_search_page(page_entries)
+                clock.mark('build')
+        else:
+            results = _run_search(query, None, emotions_filter, genres_filter, categories_filter, clock=clock,
+                                  tags_filter=tags_filter, tag_prefix=tag_prefix, limit=limit, after_id=after_id)
+            next_cursor = None
+            if len(results) > limit:
+                results = results[:limit]
+                next_cursor = listing.encode_cursor('filter', None, int(results[-1]['id'].split('_', 1)[1]))
+        for r in results:
+            r['media_url'] = uploads_index.url(r['filename']) if r.get('filename') else ''
+        results = ranking.project(results, args['fields'])
+
+        if args['stream']:
+            response = Response(ranking.ndjson_lines(results, {'next_cursor': next_cursor}),
+                                mimetype='application/x-ndjson')
+        elif not results and query and not cursor:
+            response = jsonify({
                 'results': [],
                 'message': f'No relevant B-rolls found for "{query}". Try different keywords or upload more videos.'
             })
-
-        return jsonify({'results': results[:50]})
+        else:
+            response = jsonify({'results': results, 'next_cursor': next_cursor})
+        clock.mark('serialise')
+        clock.finish()
+        response.headers['Server-Timing'] = clock.server_timing()
+        return response
+    except listing.ListArgsError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/uploads/<path:filename>')
+@app.route('/uploads/<path:filename>', methods=['GET', 'HEAD'])
 def serve_video(filename):
-    """Serve video file from local uploads folder (fall back to redirect for old http URLs)."""
+    """Serve video file from local uploads folder with Range support (see media.py).
+
+    Only a file that is not on disk costs a DB lookup, to redirect old http URLs
+    or, with a remote STORAGE_DRIVER, to the bucket.
+    """
+    local_path = uploads_index.lookup(filename)
+    if local_path:
+        return media.send_media(request, local_path)
     video = videos_col.find_one({'filename': filename}, {'video_url': 1})
     if video:
         url = video.get('video_url', '')
         if url.startswith('http'):
             return redirect(url)
-    local_path = os.path.join(UPLOADS_FOLDER, filename)
-    if os.path.exists(local_path):
-        return send_from_directory(UPLOADS_FOLDER, filename)
+        stored = redirect_to_store(f'videos/{filename}')
+        if stored:
+            return stored
     return jsonify({'error': 'File not found'}), 404
 
 
-@app.route('/thumbnails/<path:filename>')
+@app.route('/previews/<path:filename>', methods=['GET', 'HEAD'])
+def serve_preview(filename):
+    """Serve a preview rendition, sprite sheet or sprite VTT (Range support, see media.py)."""
+    local_path = previews_index.lookup(filename)
+    if local_path:
+        return media.send_media(request, local_path)
+    return redirect_to_store(f'previews/{filename}') or (jsonify({'error': 'Preview not found'}), 404)
+
+
+@app.route('/thumbnails/<path:filename>', methods=['GET', 'HEAD'])
 def serve_thumbnail(filename):
     """Serve thumbnail from local thumbnails folder."""
     if filename.startswith('http'):
         return redirect(filename)
-    local_path = os.path.join(THUMBNAILS_FOLDER, filename)
-    if os.path.exists(local_path):
-        return send_from_directory(THUMBNAILS_FOLDER, filename)
-    return jsonify({'error': 'Thumbnail not found'}), 404
+    local_path = thumbnails_index.lookup(filename)
+    if local_path:
+        return media.send_media(request, local_path)
+    return redirect_to_store(f'thumbnails/{filename}') or (jsonify({'error': 'Thumbnail not found'}), 404)
+
+
+VIDEO_LIST_PROJECTION = {
+    '_id': 0, 'id': 1, 'filename': 1, 'title': 1, 'upload_date': 1, 'duration': 1,
+    'status': 1, 'thumbnail': 1, 'custom_tags': 1, 'video_url': 1, 'category': 1,
+    'clip_count': 1, 'frame_count': 1, 'preview': 1, 'sprite_vtt': 1
+}
+
+
+def media_url(video):
+    """Playback URL: the remote URL for migrated videos, else a content-versioned /uploads URL."""
+    url = video.get('video_url') or ''
+    if url.startswith('http'):
+        return url
+    return uploads_index.url(video['filename'])
+
+
+# Migration that made every videos.upload_date a BSON date (keyset-pageable)
+UPLOAD_DATE_SCHEMA_VERSION = 8
 
 
 @app.route('/videos', methods=['GET'])
 def list_videos():
+    """Library listing - see listing.py for the query parameters and cursor format."""
     try:
-        v_docs = list(videos_col.find({}, {'_id': 0}).sort('upload_date', DESCENDING))
-
-        clip_pipeline = [
-            {'$group': {'_id': '$video_id', 'count': {'$sum': 1}}}
-        ]
-        clip_counts = {doc['_id']: doc['count'] for doc in clips_col.aggregate(clip_pipeline)}
+        try:
+            params = listing.parse_list_args(request.args)
+        except listing.ListArgsError as e:
+            return jsonify({'error': str(e)}), 400
+
+        version = library_version()
+        tag     = listing.etag(version, params)
+        if listing.is_not_modified(request, tag):
+            return listing.revalidate_headers(Response(status=304), tag)
+
+        field = params['field']
+        order = DESCENDING if params['descending'] else ASCENDING
+        if field == 'upload_date' and _schema_version < UPLOAD_DATE_SCHEMA_VERSION:
+            # upload_date may still mix dates and strings, which a keyset $lt/$gt
+            # would skip - answer with the whole (unpaged) listing instead
+            params['limit'] = None
+            params['cursor'] = None
+        query = {}
+        if params['categories']:
+            query['category'] = {'$in': params['categories']}
+        if params['statuses']:
+            query['status'] = {'$in': params['statuses']}
+        if params['cursor']:
+            op = '$lt' if params['descending'] else '$gt'
+            value, last_id = params['cursor']['v'], params['cursor']['id']
+            query['$or'] = [{field: {op: value}}, {field: value, 'id': {op: last_id}}]
+
+        cursor = videos_col.find(query, VIDEO_LIST_PROJECTION).sort([(field, order), ('id', order)])
+        if params['limit']:
+            cursor = cursor.limit(params['limit'] + 1)
+        v_docs = list(cursor)
+
+        next_cursor = None
+        if params['limit'] and len(v_docs) > params['limit']:
+            v_docs = v_docs[:params['limit']]
+            last = v_docs[-1]
+            next_cursor = listing.encode_cursor(params['sort'], last.get(field), last['id'])
 
         videos = []
         for v in v_docs:
@@ -1360,17 +1958,82 @@ def list_videos():
                 'duration':      v.get('duration') or 0,
                 'status':        v.get('status', 'pending'),
                 'thumbnail':     v.get('thumbnail'),
-                'custom_tags':   v.get('custom_tags') or '',
-                'clip_count':    clip_counts.get(v['id'], 0),
+                'custom_tags':   taglib.to_text(v.get('custom_tags')),
+                'clip_count':    v.get('clip_count') or 0,
+                'frame_count':   v.get('frame_count') or 0,
                 'video_url':     v.get('video_url'),
+                'media_url':     media_url(v),
+                'preview_url':   previews_index.url(v['preview']) if v.get('preview') else None,
+                'sprite_vtt_url': previews_index.url(v['sprite_vtt']) if v.get('sprite_vtt') else None,
                 'category':      v.get('category', 'Videos')
             })
 
-        response = jsonify({'videos': videos})
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response.headers['Pragma']        = 'no-cache'
-        response.headers['Expires']       = '0'
-        return response
+        response = jsonify({'videos': videos, 'next_cursor': next_cursor, 'library_version': version})
+        return listing.revalidate_headers(response, tag)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+VIDEO_LOOKUP_PROJECTION = {
+    '_id': 0, 'id': 1, 'filename': 1, 'sha256': 1, 'status': 1, 'category': 1,
+    'clip_count': 1, 'frame_count': 1, 'video_url': 1
+}
+
+
+def lookup_record(video):
+    """Lookup entry for a video document; file_present / size describe the served file
+    (size is None when it is remote)."""
+    url = video.get('video_url') or ''
+    size = None
+    if url.startswith('http'):
+        present = True
+    else:
+        path = uploads_index.lookup(video['filename'])
+        present = path is not None
+        if present:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                present = False
+        if not present and media_store is not local_media:
+            # Only in the bucket: serve_video redirects there, so it needs no re-upload
+            try:
+                present = media_store.exists(f"videos/{video['filename']}")
+            except Exception as e:
+                log.warning("⚠️  Could not check %s in %s storage: %s", video['filename'], media_store.driver, e)
+    return {
+        'id':           video['id'],
+        'filename':     video['filename'],
+        'status':       video.get('status', 'pending'),
+        'sha256':       video.get('sha256'),
+        'category':     video.get('category', 'Videos'),
+        'clip_count':   video.get('clip_count') or 0,
+        'frame_count':  video.get('frame_count') or 0,
+        'file_present': present,
+        'size':         size,
+    }
+
+
+@app.route('/videos/lookup', methods=['POST'])
+def lookup_videos():
+    """Status of many filenames / content hashes at once - see listing.py for the format.
+
+    One find() with an $or of two $in clauses, each served by an index
+    (filename, and the sparse sha256 index).
+    """
+    try:
+        try:
+            filenames, hashes = listing.parse_lookup_body(request.get_json(silent=True))
+        except listing.ListArgsError as e:
+            return jsonify({'error': str(e)}), 400
+
+        clauses = []
+        if filenames:
+            clauses.append({'filename': {'$in': filenames}})
+        if hashes:
+            clauses.append({'sha256': {'$in': hashes}})
+        records = [lookup_record(v) for v in videos_col.find({'$or': clauses}, VIDEO_LOOKUP_PROJECTION)]
+        return jsonify(listing.lookup_payload(records, filenames, hashes))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1402,30 +2065,28 @@ def reprocess_video(video_id):
 
         frames_col.delete_many({'video_id': video_id})
 
-        tmp_path = None
-        if video_url.startswith('http'):
-            import urllib.request
-            tmp_path = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]).name
-            try:
-                urllib.request.urlretrieve(video_url, tmp_path)
-            except Exception as e:
-                return jsonify({'error': f'Failed to download video: {e}'}), 500
-        else:
-            local_path = os.path.join(UPLOADS_FOLDER, filename)
-            if not os.path.exists(local_path):
-                return jsonify({'error': 'Video file not found locally'}), 404
-            tmp_path = local_path
+        try:
+            tmp_path, is_temp = fetch_video(filename, video_url)
+        except Exception as e:
+            return jsonify({'error': f'Failed to download video: {e}'}), 500
+        if not tmp_path:
+            return jsonify({'error': 'Video file not found locally'}), 404
 
         frames = extract_frames_for_analysis(tmp_path, video_duration, filename)
         if not frames:
-            if video_url.startswith('http') and os.path.exists(tmp_path):
+            if is_temp and os.path.exists(tmp_path):
                 os.remove(tmp_path)
             return jsonify({'error': 'Failed to extract frames'}), 500
 
-        full_transcript = ' '.join(
-            r['transcript_text'] or ''
-            for r in clips_col.find({'video_id': video_id}, {'transcript_text': 1}).sort('start_time', ASCENDING)
-        )
+        # Videos ingested before preview renditions existed get them here
+        rendition = {}
+        if not video.get('preview') and not filename.lower().endswith('.gif'):
+            rendition = generate_previews(tmp_path, filename, video_duration)
+
+        clip_docs = list(clips_col.find(
+            {'video_id': video_id},
+            {'_id': 0, 'start_time': 1, 'end_time': 1, 'transcript_text': 1}
+        ).sort('start_time', ASCENDING))
 
         INTRO_STYLE_KEYWORDS = {
             'Intro-Animation': 'Animations B-roll Narrative intro animated graphics motion graphics voiceover montage',
@@ -1436,17 +2097,9 @@ def reprocess_video(video_id):
             'Intro':           'YouTube intro movie intro opening sequence',
         }
 
-        visual_count = 0
+        frame_docs = []
         for frame_data in frames:
-            nearby_cursor = clips_col.find(
-                {
-                    'video_id':   video_id,
-                    'start_time': {'$lte': frame_data['timestamp'] + 10},
-                    'end_time':   {'$gte': frame_data['timestamp'] - 10}
-                },
-                {'transcript_text': 1}
-            ).sort('start_time', ASCENDING).limit(3)
-            context = ' '.join(r['transcript_text'] or '' for r in nearby_cursor)
+            context = nearby_transcript(clip_docs, frame_data['timestamp'])
 
             analysis = analyze_frame_with_vision(frame_data['path'], transcript_context=context,
                                                   filename_hint=filename, category=category)
@@ -1483,16 +2136,15 @@ def reprocess_video(video_id):
                     combined += f" {fld}: {val}."
             emb = json.loads(create_embedding(combined).decode('utf-8'))
 
-            frame_id  = get_next_id('visual_frames')
-            frame_doc = {
-                'id':                 frame_id,
+            frame_docs.append({
                 'video_id':           video_id,
+                'category':           category,
                 'timestamp':          frame_data['timestamp'],
                 'visual_description': desc,
                 'emotion':            str(analysis.get('emotion', '')),
                 'ocr_text':           str(analysis.get('ocr_text', '')),
                 'tags':               str(analysis.get('tags', '')),
-                'genres':             str(analysis.get('genres', '')),
+                'genres':             taglib.to_list(str(analysis.get('genres', ''))),
                 'deep_emotions':      str(analysis.get('deep_emotions', '')),
                 'scene_context':      str(analysis.get('scene_context', '')),
                 'people_description': str(analysis.get('people_description', '')),
@@ -1503,21 +2155,24 @@ def reprocess_video(video_id):
                 'scene_type':         str(analysis.get('scene_type', '')),
                 'actors':             str(analysis.get('actors', '')),
                 'media_type':         str(analysis.get('media_type', 'Unknown')),
-                'emotion_tags':       emotion_tags,
-                'laugh_tags':         laugh_tags,
-                'contextual_tags':    contextual_tags,
-                'character_tags':     character_tags,
-                'semantic_tags':      semantic_tags,
+                'emotion_tags':       taglib.to_list(emotion_tags),
+                'laugh_tags':         taglib.to_list(laugh_tags),
+                'contextual_tags':    taglib.to_list(contextual_tags),
+                'character_tags':     taglib.to_list(character_tags),
+                'semantic_tags':      taglib.to_list(semantic_tags),
                 'visual_embedding':   emb
-            }
-            try:
-                frames_col.insert_one(frame_doc)
-            except Exception:
-                frame_doc.pop('visual_embedding', None)
-                frames_col.insert_one(frame_doc)
-            visual_count += 1
+            })
+            frame_docs[-1].update(facets.filter_keys(frame_docs[-1]))
 
-        if video_url.startswith('http') and tmp_path and os.path.exists(tmp_path):
+        for frame_doc, frame_id in zip(frame_docs, id_allocator.take('visual_frames', len(frame_docs))):
+            frame_doc['id'] = frame_id
+        frame_docs = insert_docs(frames_col, frame_docs, 'visual_embedding')
+        visual_count = len(frame_docs)
+        videos_col.update_one({'id': video_id}, {'$set': {'frame_count': visual_count, **rendition}})
+        update_video_facets(video_id, video.get('facets'), facets.video_facets(frame_docs, category))
+        bump_library_version()
+
+        if is_temp and os.path.exists(tmp_path):
             os.remove(tmp_path)
 
         return jsonify({'success': True, 'visual_frames_added': visual_count})
@@ -1527,15 +2182,11 @@ def reprocess_video(video_id):
 
 @app.route('/filters', methods=['GET'])
 def get_filters():
+    """Emotions, genres, categories, actors and series with video counts (materialised in `facets`)."""
     try:
-        vf_docs  = list(frames_col.find({}, {'_id': 0, 'emotion': 1, 'genres': 1}))
-        emotions = sorted(set(r['emotion'] for r in vf_docs if r.get('emotion')))
-        genres   = set()
-        for r in vf_docs:
-            for g in (r.get('genres') or '').split(', '):
-                if g.strip():
-                    genres.add(g.strip())
-        return jsonify({'emotions': emotions, 'genres': sorted(list(genres))})
+        rows = [(d['facet'], d['value'], d['count'])
+                for d in facets_col.find({'count': {'$gt': 0}}, {'_id': 0, 'facet': 1, 'value': 1, 'count': 1})]
+        return jsonify(facets.filters_payload(rows))
     except Exception:
         return jsonify({'emotions': [], 'genres': []})
 
@@ -1547,33 +2198,36 @@ def add_custom_tag(video_id):
     if not new_tag:
         return jsonify({'error': 'Tag cannot be empty'}), 400
 
-    video = videos_col.find_one({'id': video_id}, {'custom_tags': 1})
+    # Single atomic update; the filter skips videos that already have the tag in any case
+    video = videos_col.find_one_and_update(
+        {'id': video_id, 'custom_tags': {'$not': taglib.exact_ci(new_tag)}},
+        {'$addToSet': {'custom_tags': new_tag}},
+        projection={'_id': 0, 'custom_tags': 1},
+        return_document=ReturnDocument.AFTER
+    )
     if not video:
-        return jsonify({'error': 'Video not found'}), 404
-
-    current   = video.get('custom_tags') or ''
-    tags_list = [t.strip() for t in current.split(',') if t.strip()]
-    if new_tag.lower() in [t.lower() for t in tags_list]:
-        return jsonify({'error': 'Tag already exists', 'tags': ', '.join(tags_list)}), 400
+        existing = videos_col.find_one({'id': video_id}, {'_id': 0, 'custom_tags': 1})
+        if not existing:
+            return jsonify({'error': 'Video not found'}), 404
+        return jsonify({'error': 'Tag already exists', 'tags': taglib.to_text(existing.get('custom_tags'))}), 400
 
-    tags_list.append(new_tag)
-    updated = ', '.join(tags_list)
-    videos_col.update_one({'id': video_id}, {'$set': {'custom_tags': updated}})
-    return jsonify({'success': True, 'tag': new_tag, 'all_tags': updated})
+    bump_library_version()
+    return jsonify({'success': True, 'tag': new_tag, 'all_tags': taglib.to_text(video.get('custom_tags'))})
 
 
 @app.route('/videos/<int:video_id>/tags/<path:tag>', methods=['DELETE'])
 def delete_custom_tag(video_id, tag):
-    video = videos_col.find_one({'id': video_id}, {'custom_tags': 1})
+    video = videos_col.find_one_and_update(
+        {'id': video_id},
+        {'$pull': {'custom_tags': taglib.exact_ci(tag)}},
+        projection={'_id': 0, 'custom_tags': 1},
+        return_document=ReturnDocument.AFTER
+    )
     if not video:
         return jsonify({'error': 'Video not found'}), 404
 
-    current   = video.get('custom_tags') or ''
-    tags_list = [t.strip() for t in current.split(',') if t.strip()]
-    tags_list = [t for t in tags_list if t.lower() != tag.lower()]
-    updated   = ', '.join(tags_list)
-    videos_col.update_one({'id': video_id}, {'$set': {'custom_tags': updated}})
-    return jsonify({'success': True, 'deleted_tag': tag, 'remaining_tags': updated})
+    bump_library_version()
+    return jsonify({'success': True, 'deleted_tag': tag, 'remaining_tags': taglib.to_text(video.get('custom_tags'))})
 
 
 @app.route('/storage-check', methods=['GET'])
@@ -1584,8 +2238,9 @@ def storage_check():
         'STORAGE_BASE': _STORAGE_BASE,
         'UPLOADS_FOLDER': UPLOADS_FOLDER,
         'THUMBNAILS_FOLDER': THUMBNAILS_FOLDER,
+        'PREVIEWS_FOLDER': PREVIEWS_FOLDER,
     }
-    for folder in [UPLOADS_FOLDER, THUMBNAILS_FOLDER, FRAMES_FOLDER]:
+    for folder in [UPLOADS_FOLDER, THUMBNAILS_FOLDER, FRAMES_FOLDER, PREVIEWS_FOLDER]:
         exists = os.path.exists(folder)
         writable = os.access(folder, os.W_OK) if exists else False
         try:
@@ -1598,6 +2253,7 @@ def storage_check():
         info['disk'] = {'total_gb': round(total/1e9,2), 'used_gb': round(used/1e9,2), 'free_gb': round(free/1e9,2)}
     except Exception as e:
         info['disk_error'] = str(e)
+    info['STORAGE_DRIVER'] = media_store.driver
     # Test write
     test_path = os.path.join(UPLOADS_FOLDER, '_write_test.tmp')
     try:
@@ -1626,7 +2282,11 @@ def debug_reprocess(video_id):
         # Delete old processing data
         frames_col.delete_many({'video_id': video_id})
         clips_col.delete_many({'video_id': video_id})
-        videos_col.update_one({'id': video_id}, {'$set': {'status': 'processing', 'error': None}})
+        update_video_facets(video_id, video.get('facets'), None)
+        videos_col.update_one({'id': video_id}, {'$set': {'status': 'processing', 'error': None,
+                                                          'clip_count': 0, 'frame_count': 0,
+                                                          'facets': None}})
+        bump_library_version()
         try:
             process_video(local_path, filename, category)
             return jsonify({'success': True, 'message': f'Processed {filename}'})
@@ -1639,20 +2299,22 @@ def debug_reprocess(video_id):
 @app.route('/delete-all', methods=['DELETE'])
 def delete_all_videos():
     try:
-        all_videos = list(videos_col.find({}, {'filename': 1, 'thumbnail': 1}))
-        deleted_files = 0
-        for video in all_videos:
-            for folder, field in [(UPLOADS_FOLDER, 'filename'), (THUMBNAILS_FOLDER, 'thumbnail')]:
-                fname = video.get(field)
-                if fname:
-                    path = os.path.join(folder, fname)
-                    if os.path.exists(path):
-                        os.remove(path)
-                        deleted_files += 1
+        all_videos = list(videos_col.find({}, {'filename': 1, 'thumbnail': 1, 'preview': 1, 'sprite': 1, 'sprite_vtt': 1}))
+        keys = [f"{prefix}/{video[field]}"
+                for video in all_videos
+                for prefix, field in [('videos', 'filename'), ('thumbnails', 'thumbnail'),
+                                      ('previews', 'preview'), ('previews', 'sprite'),
+                                      ('previews', 'sprite_vtt')]
+                if video.get(field)]
+        deleted_files = delete_media(keys)
         videos_col.delete_many({})
         clips_col.delete_many({})
         frames_col.delete_many({})
-        counters_col.delete_many({})
+        # ID counters are kept: workers still hold reserved blocks, and restarting
+        # the sequence would hand those IDs out again (IDs stay unique, not dense)
+        facets_col.delete_many({})
+        bump_library_version()
+        deleted_files += blob_store.prune()
         return jsonify({'success': True, 'deleted_videos': len(all_videos), 'deleted_files': deleted_files})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1661,7 +2323,7 @@ def delete_all_videos():
 @app.route('/delete/<int:video_id>', methods=['DELETE'])
 def delete_video(video_id):
     try:
-        video = videos_col.find_one({'id': video_id}, {'filename': 1, 'thumbnail': 1, 'video_url': 1})
+        video = videos_col.find_one({'id': video_id}, {'filename': 1, 'thumbnail': 1, 'video_url': 1, 'facets': 1, 'sha256': 1})
         if not video:
             print(f"⚠️ Video ID {video_id} not found, returning success (already deleted)")
             return jsonify({'success': True, 'message': 'Video already deleted or does not exist'})
@@ -1672,21 +2334,18 @@ def delete_video(video_id):
         clips_col.delete_many({'video_id': video_id})
         frames_col.delete_many({'video_id': video_id})
         videos_col.delete_one({'id': video_id})
-
-        video_path = os.path.join(UPLOADS_FOLDER, filename)
-        if os.path.exists(video_path):
-            try:
-                os.remove(video_path)
-            except Exception as e:
-                print(f"⚠️ Could not delete video file: {e}")
+        update_video_facets(video_id, video.get('facets'), None)
+        bump_library_version()
 
         thumb_name = f"thumb_{os.path.splitext(filename)[0]}.jpg"
-        thumb_path = os.path.join(THUMBNAILS_FOLDER, thumb_name)
-        if os.path.exists(thumb_path):
-            try:
-                os.remove(thumb_path)
-            except Exception as e:
-                print(f"⚠️ Could not delete thumbnail: {e}")
+        preview_names = list(previews.names(filename).values())
+        uploads_index.discard(filename)
+        thumbnails_index.discard(thumb_name)
+        for name in preview_names:
+            previews_index.discard(name)
+        delete_media([f'videos/{filename}', f'thumbnails/{thumb_name}'] +
+                     [f'previews/{name}' for name in preview_names])
+        blob_store.release(video.get('sha256'))
 
         return jsonify({'success': True, 'message': f'Deleted {filename}'})
     except Exception as e:
@@ -1,12 +1,19 @@
 import os
+import logging
 import sqlite3
+import threading
 import subprocess
 import math
 import base64
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-from openai import OpenAI
+from model_providers import make_openai_client
+import applog
+import sqlite_migrations
+import facets
+import tags as taglib
+import ranking
 from dotenv import load_dotenv
 import tempfile
 import json
@@ -28,6 +35,9 @@ else:
 
 app = Flask(__name__, static_folder='.')
 CORS(app)
+applog.init_app(app)
+log = applog.get_logger('semantic')
+_search_sampler = applog.Sampler()  # per-frame skip/detect messages in search()
 
 # Configuration
 UPLOAD_FOLDER = 'uploads'
@@ -38,11 +48,30 @@ DATABASE = 'broll_semantic.db'
 CHUNK_DURATION = 15  # 15-second chunks
 FRAME_INTERVAL = 10  # Extract 1 frame every 10 seconds for visual analysis
 
+class ReusableConnection(sqlite3.Connection):
+    """Per-thread SQLite connection: close() just ends any open transaction so the
+    connection (and its pragmas) can be handed out again by get_db_connection()."""
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def really_close(self):
+        super().close()
+
+
+_thread_db = threading.local()
+
+
 # SQLite connection helper with timeout
 def get_db_connection():
-    """Get SQLite connection with proper timeout to prevent locking."""
-    conn = sqlite3.connect(DATABASE, timeout=30.0, isolation_level='DEFERRED')
-    conn.execute('PRAGMA journal_mode=WAL')  # Write-Ahead Logging for better concurrency
+    """Get this thread's SQLite connection (opened once; WAL itself is set in init_db)."""
+    conn = getattr(_thread_db, 'conn', None)
+    if conn is None or getattr(_thread_db, 'path', None) != DATABASE:
+        conn = sqlite3.connect(DATABASE, timeout=30.0, isolation_level='DEFERRED', factory=ReusableConnection)
+        conn.execute('PRAGMA synchronous=NORMAL')  # safe with WAL, avoids an fsync per commit
+        _thread_db.conn = conn
+        _thread_db.path = DATABASE
     return conn
 
 # Ensure folders exist
@@ -51,152 +80,20 @@ os.makedirs(THUMBNAILS_FOLDER, exist_ok=True)
 os.makedirs(FRAMES_FOLDER, exist_ok=True)
 
 # Initialize OpenAI client
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+client = make_openai_client()
 
 # Database initialization
 def init_db():
+    """Check the schema version; migrate (see sqlite_migrations.py / migrate.py) only when behind."""
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Enable WAL mode for better concurrency (prevents database locked errors)
-    cursor.execute('PRAGMA journal_mode=WAL')
-    cursor.execute('PRAGMA busy_timeout=30000')  # 30 second timeout
-    
-    # Videos table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS videos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            filename TEXT NOT NULL UNIQUE,
-            upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            duration REAL NOT NULL,
-            status TEXT DEFAULT 'processing',
-            thumbnail TEXT,
-            custom_tags TEXT DEFAULT ''
-        )
-    ''')
-    
-    # Clips table with audio embeddings
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS clips (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            video_id INTEGER NOT NULL,
-            filename TEXT NOT NULL,
-            start_time REAL NOT NULL,
-            end_time REAL NOT NULL,
-            duration REAL NOT NULL,
-            transcript_text TEXT NOT NULL,
-            embedding BLOB NOT NULL,
-            FOREIGN KEY (video_id) REFERENCES videos (id)
-        )
-    ''')
-    
-    # Visual analysis table for multi-modal search with emotions, OCR, genres, and advanced tagging
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS visual_frames (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            video_id INTEGER NOT NULL,
-            filename TEXT NOT NULL,
-            timestamp REAL NOT NULL,
-            frame_path TEXT NOT NULL,
-            visual_description TEXT NOT NULL,
-            visual_embedding BLOB NOT NULL,
-            emotion TEXT,
-            ocr_text TEXT,
-            tags TEXT,
-            genres TEXT,
-            deep_emotions TEXT,
-            scene_context TEXT,
-            people_description TEXT,
-            environment TEXT,
-            dialogue_context TEXT,
-            series_movie TEXT,
-            target_audience TEXT,
-            scene_type TEXT,
-            FOREIGN KEY (video_id) REFERENCES videos (id)
-        )
-    ''')
-    
-    # Add new columns to visual_frames if they don't exist (migration)
-    cursor.execute("PRAGMA table_info(visual_frames)")
-    columns = [col[1] for col in cursor.fetchall()]
-    
-    if 'emotion' not in columns:
-        print("🔄 Adding 'emotion' column to visual_frames...")
-        cursor.execute('ALTER TABLE visual_frames ADD COLUMN emotion TEXT')
-    
-    if 'ocr_text' not in columns:
-        print("🔄 Adding 'ocr_text' column to visual_frames...")
-        cursor.execute('ALTER TABLE visual_frames ADD COLUMN ocr_text TEXT')
-    
-    if 'tags' not in columns:
-        print("🔄 Adding 'tags' column to visual_frames...")
-        cursor.execute('ALTER TABLE visual_frames ADD COLUMN tags TEXT')
-    
-    if 'genres' not in columns:
-        print("🔄 Adding 'genres' column to visual_frames...")
-        cursor.execute('ALTER TABLE visual_frames ADD COLUMN genres TEXT')
-    
-    # Add actors and media_type columns
-    if 'actors' not in columns:
-        print("🔄 Adding 'actors' column to visual_frames...")
-        cursor.execute('ALTER TABLE visual_frames ADD COLUMN actors TEXT')
-    
-    if 'media_type' not in columns:
-        print("🔄 Adding 'media_type' column to visual_frames...")
-        cursor.execute('ALTER TABLE visual_frames ADD COLUMN media_type TEXT')
-    
-    # Add new advanced tagging columns
-    if 'deep_emotions' not in columns:
-        print("🔄 Adding 'deep_emotions' column for advanced tagging...")
-        cursor.execute('ALTER TABLE visual_frames ADD COLUMN deep_emotions TEXT')
-    
-    if 'scene_context' not in columns:
-        print("🔄 Adding 'scene_context' column for advanced tagging...")
-        cursor.execute('ALTER TABLE visual_frames ADD COLUMN scene_context TEXT')
-    
-    if 'people_description' not in columns:
-        print("🔄 Adding 'people_description' column for advanced tagging...")
-        cursor.execute('ALTER TABLE visual_frames ADD COLUMN people_description TEXT')
-    
-    if 'environment' not in columns:
-        print("🔄 Adding 'environment' column for advanced tagging...")
-        cursor.execute('ALTER TABLE visual_frames ADD COLUMN environment TEXT')
-    
-    if 'dialogue_context' not in columns:
-        print("🔄 Adding 'dialogue_context' column for advanced tagging...")
-        cursor.execute('ALTER TABLE visual_frames ADD COLUMN dialogue_context TEXT')
-    
-    if 'series_movie' not in columns:
-        print("🔄 Adding 'series_movie' column for advanced tagging...")
-        cursor.execute('ALTER TABLE visual_frames ADD COLUMN series_movie TEXT')
-    
-    if 'target_audience' not in columns:
-        print("🔄 Adding 'target_audience' column for advanced tagging...")
-        cursor.execute('ALTER TABLE visual_frames ADD COLUMN target_audience TEXT')
-    
-    if 'scene_type' not in columns:
-        print("🔄 Adding 'scene_type' column for advanced tagging...")
-        cursor.execute('ALTER TABLE visual_frames ADD COLUMN scene_type TEXT')
-    
-    if 'actors' not in columns:
-        print("🔄 Adding 'actors' column for actor recognition...")
-        cursor.execute('ALTER TABLE visual_frames ADD COLUMN actors TEXT')
-    
-    if 'media_type' not in columns:
-        print("🔄 Adding 'media_type' column (Movie/Series/TV/Ad)...")
-        cursor.execute('ALTER TABLE visual_frames ADD COLUMN media_type TEXT')
-    
-    # Add custom_tags column to videos table for user-added tags
-    cursor.execute("PRAGMA table_info(videos)")
-    video_columns = [col[1] for col in cursor.fetchall()]
-    
-    if 'custom_tags' not in video_columns:
-        print("🔄 Adding 'custom_tags' column to videos table for user tags...")
-        cursor.execute("ALTER TABLE videos ADD COLUMN custom_tags TEXT DEFAULT ''")
-    
-    conn.commit()
+    if sqlite_migrations.current_version(conn) < sqlite_migrations.LATEST_VERSION:
+        # Enable WAL mode for better concurrency (persistent, so set once with the schema)
+        conn.execute('PRAGMA journal_mode=WAL')
+        applied = sqlite_migrations.migrate(conn)
+        if applied:
+            log.info("🔄 Applied schema migrations: %s", applied)
     conn.close()
-    print("✅ Database initialized")
+    log.info("✅ Database initialized (schema v%s)", sqlite_migrations.LATEST_VERSION)
 
 init_db()
 
@@ -1330,11 +1227,109 @@ def cosine_similarity(embedding1_blob, embedding2_blob):
         print(f"❌ Error calculating similarity: {e}")
         return 0.0
 
+CLIP_INSERT_SQL = '''
+    INSERT INTO clips (video_id, filename, start_time, end_time, duration, transcript_text, embedding)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+# Clips are committed in batches of this size while a transcript is embedded
+CLIP_INSERT_BATCH = 50
+
+FRAME_INSERT_SQL = '''
+    INSERT INTO visual_frames (
+        video_id, filename, timestamp, frame_path, visual_description, visual_embedding, 
+        emotion, ocr_text, tags, genres,
+        deep_emotions, scene_context, people_description, environment, 
+        dialogue_context, series_movie, target_audience, scene_type, actors, media_type,
+        emotion_tags, laugh_tags, contextual_tags, character_tags, semantic_tags
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def frame_row_facets(frame_rows):
+    """Facet values of one video from its FRAME_INSERT_SQL rows."""
+    return facets.video_facets([
+        {'emotion': row[6], 'genres': row[9], 'series_movie': row[15], 'actors': row[18]}
+        for row in frame_rows
+    ])
+
+
+def update_video_facets(cursor, video_id, new_facets):
+    """Move facet_counts from the video's stored facets to new_facets (None = video removed).
+
+    Runs on the caller's cursor so it commits together with the frame writes.
+    """
+    row = cursor.execute('SELECT facets FROM videos WHERE id = ?', (video_id,)).fetchone()
+    old = json.loads(row[0]) if row and row[0] else None
+    if new_facets is not None and old and not new_facets.get('categories'):
+        # Videos here carry no category of their own; keep one set by a migration
+        new_facets['categories'] = old.get('categories', [])
+    deltas = facets.facet_deltas(old, new_facets)
+    if deltas:
+        cursor.executemany('''
+            INSERT INTO facet_counts (facet, value, count) VALUES (?, ?, ?)
+            ON CONFLICT (facet, value) DO UPDATE SET count = count + excluded.count
+        ''', deltas)
+        cursor.execute('DELETE FROM facet_counts WHERE count <= 0')
+    if new_facets is not None:
+        cursor.execute('UPDATE videos SET facets = ? WHERE id = ?', (json.dumps(new_facets), video_id))
+
+
+def write_frame_tags(cursor, video_id):
+    """Rebuild the frame_tags rows of one video from its visual_frames (caller's transaction)."""
+    fields = taglib.FRAME_TAG_FIELDS
+    cursor.execute('DELETE FROM frame_tags WHERE video_id = ?', (video_id,))
+    rows = cursor.execute(f"SELECT id, {', '.join(fields)} FROM visual_frames WHERE video_id = ?",
+                          (video_id,)).fetchall()
+    cursor.executemany('INSERT OR IGNORE INTO frame_tags (frame_id, video_id, field, tag) VALUES (?, ?, ?, ?)',
+                       [(row[0], video_id, field, tag)
+                        for row in rows
+                        for field, value in zip(fields, row[1:])
+                        for tag in taglib.to_list(value)])
+
+
+def sync_custom_tags(cursor, video_id):
+    """Refresh the videos.custom_tags display copy from video_tags; returns it."""
+    rows = cursor.execute('SELECT tag FROM video_tags WHERE video_id = ? ORDER BY rowid', (video_id,)).fetchall()
+    text = taglib.to_text([row[0] for row in rows])
+    cursor.execute('UPDATE videos SET custom_tags = ? WHERE id = ?', (text, video_id))
+    return text
+
+
+def tag_filter_sql(tags_filter, tag_prefix):
+    """WHERE clause (alias vf) for frames carrying one of the tags / a tag with the prefix.
+
+    Frame tags and video custom tags are both answered from the junction-table indexes;
+    the prefix becomes a range scan.
+    """
+    conds, params = [], []
+    if tags_filter:
+        conds.append(f"tag IN ({', '.join('?' * len(tags_filter))})")
+        params.extend(tags_filter)
+    if tag_prefix:
+        conds.append('(tag >= ? AND tag < ?)')
+        params.extend([tag_prefix, tag_prefix[:-1] + chr(ord(tag_prefix[-1]) + 1)])
+    match = ' OR '.join(conds)
+    sql = (f'(vf.id IN (SELECT frame_id FROM frame_tags WHERE {match}) '
+           f'OR vf.video_id IN (SELECT video_id FROM video_tags WHERE {match}))')
+    return sql, params + params
+
+
+def nearby_transcript(segments, timestamp, window=10, limit=3):
+    """Transcript of up to `limit` (start, end, text) segments overlapping timestamp ± window."""
+    near = [text for start, end, text in sorted(segments)
+            if start <= timestamp + window and end >= timestamp - window and text]
+    return ' '.join(near[:limit])
+
+
 def process_video(video_path, filename):
-    """Process video: extract audio, transcribe, create embeddings, and store."""
-    print(f"\n{'='*60}")
-    print(f"🎬 PROCESSING VIDEO: {filename}")
-    print(f"{'='*60}")
+    """Process video: extract audio, transcribe, create embeddings, and store.
+
+    All OpenAI/Gemini calls happen outside any transaction; each stage's rows are
+    written with one executemany + commit.
+    """
+    log.info("🎬 PROCESSING VIDEO: %s", filename)
+    debug = log.isEnabledFor(logging.DEBUG)
     
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -1342,7 +1337,7 @@ def process_video(video_path, filename):
     try:
         # Get video duration
         video_duration = get_video_duration(video_path)
-        print(f"⏱️  Video duration: {video_duration:.2f}s")
+        log.info("⏱️  Video duration: %.2fs", video_duration)
         
         # Generate thumbnail (at 1 second or 10% into video, whichever is smaller)
         thumbnail_time = min(1.0, video_duration * 0.1)
@@ -1357,22 +1352,32 @@ def process_video(video_path, filename):
         ''', (filename, video_duration, thumbnail_filename))
         video_id = cursor.lastrowid
         conn.commit()
-        print(f"✅ Video record created (ID: {video_id})")
+        log.info("✅ Video record created (ID: %s)", video_id)
         
         # Extract audio
-        print("\n🔊 Step 1: Extracting audio...")
+        log.info("🔊 Step 1: Extracting audio...")
         audio_path = extract_audio(video_path)
         
         segment_count = 0
+        clip_rows = []      # committed to the clips table
+        pending = []        # embedded, not yet written
+        
+        def flush_clips():
+            # One short transaction per batch; the embedding calls stay outside it
+            if pending:
+                cursor.executemany(CLIP_INSERT_SQL, pending)
+                conn.commit()
+                clip_rows.extend(pending)
+                pending.clear()
         
         if audio_path:
             try:
                 # Transcribe
-                print("\n🎤 Step 2: Transcribing with Whisper...")
+                log.info("🎤 Step 2: Transcribing with Whisper...")
                 transcript = transcribe_audio(audio_path)
                 
                 # Process segments and create embeddings
-                print(f"\n🧠 Step 3: Creating embeddings for {len(transcript.segments)} segments...")
+                log.info("🧠 Step 3: Creating embeddings for %d segments...", len(transcript.segments))
                 
                 for i, segment in enumerate(transcript.segments):
                     start_time = segment.start
@@ -1383,21 +1388,17 @@ def process_video(video_path, filename):
                         continue
                     
                     segment_count += 1
-                    print(f"  📝 Segment {segment_count}/{len(transcript.segments)}: {text[:60]}...")
+                    if debug:
+                        log.debug("  📝 Segment %d/%d: %s...", segment_count, len(transcript.segments), text[:60])
                     
                     # Create combined text with metadata for embedding
                     # Extract clean title from filename
                     clean_title = os.path.splitext(filename)[0].replace('-', ' ').replace('_', ' ')
                     combined_text_audio = f"Title: {clean_title}. Transcript: {text}"
                     
-                    print(f"     🧠 Creating embedding with title metadata...")
                     embedding_blob = create_embedding(combined_text_audio)
                     
-                    # Store in database
-                    cursor.execute('''
-                        INSERT INTO clips (video_id, filename, start_time, end_time, duration, transcript_text, embedding)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (
+                    pending.append((
                         video_id,
                         filename,
                         start_time,
@@ -1406,53 +1407,42 @@ def process_video(video_path, filename):
                         text,
                         embedding_blob
                     ))
-                    print(f"     ✅ Stored in database")
+                    if len(pending) >= CLIP_INSERT_BATCH:
+                        flush_clips()
                 
             except Exception as e:
-                import traceback
-                print(f"⚠️  Audio transcription error: {e}")
-                print(traceback.format_exc())
+                log.warning("⚠️  Audio transcription error: %s", e, exc_info=True)
             
             finally:
+                # Keep the clips embedded before any failure
+                try:
+                    flush_clips()
+                except sqlite3.Error as e:
+                    conn.rollback()
+                    pending.clear()
+                    log.warning("⚠️  Could not store clips: %s", e)
                 # Clean up temporary audio file
                 if audio_path and os.path.exists(audio_path):
                     os.remove(audio_path)
-                    print("🧹 Cleaned up temporary audio file")
+                    log.debug("🧹 Cleaned up temporary audio file")
         else:
-            print("\n⚠️  No audio track found - Skipping transcription (normal for GIFs/silent videos)")
+            log.info("⚠️  No audio track found - Skipping transcription (normal for GIFs/silent videos)")
+        segment_count = len(clip_rows)
         
         # Step 4: Visual Analysis (ALWAYS RUN - for both videos and GIFs)
-        print(f"\n🎨 Step 4: Visual content analysis...")
+        log.info("🎨 Step 4: Visual content analysis...")
         frames = extract_frames_for_analysis(video_path, video_duration, filename)
         
-        # GET TRANSCRIPT FOR THIS VIDEO (for context-rich visual descriptions)
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT transcript_text FROM clips WHERE video_id = ? ORDER BY start_time', (video_id,))
-        transcript_rows = cursor.fetchall()
-        full_transcript = ' '.join([row[0] for row in transcript_rows if row[0]]) if transcript_rows else ''
-        conn.close()
-        print(f"📝 Transcript loaded: {len(full_transcript)} characters")
+        # Stored transcript segments for this video are already in memory (for context-rich visual descriptions)
+        segments = [(row[2], row[3], row[5]) for row in clip_rows]
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        visual_count = 0
+        frame_rows = []
         for frame_data in frames:
-            print(f"  🔍 Analyzing frame at {frame_data['timestamp']}s...")
+            if debug:
+                log.debug("  🔍 Analyzing frame at %ss...", frame_data['timestamp'])
             
             # Get transcript segment near this timestamp (±10s window)
-            cursor.execute('''
-                SELECT transcript_text FROM clips 
-                WHERE video_id = ? 
-                AND start_time <= ? 
-                AND end_time >= ?
-                ORDER BY start_time
-                LIMIT 3
-            ''', (video_id, frame_data['timestamp'] + 10, frame_data['timestamp'] - 10))
-            
-            nearby_transcripts = cursor.fetchall()
-            context_transcript = ' '.join([row[0] for row in nearby_transcripts if row[0]])
+            context_transcript = nearby_transcript(segments, frame_data['timestamp'])
             
             # Analyze frame with Vision API + transcript context + filename hint
             analysis = analyze_frame_with_vision(frame_data['path'], transcript_context=context_transcript, filename_hint=filename)
@@ -1493,19 +1483,19 @@ def process_video(video_path, filename):
                 
                 # FALLBACK: If Vision API didn't return categorized tags, INTELLIGENTLY GENERATE them
                 if not emotion_tags and not laugh_tags and not contextual_tags:
-                    print(f"     ⚠️  Vision API didn't return categorized tags - intelligently generating from analysis...")
+                    log.info("     ⚠️  Vision API didn't return categorized tags - intelligently generating from analysis...")
                     generated = intelligently_generate_categorized_tags(analysis)
                     emotion_tags = generated['emotion_tags']
                     laugh_tags = generated['laugh_tags']
                     contextual_tags = generated['contextual_tags']
                     character_tags = generated['character_tags']
                     semantic_tags = generated['semantic_tags']
-                    print(f"     ✅ Generated {generated['total_count']} tags: Emotion={generated['counts']['emotion']}, Laugh={generated['counts']['laugh']}, Context={generated['counts']['contextual']}, Char={generated['counts']['character']}, Semantic={generated['counts']['semantic']}")
+                    if debug:
+                        log.debug("     ✅ Generated %d tags: %s", generated['total_count'], generated['counts'])
                 
                 
-                print(f"     📝 Description: {description[:80]}...")
-                if actors:
-                    print(f"     🎭 Actors: {actors}")
+                if debug:
+                    log.debug("     📝 Description: %s... | 🎭 Actors: %s", description[:80], actors or '-')
                 
                 # Extract clean title from filename for metadata
                 clean_title = os.path.splitext(filename)[0].replace('-', ' ').replace('_', ' ')
@@ -1542,20 +1532,10 @@ def process_video(video_path, filename):
                     combined_text += f" Genres: {genres}."
                 
                 # Create embedding from comprehensive metadata
-                print(f"     🧠 Creating visual embedding with comprehensive metadata...")
                 visual_embedding = create_embedding(combined_text)
                 
-                # Store visual data with ALL fields (basic + advanced tagging + categorized tags)
-                cursor.execute('''
-                    INSERT INTO visual_frames (
-                        video_id, filename, timestamp, frame_path, visual_description, visual_embedding, 
-                        emotion, ocr_text, tags, genres,
-                        deep_emotions, scene_context, people_description, environment, 
-                        dialogue_context, series_movie, target_audience, scene_type, actors, media_type,
-                        emotion_tags, laugh_tags, contextual_tags, character_tags, semantic_tags
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
+                # Queue visual data with ALL fields (basic + advanced tagging + categorized tags)
+                frame_rows.append((
                     video_id,
                     filename,
                     frame_data['timestamp'],
@@ -1582,30 +1562,28 @@ def process_video(video_path, filename):
                     character_tags,
                     semantic_tags
                 ))
-                visual_count += 1
-                print(f"     ✅ Visual data stored")
         
-        # Update video status to complete
+        # Store all frames and mark the video complete in one transaction
+        visual_count = len(frame_rows)
+        cursor.executemany(FRAME_INSERT_SQL, frame_rows)
+        write_frame_tags(cursor, video_id)
+        update_video_facets(cursor, video_id, frame_row_facets(frame_rows))
         cursor.execute('''
             UPDATE videos SET status = 'complete' WHERE id = ?
         ''', (video_id,))
         conn.commit()
         
-        print(f"\n{'='*60}")
-        print(f"✅ VIDEO PROCESSING COMPLETE!")
-        print(f"   - {segment_count} audio clips created")
-        print(f"   - {visual_count} visual frames analyzed")
-        print(f"   - Multi-modal embeddings stored")
-        print(f"   - Ready for visual + audio search")
-        print(f"{'='*60}\n")
+        log.info("✅ VIDEO PROCESSING COMPLETE! %d audio clips, %d visual frames",
+                 segment_count, visual_count, extra={'video_id': video_id, 'clips': segment_count, 'frames': visual_count})
     
     except Exception as e:
         # Mark video as failed
+        conn.rollback()
         cursor.execute('''
             UPDATE videos SET status = 'failed' WHERE id = ?
         ''', (video_id,))
         conn.commit()
-        print(f"\n❌ VIDEO PROCESSING FAILED: {e}")
+        log.error("❌ VIDEO PROCESSING FAILED: %s", e, extra={'video_id': video_id})
         raise
     finally:
         conn.close()
@@ -1652,6 +1630,9 @@ def upload_file():
             
             # Delete existing video record and all associated data
             video_id = existing_video[0]
+            update_video_facets(cursor, video_id, None)
+            cursor.execute('DELETE FROM frame_tags WHERE video_id = ?', (video_id,))
+            cursor.execute('DELETE FROM video_tags WHERE video_id = ?', (video_id,))
             cursor.execute('DELETE FROM clips WHERE video_id = ?', (video_id,))
             cursor.execute('DELETE FROM visual_frames WHERE video_id = ?', (video_id,))
             cursor.execute('DELETE FROM videos WHERE id = ?', (video_id,))
@@ -1669,42 +1650,89 @@ def upload_file():
             process_video(filepath, filename)
             return jsonify({'success': True, 'filename': filename})
         except Exception as e:
-            import traceback
-            error_detail = traceback.format_exc()
-            print(f"❌ ERROR during processing:\n{error_detail}")
+            log.exception("❌ ERROR during processing %s", filename)
             return jsonify({'error': str(e)}), 500
     
     print(f"❌ Invalid file type for {file.filename}")
     return jsonify({'error': 'Invalid file type'}), 400
 
+SEARCH_RESULT_LIMIT = 20
+
+
+def audio_result(row, similarity):
+    """Search result for a clips row (id, video_id, filename, start_time, end_time, duration, transcript_text, ...)."""
+    clip_id, video_id, filename, start_time, end_time, duration, text = row[:7]
+    return {
+        'id': f"audio_{clip_id}",
+        'video_id': video_id,
+        'filename': filename,
+        'timestamp': start_time,
+        'start_time': start_time,
+        'end_time': end_time,
+        'duration': duration,
+        'text': text,
+        'similarity': similarity,
+        'source': 'audio'
+    }
+
+
+def visual_result(row, similarity):
+    """Search result for a visual_frames row as selected by /search."""
+    frame_id, video_id, filename, timestamp, description, _, emotion, ocr_text, tags, genres, _, _, _, _, _, _, custom_tags, emotion_tags, laugh_tags, contextual_tags, character_tags, semantic_tags = row
+    
+    # Build display text with emotion and OCR
+    display_text = f"[Visual] {description}"
+    if emotion and emotion != 'neutral':
+        display_text = f"[Visual - {emotion.title()}] {description}"
+    if ocr_text:
+        display_text += f" | Text: \"{ocr_text}\""
+    
+    return {
+        'id': f"visual_{frame_id}",
+        'video_id': video_id,
+        'filename': filename,
+        'timestamp': timestamp,
+        'start_time': timestamp,
+        'end_time': timestamp + 10,  # Show 10s window
+        'duration': 10.0,
+        'text': display_text,
+        'similarity': similarity,
+        'source': 'visual',
+        'emotion': emotion or 'neutral',
+        'ocr_text': ocr_text or '',
+        'tags': tags or '',
+        'genres': genres or '',
+        'custom_tags': custom_tags or '',
+        'emotion_tags': emotion_tags or '',
+        'laugh_tags': laugh_tags or '',
+        'contextual_tags': contextual_tags or '',
+        'character_tags': character_tags or '',
+        'semantic_tags': semantic_tags or ''
+    }
+
+
 @app.route('/search', methods=['POST'])
 def search():
-    print("\n" + "="*60)
-    print("🔍 MULTI-MODAL SEARCH REQUEST")
-    print("="*60)
-    
+    debug = log.isEnabledFor(logging.DEBUG)
     data = request.json
     query = data.get('query', '').strip()
     emotions_filter = data.get('emotions', [])  # List of selected emotions
     genres_filter = data.get('genres', [])  # List of selected genres
+    tags_filter = taglib.to_list(data.get('tags'))  # Exact tags (any categorised field or custom tag)
+    tag_prefix = (data.get('tag_prefix') or '').strip()
+    tag_filtered = bool(tags_filter or tag_prefix)
     
     # Allow filter-only search (no query text required)
-    if not query and not emotions_filter and not genres_filter:
-        print("❌ Empty query and no filters")
+    if not query and not emotions_filter and not genres_filter and not tag_filtered:
         return jsonify({'results': []})
     
-    print(f"🔎 Query: \"{query}\"")
-    if emotions_filter:
-        print(f"🎭 Emotion Filters: {emotions_filter}")
-    if genres_filter:
-        print(f"🎬 Genre Filters: {genres_filter}")
+    log.info("🔍 SEARCH: \"%s\"", query, extra={'emotions': emotions_filter, 'genres': genres_filter})
     
     try:
         # Create embedding for search query (only if query exists)
         query_embedding = None
         detected_series = None
         if query:
-            print("🧠 Creating query embedding...")
             query_embedding = create_embedding(query)
             
             # DETECT SERIES/MOVIE NAME IN QUERY for filtering
@@ -1756,7 +1784,7 @@ def search():
             for series in known_series:
                 if series in query_lower:
                     detected_series = series
-                    print(f"🎬 Detected series/movie filter: '{detected_series}' - will filter out other series!")
+                    log.debug("🎬 Detected series/movie filter: '%s'", detected_series)
                     break
             
             # DETECT GENDER/PEOPLE FILTERS IN QUERY
@@ -1776,7 +1804,7 @@ def search():
                     # Use word boundaries to avoid partial matches (e.g., "women" shouldn't match "moment")
                     if f' {keyword} ' in f' {query_lower} ' or query_lower.startswith(keyword + ' ') or query_lower.endswith(' ' + keyword) or query_lower == keyword:
                         detected_gender = gender_type
-                        print(f"👥 Detected gender/people filter: '{gender_type}' (from keyword: '{keyword}') - will validate people descriptions!")
+                        log.debug("👥 Detected gender/people filter: '%s' (from keyword: '%s')", gender_type, keyword)
                         break
                 if detected_gender:
                     break
@@ -1793,63 +1821,59 @@ def search():
             for num_word, count in number_keywords.items():
                 if num_word in query_lower.split():
                     detected_count = count
-                    print(f"🔢 Detected people count: '{num_word}' ({count}) - will validate number of people!")
+                    log.debug("🔢 Detected people count: '%s' (%s)", num_word, count)
                     break
         
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        results = []
+        # Candidates go into a bounded heap as (score, kind, row id) + the fetched row;
+        # result dicts are only built for the survivors once scoring is done
+        top = ranking.TopK(SEARCH_RESULT_LIMIT)
+        
+        # Emotion / genre filters are checked per row before scoring (transcript
+        # clips have no genres and count as "neutral")
+        emotions_lower = [e.lower() for e in emotions_filter]
+        genres_lower = [g.lower() for g in genres_filter]
+        
+        def passes_filters(row):
+            if emotions_lower and (row[6] or 'neutral').lower() not in emotions_lower:
+                return False
+            if genres_lower and not any(g in (row[9] or '').lower().split(', ') for g in genres_lower):
+                return False
+            return True
+        
+        skip_clips = tag_filtered or bool(genres_lower) or (emotions_lower and 'neutral' not in emotions_lower)
+        
+        # Tag filters narrow the frame queries below via the frame_tags / video_tags indexes
+        frame_where, frame_params = '', ()
+        if tag_filtered:
+            tag_sql, tag_params = tag_filter_sql(tags_filter, tag_prefix)
+            frame_where, frame_params = ' WHERE ' + tag_sql, tuple(tag_params)
         
         # If filter-only search (no query), fetch all visual frames for filtering
-        if not query and (emotions_filter or genres_filter):
-            print(f"🎨 Fetching all visual content for filter-only search...")
+        if not query and (emotions_filter or genres_filter or tag_filtered):
+            log.debug("🎨 Fetching all visual content for filter-only search...")
             cursor.execute('''SELECT vf.id, vf.video_id, vf.filename, vf.timestamp, vf.visual_description, vf.visual_embedding, 
                                      vf.emotion, vf.ocr_text, vf.tags, vf.genres, vf.deep_emotions, vf.scene_context, 
                                      vf.people_description, vf.environment, vf.series_movie, vf.actors, v.custom_tags,
                                      vf.emotion_tags, vf.laugh_tags, vf.contextual_tags, vf.character_tags, vf.semantic_tags
                               FROM visual_frames vf
-                              LEFT JOIN videos v ON vf.video_id = v.id''')
+                              LEFT JOIN videos v ON vf.video_id = v.id''' + frame_where, frame_params)
             
-            for row in cursor.fetchall():
-                frame_id, video_id, filename, timestamp, description, embedding_blob, emotion, ocr_text, tags, genres, deep_emotions, scene_context, people_description, environment, series_movie, actors, custom_tags, emotion_tags, laugh_tags, contextual_tags, character_tags, semantic_tags = row
-                
-                # Build display text with emotion and OCR
-                display_text = f"[Visual] {description}"
-                if emotion and emotion != 'neutral':
-                    display_text = f"[Visual - {emotion.title()}] {description}"
-                if ocr_text:
-                    display_text += f" | Text: \"{ocr_text}\""
-                
-                results.append({
-                    'id': f"visual_{frame_id}",
-                    'video_id': video_id,
-                    'filename': filename,
-                    'timestamp': timestamp,
-                    'start_time': timestamp,
-                    'end_time': timestamp + 10,
-                    'duration': 10.0,
-                    'text': display_text,
-                    'similarity': 1.0,  # Max similarity for filter-only
-                    'source': 'visual',
-                    'emotion': emotion or 'neutral',
-                    'ocr_text': ocr_text or '',
-                    'tags': tags or '',
-                    'genres': genres or '',
-                    'custom_tags': custom_tags or '',
-                    'emotion_tags': emotion_tags or '',
-                    'laugh_tags': laugh_tags or '',
-                    'contextual_tags': contextual_tags or '',
-                    'character_tags': character_tags or '',
-                    'semantic_tags': semantic_tags or ''
-                })
+            for row in cursor:
+                if passes_filters(row):
+                    top.push(1.0, 'visual', row[0], row)  # Max similarity for filter-only
         
         # Search in audio transcripts (only if query exists)
         elif query:
-            print(f"🎤 Searching audio transcripts...")
-            cursor.execute('SELECT id, video_id, filename, start_time, end_time, duration, transcript_text, embedding FROM clips')
+            log.debug("🎤 Searching audio transcripts...")
+            # Transcript clips carry no tags or genres, so those filters leave only visual results
+            clip_rows = [] if skip_clips else cursor.execute(
+                'SELECT id, video_id, filename, start_time, end_time, duration, transcript_text, embedding FROM clips'
+            )
             
-            for row in cursor.fetchall():
+            for row in clip_rows:
                 clip_id, video_id, filename, start_time, end_time, duration, text, embedding_blob = row
                 
                 # Calculate semantic similarity
@@ -1876,30 +1900,22 @@ def search():
                     
                     if is_music_only and not is_music_query:
                         continue
-                        
-                    results.append({
-                        'id': f"audio_{clip_id}",
-                        'video_id': video_id,
-                        'filename': filename,
-                        'timestamp': start_time,
-                        'start_time': start_time,
-                        'end_time': end_time,
-                        'duration': duration,
-                        'text': text,
-                        'similarity': float(boosted_similarity),  # Use boosted score
-                        'source': 'audio'
-                    })
+                    
+                    top.push(float(boosted_similarity), 'audio', clip_id, row)  # Use boosted score
             
             # Search in visual frames (with all metadata fields) - only if query exists
-            print(f"🎨 Searching visual content...")
+            log.debug("🎨 Searching visual content...")
             cursor.execute('''SELECT vf.id, vf.video_id, vf.filename, vf.timestamp, vf.visual_description, vf.visual_embedding, 
                                      vf.emotion, vf.ocr_text, vf.tags, vf.genres, vf.deep_emotions, vf.scene_context, 
                                      vf.people_description, vf.environment, vf.series_movie, vf.actors, v.custom_tags,
                                      vf.emotion_tags, vf.laugh_tags, vf.contextual_tags, vf.character_tags, vf.semantic_tags
                               FROM visual_frames vf
-                              LEFT JOIN videos v ON vf.video_id = v.id''')
+                              LEFT JOIN videos v ON vf.video_id = v.id''' + frame_where, frame_params)
             
-            for row in cursor.fetchall():
+            # Rows are streamed off the cursor; only the heap's survivors stay referenced
+            for row in cursor:
+                if not passes_filters(row):
+                    continue
                 frame_id, video_id, filename, timestamp, description, embedding_blob, emotion, ocr_text, tags, genres, deep_emotions, scene_context, people_description, environment, series_movie, actors, custom_tags, emotion_tags, laugh_tags, contextual_tags, character_tags, semantic_tags = row
                 
                 # Calculate semantic similarity
@@ -2083,7 +2099,8 @@ def search():
                     
                     if not series_lower or detected_series not in series_lower:
                         # Skip this result - it's either Unknown or from a different movie
-                        print(f"   ⚠️ Skipping result - User searched '{detected_series}' but video is from '{series_movie or 'Unknown'}'")
+                        if debug and _search_sampler.hit():
+                            log.debug(f"   ⚠️ Skipping result - User searched '{detected_series}' but video is from '{series_movie or 'Unknown'}'")
                         continue  # Skip to next result
                 
                 # ACTOR NAME FILTERING: If query is an actor name, ONLY show videos with that actor
@@ -2116,7 +2133,8 @@ def search():
                 for actor_key, actor_variants in known_actors.items():
                     if actor_key in query_lower:
                         detected_actor = actor_variants
-                        print(f"🎭 Detected actor search: '{actor_key}' - will filter to only this actor's videos!")
+                        if debug and _search_sampler.hit():
+                            log.debug(f"🎭 Detected actor search: '{actor_key}' - will filter to only this actor's videos!")
                         break
                 
                 if detected_actor:
@@ -2128,7 +2146,8 @@ def search():
                     actor_found = any(variant in combined_actor_text for variant in detected_actor)
                     
                     if not actor_found:
-                        print(f"   ⚠️ Skipping result - User searched for {detected_actor[0]} but video has actors: '{actors or 'Unknown'}'")
+                        if debug and _search_sampler.hit():
+                            log.debug(f"   ⚠️ Skipping result - User searched for {detected_actor[0]} but video has actors: '{actors or 'Unknown'}'")
                         continue  # Skip this video - wrong actor!
                 
                 # GENDER/PEOPLE FILTERING: If gender/people keyword detected, validate people descriptions
@@ -2250,7 +2269,8 @@ def search():
                         # Word boundary check
                         if f' {variant} ' in f' {query_lower} ' or query_lower.startswith(variant + ' ') or query_lower.endswith(' ' + variant) or query_lower == variant:
                             detected_action = action
-                            print(f"🎬 Detected action filter: '{action}' - will validate this action is visible!")
+                            if debug and _search_sampler.hit():
+                                log.debug(f"🎬 Detected action filter: '{action}' - will validate this action is visible!")
                             break
                     if detected_action:
                         break
@@ -2274,10 +2294,12 @@ def search():
                     
                     # Skip if action is not present AND we have good data to validate against
                     if not action_valid and has_good_data:
-                        print(f"   ⚠️ Skipping result - '{detected_action}' not found in video")
+                        if debug and _search_sampler.hit():
+                            log.debug(f"   ⚠️ Skipping result - '{detected_action}' not found in video")
                         continue  # Skip to next result
                     elif not action_valid and not has_good_data:
-                        print(f"   ⚠️ '{detected_action}' not found, but description is incomplete - including result anyway")
+                        if debug and _search_sampler.hit():
+                            log.debug(f"   ⚠️ '{detected_action}' not found, but description is incomplete - including result anyway")
                         # Allow result through since we can't reliably validate
                 
                 # OBJECT/VISUAL ELEMENT VALIDATION: If query mentions specific objects, validate they're present
@@ -2320,7 +2342,8 @@ def search():
                         # Word boundary check - be strict for object matching
                         if f' {variant} ' in f' {query_lower} ' or query_lower.startswith(variant + ' ') or query_lower.endswith(' ' + variant) or query_lower == variant:
                             detected_object = obj
-                            print(f"👁️ Detected object filter: '{obj}' - will validate this object is visible!")
+                            if debug and _search_sampler.hit():
+                                log.debug(f"👁️ Detected object filter: '{obj}' - will validate this object is visible!")
                             break
                     if detected_object:
                         break
@@ -2349,10 +2372,12 @@ def search():
                     
                     # Skip if object is not present AND we have good data to validate against
                     if not object_valid and has_good_data:
-                        print(f"   ⚠️ Skipping result - '{detected_object}' not found in video (searched for but not visible)")
+                        if debug and _search_sampler.hit():
+                            log.debug(f"   ⚠️ Skipping result - '{detected_object}' not found in video (searched for but not visible)")
                         continue  # Skip to next result
                     elif not object_valid and not has_good_data:
-                        print(f"   ⚠️ '{detected_object}' not found, but description is incomplete - including result anyway")
+                        if debug and _search_sampler.hit():
+                            log.debug(f"   ⚠️ '{detected_object}' not found, but description is incomplete - including result anyway")
                         # Allow result through since we can't reliably validate
                 
                 # EMOTION CONTRADICTION CHECKING: Prevent opposite emotions
@@ -2387,80 +2412,24 @@ def search():
                 min_threshold = 0.30
                 
                 if boosted_similarity > min_threshold:
-                    # Build display text with emotion and OCR
-                    display_text = f"[Visual] {description}"
-                    if emotion and emotion != 'neutral':
-                        display_text = f"[Visual - {emotion.title()}] {description}"
-                    if ocr_text:
-                        display_text += f" | Text: \"{ocr_text}\""
-                    
-                    results.append({
-                        'id': f"visual_{frame_id}",
-                        'video_id': video_id,
-                        'filename': filename,
-                        'timestamp': timestamp,
-                        'start_time': timestamp,
-                        'end_time': timestamp + 10,  # Show 10s window
-                        'duration': 10.0,
-                        'text': display_text,
-                        'similarity': float(boosted_similarity),  # Use boosted score
-                        'source': 'visual',
-                        'emotion': emotion or 'neutral',
-                        'ocr_text': ocr_text or '',
-                        'tags': tags or '',
-                        'genres': genres or '',
-                        'custom_tags': custom_tags or '',
-                        'emotion_tags': emotion_tags or '',
-                        'laugh_tags': laugh_tags or '',
-                        'contextual_tags': contextual_tags or '',
-                        'character_tags': character_tags or '',
-                        'semantic_tags': semantic_tags or ''
-                    })
+                    top.push(float(boosted_similarity), 'visual', frame_id, row)  # Use boosted score
         
         conn.close()
         
-        # Apply filters AFTER semantic search (as requested)
-        if emotions_filter or genres_filter:
-            filtered_results = []
-            for result in results:
-                # Check emotion filter
-                emotion_match = True
-                if emotions_filter:
-                    result_emotion = result.get('emotion', 'neutral').lower()
-                    emotion_match = result_emotion in [e.lower() for e in emotions_filter]
-                
-                # Check genre filter
-                genre_match = True
-                if genres_filter and result.get('source') == 'visual':
-                    result_genres = result.get('genres', '').lower().split(', ')
-                    genre_match = any(g.lower() in result_genres for g in genres_filter)
-                elif genres_filter and result.get('source') == 'audio':
-                    # For audio-only results, skip genre filtering (no visual genres)
-                    genre_match = False
-                
-                # Include result if it matches all active filters
-                if emotion_match and genre_match:
-                    filtered_results.append(result)
-            
-            results = filtered_results
-            print(f"🔍 Applied filters: {len(filtered_results)} results after filtering")
-        
-        # Sort by similarity (descending) - combines audio and visual results
-        results.sort(key=lambda x: x['similarity'], reverse=True)
+        # Best first - combines audio and visual results
+        results = [audio_result(row, sim) if kind == 'audio' else visual_result(row, sim)
+                   for sim, kind, _, row in top.best()]
         
         # Count results by source
         audio_count = sum(1 for r in results if r['source'] == 'audio')
         visual_count = sum(1 for r in results if r['source'] == 'visual')
         
-        print(f"✅ Found {len(results)} total matches:")
-        print(f"   🎤 Audio: {audio_count} clips")
-        print(f"   🎨 Visual: {visual_count} frames")
-        if results:
-            print(f"   🏆 Top match ({results[0]['source']}): {results[0]['similarity']:.2%}")
+        log.info("✅ Found %d total matches (top %d: 🎤 %d audio, 🎨 %d visual)%s", top.seen, len(results),
+                 audio_count, visual_count,
+                 f", top {results[0]['source']} {results[0]['similarity']:.2%}" if results else '')
         
         # If no relevant results found, return empty with message
         if len(results) == 0:
-            print(f"⚠️  No relevant results found for '{query}' (all below relevance threshold)")
             
             # Provide specific message if series was detected but no results found
             if detected_series:
@@ -2475,12 +2444,10 @@ def search():
                 })
         
         # Return top 20 results (mixed audio + visual)
-        return jsonify({'results': results[:20]})
+        return jsonify({'results': results})
     
     except Exception as e:
-        import traceback
-        error_detail = traceback.format_exc()
-        print(f"❌ Search error:\n{error_detail}")
+        log.exception("❌ Search error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/uploads/<path:filename>')
@@ -2528,9 +2495,8 @@ def list_videos():
 @app.route('/reprocess/<int:video_id>', methods=['POST'])
 def reprocess_video(video_id):
     """Re-process a video to add visual analysis."""
-    print(f"\n{'='*60}")
-    print(f"🔄 RE-PROCESS REQUEST - Video ID: {video_id}")
-    print(f"{'='*60}")
+    log.info("🔄 RE-PROCESS REQUEST - Video ID: %s", video_id)
+    debug = log.isEnabledFor(logging.DEBUG)
     
     conn = None
     try:
@@ -2547,17 +2513,11 @@ def reprocess_video(video_id):
         
         filename, video_duration = video_data
         
-        # Check existing frames
-        cursor.execute('SELECT COUNT(*) FROM visual_frames WHERE video_id = ?', (video_id,))
-        existing_frames = cursor.fetchone()[0]
+        # Transcript segments for context-rich visual descriptions
+        cursor.execute('SELECT start_time, end_time, transcript_text FROM clips WHERE video_id = ?', (video_id,))
+        segments = cursor.fetchall()
         
-        if existing_frames > 0:
-            print(f"⚠️  Video already has {existing_frames} visual frames - DELETING OLD FRAMES")
-            cursor.execute('DELETE FROM visual_frames WHERE video_id = ?', (video_id,))
-            conn.commit()
-            print(f"   ✅ Old visual frames deleted")
-        
-        # Close connection before long operation
+        # End the read transaction before the long (network-bound) analysis
         conn.close()
         conn = None
         
@@ -2566,62 +2526,40 @@ def reprocess_video(video_id):
         if not os.path.exists(video_path):
             return jsonify({'error': 'Video file not found'}), 404
         
-        print(f"📁 Re-processing: {filename}")
-        print(f"📹 Video duration: {video_duration}s")
+        log.info("📁 Re-processing: %s (📹 %ss)", filename, video_duration)
         
         # Extract and analyze frames (without DB connection open)
-        print(f"\n🎨 Starting visual analysis...")
         try:
             frames = extract_frames_for_analysis(video_path, video_duration, filename)
             if not frames or len(frames) == 0:
-                print(f"❌ No frames could be extracted from video")
+                log.error("❌ No frames could be extracted from video")
                 return jsonify({'error': 'Failed to extract frames from video. Video may be corrupted.'}), 500
-            print(f"✅ Extracted {len(frames)} frames for analysis")
+            log.info("✅ Extracted %d frames for analysis", len(frames))
         except Exception as extract_error:
-            print(f"❌ Frame extraction error: {str(extract_error)}")
+            log.error("❌ Frame extraction error: %s", extract_error)
             return jsonify({'error': f'Failed to extract frames: {str(extract_error)}'}), 500
         
-        # Re-open connection for storing results
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # GET TRANSCRIPT FOR THIS VIDEO (for context-rich visual descriptions)
-        cursor.execute('SELECT transcript_text FROM clips WHERE video_id = ? ORDER BY start_time', (video_id,))
-        transcript_rows = cursor.fetchall()
-        full_transcript = ' '.join([row[0] for row in transcript_rows if row[0]]) if transcript_rows else ''
-        print(f"📝 Transcript loaded: {len(full_transcript)} characters")
-        
-        visual_count = 0
+        frame_rows = []
         failed_frames = 0
         for frame_data in frames:
             try:
-                print(f"  🔍 Analyzing frame at {frame_data['timestamp']}s...")
+                if debug:
+                    log.debug("  🔍 Analyzing frame at %ss...", frame_data['timestamp'])
                 
                 # Get transcript segment near this timestamp (±10s window)
-                cursor.execute('''
-                    SELECT transcript_text FROM clips 
-                    WHERE video_id = ? 
-                    AND start_time <= ? 
-                    AND end_time >= ?
-                    ORDER BY start_time
-                    LIMIT 3
-                ''', (video_id, frame_data['timestamp'] + 10, frame_data['timestamp'] - 10))
-                
-                nearby_transcripts = cursor.fetchall()
-                context_transcript = ' '.join([row[0] for row in nearby_transcripts if row[0]])
+                context_transcript = nearby_transcript(segments, frame_data['timestamp'])
                 
                 # Analyze frame with Vision API + transcript context + filename hint
                 analysis = analyze_frame_with_vision(frame_data['path'], transcript_context=context_transcript, filename_hint=filename)
                 
                 # Check if analysis was successful
                 if not analysis:
-                    print(f"     ⚠️  Frame analysis returned None - skipping this frame")
+                    log.warning("     ⚠️  Frame analysis returned None - skipping frame at %ss", frame_data['timestamp'])
                     failed_frames += 1
                     continue
                     
             except Exception as frame_error:
-                print(f"     ⚠️  Frame analysis failed: {str(frame_error)}")
-                print(f"     Skipping frame at {frame_data['timestamp']}s and continuing...")
+                log.warning("     ⚠️  Frame analysis failed at %ss, skipping: %s", frame_data['timestamp'], frame_error)
                 failed_frames += 1
                 continue  # Skip this frame and continue with next one
             
@@ -2661,19 +2599,19 @@ def reprocess_video(video_id):
                 
                 # FALLBACK: If Vision API didn't return categorized tags, INTELLIGENTLY GENERATE them
                 if not emotion_tags and not laugh_tags and not contextual_tags:
-                    print(f"     ⚠️  Vision API didn't return categorized tags - intelligently generating from analysis...")
+                    log.info("     ⚠️  Vision API didn't return categorized tags - intelligently generating from analysis...")
                     generated = intelligently_generate_categorized_tags(analysis)
                     emotion_tags = generated['emotion_tags']
                     laugh_tags = generated['laugh_tags']
                     contextual_tags = generated['contextual_tags']
                     character_tags = generated['character_tags']
                     semantic_tags = generated['semantic_tags']
-                    print(f"     ✅ Generated {generated['total_count']} tags: Emotion={generated['counts']['emotion']}, Laugh={generated['counts']['laugh']}, Context={generated['counts']['contextual']}, Char={generated['counts']['character']}, Semantic={generated['counts']['semantic']}")
+                    if debug:
+                        log.debug("     ✅ Generated %d tags: %s", generated['total_count'], generated['counts'])
                 
                 
-                print(f"     📝 Description: {description[:80]}...")
-                if actors:
-                    print(f"     🎭 Actors: {actors}")
+                if debug:
+                    log.debug("     📝 Description: %s... | 🎭 Actors: %s", description[:80], actors or '-')
                 
                 # Extract clean title from filename for metadata
                 clean_title = os.path.splitext(filename)[0].replace('-', ' ').replace('_', ' ')
@@ -2710,20 +2648,10 @@ def reprocess_video(video_id):
                     combined_text += f" Genres: {genres}."
                 
                 # Create embedding from comprehensive metadata
-                print(f"     🧠 Creating visual embedding with comprehensive metadata...")
                 visual_embedding = create_embedding(combined_text)
                 
-                # Store visual data with ALL fields (basic + advanced tagging + categorized tags)
-                cursor.execute('''
-                    INSERT INTO visual_frames (
-                        video_id, filename, timestamp, frame_path, visual_description, visual_embedding, 
-                        emotion, ocr_text, tags, genres,
-                        deep_emotions, scene_context, people_description, environment, 
-                        dialogue_context, series_movie, target_audience, scene_type, actors, media_type,
-                        emotion_tags, laugh_tags, contextual_tags, character_tags, semantic_tags
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
+                # Queue visual data with ALL fields (basic + advanced tagging + categorized tags)
+                frame_rows.append((
                     video_id,
                     filename,
                     frame_data['timestamp'],
@@ -2750,27 +2678,29 @@ def reprocess_video(video_id):
                     character_tags,
                     semantic_tags
                 ))
-                visual_count += 1
-                print(f"     ✅ Visual data stored")
         
+        visual_count = len(frame_rows)
+        if visual_count == 0:
+            log.error("❌ Re-processing failed: No frames were successfully analyzed (%d failed)", failed_frames)
+            return jsonify({'error': 'No frames could be analyzed. Please check OpenAI API key and try again.'}), 500
+        
+        # Swap old frames for new ones in a single short transaction
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM visual_frames WHERE video_id = ?', (video_id,))
+        cursor.executemany(FRAME_INSERT_SQL, frame_rows)
+        write_frame_tags(cursor, video_id)
+        update_video_facets(cursor, video_id, frame_row_facets(frame_rows))
         conn.commit()
         conn.close()
         conn = None
         
-        if visual_count == 0:
-            print(f"\n❌ Re-processing failed: No frames were successfully analyzed")
-            if failed_frames > 0:
-                print(f"   {failed_frames} frames failed during analysis")
-            return jsonify({'error': 'No frames could be analyzed. Please check OpenAI API key and try again.'}), 500
-        
-        print(f"\n✅ Re-processing complete: {visual_count} visual frames added")
-        if failed_frames > 0:
-            print(f"   ⚠️  {failed_frames} frames failed but processing continued")
+        log.info("✅ Re-processing complete: %d visual frames added, %d failed", visual_count, failed_frames)
         return jsonify({'success': True, 'visual_frames_added': visual_count, 'failed_frames': failed_frames})
         
     except sqlite3.OperationalError as e:
         error_msg = str(e)
-        print(f"❌ Database error: {error_msg}")
+        log.error("❌ Database error: %s", error_msg)
         if conn:
             try:
                 conn.close()
@@ -2778,9 +2708,7 @@ def reprocess_video(video_id):
                 pass
         return jsonify({'error': f'Database error: {error_msg}'}), 500
     except Exception as e:
-        import traceback
-        error_detail = traceback.format_exc()
-        print(f"❌ Re-process error:\n{error_detail}")
+        log.exception("❌ Re-process error: %s", e)
         if conn:
             try:
                 conn.close()
@@ -2790,32 +2718,14 @@ def reprocess_video(video_id):
 
 @app.route('/filters', methods=['GET'])
 def get_filters():
-    """Get available emotions and genres for filtering."""
+    """Get available emotions, genres, categories, actors and series (with video counts) for filtering."""
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        
-        # Get all unique emotions
-        cursor.execute('SELECT DISTINCT emotion FROM visual_frames WHERE emotion IS NOT NULL AND emotion != ""')
-        emotions = sorted([row[0] for row in cursor.fetchall()])
-        
-        # Get all unique genres (split comma-separated values)
-        cursor.execute('SELECT genres FROM visual_frames WHERE genres IS NOT NULL AND genres != ""')
-        all_genres = set()
-        for row in cursor.fetchall():
-            genres_str = row[0]
-            if genres_str:
-                for genre in genres_str.split(', '):
-                    all_genres.add(genre.strip())
-        
-        genres = sorted(list(all_genres))
-        
+        cursor.execute('SELECT facet, value, count FROM facet_counts WHERE count > 0')
+        rows = cursor.fetchall()
         conn.close()
-        
-        return jsonify({
-            'emotions': emotions,
-            'genres': genres
-        })
+        return jsonify(facets.filters_payload(rows))
     except Exception as e:
         print(f"❌ Error fetching filters: {e}")
         return jsonify({'emotions': [], 'genres': []})
@@ -2837,30 +2747,19 @@ def add_custom_tag(video_id):
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Get current custom tags
-        cursor.execute('SELECT custom_tags FROM videos WHERE id = ?', (video_id,))
-        row = cursor.fetchone()
-        
-        if not row:
+        cursor.execute('SELECT 1 FROM videos WHERE id = ?', (video_id,))
+        if not cursor.fetchone():
             conn.close()
             return jsonify({'error': 'Video not found'}), 404
         
-        current_tags = row[0] or ''
-        
-        # Parse existing tags
-        tags_list = [t.strip() for t in current_tags.split(',') if t.strip()]
-        
-        # Check if tag already exists (case-insensitive)
-        if new_tag.lower() in [t.lower() for t in tags_list]:
+        # video_tags.tag is COLLATE NOCASE, so the primary key rejects case-insensitive duplicates
+        cursor.execute('INSERT OR IGNORE INTO video_tags (video_id, tag) VALUES (?, ?)', (video_id, new_tag))
+        if cursor.rowcount == 0:
+            existing = cursor.execute('SELECT custom_tags FROM videos WHERE id = ?', (video_id,)).fetchone()[0] or ''
             conn.close()
-            return jsonify({'error': 'Tag already exists', 'tags': ', '.join(tags_list)}), 400
+            return jsonify({'error': 'Tag already exists', 'tags': existing}), 400
         
-        # Add new tag
-        tags_list.append(new_tag)
-        updated_tags = ', '.join(tags_list)
-        
-        # Update database
-        cursor.execute('UPDATE videos SET custom_tags = ? WHERE id = ?', (updated_tags, video_id))
+        updated_tags = sync_custom_tags(cursor, video_id)
         conn.commit()
         conn.close()
         
@@ -2890,26 +2789,14 @@ def delete_custom_tag(video_id, tag):
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Get current custom tags
-        cursor.execute('SELECT custom_tags FROM videos WHERE id = ?', (video_id,))
-        row = cursor.fetchone()
-        
-        if not row:
+        cursor.execute('SELECT 1 FROM videos WHERE id = ?', (video_id,))
+        if not cursor.fetchone():
             conn.close()
             return jsonify({'error': 'Video not found'}), 404
         
-        current_tags = row[0] or ''
-        
-        # Parse existing tags
-        tags_list = [t.strip() for t in current_tags.split(',') if t.strip()]
-        
-        # Remove tag (case-insensitive match)
-        tags_list = [t for t in tags_list if t.lower() != tag.lower()]
-        
-        updated_tags = ', '.join(tags_list)
-        
-        # Update database
-        cursor.execute('UPDATE videos SET custom_tags = ? WHERE id = ?', (updated_tags, video_id))
+        # Case-insensitive match through the column's NOCASE collation
+        cursor.execute('DELETE FROM video_tags WHERE video_id = ? AND tag = ?', (video_id, tag))
+        updated_tags = sync_custom_tags(cursor, video_id)
         conn.commit()
         conn.close()
         
@@ -2963,6 +2850,9 @@ def delete_video(video_id):
         conn.commit()
         print(f"   ✅ Deleted visual frames")
         
+        update_video_facets(cursor, video_id, None)
+        cursor.execute('DELETE FROM frame_tags WHERE video_id = ?', (video_id,))
+        cursor.execute('DELETE FROM video_tags WHERE video_id = ?', (video_id,))
         cursor.execute('DELETE FROM videos WHERE id = ?', (video_id,))
         conn.commit()
         print(f"   ✅ Deleted video record")
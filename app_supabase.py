@@ -23,9 +23,15 @@ from pathlib import Path
 from flask import Flask, request, jsonify, send_from_directory, redirect
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-from openai import OpenAI
+from model_providers import make_openai_client
 from dotenv import load_dotenv
 from supabase import create_client, Client
+import listing
+import tags as taglib
+import ranking
+import blobstore
+import resumable
+import objectstore
 
 load_dotenv()
 
@@ -38,6 +44,8 @@ if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
     raise RuntimeError("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in environment")
 
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+# Media files go through the shared Supabase storage driver (see objectstore.py)
+media_store = objectstore.SupabaseStore(SUPABASE_URL, SUPABASE_SERVICE_KEY, BUCKET_NAME)
 
 app = Flask(__name__, static_folder='.')
 
@@ -45,9 +53,9 @@ app = Flask(__name__, static_folder='.')
 CORS(app, 
      resources={r"/*": {
          "origins": "*",
-         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-         "allow_headers": ["Content-Type", "Authorization"],
-         "expose_headers": ["Content-Length", "X-Upload-Progress"],
+         "methods": ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+         "allow_headers": ["Content-Type", "Authorization", "If-None-Match", "Upload-Offset"],
+         "expose_headers": ["Content-Length", "X-Upload-Progress", "ETag", "Upload-Offset", "Upload-Length", "Location"],
          "max_age": 3600
      }})
 
@@ -55,6 +63,12 @@ CORS(app,
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max file size
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0  # Disable caching
 
+# Upload bodies are parsed straight into hashed staging blobs (see blobstore.py);
+# each upload gets a hard link of its blob to work from until it is in Storage.
+blob_store = blobstore.BlobStore(os.path.join(tempfile.gettempdir(), 'broll_blobs'))
+app.request_class = blobstore.request_class(blob_store)
+upload_sessions = resumable.SessionStore(os.path.join(blob_store.staging, 'sessions'))
+
 # Configuration
 THUMBNAILS_FOLDER = 'thumbnails'
 FRAMES_FOLDER = 'frames'
@@ -65,7 +79,7 @@ FRAME_INTERVAL = 10
 os.makedirs(THUMBNAILS_FOLDER, exist_ok=True)
 os.makedirs(FRAMES_FOLDER, exist_ok=True)
 
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+client = make_openai_client()
 
 
 def allowed_file(filename):
@@ -544,40 +558,17 @@ def cosine_similarity(embedding1_blob, embedding2_blob):
 
 
 def upload_to_supabase_storage(local_path, remote_path, content_type=None):
-    """Upload file to Supabase Storage with support for large files."""
-    import mimetypes
-    import requests
-    
+    """Upload file to Supabase Storage, streamed from disk.
+
+    Every size goes through the Storage REST API with the open file as the body,
+    which is sent block by block with a Content-Length taken from fstat, so
+    memory stays flat instead of holding the whole file. Transient failures
+    (429 / 5xx / connection errors) are retried.
+    """
     file_size = os.path.getsize(local_path)
-    mime_type = content_type or mimetypes.guess_type(local_path)[0] or 'application/octet-stream'
-    
-    # For files > 45MB, use direct HTTP upload with streaming
-    if file_size > 45 * 1024 * 1024:
-        print(f"📦 Large file ({file_size / 1024 / 1024:.1f}MB) - using streaming upload...")
-        
-        # Use direct Supabase Storage API with streaming
-        upload_url = f"{SUPABASE_URL}/storage/v1/object/{BUCKET_NAME}/{remote_path}"
-        
-        headers = {
-            'Authorization': f'Bearer {SUPABASE_SERVICE_KEY}',
-            'Content-Type': mime_type,
-            'x-upsert': 'true'
-        }
-        
-        with open(local_path, 'rb') as f:
-            response = requests.post(upload_url, data=f, headers=headers, timeout=300)
-            
-            if response.status_code not in [200, 201]:
-                raise Exception(f"Upload failed: {response.status_code} - {response.text[:200]}")
-        
-        return f"{SUPABASE_URL}/storage/v1/object/public/{BUCKET_NAME}/{remote_path}"
-    
-    # For smaller files, use regular supabase client
-    with open(local_path, 'rb') as f:
-        file_data = f.read()
-    
-    supabase.storage.from_(BUCKET_NAME).upload(remote_path, file_data, file_options={"content-type": mime_type, "upsert": "true"})
-    return f"{SUPABASE_URL}/storage/v1/object/public/{BUCKET_NAME}/{remote_path}"
+    print(f"📦 Streaming {file_size / 1024 / 1024:.1f}MB to Storage: {remote_path}")
+    media_store.put_file(remote_path, local_path, content_type)
+    return media_store.url(remote_path)
 
 
 def process_video(video_path, filename, category='Videos'):
@@ -625,7 +616,7 @@ def process_video(video_path, filename, category='Videos'):
         'duration': video_duration,
         'status': 'processing',
         'thumbnail': thumbnail_filename,
-        'custom_tags': '',
+        'custom_tags': [],
         'supabase_video_url': video_url,
         'category': category
     }
@@ -756,7 +747,7 @@ def process_video(video_path, filename, category='Videos'):
             'emotion': emotion,
             'ocr_text': ocr_text,
             'tags': tags,
-            'genres': genres,
+            'genres': taglib.to_list(genres),
             'deep_emotions': deep_emotions,
             'scene_context': scene_context,
             'people_description': people_description,
@@ -767,11 +758,11 @@ def process_video(video_path, filename, category='Videos'):
             'scene_type': scene_type,
             'actors': actors,
             'media_type': media_type,
-            'emotion_tags': emotion_tags,
-            'laugh_tags': laugh_tags,
-            'contextual_tags': contextual_tags,
-            'character_tags': character_tags,
-            'semantic_tags': semantic_tags,
+            'emotion_tags': taglib.to_list(emotion_tags),
+            'laugh_tags': taglib.to_list(laugh_tags),
+            'contextual_tags': taglib.to_list(contextual_tags),
+            'character_tags': taglib.to_list(character_tags),
+            'semantic_tags': taglib.to_list(semantic_tags),
             'visual_embedding': embedding_list
         }
         try:
@@ -832,7 +823,7 @@ def process_video_endpoint(video_id):
         return jsonify({'error': str(e)}), 500
 
 
-def process_video_async(tmp_path, filename, category):
+def process_video_async(tmp_path, filename, category, content_hash=None):
     """Background thread to process video - runs AFTER upload returns"""
     try:
         print(f"🎬 [BACKGROUND] Processing video: {filename} (Category: {category})")
@@ -841,10 +832,66 @@ def process_video_async(tmp_path, filename, category):
     except Exception as e:
         print(f"❌ [BACKGROUND] Error processing {filename}: {str(e)}")
     finally:
-        # Clean up temp file
+        # Clean up temp file (and its staging blob once no other upload links it)
         if os.path.exists(tmp_path):
             os.remove(tmp_path)
             print(f"🗑️ [BACKGROUND] Cleaned up temp file: {tmp_path}")
+        blob_store.release(content_hash)
+
+
+UPLOAD_CATEGORIES = ['Videos', 'GIFs', 'PS', 'Intro',
+                     'Intro-Animation', 'Intro-Location', 'Intro-Vlog',
+                     'Intro-ColdOpen', 'Intro-Narration', 'Photo']
+
+
+def accept_upload(blob_path, content_hash, size, filename, category):
+    """Replace any existing record for `filename` and process the upload in the background.
+
+    Shared by the multipart /upload and the resumable /upload/sessions paths.
+    """
+    try:
+        # Check if video already exists and delete it
+        print(f"🔍 Checking for existing video: {filename}")
+        existing = supabase.table('videos').select('id').eq('filename', filename).execute()
+        if existing.data:
+            video_id = existing.data[0]['id']
+            print(f"🔄 Found existing video (ID: {video_id}), deleting old data...")
+            supabase.table('clips').delete().eq('video_id', video_id).execute()
+            supabase.table('visual_frames').delete().eq('video_id', video_id).execute()
+            supabase.table('videos').delete().eq('id', video_id).execute()
+            print(f"✅ Old data deleted")
+        else:
+            print(f"✅ No existing video found, proceeding with new upload")
+    except Exception as db_error:
+        print(f"⚠️ Database check error (non-fatal): {str(db_error)}")
+
+    # Link the committed blob to a per-upload path instead of copying it
+    fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(filename)[1])
+    os.close(fd)
+    blob_store.link(blob_path, tmp_path)
+
+    file_size_mb = size / 1024 / 1024
+    print(f"✅ Staged upload: {tmp_path} ({file_size_mb:.1f}MB, sha256 {content_hash[:12]})")
+
+    # Start background processing thread
+    print(f"🚀 Starting background thread for: {filename}")
+    thread = threading.Thread(
+        target=process_video_async,
+        args=(tmp_path, filename, category, content_hash),
+        daemon=True
+    )
+    thread.start()
+    print(f"✅ Background thread started (Thread ID: {thread.ident})")
+    print(f"⚡ RETURNING SUCCESS IMMEDIATELY - Processing in background\n{'='*60}\n")
+
+    # Return SUCCESS immediately - video will process in background
+    return jsonify({
+        'success': True, 
+        'filename': filename,
+        'message': f'Upload successful! AI analyzing {filename} in background...',
+        'category': category,
+        'file_size_mb': round(file_size_mb, 2)
+    })
 
 
 @app.route('/upload', methods=['POST'])
@@ -872,10 +919,7 @@ def upload_file():
         print(f"📋 Category from form: '{category}'")
         
         # Allow all valid categories including Intro sub-styles and Photo
-        VALID_CATEGORIES = ['Videos', 'GIFs', 'PS', 'Intro',
-                            'Intro-Animation', 'Intro-Location', 'Intro-Vlog',
-                            'Intro-ColdOpen', 'Intro-Narration', 'Photo']
-        if category not in VALID_CATEGORIES:
+        if category not in UPLOAD_CATEGORIES:
             print(f"⚠️ Invalid category '{category}', defaulting to 'Videos'")
             category = 'Videos'
         
@@ -885,50 +929,9 @@ def upload_file():
             filename = secure_filename(file.filename)
             print(f"🔒 Secured filename: {filename}")
 
-            try:
-                # Check if video already exists and delete it
-                print(f"🔍 Checking for existing video: {filename}")
-                existing = supabase.table('videos').select('id').eq('filename', filename).execute()
-                if existing.data:
-                    video_id = existing.data[0]['id']
-                    print(f"🔄 Found existing video (ID: {video_id}), deleting old data...")
-                    supabase.table('clips').delete().eq('video_id', video_id).execute()
-                    supabase.table('visual_frames').delete().eq('video_id', video_id).execute()
-                    supabase.table('videos').delete().eq('id', video_id).execute()
-                    print(f"✅ Old data deleted")
-                else:
-                    print(f"✅ No existing video found, proceeding with new upload")
-            except Exception as db_error:
-                print(f"⚠️ Database check error (non-fatal): {str(db_error)}")
-
-            # Save to temp file
-            print(f"💾 Saving file to temp storage...")
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]) as tmp:
-                file.save(tmp.name)
-                tmp_path = tmp.name
-
-            file_size_mb = os.path.getsize(tmp_path) / 1024 / 1024
-            print(f"✅ Saved to temp: {tmp_path} ({file_size_mb:.1f}MB)")
-            
-            # Start background processing thread
-            print(f"🚀 Starting background thread for: {filename}")
-            thread = threading.Thread(
-                target=process_video_async,
-                args=(tmp_path, filename, category),
-                daemon=True
-            )
-            thread.start()
-            print(f"✅ Background thread started (Thread ID: {thread.ident})")
-            print(f"⚡ RETURNING SUCCESS IMMEDIATELY - Processing in background\n{'='*60}\n")
-            
-            # Return SUCCESS immediately - video will process in background
-            return jsonify({
-                'success': True, 
-                'filename': filename,
-                'message': f'Upload successful! AI analyzing {filename} in background...',
-                'category': category,
-                'file_size_mb': round(file_size_mb, 2)
-            })
+            # The body was hashed into a staged blob while it was parsed
+            blob_path, content_hash, size = blobstore.commit_upload(blob_store, file)
+            return accept_upload(blob_path, content_hash, size, filename, category)
         else:
             print(f"❌ ERROR: File not allowed or missing")
             return jsonify({'error': 'Invalid file type. Allowed: mp4, mov, avi, mkv, webm, gif'}), 400
@@ -943,8 +946,115 @@ def upload_file():
         return jsonify({'error': f'Upload failed: {str(e)}'}), 500
 
 
-def _run_search(query, query_embedding, emotions_filter, genres_filter, categories_filter=None):
-    """Core search logic - fetches from Supabase and computes similarity."""
+# Resumable uploads - protocol in resumable.py
+
+def _session_error(e):
+    response = jsonify({'error': str(e)})
+    response.status_code = e.status
+    if e.offset is not None:
+        response.headers['Upload-Offset'] = str(e.offset)
+    return response
+
+
+@app.route('/upload/sessions', methods=['POST'])
+def create_upload_session():
+    try:
+        data     = request.get_json(silent=True) or {}
+        filename = secure_filename(str(data.get('filename') or ''))
+        if not filename or not allowed_file(filename):
+            return jsonify({'error': 'Invalid file type. Allowed: mp4, mov, avi, mkv, webm, gif'}), 400
+        try:
+            size = int(data.get('size'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'size must be a non-negative integer'}), 400
+        if size > app.config['MAX_CONTENT_LENGTH']:
+            return jsonify({'error': 'File is larger than the upload limit'}), 413
+        category = data.get('category', 'Videos')
+        if category not in UPLOAD_CATEGORIES:
+            category = 'Videos'
+
+        session = upload_sessions.create(filename, size, category)
+        print(f"📥 Upload session {session['upload_id']}: {filename} ({size / 1024 / 1024:.1f}MB)")
+        response = jsonify({
+            'upload_id':  session['upload_id'],
+            'filename':   filename,
+            'size':       size,
+            'offset':     0,
+            'chunk_size': resumable.CHUNK_SIZE,
+        })
+        response.status_code = 201
+        response.headers['Location'] = f"/upload/sessions/{session['upload_id']}"
+        return response
+    except resumable.SessionError as e:
+        return _session_error(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/upload/sessions/<upload_id>', methods=['GET', 'HEAD', 'PATCH', 'DELETE'])
+def upload_session(upload_id):
+    try:
+        if request.method == 'DELETE':
+            upload_sessions.discard(upload_id)
+            return '', 204
+
+        if request.method == 'PATCH':
+            try:
+                offset = int(request.headers.get('Upload-Offset', ''))
+            except ValueError:
+                return jsonify({'error': 'Upload-Offset header is required'}), 400
+            new_offset = upload_sessions.append(upload_id, offset, request.stream)
+            return '', 204, {'Upload-Offset': str(new_offset)}
+
+        session = upload_sessions.get(upload_id)
+        response = jsonify({'upload_id': upload_id, 'filename': session['filename'],
+                            'size': session['size'], 'offset': session['offset']})
+        response.headers['Upload-Offset'] = str(session['offset'])
+        response.headers['Upload-Length'] = str(session['size'])
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    except resumable.SessionError as e:
+        return _session_error(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/upload/sessions/<upload_id>/complete', methods=['POST'])
+def complete_upload_session(upload_id):
+    try:
+        session, part_path = upload_sessions.finish(upload_id)
+        blob_path = None
+        try:
+            blob_path, content_hash, size = blob_store.commit_file(part_path)
+            response = accept_upload(blob_path, content_hash, size, session['filename'], session['category'])
+        except Exception:
+            # Put the file back and reopen the session, so the client can retry complete
+            if blob_path and not os.path.exists(part_path):
+                blob_store.link(blob_path, part_path)
+            upload_sessions.reopen(upload_id)
+            raise
+        upload_sessions.close(upload_id)
+        return response
+    except resumable.SessionError as e:
+        return _session_error(e)
+    except Exception as e:
+        print(f"❌ Completing upload {upload_id} failed: {e}")
+        return jsonify({'error': f'Upload failed: {str(e)}'}), 500
+
+
+SEARCH_RESULT_LIMIT = 50
+
+
+def _postgrest_array(values):
+    return '{' + ','.join('"' + str(v).replace('\\', '\\\\').replace('"', '\\"') + '"' for v in values) + '}'
+
+
+def _run_search(query, query_embedding, emotions_filter, genres_filter, categories_filter=None, tags_filter=None):
+    """Core search logic - fetches from Supabase and computes similarity.
+
+    tags_filter restricts visual results to frames sharing a tag (any categorised
+    field, genres, or the video's custom tags) - text[] overlap on the GIN indexes.
+    """
     results = []
     detected_series = None
     detected_gender = None
@@ -967,7 +1077,7 @@ def _run_search(query, query_embedding, emotions_filter, genres_filter, categori
                 detected_actor = v
                 break
 
-    if not query and not emotions_filter and not genres_filter:
+    if not query and not emotions_filter and not genres_filter and not tags_filter:
         return []
 
     # Fetch videos with category filtering (handle missing category column)
@@ -992,13 +1102,24 @@ def _run_search(query, query_embedding, emotions_filter, genres_filter, categori
         v_resp = supabase.table('videos').select('id, filename, custom_tags').execute()
     
     v_map = {v['id']: v for v in v_resp.data}
-    v_tags = {v['id']: v.get('custom_tags') or '' for v in v_resp.data}
+    v_tags = {v['id']: taglib.to_text(v.get('custom_tags')) for v in v_resp.data}
+
+    def frames_query(columns):
+        q = supabase.table('visual_frames').select(columns)
+        if tags_filter:
+            wanted  = _postgrest_array(tags_filter)
+            clauses = [f'{field}.ov.{wanted}' for field in taglib.FRAME_TAG_FIELDS]
+            tagged  = supabase.table('videos').select('id').overlaps('custom_tags', tags_filter).execute().data
+            if tagged:
+                clauses.append(f"video_id.in.({','.join(str(v['id']) for v in tagged)})")
+            q = q.or_(','.join(clauses))
+        return q
     
     # Create set of allowed video IDs for category filtering (skip if categories not supported)
     allowed_video_ids = set(v_map.keys()) if (categories_filter and any('category' in v for v in v_resp.data)) else None
 
-    if not query and (emotions_filter or genres_filter):
-        vf_resp = supabase.table('visual_frames').select('id, video_id, timestamp, visual_description, emotion, ocr_text, tags, genres, deep_emotions, scene_context, people_description, environment, series_movie, actors, emotion_tags, laugh_tags, contextual_tags, character_tags, semantic_tags').execute()
+    if not query and (emotions_filter or genres_filter or tags_filter):
+        vf_resp = frames_query('id, video_id, timestamp, visual_description, emotion, ocr_text, tags, genres, deep_emotions, scene_context, people_description, environment, series_movie, actors, emotion_tags, laugh_tags, contextual_tags, character_tags, semantic_tags').execute()
 
         for vf in vf_resp.data:
             vid = vf.get('video_id')
@@ -1023,21 +1144,40 @@ def _run_search(query, query_embedding, emotions_filter, genres_filter, categori
                 'emotion': emo,
                 'ocr_text': vf.get('ocr_text') or '',
                 'tags': vf.get('tags') or '',
-                'genres': vf.get('genres') or '',
+                'genres': taglib.to_text(vf.get('genres')),
                 'custom_tags': custom_tags,
-                'emotion_tags': vf.get('emotion_tags') or '',
-                'laugh_tags': vf.get('laugh_tags') or '',
-                'contextual_tags': vf.get('contextual_tags') or '',
-                'character_tags': vf.get('character_tags') or '',
-                'semantic_tags': vf.get('semantic_tags') or ''
+                'emotion_tags': taglib.to_text(vf.get('emotion_tags')),
+                'laugh_tags': taglib.to_text(vf.get('laugh_tags')),
+                'contextual_tags': taglib.to_text(vf.get('contextual_tags')),
+                'character_tags': taglib.to_text(vf.get('character_tags')),
+                'semantic_tags': taglib.to_text(vf.get('semantic_tags'))
             })
         return results
 
     # Optimize: Only fetch needed columns, limit results
-    clips_resp = supabase.table('clips').select('id, video_id, start_time, end_time, transcript_text, embedding').limit(500).execute()
-    vf_resp = supabase.table('visual_frames').select('id, video_id, timestamp, visual_description, emotion, ocr_text, tags, genres, actors, series_movie, emotion_tags, laugh_tags, contextual_tags, character_tags, semantic_tags, visual_embedding').limit(500).execute()
-
-    for clip in clips_resp.data:
+    # Transcript clips carry no tags, so a tag filter leaves only visual results
+    clips_data = [] if tags_filter else supabase.table('clips').select('id, video_id, start_time, end_time, transcript_text, embedding').limit(500).execute().data
+    vf_resp = frames_query('id, video_id, timestamp, visual_description, emotion, ocr_text, tags, genres, actors, series_movie, emotion_tags, laugh_tags, contextual_tags, character_tags, semantic_tags, visual_embedding').limit(500).execute()
+
+    # Emotion / genre filters are checked per candidate so the bounded heap only
+    # holds matching rows (transcript clips have no genres and count as "neutral")
+    emotions_lower = [e.lower() for e in emotions_filter or []]
+    genres_lower = [g.lower() for g in genres_filter or []]
+    skip_clips = bool(genres_lower) or (emotions_lower and 'neutral' not in emotions_lower)
+
+    def passes_filters(vf):
+        if emotions_lower and (vf.get('emotion') or 'neutral').lower() not in emotions_lower:
+            return False
+        if genres_lower:
+            frame_genres = [g.lower() for g in taglib.to_list(vf.get('genres'))]
+            if not any(g in frame_genres for g in genres_lower):
+                return False
+        return True
+
+    # Candidates are (score, kind, row id) + the fetched row; dicts are built for the top k only
+    top = ranking.TopK(SEARCH_RESULT_LIMIT)
+
+    for clip in ([] if skip_clips else clips_data):
         # Skip if category filter is active and this video's category doesn't match
         if allowed_video_ids is not None and clip['video_id'] not in allowed_video_ids:
             continue
@@ -1053,29 +1193,17 @@ def _run_search(query, query_embedding, emotions_filter, genres_filter, categori
         if sim > 0.40:
             if text.strip() in ['♪', '♪♪', '[Music]', '(Music)'] and 'music' not in query.lower():
                 continue
-            clip_fname = clip.get('filename') or (v_map.get(clip['video_id']) or {}).get('filename', '')
-            video_category = (v_map.get(clip['video_id']) or {}).get('category', 'Videos')
-            results.append({
-                'id': f"audio_{clip['id']}",
-                'video_id': clip['video_id'],
-                'filename': clip_fname,
-                'timestamp': clip['start_time'],
-                'start_time': clip['start_time'],
-                'end_time': clip['end_time'],
-                'duration': clip.get('duration', clip['end_time'] - clip['start_time']),
-                'text': text,
-                'similarity': float(sim),
-                'source': 'audio',
-                'category': video_category
-            })
+            top.push(float(sim), 'audio', clip['id'], clip)
 
     # Group visual frames by video_id to avoid duplicate results
-    video_best_frames = {}  # video_id -> best frame data
+    video_best_frames = {}  # video_id -> (best similarity, frame)
     
     for vf in vf_resp.data:
         # Skip if category filter is active and this video's category doesn't match
         if allowed_video_ids is not None and vf['video_id'] not in allowed_video_ids:
             continue
+        if not passes_filters(vf):
+            continue
             
         emb = vf.get('visual_embedding')
         if not emb:
@@ -1087,15 +1215,6 @@ def _run_search(query, query_embedding, emotions_filter, genres_filter, categori
         desc = vf.get('visual_description', '')
         actors = vf.get('actors', '')
         series_movie = vf.get('series_movie', '')
-        deep_emotions = vf.get('deep_emotions', '')
-        ocr_text = vf.get('ocr_text', '')
-        scene_context = vf.get('scene_context', '')
-        tags = vf.get('tags', '')
-        emotion_tags = vf.get('emotion_tags', '')
-        laugh_tags = vf.get('laugh_tags', '')
-        contextual_tags = vf.get('contextual_tags', '')
-        character_tags = vf.get('character_tags', '')
-        semantic_tags = vf.get('semantic_tags', '')
 
         exact_boost = 0.0
         if query and len(query_lower) > 2:
@@ -1107,7 +1226,8 @@ def _run_search(query, query_embedding, emotions_filter, genres_filter, categori
                 exact_boost = max(exact_boost, 0.40)
             if desc and query_lower in desc.lower():
                 exact_boost = max(exact_boost, 0.35)
-            for tag_fld in [emotion_tags, laugh_tags, contextual_tags, character_tags, semantic_tags]:
+            for field in ('emotion_tags', 'laugh_tags', 'contextual_tags', 'character_tags', 'semantic_tags'):
+                tag_fld = taglib.to_text(vf.get(field))
                 if tag_fld and query_lower.replace('-', ' ').replace('_', ' ') in tag_fld.lower().replace('-', ' ').replace('_', ' '):
                     exact_boost = max(exact_boost, 0.40)
                     break
@@ -1134,20 +1254,8 @@ def _run_search(query, query_embedding, emotions_filter, genres_filter, categori
         
         if video_duration < 30:
             # Short video: keep only best frame per video
-            if video_id not in video_best_frames or sim > video_best_frames[video_id]['similarity']:
-                video_best_frames[video_id] = {
-                    'vf': vf,
-                    'similarity': sim,
-                    'custom_tags': custom_tags,
-                    'desc': desc,
-                    'ocr_text': ocr_text,
-                    'tags': tags,
-                    'emotion_tags': emotion_tags,
-                    'laugh_tags': laugh_tags,
-                    'contextual_tags': contextual_tags,
-                    'character_tags': character_tags,
-                    'semantic_tags': semantic_tags
-                }
+            if video_id not in video_best_frames or sim > video_best_frames[video_id][0]:
+                video_best_frames[video_id] = (sim, vf)
             continue  # Don't add to results yet
         
         # Long videos (>= 30s): add all frames as separate results
@@ -1159,41 +1267,10 @@ def _run_search(query, query_embedding, emotions_filter, genres_filter, categori
                 continue
 
         if sim > 0.30:
-            emo = vf.get('emotion') or 'neutral'
-            display = f"[Visual - {emo.title()}] {desc}" if emo != 'neutral' else f"[Visual] {desc}"
-            if ocr_text:
-                display += f" | Text: \"{ocr_text}\""
-            vf_fname = vf.get('filename') or (v_map.get(vf['video_id']) or {}).get('filename', '')
-            video_category = (v_map.get(vf['video_id']) or {}).get('category', 'Videos')
-            results.append({
-                'id': f"visual_{vf['id']}",
-                'video_id': vf['video_id'],
-                'filename': vf_fname,
-                'timestamp': vf['timestamp'],
-                'start_time': vf['timestamp'],
-                'end_time': vf['timestamp'] + 10,
-                'duration': 10.0,
-                'text': display,
-                'similarity': float(sim),
-                'source': 'visual',
-                'emotion': emo,
-                'ocr_text': ocr_text or '',
-                'tags': tags or '',
-                'genres': vf.get('genres') or '',
-                'custom_tags': custom_tags or '',
-                'emotion_tags': emotion_tags or '',
-                'laugh_tags': laugh_tags or '',
-                'contextual_tags': contextual_tags or '',
-                'character_tags': character_tags or '',
-                'semantic_tags': semantic_tags or '',
-                'category': video_category
-            })
+            top.push(float(sim), 'visual', vf['id'], vf)
 
     # Add best frames from short videos (< 30s deduplication)
-    for video_id, best in video_best_frames.items():
-        vf = best['vf']
-        sim = best['similarity']
-
+    for video_id, (sim, vf) in video_best_frames.items():
         if detected_series and vf.get('series_movie') and detected_series not in (vf.get('series_movie') or '').lower():
             continue
         if detected_actor and vf.get('actors'):
@@ -1201,53 +1278,56 @@ def _run_search(query, query_embedding, emotions_filter, genres_filter, categori
                 continue
 
         if sim > 0.30:
-            emo = vf.get('emotion') or 'neutral'
-            desc = best['desc']
-            ocr_text = best['ocr_text']
-            display = f"[Visual - {emo.title()}] {desc}" if emo != 'neutral' else f"[Visual] {desc}"
-            if ocr_text:
-                display += f" | Text: \"{ocr_text}\""
-            vf_fname = vf.get('filename') or (v_map.get(vf['video_id']) or {}).get('filename', '')
-            video_category = (v_map.get(vf['video_id']) or {}).get('category', 'Videos')
+            top.push(float(sim), 'visual', vf['id'], vf)
+
+    # Result dicts for the survivors, best first
+    for sim, kind, _, row in top.best():
+        video = v_map.get(row['video_id']) or {}
+        fname = row.get('filename') or video.get('filename', '')
+        if kind == 'audio':
             results.append({
-                'id': f"visual_{vf['id']}",
-                'video_id': vf['video_id'],
-                'filename': vf_fname,
-                'timestamp': vf['timestamp'],
-                'start_time': vf['timestamp'],
-                'end_time': vf['timestamp'] + 10,
-                'duration': 10.0,
-                'text': display,
-                'similarity': float(sim),
-                'source': 'visual',
-                'emotion': emo,
-                'ocr_text': ocr_text or '',
-                'tags': best['tags'] or '',
-                'genres': vf.get('genres') or '',
-                'custom_tags': best['custom_tags'] or '',
-                'emotion_tags': best['emotion_tags'] or '',
-                'laugh_tags': best['laugh_tags'] or '',
-                'contextual_tags': best['contextual_tags'] or '',
-                'character_tags': best['character_tags'] or '',
-                'semantic_tags': best['semantic_tags'] or '',
-                'category': video_category
+                'id': f"audio_{row['id']}",
+                'video_id': row['video_id'],
+                'filename': fname,
+                'timestamp': row['start_time'],
+                'start_time': row['start_time'],
+                'end_time': row['end_time'],
+                'duration': row.get('duration', row['end_time'] - row['start_time']),
+                'text': row.get('transcript_text', ''),
+                'similarity': sim,
+                'source': 'audio',
+                'category': video.get('category', 'Videos')
             })
-
-    if emotions_filter or genres_filter:
-        filtered = []
-        for r in results:
-            em_match = not emotions_filter or (r.get('emotion', 'neutral').lower() in [e.lower() for e in emotions_filter])
-            genre_match = True
-            if genres_filter and r.get('source') == 'visual':
-                rg = (r.get('genres') or '').lower().split(', ')
-                genre_match = any(g.lower() in rg for g in genres_filter)
-            elif genres_filter and r.get('source') == 'audio':
-                genre_match = False
-            if em_match and genre_match:
-                filtered.append(r)
-        results = filtered
-
-    results.sort(key=lambda x: x['similarity'], reverse=True)
+            continue
+        emo = row.get('emotion') or 'neutral'
+        desc = row.get('visual_description', '')
+        ocr_text = row.get('ocr_text', '')
+        display = f"[Visual - {emo.title()}] {desc}" if emo != 'neutral' else f"[Visual] {desc}"
+        if ocr_text:
+            display += f" | Text: \"{ocr_text}\""
+        results.append({
+            'id': f"visual_{row['id']}",
+            'video_id': row['video_id'],
+            'filename': fname,
+            'timestamp': row['timestamp'],
+            'start_time': row['timestamp'],
+            'end_time': row['timestamp'] + 10,
+            'duration': 10.0,
+            'text': display,
+            'similarity': sim,
+            'source': 'visual',
+            'emotion': emo,
+            'ocr_text': ocr_text or '',
+            'tags': row.get('tags') or '',
+            'genres': taglib.to_text(row.get('genres')),
+            'custom_tags': v_tags.get(row['video_id'], ''),
+            'emotion_tags': taglib.to_text(row.get('emotion_tags')),
+            'laugh_tags': taglib.to_text(row.get('laugh_tags')),
+            'contextual_tags': taglib.to_text(row.get('contextual_tags')),
+            'character_tags': taglib.to_text(row.get('character_tags')),
+            'semantic_tags': taglib.to_text(row.get('semantic_tags')),
+            'category': video.get('category', 'Videos')
+        })
     return results
 
 
@@ -1258,8 +1338,9 @@ def search():
     emotions_filter = data.get('emotions', [])
     genres_filter = data.get('genres', [])
     categories_filter = data.get('categories', [])
+    tags_filter = taglib.to_list(data.get('tags'))
 
-    if not query and not emotions_filter and not genres_filter:
+    if not query and not emotions_filter and not genres_filter and not tags_filter:
         return jsonify({'results': []})
 
     try:
@@ -1267,7 +1348,7 @@ def search():
         if query:
             query_embedding = create_embedding(query)
 
-        results = _run_search(query, query_embedding, emotions_filter, genres_filter, categories_filter)
+        results = _run_search(query, query_embedding, emotions_filter, genres_filter, categories_filter, tags_filter)
 
         if not results and query:
             return jsonify({
@@ -1276,7 +1357,7 @@ def search():
             })
 
         # Return top 50 results (was 20, now more but still limited)
-        return jsonify({'results': results[:50]})
+        return jsonify({'results': results[:SEARCH_RESULT_LIMIT]})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1303,25 +1384,76 @@ def serve_thumbnail(filename):
     return redirect(url)
 
 
+VIDEO_LIST_COLUMNS = 'id, filename, title, upload_date, duration, status, thumbnail, custom_tags, supabase_video_url, category'
+
+
+def _library_version():
+    """library_state.version (see ADD_VIDEO_COUNTS.sql), or None if the table is missing."""
+    try:
+        resp = supabase.table('library_state').select('version').eq('id', 1).execute()
+        return resp.data[0]['version'] if resp.data else 0
+    except Exception:
+        return None
+
+
+def _postgrest_value(value):
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
 @app.route('/videos', methods=['GET'])
 def list_videos():
+    """Library listing - see listing.py for the query parameters and cursor format."""
     try:
-        # Try to fetch with category, fallback to without if column doesn't exist
         try:
-            v_resp = supabase.table('videos').select('id, filename, title, upload_date, duration, status, thumbnail, custom_tags, supabase_video_url, category').order('upload_date', desc=True).execute()
+            params = listing.parse_list_args(request.args)
+        except listing.ListArgsError as e:
+            return jsonify({'error': str(e)}), 400
+
+        version = _library_version()
+        tag     = listing.etag(version, params) if version is not None else None
+        if tag and listing.is_not_modified(request, tag):
+            return listing.revalidate_headers(app.response_class(status=304), tag)
+
+        field = params['field']
+        desc  = params['descending']
+
+        def build(columns):
+            q = supabase.table('videos').select(columns)
+            if params['categories']:
+                q = q.in_('category', params['categories'])
+            if params['statuses']:
+                q = q.in_('status', params['statuses'])
+            if params['cursor']:
+                op    = 'lt' if desc else 'gt'
+                value = _postgrest_value(params['cursor']['v'])
+                q = q.or_(f"{field}.{op}.{value},and({field}.eq.{value},id.{op}.{int(params['cursor']['id'])})")
+            q = q.order(field, desc=desc).order('id', desc=desc)
+            if params['limit']:
+                q = q.limit(params['limit'] + 1)
+            return q
+
+        try:
+            v_rows = build(VIDEO_LIST_COLUMNS + ', clip_count, frame_count').execute().data
         except Exception as e:
-            # If category column doesn't exist, fetch without it
-            print(f"⚠️ Category column not found, fetching without it: {e}")
-            v_resp = supabase.table('videos').select('id, filename, title, upload_date, duration, status, thumbnail, custom_tags, supabase_video_url').order('upload_date', desc=True).execute()
-        
-        c_resp = supabase.table('clips').select('video_id').execute()
-        clip_counts = {}
-        for c in c_resp.data:
-            vid = c['video_id']
-            clip_counts[vid] = clip_counts.get(vid, 0) + 1
+            # Count columns not added yet: count this page's clips instead
+            print(f"⚠️ clip_count column not found (run ADD_VIDEO_COUNTS.sql): {e}")
+            v_rows = build(VIDEO_LIST_COLUMNS).execute().data
+            page_ids = [v['id'] for v in v_rows]
+            counts = {}
+            if page_ids:
+                for c in supabase.table('clips').select('video_id').in_('video_id', page_ids).execute().data:
+                    counts[c['video_id']] = counts.get(c['video_id'], 0) + 1
+            for v in v_rows:
+                v['clip_count'] = counts.get(v['id'], 0)
+
+        next_cursor = None
+        if params['limit'] and len(v_rows) > params['limit']:
+            v_rows = v_rows[:params['limit']]
+            last = v_rows[-1]
+            next_cursor = listing.encode_cursor(params['sort'], last.get(field), last['id'])
 
         videos = []
-        for v in v_resp.data:
+        for v in v_rows:
             videos.append({
                 'id': v['id'],
                 'filename': v['filename'],
@@ -1330,18 +1462,61 @@ def list_videos():
                 'duration': v.get('duration') or 0,
                 'status': v.get('status', 'pending'),
                 'thumbnail': v.get('thumbnail'),
-                'custom_tags': v.get('custom_tags') or '',
-                'clip_count': clip_counts.get(v['id'], 0),
+                'custom_tags': taglib.to_text(v.get('custom_tags')),
+                'clip_count': v.get('clip_count') or 0,
+                'frame_count': v.get('frame_count') or 0,
                 'supabase_video_url': v.get('supabase_video_url'),
                 'category': v.get('category', 'Videos')
             })
-        
-        # Add cache-busting headers
-        response = jsonify({'videos': videos})
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
-        return response
+
+        response = jsonify({'videos': videos, 'next_cursor': next_cursor, 'library_version': version})
+        if not tag:
+            response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+            return response
+        return listing.revalidate_headers(response, tag)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+LOOKUP_COLUMNS = 'id, filename, status, category, supabase_video_url'
+LOOKUP_FILENAMES_PER_QUERY = 100   # keeps the PostgREST in.(...) filter within URL limits
+
+
+@app.route('/videos/lookup', methods=['POST'])
+def lookup_videos():
+    """Status of many filenames at once - see listing.py for the format.
+
+    Content hashes are accepted, but this backend does not store them, so every
+    entry under "hashes" is null and callers fall back to the filename entries.
+    """
+    try:
+        try:
+            filenames, hashes = listing.parse_lookup_body(request.get_json(silent=True))
+        except listing.ListArgsError as e:
+            return jsonify({'error': str(e)}), 400
+
+        rows = []
+        for i in range(0, len(filenames), LOOKUP_FILENAMES_PER_QUERY):
+            batch = filenames[i:i + LOOKUP_FILENAMES_PER_QUERY]
+            try:
+                rows += supabase.table('videos').select(LOOKUP_COLUMNS + ', clip_count, frame_count') \
+                    .in_('filename', batch).execute().data
+            except Exception:
+                # Count columns not added yet (ADD_VIDEO_COUNTS.sql)
+                rows += supabase.table('videos').select(LOOKUP_COLUMNS).in_('filename', batch).execute().data
+
+        records = [{
+            'id':           v['id'],
+            'filename':     v['filename'],
+            'status':       v.get('status', 'pending'),
+            'sha256':       None,
+            'category':     v.get('category', 'Videos'),
+            'clip_count':   v.get('clip_count') or 0,
+            'frame_count':  v.get('frame_count') or 0,
+            'file_present': bool(v.get('supabase_video_url')),
+            'size':         None,
+        } for v in rows]
+        return jsonify(listing.lookup_payload(records, filenames, hashes))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1450,7 +1625,7 @@ def reprocess_video(video_id):
                 'emotion': str(analysis.get('emotion', '')),
                 'ocr_text': str(analysis.get('ocr_text', '')),
                 'tags': str(analysis.get('tags', '')),
-                'genres': str(analysis.get('genres', '')),
+                'genres': taglib.to_list(str(analysis.get('genres', ''))),
                 'deep_emotions': str(analysis.get('deep_emotions', '')),
                 'scene_context': str(analysis.get('scene_context', '')),
                 'people_description': str(analysis.get('people_description', '')),
@@ -1461,11 +1636,11 @@ def reprocess_video(video_id):
                 'scene_type': str(analysis.get('scene_type', '')),
                 'actors': str(analysis.get('actors', '')),
                 'media_type': str(analysis.get('media_type', 'Unknown')),
-                'emotion_tags': emotion_tags,
-                'laugh_tags': laugh_tags,
-                'contextual_tags': contextual_tags,
-                'character_tags': character_tags,
-                'semantic_tags': semantic_tags,
+                'emotion_tags': taglib.to_list(emotion_tags),
+                'laugh_tags': taglib.to_list(laugh_tags),
+                'contextual_tags': taglib.to_list(contextual_tags),
+                'character_tags': taglib.to_list(character_tags),
+                'semantic_tags': taglib.to_list(semantic_tags),
                 'visual_embedding': emb
             }
             try:
@@ -1490,7 +1665,7 @@ def get_filters():
         emotions = sorted(set(r['emotion'] for r in vf.data if r.get('emotion')))
         genres = set()
         for r in vf.data:
-            for g in (r.get('genres') or '').split(', '):
+            for g in taglib.to_list(r.get('genres')):
                 if g.strip():
                     genres.add(g.strip())
         return jsonify({'emotions': emotions, 'genres': sorted(list(genres))})
@@ -1505,33 +1680,24 @@ def add_custom_tag(video_id):
     if not new_tag:
         return jsonify({'error': 'Tag cannot be empty'}), 400
 
-    v = supabase.table('videos').select('custom_tags').eq('id', video_id).execute()
-    if not v.data:
+    # add_custom_tag / remove_custom_tag are defined in ADD_TAG_ARRAYS.sql
+    resp = supabase.rpc('add_custom_tag', {'p_video_id': video_id, 'p_tag': new_tag}).execute()
+    if not resp.data:
         return jsonify({'error': 'Video not found'}), 404
-
-    current = v.data[0].get('custom_tags') or ''
-    tags_list = [t.strip() for t in current.split(',') if t.strip()]
-    if new_tag.lower() in [t.lower() for t in tags_list]:
-        return jsonify({'error': 'Tag already exists', 'tags': ', '.join(tags_list)}), 400
-
-    tags_list.append(new_tag)
-    updated = ', '.join(tags_list)
-    supabase.table('videos').update({'custom_tags': updated}).eq('id', video_id).execute()
-    return jsonify({'success': True, 'tag': new_tag, 'all_tags': updated})
+    row = resp.data[0]
+    all_tags = taglib.to_text(row.get('custom_tags'))
+    if not row.get('added'):
+        return jsonify({'error': 'Tag already exists', 'tags': all_tags}), 400
+    return jsonify({'success': True, 'tag': new_tag, 'all_tags': all_tags})
 
 
 @app.route('/videos/<int:video_id>/tags/<path:tag>', methods=['DELETE'])
 def delete_custom_tag(video_id, tag):
-    v = supabase.table('videos').select('custom_tags').eq('id', video_id).execute()
-    if not v.data:
+    resp = supabase.rpc('remove_custom_tag', {'p_video_id': video_id, 'p_tag': tag}).execute()
+    if not resp.data:
         return jsonify({'error': 'Video not found'}), 404
-
-    current = v.data[0].get('custom_tags') or ''
-    tags_list = [t.strip() for t in current.split(',') if t.strip()]
-    tags_list = [t for t in tags_list if t.lower() != tag.lower()]
-    updated = ', '.join(tags_list)
-    supabase.table('videos').update({'custom_tags': updated}).eq('id', video_id).execute()
-    return jsonify({'success': True, 'deleted_tag': tag, 'remaining_tags': updated})
+    remaining = taglib.to_text(resp.data[0].get('custom_tags'))
+    return jsonify({'success': True, 'deleted_tag': tag, 'remaining_tags': remaining})
 
 
 @app.route('/delete/<int:video_id>', methods=['DELETE'])
@@ -1550,16 +1716,11 @@ def delete_video(video_id):
         supabase.table('visual_frames').delete().eq('video_id', video_id).execute()
         supabase.table('videos').delete().eq('id', video_id).execute()
 
-        try:
-            supabase.storage.from_(BUCKET_NAME).remove([f"videos/{filename}"])
-        except Exception as e:
-            print(f"⚠️ Could not delete video file: {e}")
-        
         thumb_name = f"thumb_{os.path.splitext(filename)[0]}.jpg"
         try:
-            supabase.storage.from_(BUCKET_NAME).remove([f"thumbnails/{thumb_name}"])
+            media_store.delete_many([f"videos/{filename}", f"thumbnails/{thumb_name}"])
         except Exception as e:
-            print(f"⚠️ Could not delete thumbnail: {e}")
+            print(f"⚠️ Could not delete video files: {e}")
 
         return jsonify({'success': True, 'message': f'Deleted {filename}'})
     except Exception as e:
@@ -0,0 +1,136 @@
+"""
+B-Roll Mapper - Logging
+Thin layer over the stdlib `logging` module shared by the app variants.
+
+- LOG_LEVEL         DEBUG / INFO (default) / WARNING / ERROR
+- LOG_FORMAT        "text" (default, emoji-friendly one-liners) or "json" (one object per line)
+- LOG_SAMPLE_EVERY  keep 1 in N per-item debug messages (default 100, 1 = keep all)
+
+Every record carries the current request ID. Flask hooks set it per request
+(from an incoming X-Request-ID header when present) and `propagate()` carries
+it into background ingest threads.
+
+Per-item messages in hot loops should be guarded once outside the loop:
+
+    debug = log.isEnabledFor(logging.DEBUG)
+    for frame in frames:
+        if debug and sampler.hit():
+            log.debug("skipping frame %s", frame['id'])
+
+so the loop pays a single boolean check when debug is off.
+"""
+
+import os
+import sys
+import json
+import uuid
+import logging
+import itertools
+import contextvars
+import threading
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+LOG_SAMPLE_EVERY = max(1, int(os.getenv('LOG_SAMPLE_EVERY', '100')))
+
+_request_id = contextvars.ContextVar('request_id', default='-')
+
+
+def get_request_id():
+    return _request_id.get()
+
+
+def set_request_id(request_id=None):
+    """Bind a request ID to the current context (a new one is generated if not given)."""
+    request_id = request_id or uuid.uuid4().hex[:16]
+    _request_id.set(request_id)
+    return request_id
+
+
+def propagate(target):
+    """Wrap `target` so it runs in a copy of the current context (keeps the request ID in threads)."""
+    ctx = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return ctx.run(target, *args, **kwargs)
+    return run
+
+
+class Sampler:
+    """Thread-safe 1-in-N gate for per-item log lines."""
+
+    def __init__(self, every=None):
+        self.every = every or LOG_SAMPLE_EVERY
+        self._counter = itertools.count()
+
+    def hit(self):
+        return next(self._counter) % self.every == 0
+
+
+class _RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+_RESERVED = set(logging.makeLogRecord({}).__dict__) | {'message', 'asctime', 'request_id'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def setup():
+    """Install the handler on the `broll` logger tree once per process."""
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler(sys.stdout)
+        handler.addFilter(_RequestIdFilter())
+        if LOG_FORMAT == 'json':
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter('%(message)s [%(request_id)s]'))
+        root = logging.getLogger('broll')
+        root.addHandler(handler)
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        root.propagate = False
+        _configured = True
+
+
+def get_logger(name):
+    setup()
+    return logging.getLogger(f'broll.{name}')
+
+
+def init_app(app):
+    """Register request-ID hooks on a Flask app."""
+    from flask import request
+
+    @app.before_request
+    def _bind_request_id():
+        set_request_id(request.headers.get('X-Request-ID'))
+
+    @app.after_request
+    def _echo_request_id(response):
+        response.headers['X-Request-ID'] = get_request_id()
+        return response
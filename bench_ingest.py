@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Ingest throughput benchmark.
+
+Generates synthetic media with ffmpeg (testsrc video + sine audio at several
+durations, silent clips, GIFs, JPEG/PNG stills and HEIC when pillow-heif is
+installed), then pushes it through the ingest pipeline and reports
+videos/hour, per-stage timings and peak RSS as JSON.
+
+Model calls go through model_providers with MODEL_PROVIDER=fake, so no API
+keys or network are needed; --latency simulates provider latency.
+
+Usage:
+    # In-process against the SQLite app (app_semantic.process_video)
+    python3 bench_ingest.py --backend sqlite --concurrency 1,2,4
+
+    # In-process against the MongoDB app (needs MONGODB_URI, e.g. a local mongod)
+    MONGODB_URI=mongodb://localhost:27017 python3 bench_ingest.py --backend mongo
+
+    # Over HTTP against a running server's /upload endpoint
+    python3 bench_ingest.py --backend http --url http://localhost:5002
+
+    # Custom mix / latency, results to a file for regression tracking
+    python3 bench_ingest.py --mix mp4:5,mp4:60,gif:3,jpg --count 4 \\
+        --latency embeddings=5,transcriptions=400,chat=900 --output bench_ingest.json
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import importlib
+import resource
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MIX = 'mp4:5,mp4:30,mp4:120,silent:15,gif:3,jpg,png,heic'
+
+# Pipeline function -> reported stage name
+STAGES = {
+    'get_video_duration':          'probe',
+    'generate_thumbnail':          'thumbnail',
+    'generate_previews':           'preview',
+    'extract_audio':               'audio',
+    'transcribe_audio':            'transcribe',
+    'create_embedding':            'embed',
+    'extract_frames_for_analysis': 'frame_extract',
+    'extract_text_with_tesseract': 'ocr',
+    'analyze_frame_with_vision':   'vision',
+}
+STAGE_ORDER = ['probe', 'thumbnail', 'preview', 'audio', 'transcribe', 'embed',
+               'frame_extract', 'ocr', 'vision', 'db_write', 'db_read']
+
+
+def find_binary(name):
+    for path in [f'/opt/homebrew/bin/{name}', f'/usr/bin/{name}']:
+        if os.path.exists(path):
+            return path
+    return shutil.which(name) or name
+
+
+# ---------------------------------------------------------------------------
+# Synthetic media
+# ---------------------------------------------------------------------------
+
+def parse_mix(spec):
+    """'mp4:5,gif:3,jpg' -> [('mp4', 5.0), ('gif', 3.0), ('jpg', 0.0)]"""
+    items = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        kind, _, duration = part.partition(':')
+        items.append((kind.lower(), float(duration or 0)))
+    return items
+
+
+def generate_media(kind, duration, out_dir, index):
+    """Create one synthetic file and return its path (None if the kind can't be produced here)."""
+    ffmpeg = find_binary('ffmpeg')
+    base = os.path.join(out_dir, f"bench_{kind}_{int(duration)}s_{index}")
+    testsrc = f"testsrc=duration={duration or 1}:size=640x360:rate=25"
+
+    if kind == 'mp4':
+        path = base + '.mp4'
+        cmd = [ffmpeg, '-f', 'lavfi', '-i', testsrc,
+               '-f', 'lavfi', '-i', f'sine=frequency={220 + 40 * index}:duration={duration}',
+               '-shortest', '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p',
+               '-c:a', 'aac', '-y', path]
+    elif kind == 'silent':
+        path = base + '.mp4'
+        cmd = [ffmpeg, '-f', 'lavfi', '-i', testsrc, '-c:v', 'libx264', '-preset', 'ultrafast',
+               '-pix_fmt', 'yuv420p', '-an', '-y', path]
+    elif kind == 'gif':
+        path = base + '.gif'
+        cmd = [ffmpeg, '-f', 'lavfi', '-i', f"testsrc=duration={duration or 3}:size=320x240:rate=10", '-y', path]
+    elif kind in ('jpg', 'png', 'heic'):
+        path = base + ('.png' if kind == 'png' else '.jpg')
+        cmd = [ffmpeg, '-f', 'lavfi', '-i', 'testsrc=size=1280x720', '-frames:v', '1', '-y', path]
+    else:
+        raise ValueError(f"Unknown media kind: {kind}")
+
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed for {kind}: {result.stderr[-300:]}")
+
+    if kind == 'heic':
+        try:
+            import pillow_heif
+            from PIL import Image
+            pillow_heif.register_heif_opener()
+            heic_path = base + '.heic'
+            Image.open(path).save(heic_path, format='HEIF')
+            os.remove(path)
+            path = heic_path
+        except Exception as e:
+            print(f"⚠️  Skipping HEIC (pillow-heif unavailable: {e})", file=sys.stderr)
+            os.remove(path)
+            return None
+    return path
+
+
+# ---------------------------------------------------------------------------
+# Stage timing
+# ---------------------------------------------------------------------------
+
+_local = threading.local()
+
+
+def _record(stage, elapsed):
+    timings = getattr(_local, 'timings', None)
+    if timings is None:
+        return
+    entry = timings.setdefault(stage, {'seconds': 0.0, 'calls': 0})
+    entry['seconds'] += elapsed
+    entry['calls'] += 1
+
+
+def _timed(stage, fn):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _record(stage, time.perf_counter() - start)
+    wrapper.__wrapped__ = fn
+    return wrapper
+
+
+class _TimedCollection:
+    """Mongo collection proxy that times write operations as db_write."""
+
+    WRITES = {'insert_one', 'insert_many', 'update_one', 'update_many', 'replace_one',
+              'delete_one', 'delete_many', 'find_one_and_update', 'bulk_write'}
+    READS = {'find_one', 'count_documents'}
+
+    def __init__(self, col):
+        self._col = col
+
+    def __getattr__(self, name):
+        attr = getattr(self._col, name)
+        if name in self.WRITES:
+            return _timed('db_write', attr)
+        if name in self.READS:
+            return _timed('db_read', attr)
+        return attr
+
+
+class _TimedCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def _stage(self, sql):
+        return 'db_read' if sql.lstrip().upper().startswith(('SELECT', 'PRAGMA', 'EXPLAIN')) else 'db_write'
+
+    def execute(self, sql, *args):
+        return _timed(self._stage(sql), self._cursor.execute)(sql, *args)
+
+    def executemany(self, sql, *args):
+        return _timed(self._stage(sql), self._cursor.executemany)(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _TimedConnection:
+    """sqlite3 connection proxy; INSERT/UPDATE/DELETE and commit count as db_write."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return _TimedCursor(self._conn.cursor())
+
+    def execute(self, sql, *args):
+        return _TimedCursor(self._conn.cursor()).execute(sql, *args)
+
+    def commit(self):
+        return _timed('db_write', self._conn.commit)()
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return _timed('db_write', self._conn.__exit__)(*exc)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def instrument(app_module):
+    """Wrap pipeline stages and DB handles on the imported app module."""
+    for func_name, stage in STAGES.items():
+        fn = getattr(app_module, func_name, None)
+        if fn is not None and not hasattr(fn, '__wrapped__'):
+            setattr(app_module, func_name, _timed(stage, fn))
+    for col_name in ('videos_col', 'clips_col', 'frames_col', 'counters_col', 'facets_col'):
+        col = getattr(app_module, col_name, None)
+        if col is not None and not isinstance(col, _TimedCollection):
+            setattr(app_module, col_name, _TimedCollection(col))
+    if hasattr(app_module, 'IdAllocator'):
+        app_module.id_allocator = app_module.IdAllocator(app_module.counters_col)
+    get_conn = getattr(app_module, 'get_db_connection', None)
+    if get_conn is not None and not hasattr(get_conn, '__wrapped__'):
+        def timed_get_db_connection(*args, **kwargs):
+            return _TimedConnection(get_conn(*args, **kwargs))
+        timed_get_db_connection.__wrapped__ = get_conn
+        app_module.get_db_connection = timed_get_db_connection
+
+
+# ---------------------------------------------------------------------------
+# Memory sampling
+# ---------------------------------------------------------------------------
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return max_rss_mb()
+
+
+def max_rss_mb():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return usage / 1024 / 1024 if platform.system() == 'Darwin' else usage / 1024
+
+
+class RssSampler:
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+
+# ---------------------------------------------------------------------------
+# Drivers
+# ---------------------------------------------------------------------------
+
+def load_app(backend, workdir):
+    """Import the app module inside an isolated working directory with fake providers."""
+    os.environ['MODEL_PROVIDER'] = 'fake'
+    os.environ.setdefault('OPENAI_API_KEY', 'bench')
+    os.environ['STORAGE_BASE'] = workdir
+    os.chdir(workdir)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    module = importlib.import_module('app_mongo' if backend == 'mongo' else 'app_semantic')
+    instrument(module)
+    return module
+
+
+def run_in_process(app_module, media_path, backend):
+    """Copy the source into a fresh temp file (as /upload does) and run process_video on it."""
+    ext = os.path.splitext(media_path)[1]
+    filename = f"{os.path.splitext(os.path.basename(media_path))[0]}_{uuid.uuid4().hex[:8]}{ext}"
+    tmp_dir = tempfile.mkdtemp(prefix='bench_ingest_')
+    tmp_path = os.path.join(tmp_dir, filename)
+    shutil.copy2(media_path, tmp_path)
+
+    _local.timings = {}
+    start = time.perf_counter()
+    error = None
+    try:
+        if backend == 'mongo':
+            app_module.process_video(tmp_path, filename, 'Videos')
+        else:
+            app_module.process_video(tmp_path, filename)
+    except Exception as e:
+        error = str(e)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    total = time.perf_counter() - start
+    timings, _local.timings = _local.timings, None
+    return {'file': os.path.basename(media_path), 'seconds': total, 'stages': timings, 'error': error}
+
+
+def run_http(base_url, media_path, poll_timeout):
+    """POST to /upload and poll /videos until the record completes (or fails)."""
+    import requests
+
+    ext = os.path.splitext(media_path)[1]
+    filename = f"{os.path.splitext(os.path.basename(media_path))[0]}_{uuid.uuid4().hex[:8]}{ext}"
+    start = time.perf_counter()
+    error = None
+    upload_seconds = None
+    try:
+        with open(media_path, 'rb') as f:
+            resp = requests.post(f"{base_url}/upload", files={'file': (filename, f)}, timeout=600)
+        upload_seconds = time.perf_counter() - start
+        if resp.status_code != 200:
+            error = f"HTTP {resp.status_code}: {resp.text[:200]}"
+        else:
+            deadline = time.time() + poll_timeout
+            status = 'processing'
+            while status == 'processing' and time.time() < deadline:
+                time.sleep(0.5)
+                videos = requests.get(f"{base_url}/videos", timeout=30).json().get('videos', [])
+                match = next((v for v in videos if v.get('filename') == filename), None)
+                status = match.get('status', 'processing') if match else 'processing'
+            if status != 'complete':
+                error = f"status={status}"
+    except Exception as e:
+        error = str(e)
+    return {'file': os.path.basename(media_path), 'seconds': time.perf_counter() - start,
+            'upload_seconds': upload_seconds, 'stages': {}, 'error': error}
+
+
+def summarise(runs, wall_seconds, concurrency, peak_rss_mb):
+    ok = [r for r in runs if not r['error']]
+    stages = {}
+    for r in runs:
+        for stage, entry in r['stages'].items():
+            agg = stages.setdefault(stage, {'seconds': 0.0, 'calls': 0})
+            agg['seconds'] += entry['seconds']
+            agg['calls'] += entry['calls']
+    for agg in stages.values():
+        agg['seconds'] = round(agg['seconds'], 4)
+        agg['mean_ms'] = round(agg['seconds'] * 1000 / agg['calls'], 3) if agg['calls'] else 0.0
+    latencies = sorted(r['seconds'] for r in ok)
+    return {
+        'concurrency':      concurrency,
+        'files':            len(runs),
+        'succeeded':        len(ok),
+        'failed':           len(runs) - len(ok),
+        'wall_seconds':     round(wall_seconds, 3),
+        'videos_per_hour':  round(len(ok) * 3600 / wall_seconds, 1) if wall_seconds else 0.0,
+        'mean_seconds':     round(sum(latencies) / len(latencies), 3) if latencies else None,
+        'max_seconds':      round(latencies[-1], 3) if latencies else None,
+        'peak_rss_mb':      round(peak_rss_mb, 1),
+        'stages':           {s: stages[s] for s in STAGE_ORDER if s in stages},
+        'errors':           sorted({r['error'] for r in runs if r['error']})[:10],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='B-Roll Mapper ingest throughput benchmark')
+    parser.add_argument('--backend', choices=['sqlite', 'mongo', 'http'], default='sqlite')
+    parser.add_argument('--url', default='http://localhost:5002', help='server URL for --backend http')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'media kinds[:seconds] (default: {DEFAULT_MIX})')
+    parser.add_argument('--count', type=int, default=2, help='copies of each mix entry per concurrency level')
+    parser.add_argument('--concurrency', default='1,2,4', help='comma-separated worker counts')
+    parser.add_argument('--latency', default='embeddings=5,transcriptions=300,chat=800',
+                        help='fake provider latency in ms (see model_providers.FAKE_MODEL_LATENCY)')
+    parser.add_argument('--poll-timeout', type=float, default=600, help='seconds to wait per file in http mode')
+    parser.add_argument('--workdir', default=None, help='scratch directory (default: a new temp dir)')
+    parser.add_argument('--keep', action='store_true', help='keep the scratch directory afterwards')
+    parser.add_argument('--output', default=None, help='write JSON results here instead of stdout')
+    args = parser.parse_args()
+
+    output_path = os.path.abspath(args.output) if args.output else None
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='broll_bench_'))
+    media_dir = os.path.join(workdir, 'media')
+    os.makedirs(media_dir, exist_ok=True)
+
+    os.environ['FAKE_MODEL_LATENCY'] = args.latency
+    print(f"🎞️  Generating synthetic media in {media_dir}", file=sys.stderr)
+    media = []
+    for index, (kind, duration) in enumerate(parse_mix(args.mix)):
+        path = generate_media(kind, duration, media_dir, index)
+        if path:
+            media.append(path)
+
+    app_module = None
+    if args.backend != 'http':
+        app_module = load_app(args.backend, workdir)
+        allowed = getattr(app_module, 'ALLOWED_EXTENSIONS', None)
+        if allowed:
+            skipped = [m for m in media if os.path.splitext(m)[1][1:].lower() not in allowed]
+            for m in skipped:
+                print(f"⚠️  {args.backend} backend does not accept {os.path.basename(m)} - skipping", file=sys.stderr)
+            media = [m for m in media if m not in skipped]
+        from model_providers import set_fake_latency
+        set_fake_latency(args.latency)
+
+    levels = []
+    for concurrency in [int(c) for c in args.concurrency.split(',') if c.strip()]:
+        batch = media * args.count
+        print(f"🚀 concurrency={concurrency}: {len(batch)} files", file=sys.stderr)
+        with RssSampler() as sampler:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                if args.backend == 'http':
+                    runs = list(pool.map(lambda p: run_http(args.url.rstrip('/'), p, args.poll_timeout), batch))
+                else:
+                    runs = list(pool.map(lambda p: run_in_process(app_module, p, args.backend), batch))
+            wall = time.perf_counter() - start
+        level = summarise(runs, wall, concurrency, sampler.peak_mb)
+        levels.append(level)
+        print(f"   ✅ {level['videos_per_hour']} videos/hour, peak RSS {level['peak_rss_mb']} MB, "
+              f"{level['failed']} failed", file=sys.stderr)
+
+    report = {
+        'benchmark':    'ingest',
+        'backend':      args.backend,
+        'timestamp':    time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python':       platform.python_version(),
+        'mix':          args.mix,
+        'count':        args.count,
+        'fake_latency': args.latency,
+        'levels':       levels,
+        'max_rss_mb':   round(max_rss_mb(), 1),
+    }
+    text = json.dumps(report, indent=2)
+    if output_path:
+        with open(output_path, 'w') as f:
+            f.write(text + '\n')
+        print(f"📄 Results written to {output_path}", file=sys.stderr)
+    else:
+        print(text)
+
+    if not args.keep and not args.workdir:
+        os.chdir('/')
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,625 @@
+#!/usr/bin/env python3
+"""
+Search latency benchmark with synthetic corpora.
+
+Populates a backend with N synthetic clips and N visual frames (realistic
+metadata field lengths, random unit embeddings), replays a fixed query mix
+against POST /search through the Flask test client, and reports
+p50/p95/p99 latency, bytes fetched from the DB and a CPU-time split
+between DB fetch, scoring, boosting/filtering (the unaccounted remainder of
+the search loop, reported as boost_filter_other) and serialisation.
+
+Backends:
+- sqlite  app_semantic against a scratch copy of the broll_semantic.db schema
+- mongo   app_mongo against MONGODB_URI (uses a separate broll_mapper_bench database)
+- memory  app_mongo with its collections swapped for in-memory stand-ins
+
+Query embeddings come from model_providers with MODEL_PROVIDER=fake.
+
+Usage:
+    python3 bench_search.py --backend memory --sizes 1000,10000
+    python3 bench_search.py --backend sqlite --sizes 1000,10000,100000 --output bench_search.json
+    python3 bench_search.py --backend sqlite --sizes 50000 --dims 256 --trace-memory
+    MONGODB_URI=mongodb://localhost:27017 python3 bench_search.py --backend mongo
+
+Disk / memory note: at the default 1536 dims every stored embedding is ~30 KB
+of JSON, so N=100k (100k clips + 100k frames) is several GB in SQLite.
+Use --dims to shrink the corpus when only relative numbers matter.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import tracemalloc
+import importlib
+from types import SimpleNamespace
+
+from tags import FRAME_TAG_FIELDS, to_list
+
+WORDS = ('man woman young old office street market money cash phone laptop car road night day rooftop '
+         'warm cool light shadow smile laugh tears anger fear pressure trapped friends brother father son '
+         'college classroom desk chair window plant sofa city crowd rain sun wide close medium shot angle '
+         'static tracking handheld dolly zoom cinematic moody vibrant muted golden blue neon stack suit '
+         'turban saree uniform glasses coffee tea food dinner party dance fight chase hug kiss talk shout').split()
+
+EMOTIONS = ['happy', 'sad', 'laughing', 'angry', 'surprised', 'contemplative', 'anxious', 'neutral', 'fear', 'love']
+GENRES   = ['Drama', 'Comedy', 'Thriller', 'Romance', 'Action']
+SERIES   = ['Farzi', 'Scam 1992', '3 Idiots', 'The Office', 'Breaking Bad', 'Unknown', '']
+ACTORS   = ['Shahid Kapoor', 'Aamir Khan', 'Alia Bhatt', 'Vijay Sethupathi', 'Pratik Gandhi', '']
+CATEGORIES = ['Videos', 'Videos', 'Videos', 'GIFs', 'PS', 'Photo', 'Intro', 'Intro-Vlog', 'Intro-Narration']
+
+QUERY_MIX = [
+    ('actor',           {'query': 'shahid kapoor'}),
+    ('actor',           {'query': 'aamir khan'}),
+    ('series',          {'query': 'farzi'}),
+    ('series',          {'query': 'scam 1992'}),
+    ('emotion',         {'query': 'sad'}),
+    ('emotion',         {'query': 'under pressure'}),
+    ('broad',           {'query': 'man'}),
+    ('filter_only',     {'query': '', 'emotions': ['sad', 'angry']}),
+    ('filter_only',     {'query': '', 'genres': ['Drama']}),
+    ('category',        {'query': 'money', 'categories': ['GIFs']}),
+    ('category',        {'query': 'presenter talking to camera', 'categories': ['Intro']}),
+]
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+def _text(rng, chars):
+    out, length = [], 0
+    while length < chars:
+        w = rng.choice(WORDS)
+        out.append(w)
+        length += len(w) + 1
+    return ' '.join(out)
+
+
+def _tags(rng, lo, hi):
+    return ', '.join('-'.join(rng.sample(WORDS, rng.randint(1, 3))) for _ in range(rng.randint(lo, hi)))
+
+
+def unit_vectors(count, dims, seed):
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(count):
+        vec = [rng.gauss(0.0, 1.0) for _ in range(dims)]
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        pool.append([v / norm for v in vec])
+    return pool
+
+
+def synth_corpus(n, dims, seed=42, pool_size=1024):
+    """Yield (videos, clips, frames) lists for a corpus of n clips and n frames."""
+    rng = random.Random(seed)
+    pool = unit_vectors(min(pool_size, n), dims, seed)
+    n_videos = max(1, n // 20)
+    videos, clips, frames = [], [], []
+    for vid in range(1, n_videos + 1):
+        videos.append({
+            'id':          vid,
+            'filename':    f"{rng.choice(SERIES) or 'clip'}_{_text(rng, 20).replace(' ', '_')}_{vid}.mp4",
+            'title':       _text(rng, 40),
+            'duration':    rng.choice([8.0, 15.0, 45.0, 120.0, 300.0]),
+            'status':      'complete',
+            'thumbnail':   f"thumb_{vid}.jpg",
+            'custom_tags': _tags(rng, 0, 4),
+            'category':    rng.choice(CATEGORIES),
+        })
+    for i in range(1, n + 1):
+        video = videos[(i - 1) % n_videos]
+        start = float((i // n_videos) * 5)
+        clips.append({
+            'id':              i,
+            'video_id':        video['id'],
+            'category':        video['category'],
+            'filename':        video['filename'],
+            'start_time':      start,
+            'end_time':        start + 5.0,
+            'duration':        5.0,
+            'transcript_text': _text(rng, rng.randint(40, 200)),
+            'embedding':       pool[rng.randrange(len(pool))],
+        })
+        emotion = rng.choice(EMOTIONS)
+        frames.append({
+            'id':                 i,
+            'video_id':           video['id'],
+            'category':           video['category'],
+            'filename':           video['filename'],
+            'timestamp':          start,
+            'frame_path':         f"frame_{i}.jpg",
+            'visual_description': f"[Visual - {emotion.title()}] " + _text(rng, rng.randint(400, 900)),
+            'emotion':            emotion,
+            'ocr_text':           _text(rng, rng.randint(0, 40)),
+            'tags':               _tags(rng, 20, 40),
+            'genres':             ', '.join(rng.sample(GENRES, rng.randint(1, 2))),
+            'deep_emotions':      _tags(rng, 30, 50),
+            'scene_context':      _text(rng, rng.randint(120, 300)),
+            'people_description': rng.choice(['young man', 'woman', 'two men', 'father and son']) + ' ' + _text(rng, 40),
+            'environment':        _text(rng, rng.randint(200, 500)),
+            'dialogue_context':   _text(rng, rng.randint(0, 200)),
+            'series_movie':       rng.choice(SERIES),
+            'target_audience':    'General',
+            'scene_type':         'dramatic',
+            'actors':             rng.choice(ACTORS),
+            'media_type':         'Movie',
+            'emotion_tags':       _tags(rng, 30, 50),
+            'laugh_tags':         _tags(rng, 0, 15) if emotion in ('happy', 'laughing') else '',
+            'contextual_tags':    _tags(rng, 25, 35),
+            'character_tags':     _tags(rng, 10, 20),
+            'semantic_tags':      _tags(rng, 35, 50),
+            'visual_embedding':   pool[rng.randrange(len(pool))],
+        })
+    return videos, clips, frames
+
+
+# ---------------------------------------------------------------------------
+# Fetch accounting (references are collected on the hot path, sized afterwards)
+# ---------------------------------------------------------------------------
+
+_local = threading.local()
+
+
+def _fetched(rows):
+    sink = getattr(_local, 'fetched', None)
+    if sink is not None:
+        sink.append(rows)
+    return rows
+
+
+def _add(bucket, wall, cpu):
+    timings = getattr(_local, 'timings', None)
+    if timings is not None:
+        t = timings.setdefault(bucket, [0.0, 0.0])
+        t[0] += wall
+        t[1] += cpu
+
+
+def _timed(bucket, fn):
+    def wrapper(*args, **kwargs):
+        w, c = time.perf_counter(), time.thread_time()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _add(bucket, time.perf_counter() - w, time.thread_time() - c)
+    wrapper.__wrapped__ = fn
+    return wrapper
+
+
+def _value_size(value):
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, (int, float)):
+        return 8
+    if isinstance(value, dict):
+        return sum(len(k) + _value_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_value_size(v) for v in value)
+    return len(str(value))
+
+
+def fetched_bytes():
+    return sum(_value_size(rows) for rows in getattr(_local, 'fetched', []) or [])
+
+
+class _TimedCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def fetchall(self):
+        return _fetched(_timed('db_fetch', self._cursor.fetchall)())
+
+    def fetchone(self):
+        return _fetched(_timed('db_fetch', self._cursor.fetchone)())
+
+    def execute(self, *args):
+        _timed('db_fetch', self._cursor.execute)(*args)
+        return self
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _TimedConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return _TimedCursor(self._conn.cursor())
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class _TimedMongoCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def limit(self, n):
+        return _TimedMongoCursor(self._cursor.limit(n))
+
+    def sort(self, *args, **kwargs):
+        return _TimedMongoCursor(self._cursor.sort(*args, **kwargs))
+
+    def __iter__(self):
+        docs = _timed('db_fetch', list)(self._cursor)
+        return iter(_fetched(docs))
+
+
+class _TimedMongoCollection:
+    def __init__(self, col):
+        self._col = col
+
+    def find(self, *args, **kwargs):
+        return _TimedMongoCursor(self._col.find(*args, **kwargs))
+
+    def find_one(self, *args, **kwargs):
+        return _fetched(_timed('db_fetch', self._col.find_one)(*args, **kwargs))
+
+    def aggregate(self, *args, **kwargs):
+        return iter(_fetched(_timed('db_fetch', lambda: list(self._col.aggregate(*args, **kwargs)))()))
+
+    def __getattr__(self, name):
+        return getattr(self._col, name)
+
+
+# ---------------------------------------------------------------------------
+# In-memory Mongo stand-in (only the query shapes app_mongo uses)
+# ---------------------------------------------------------------------------
+
+def _matches(doc, flt):
+    for key, cond in (flt or {}).items():
+        if key == '$and':
+            if not all(_matches(doc, c) for c in cond):
+                return False
+            continue
+        if key == '$or':
+            if not any(_matches(doc, c) for c in cond):
+                return False
+            continue
+        value = doc.get(key)
+        if isinstance(cond, dict):
+            for op, arg in cond.items():
+                if op == '$in' and not (set(value) & set(arg) if isinstance(value, list) else value in arg):
+                    return False
+                if op == '$nin' and value in arg:
+                    return False
+                if op == '$lte' and not (value is not None and value <= arg):
+                    return False
+                if op == '$gte' and not (value is not None and value >= arg):
+                    return False
+                if op == '$gt' and not (value is not None and value > arg):
+                    return False
+                if op == '$lt' and not (value is not None and value < arg):
+                    return False
+                if op == '$ne' and value == arg:
+                    return False
+        elif value != cond:
+            return False
+    return True
+
+
+def _project(doc, projection):
+    if not projection:
+        return dict(doc)
+    include = [k for k, v in projection.items() if v and k != '_id']
+    if not include:
+        return {k: v for k, v in doc.items() if projection.get(k, 1)}
+    return {k: doc[k] for k in include if k in doc}
+
+
+class MemoryCursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def limit(self, n):
+        return MemoryCursor(self._docs[:n] if n else self._docs)
+
+    def sort(self, key, direction=1):
+        return MemoryCursor(sorted(self._docs, key=lambda d: d.get(key) or 0, reverse=direction < 0))
+
+    def __iter__(self):
+        return iter(self._docs)
+
+
+class MemoryCollection:
+    def __init__(self):
+        self.docs = []
+
+    def insert_many(self, docs, ordered=True):
+        self.docs.extend(dict(d) for d in docs)
+
+    def insert_one(self, doc):
+        self.docs.append(dict(doc))
+
+    def update_one(self, flt, update, upsert=False):
+        doc = next((d for d in self.docs if _matches(d, flt)), None)
+        if doc is not None:
+            doc.update(update.get('$set', {}))
+
+    def find_one_and_update(self, flt, update, upsert=False, return_document=False):
+        doc = next((d for d in self.docs if _matches(d, flt)), None)
+        if doc is None:
+            doc = dict(flt)
+            self.docs.append(doc)
+        for key, amount in update.get('$inc', {}).items():
+            doc[key] = doc.get(key, 0) + amount
+        return dict(doc)
+
+    def find(self, flt=None, projection=None):
+        return MemoryCursor([_project(d, projection) for d in self.docs if _matches(d, flt)])
+
+    def find_one(self, flt=None, projection=None):
+        return next(iter(self.find(flt, projection)), None)
+
+    def count_documents(self, flt):
+        return sum(1 for d in self.docs if _matches(d, flt))
+
+    def aggregate(self, pipeline):
+        counts = {}
+        for d in self.docs:
+            counts[d.get('video_id')] = counts.get(d.get('video_id'), 0) + 1
+        return iter({'_id': k, 'count': v} for k, v in counts.items())
+
+    def delete_many(self, flt):
+        self.docs = [d for d in self.docs if not _matches(d, flt)]
+
+    def create_index(self, *args, **kwargs):
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+
+SQLITE_FRAME_COLUMNS = ['emotion_tags', 'laugh_tags', 'contextual_tags', 'character_tags', 'semantic_tags',
+                        'actors', 'media_type']
+
+
+def _ensure_sqlite_columns(conn):
+    """Older init_db() versions never created the categorised tag columns; add them for the bench DB."""
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(visual_frames)')}
+    for col in SQLITE_FRAME_COLUMNS:
+        if col not in existing:
+            conn.execute(f'ALTER TABLE visual_frames ADD COLUMN {col} TEXT')
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(videos)')}
+    for col, decl in [('title', 'TEXT'), ('category', "TEXT DEFAULT 'Videos'")]:
+        if col not in existing:
+            conn.execute(f'ALTER TABLE videos ADD COLUMN {col} {decl}')
+    conn.commit()
+
+
+def populate_sqlite(app_module, videos, clips, frames):
+    import sqlite3
+    conn = sqlite3.connect(app_module.DATABASE, timeout=30.0)
+    _ensure_sqlite_columns(conn)
+    for table in ('visual_frames', 'clips', 'videos'):
+        conn.execute(f'DELETE FROM {table}')
+    conn.executemany(
+        'INSERT INTO videos (id, filename, duration, status, thumbnail, custom_tags, title, category) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        [(v['id'], v['filename'], v['duration'], v['status'], v['thumbnail'], v['custom_tags'],
+          v['title'], v['category']) for v in videos])
+    conn.executemany(
+        'INSERT INTO clips (id, video_id, filename, start_time, end_time, duration, transcript_text, embedding) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        ((c['id'], c['video_id'], c['filename'], c['start_time'], c['end_time'], c['duration'],
+          c['transcript_text'], json.dumps(c['embedding']).encode('utf-8')) for c in clips))
+    cols = ['id', 'video_id', 'filename', 'timestamp', 'frame_path', 'visual_description', 'visual_embedding',
+            'emotion', 'ocr_text', 'tags', 'genres', 'deep_emotions', 'scene_context', 'people_description',
+            'environment', 'dialogue_context', 'series_movie', 'target_audience', 'scene_type', 'actors',
+            'media_type', 'emotion_tags', 'laugh_tags', 'contextual_tags', 'character_tags', 'semantic_tags']
+    conn.executemany(
+        f"INSERT INTO visual_frames ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+        (tuple(json.dumps(f[c]).encode('utf-8') if c == 'visual_embedding' else f[c] for c in cols) for f in frames))
+    conn.commit()
+    conn.close()
+
+
+def _as_arrays(doc, fields):
+    """Mongo stores tag fields as arrays (mongo_migrations 4)."""
+    doc = dict(doc)
+    for field in fields:
+        if field in doc:
+            doc[field] = to_list(doc[field])
+    return doc
+
+
+def populate_mongo(app_module, videos, clips, frames, batch=1000):
+    for col, docs, fields in [(app_module.videos_col, videos, ('custom_tags',)),
+                              (app_module.clips_col, clips, ()),
+                              (app_module.frames_col, frames, FRAME_TAG_FIELDS)]:
+        col.delete_many({})
+        for i in range(0, len(docs), batch):
+            col.insert_many([_as_arrays(d, fields) for d in docs[i:i + batch]], ordered=False)
+
+
+def load_app(backend, workdir):
+    os.environ['MODEL_PROVIDER'] = 'fake'
+    os.environ.setdefault('OPENAI_API_KEY', 'bench')
+    os.environ['STORAGE_BASE'] = workdir
+    os.environ['SEARCH_CACHE_ENABLED'] = '0'  # measure scoring, not cached pages
+    if backend == 'memory':
+        os.environ.setdefault('MONGODB_URI', 'mongodb://localhost:27017')
+    os.chdir(workdir)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    module = importlib.import_module('app_semantic' if backend == 'sqlite' else 'app_mongo')
+
+    if backend == 'memory':
+        module.ensure_schema = lambda: None
+        for name in ('videos_col', 'clips_col', 'frames_col', 'counters_col'):
+            setattr(module, name, MemoryCollection())
+    elif backend == 'mongo':
+        module.db = module.mongo_client['broll_mapper_bench']
+        module.videos_col = module.db['videos']
+        module.clips_col = module.db['clips']
+        module.frames_col = module.db['visual_frames']
+        module.counters_col = module.db['counters']
+    if hasattr(module, 'IdAllocator'):
+        module.id_allocator = module.IdAllocator(module.counters_col)
+    return module
+
+
+def instrument(app_module, backend):
+    app_module.cosine_similarity = _timed('scoring', app_module.cosine_similarity)
+    app_module.create_embedding = _timed('query_embed', app_module.create_embedding)
+    app_module.jsonify = _timed('serialise', app_module.jsonify)
+    if backend == 'sqlite':
+        get_conn = app_module.get_db_connection
+        app_module.get_db_connection = lambda: _TimedConnection(get_conn())
+    else:
+        for name in ('videos_col', 'clips_col', 'frames_col'):
+            setattr(app_module, name, _TimedMongoCollection(getattr(app_module, name)))
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    lo, hi = math.floor(k), math.ceil(k)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def run_queries(client, repeat):
+    per_kind = {}
+    for _ in range(repeat):
+        for kind, payload in QUERY_MIX:
+            _local.timings, _local.fetched = {}, []
+            w, c = time.perf_counter(), time.thread_time()
+            resp = client.post('/search', json=payload)
+            wall, cpu = time.perf_counter() - w, time.thread_time() - c
+            body = resp.get_data()
+            timings = _local.timings
+            stats = per_kind.setdefault(kind, {'latency': [], 'cpu': {}, 'bytes': [], 'results': [], 'errors': 0})
+            stats['latency'].append(wall)
+            stats['bytes'].append(fetched_bytes())
+            if resp.status_code != 200:
+                stats['errors'] += 1
+            else:
+                stats['results'].append(len(json.loads(body).get('results', [])))
+            accounted = sum(t[1] for t in timings.values())
+            split = {k: v[1] for k, v in timings.items()}
+            # Boosting, filtering and per-row embedding decoding run inline in the search loop,
+            # so they are reported together as the unaccounted remainder.
+            split['boost_filter_other'] = max(0.0, cpu - accounted)
+            for k, v in split.items():
+                stats['cpu'].setdefault(k, []).append(v)
+            _local.timings, _local.fetched = None, None
+    return per_kind
+
+
+def measure_memory(client):
+    """Peak Python heap (KB) per query kind over one extra pass, traced separately
+    so tracemalloc's overhead stays out of the latency numbers."""
+    peaks = {}
+    for kind, payload in QUERY_MIX:
+        tracemalloc.start()
+        client.post('/search', json=payload).get_data()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        peaks[kind] = max(peaks.get(kind, 0), peak // 1024)
+    return peaks
+
+
+def summarise(per_kind, peaks=None):
+    out = {}
+    for kind, s in per_kind.items():
+        out[kind] = {
+            'queries':        len(s['latency']),
+            'errors':         s['errors'],
+            'p50_ms':         round(percentile(s['latency'], 50) * 1000, 2),
+            'p95_ms':         round(percentile(s['latency'], 95) * 1000, 2),
+            'p99_ms':         round(percentile(s['latency'], 99) * 1000, 2),
+            'mean_db_bytes':  int(sum(s['bytes']) / len(s['bytes'])),
+            'mean_results':   round(sum(s['results']) / len(s['results']), 1) if s['results'] else 0,
+            'cpu_ms':         {k: round(sum(v) / len(v) * 1000, 3) for k, v in sorted(s['cpu'].items())},
+        }
+        if peaks:
+            out[kind]['peak_kb'] = peaks.get(kind)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description='B-Roll Mapper search latency benchmark')
+    parser.add_argument('--backend', choices=['sqlite', 'mongo', 'memory'], default='memory')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='comma-separated corpus sizes (clips = frames = N)')
+    parser.add_argument('--dims', type=int, default=1536, help='embedding dimensions')
+    parser.add_argument('--repeat', type=int, default=5, help='passes over the query mix per size')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workdir', default=None, help='scratch directory (default: a new temp dir)')
+    parser.add_argument('--output', default=None, help='write JSON results here instead of stdout')
+    parser.add_argument('--trace-memory', action='store_true', help='add peak heap per query kind (extra traced pass)')
+    args = parser.parse_args()
+
+    output_path = os.path.abspath(args.output) if args.output else None
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='broll_bench_search_'))
+    os.makedirs(workdir, exist_ok=True)
+    os.environ['FAKE_EMBEDDING_DIMS'] = str(args.dims)
+
+    app_module = load_app(args.backend, workdir)
+    populate = populate_sqlite if args.backend == 'sqlite' else populate_mongo
+    # populate through the raw handles, not the timing proxies
+    target = SimpleNamespace(**{name: getattr(app_module, name, None) for name in
+                                ('DATABASE', 'videos_col', 'clips_col', 'frames_col')})
+    instrument(app_module, args.backend)
+    client = app_module.app.test_client()
+
+    sizes = []
+    for n in [int(s) for s in args.sizes.split(',') if s.strip()]:
+        print(f"🧱 Populating {args.backend} with {n} clips + {n} frames ({args.dims} dims)...", file=sys.stderr)
+        start = time.perf_counter()
+        videos, clips, frames = synth_corpus(n, args.dims, seed=args.seed)
+        populate(target, videos, clips, frames)
+        del videos, clips, frames
+        populate_seconds = time.perf_counter() - start
+
+        print(f"🔍 Replaying {len(QUERY_MIX)} queries x {args.repeat}...", file=sys.stderr)
+        client.post('/search', json={'query': 'warmup'})
+        per_kind = run_queries(client, args.repeat)
+        peaks = measure_memory(client) if args.trace_memory else None
+        sizes.append({'n': n, 'populate_seconds': round(populate_seconds, 2), 'queries': summarise(per_kind, peaks)})
+        print(f"   ✅ N={n}: broad p50 {sizes[-1]['queries'].get('broad', {}).get('p50_ms')} ms", file=sys.stderr)
+
+    report = {
+        'benchmark': 'search',
+        'backend':   args.backend,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python':    platform.python_version(),
+        'dims':      args.dims,
+        'repeat':    args.repeat,
+        'sizes':     sizes,
+    }
+    text = json.dumps(report, indent=2)
+    if output_path:
+        with open(output_path, 'w') as f:
+            f.write(text + '\n')
+        print(f"📄 Results written to {output_path}", file=sys.stderr)
+    else:
+        print(text)
+
+    if not args.workdir:
+        os.chdir('/')
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""
+B-Roll Mapper - Content-addressed upload storage
+Uploads are written once, straight from the request body, and never copied.
+
+- The multipart parser asks the request for a file to write each upload part
+  into (`Request._get_file_stream`). `request_class` returns one whose
+  IncomingBlob sits in the store's staging directory and hashes (SHA-256) every
+  chunk as it is written - no SpooledTemporaryFile, no second temp file.
+- `commit` renames the staged file to blobs/<sha[:2]>/<sha>. Re-uploading the
+  same bytes finds the blob already there and just drops the staged copy.
+  `commit_file` does the same for a file assembled chunk by chunk
+  (resumable.py), hashing it in one read pass.
+- `link` puts a blob at its serving path (uploads/<filename>) with a hard link,
+  so the library file and the blob share one inode. It only falls back to a
+  copy when the two paths are on different filesystems.
+- `release` / `prune` delete blobs whose link count shows nothing in uploads/
+  refers to them any more.
+
+An IncomingBlob closed without being committed (bad extension, aborted
+request, parse error) removes its staged file.
+
+Stdlib + Flask only.
+"""
+
+import os
+import errno
+import shutil
+import uuid
+import hashlib
+import tempfile
+
+from flask import Request
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class IncomingBlob:
+    """Writable file in the staging directory that hashes what is written to it."""
+
+    def __init__(self, staging_dir):
+        fd, self.name = tempfile.mkstemp(dir=staging_dir, suffix='.part')
+        self._f = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.sha256()
+        self.size = 0
+        self.committed = False
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+        return self._f.write(data)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def read(self, size=-1):
+        return self._f.read(size)
+
+    def readline(self, size=-1):
+        return self._f.readline(size)
+
+    def seek(self, offset, whence=0):
+        return self._f.seek(offset, whence)
+
+    def tell(self):
+        return self._f.tell()
+
+    def flush(self):
+        self._f.flush()
+
+    def fileno(self):
+        return self._f.fileno()
+
+    def close(self):
+        if not self._f.closed:
+            self._f.close()
+        if not self.committed and os.path.exists(self.name):
+            os.remove(self.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class BlobStore:
+    def __init__(self, root):
+        self.root = root
+        self.staging = os.path.join(root, 'incoming')
+        os.makedirs(self.staging, exist_ok=True)
+
+    def path_for(self, sha256):
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def open_incoming(self):
+        return IncomingBlob(self.staging)
+
+    def receive(self, stream, chunk_size=CHUNK_SIZE):
+        """Copy a readable stream into a new IncomingBlob chunk by chunk (not committed)."""
+        blob = self.open_incoming()
+        try:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                blob.write(chunk)
+        except BaseException:
+            blob.close()
+            raise
+        return blob
+
+    def commit(self, blob):
+        """Move a fully written IncomingBlob to its content address. Returns that path."""
+        blob.flush()
+        os.fsync(blob.fileno())
+        path = self.path_for(blob.sha256)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            blob.close()                       # same bytes already stored
+        else:
+            os.replace(blob.name, path)
+            blob.committed = True
+            blob.close()
+        return path
+
+    def commit_file(self, path, chunk_size=CHUNK_SIZE):
+        """Hash a file assembled elsewhere on this filesystem (resumable uploads) and
+        move it to its content address. Returns (blob path, sha256, size)."""
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+        sha256 = digest.hexdigest()
+        blob_path = self.path_for(sha256)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        if os.path.exists(blob_path):
+            os.remove(path)
+        else:
+            os.replace(path, blob_path)
+        return blob_path, sha256, size
+
+    def link(self, blob_path, dest):
+        """Make `dest` the same file as `blob_path` (hard link; copy across filesystems)."""
+        # Unique per call: two requests linking the same filename must not collide
+        tmp = f'{dest}.{uuid.uuid4().hex}.link'
+        try:
+            try:
+                os.link(blob_path, tmp)
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                    raise
+                shutil.copyfile(blob_path, tmp)
+            os.replace(tmp, dest)
+        finally:
+            # Also after a successful replace: rename() is a no-op when `dest` is
+            # already a link to the same blob, which leaves `tmp` behind
+            if os.path.lexists(tmp):
+                os.remove(tmp)
+        return dest
+
+    def release(self, sha256):
+        """Delete the blob for `sha256` if nothing else links to it. Returns True if removed."""
+        if not sha256:
+            return False
+        path = self.path_for(sha256)
+        try:
+            if os.stat(path).st_nlink <= 1:
+                os.remove(path)
+                return True
+        except FileNotFoundError:
+            pass
+        return False
+
+    def prune(self):
+        """Delete every unreferenced blob. Returns how many were removed."""
+        removed = 0
+        for entry in os.scandir(self.root):
+            if not entry.is_dir() or entry.name == 'incoming':
+                continue
+            for blob in os.scandir(entry.path):
+                if blob.is_file() and blob.stat().st_nlink <= 1:
+                    os.remove(blob.path)
+                    removed += 1
+        return removed
+
+
+def request_class(store):
+    """Flask request class whose file uploads are parsed straight into `store`."""
+
+    class StreamingRequest(Request):
+        def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+            if filename:
+                return store.open_incoming()
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+    return StreamingRequest
+
+
+def commit_upload(store, file_storage):
+    """(blob path, sha256, size) for an uploaded FileStorage.
+
+    Uploads parsed by `request_class` are committed in place; anything else (a
+    different request class, tests) is streamed through the store once.
+    """
+    blob = file_storage.stream
+    if not isinstance(blob, IncomingBlob):
+        file_storage.stream.seek(0)
+        blob = store.receive(file_storage.stream)
+    sha256, size = blob.sha256, blob.size
+    return store.commit(blob), sha256, size
@@ -0,0 +1,423 @@
+"""
+B-Roll Mapper - Bulk upload / restore
+Sends a folder of videos and images to the server through the resumable
+upload API, several files at a time, and can be stopped and re-run at any point.
+
+- Journal: one JSON line per event in <folder>/.broll-upload.jsonl, keyed by
+  server + absolute path, remembering size, mtime, sha256, the open upload
+  session and the outcome. A re-run skips finished files, reuses hashes of
+  files that have not changed and continues half-sent files from the server's
+  offset.
+- Existence check: content hashes (and filenames, for records stored before
+  hashes were kept) go to POST /videos/lookup in batches of LOOKUP_BATCH, and
+  files the server already has are not sent at all. Servers without the
+  endpoint simply get every file.
+- Adaptive concurrency: up to --workers uploads run at once. A watcher reads
+  broll_ingest_queue_depth from GET /metrics every few seconds and drops one
+  slot while the ingest queue is above --queue-high, adding one back once it
+  falls to --queue-low, so uploads never outrun the AI pipeline.
+
+batch_upload_all.py and bulk_restore.py are thin wrappers around `main`.
+
+    python3 bulk_restore.py /path/to/videos --workers 6
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from upload_client import resumable_upload, UploadError
+
+JOURNAL_NAME = '.broll-upload.jsonl'
+LOOKUP_BATCH = 500
+HASH_CHUNK = 1024 * 1024
+QUEUE_METRIC = 'broll_ingest_queue_depth'
+WATCH_INTERVAL = 5
+
+SUPPORTED_EXTENSIONS = {'.mp4', '.mov', '.avi', '.mkv', '.gif', '.jpg', '.jpeg', '.png', '.heic', '.webm'}
+
+_print_lock = threading.Lock()
+
+
+def say(*args, **kwargs):
+    with _print_lock:
+        print(*args, **kwargs, flush=True)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Journal:
+    """Append-only JSON-lines log of per-file progress; the last line for a key wins.
+
+    Every record is flushed and fsynced before returning, so a crash loses at
+    most the event that was being written. The file is compacted on open.
+    """
+
+    def __init__(self, path, base_url):
+        self.path = path
+        self.base_url = base_url
+        self._entries = {}
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self._entries[(entry['url'], entry['path'])] = entry
+                    except (ValueError, KeyError):
+                        continue               # torn last line from a crash
+        except FileNotFoundError:
+            pass
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            for entry in self._entries.values():
+                f.write(json.dumps(entry) + '\n')
+        os.replace(tmp, path)
+        self._f = open(path, 'a')
+
+    def get(self, path, st):
+        """Entry for `path` on this server, or None if there is none or the file changed."""
+        entry = self._entries.get((self.base_url, path))
+        if entry and entry.get('size') == st.st_size and entry.get('mtime_ns') == st.st_mtime_ns:
+            return entry
+        return None
+
+    def record(self, path, st, **fields):
+        with self._lock:
+            entry = self.get(path, st) or {'url': self.base_url, 'path': path,
+                                           'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+            entry = dict(entry, **fields, at=time.time())
+            self._entries[(self.base_url, path)] = entry
+            self._f.write(json.dumps(entry) + '\n')
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            return entry
+
+    def close(self):
+        self._f.close()
+
+
+class AdaptiveLimit:
+    """Counting semaphore whose limit can be moved between `minimum` and `maximum`
+    while workers are waiting on it."""
+
+    def __init__(self, initial, minimum, maximum):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(self.maximum, max(self.minimum, initial))
+        self._active = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self._active >= self.limit:
+                self._cond.wait()
+            self._active += 1
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
+
+    def adjust(self, step):
+        """Move the limit by `step` (clamped). Returns the new limit."""
+        with self._cond:
+            self.limit = min(self.maximum, max(self.minimum, self.limit + step))
+            self._cond.notify_all()
+            return self.limit
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def queue_depth(session, base_url):
+    """Server ingest queue depth from /metrics, or None if it cannot be read."""
+    try:
+        resp = session.get(f"{base_url}/metrics", timeout=10)
+    except requests.exceptions.RequestException:
+        return None
+    if resp.status_code != 200:
+        return None
+    depth = None
+    for line in resp.text.splitlines():
+        if line.startswith(QUEUE_METRIC) and not line.startswith(QUEUE_METRIC + '_'):
+            try:
+                depth = (depth or 0) + float(line.rsplit(' ', 1)[1])
+            except (IndexError, ValueError):
+                continue
+    return depth
+
+
+class QueueWatcher(threading.Thread):
+    """Background thread steering an AdaptiveLimit by the server's ingest queue."""
+
+    def __init__(self, base_url, limit, high, low, interval=WATCH_INTERVAL):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.limit = limit
+        self.high = high
+        self.low = low
+        self.interval = interval
+        self.peak = None
+        self._halt = threading.Event()
+
+    def run(self):
+        session = requests.Session()
+        while not self._halt.wait(self.interval):
+            depth = queue_depth(session, self.base_url)
+            if depth is None:
+                continue
+            self.peak = depth if self.peak is None else max(self.peak, depth)
+            before = self.limit.limit
+            if depth > self.high:
+                after = self.limit.adjust(-1)
+            elif depth <= self.low:
+                after = self.limit.adjust(+1)
+            else:
+                continue
+            if after != before:
+                say(f"   ⚙️  Ingest queue at {depth:.0f} → {after} concurrent upload(s)")
+
+    def stop(self):
+        self._halt.set()
+
+
+def lookup_existing(session, base_url, items):
+    """Paths of `items` (dicts with path, filename, sha256) the server already has.
+
+    Returns None when the server has no POST /videos/lookup.
+    """
+    existing = set()
+    for i in range(0, len(items), LOOKUP_BATCH):
+        batch = items[i:i + LOOKUP_BATCH]
+        try:
+            resp = session.post(f"{base_url}/videos/lookup", json={
+                'hashes': [it['sha256'] for it in batch],
+                'filenames': [it['filename'] for it in batch],
+            }, timeout=60)
+        except requests.exceptions.RequestException as e:
+            say(f"⚠️  Lookup failed ({e}) — uploading this batch without checking")
+            continue
+        if resp.status_code in (404, 405):
+            return None
+        if resp.status_code != 200:
+            say(f"⚠️  Lookup failed (HTTP {resp.status_code}) — uploading this batch without checking")
+            continue
+        data = resp.json()
+        by_hash = data.get('hashes') or {}
+        by_name = data.get('filenames') or {}
+        for it in batch:
+            if _already_stored(by_hash.get(it['sha256'])):
+                existing.add(it['path'])
+                continue
+            # Records from before hashes were kept: same name, and same size where known
+            record = by_name.get(it['filename'])
+            if (_already_stored(record) and record.get('sha256') in (None, it['sha256'])
+                    and record.get('size') in (None, it['stat'].st_size)):
+                existing.add(it['path'])
+    return existing
+
+
+def _already_stored(record):
+    return bool(record) and record.get('status') in ('complete', 'processing') and record.get('file_present', True)
+
+
+def find_files(folder, extensions=SUPPORTED_EXTENSIONS):
+    return sorted(
+        os.path.join(folder, f) for f in os.listdir(folder)
+        if os.path.splitext(f)[1].lower() in extensions and os.path.isfile(os.path.join(folder, f))
+    )
+
+
+def run(base_url, files, journal, workers=4, min_workers=1, category=None,
+        queue_high=8, queue_low=2, dry_run=False):
+    """Upload `files` (absolute paths). Returns a summary dict."""
+    started = time.time()
+    summary = {'total': len(files), 'uploaded': 0, 'restored': 0, 'skipped': 0,
+               'already_done': 0, 'failed': [], 'bytes_sent': 0}
+    session = requests.Session()
+
+    # 1. Files finished by an earlier run need nothing; the rest need a hash.
+    pending = []
+    for path in files:
+        st = os.stat(path)
+        entry = journal.get(path, st)
+        if entry and entry.get('status') in ('uploaded', 'restored', 'skipped'):
+            summary['already_done'] += 1
+            continue
+        pending.append({'path': path, 'filename': os.path.basename(path), 'stat': st,
+                        'sha256': entry.get('sha256') if entry else None,
+                        'upload_id': entry.get('upload_id') if entry else None})
+    if summary['already_done']:
+        say(f"📒 {summary['already_done']} file(s) already done in an earlier run (journal)")
+
+    to_hash = [it for it in pending if not it['sha256']]
+    if to_hash:
+        say(f"🔑 Hashing {len(to_hash)} file(s)...")
+
+        def _hash(it):
+            it['sha256'] = file_sha256(it['path'])
+            journal.record(it['path'], it['stat'], sha256=it['sha256'], status='hashed')
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            list(pool.map(_hash, to_hash))
+
+    # 2. Ask the server which of them it already has.
+    if pending:
+        existing = lookup_existing(session, base_url, pending)
+        if existing is None:
+            say("ℹ️  Server has no /videos/lookup — every file will be sent (restores are still cheap)")
+        else:
+            for it in pending:
+                if it['path'] in existing:
+                    journal.record(it['path'], it['stat'], status='skipped')
+                    summary['skipped'] += 1
+            pending = [it for it in pending if it['path'] not in existing]
+            say(f"🔍 {summary['skipped']} already on the server, {len(pending)} to send")
+
+    total_bytes = sum(it['stat'].st_size for it in pending)
+    say(f"📦 {len(pending)} file(s), {total_bytes / 1024 / 1024 / 1024:.2f} GB to upload")
+    if dry_run or not pending:
+        summary['elapsed'] = time.time() - started
+        return summary
+
+    # 3. Upload with a worker pool whose width follows the ingest queue.
+    limit = AdaptiveLimit(workers, min_workers, workers)
+    watcher = QueueWatcher(base_url, limit, queue_high, queue_low)
+    watcher.start()
+    local = threading.local()
+
+    def _upload(it):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        with limit:
+            result = resumable_upload(
+                base_url, it['path'], category=category, filename=it['filename'],
+                session=local.session, upload_id=it['upload_id'],
+                on_created=lambda upload_id: journal.record(it['path'], it['stat'], upload_id=upload_id),
+            )
+        if not result.get('success'):
+            raise UploadError(result.get('error', 'Unknown error'))
+        return result
+
+    pool = ThreadPoolExecutor(max_workers=limit.maximum)
+    try:
+        futures = {pool.submit(_upload, it): it for it in pending}
+        for n, future in enumerate(as_completed(futures), 1):
+            it = futures[future]
+            size_mb = it['stat'].st_size / 1024 / 1024
+            try:
+                result = future.result()
+            except Exception as e:
+                journal.record(it['path'], it['stat'], status='failed', error=str(e)[:200])
+                summary['failed'].append((it['filename'], str(e)[:100]))
+                say(f"[{n}/{len(pending)}] ❌ {it['filename']}: {str(e)[:80]}")
+                continue
+            status = 'restored' if result.get('restored') else 'uploaded'
+            journal.record(it['path'], it['stat'], status=status, upload_id=None)
+            summary[status] += 1
+            summary['bytes_sent'] += it['stat'].st_size
+            icon = '♻️  Restored' if status == 'restored' else '✅ Uploaded'
+            say(f"[{n}/{len(pending)}] {icon} {it['filename']} ({size_mb:.1f} MB)")
+    finally:
+        watcher.stop()
+        pool.shutdown(wait=False, cancel_futures=True)   # Ctrl-C: don't start queued files
+
+    summary['elapsed'] = time.time() - started
+    summary['peak_queue_depth'] = watcher.peak
+    return summary
+
+
+def print_summary(summary, base_url):
+    elapsed = summary.get('elapsed', 0)
+    rate = summary['bytes_sent'] / 1024 / 1024 / elapsed if elapsed else 0
+    say()
+    say("=" * 70)
+    say("✅ BULK UPLOAD COMPLETE" if not summary['failed'] else "⚠️  BULK UPLOAD FINISHED WITH ERRORS")
+    say("=" * 70)
+    say(f"   📁 Files:            {summary['total']}")
+    say(f"   ✅ Uploaded:         {summary['uploaded']}")
+    say(f"   ♻️  Restored:         {summary['restored']}")
+    say(f"   ⏭️  Already on server: {summary['skipped']}")
+    say(f"   📒 Done earlier:     {summary['already_done']}")
+    say(f"   ❌ Failed:           {len(summary['failed'])}")
+    say(f"   ⏱️  Time taken:       {elapsed / 60:.1f} minutes ({rate:.1f} MB/s)")
+    if summary.get('peak_queue_depth') is not None:
+        say(f"   📊 Peak ingest queue: {summary['peak_queue_depth']:.0f}")
+    if summary['failed']:
+        say()
+        say("Failed files (re-run the same command to retry them):")
+        for name, error in summary['failed']:
+            say(f"   - {name}: {error}")
+    say()
+    say(f"🌐 {base_url}")
+
+
+def main(argv=None, default_url=None, default_folder=None, description=None, extensions=SUPPORTED_EXTENSIONS):
+    parser = argparse.ArgumentParser(description=description or __doc__.splitlines()[1])
+    parser.add_argument('folder', nargs='?' if default_folder else None, default=default_folder,
+                        help='folder with the videos / images to send' +
+                             (f' (default: {default_folder})' if default_folder else ''))
+    parser.add_argument('--url', default=default_url, required=default_url is None,
+                        help=f'server base URL (default: {default_url})')
+    parser.add_argument('--workers', type=int, default=4, help='maximum concurrent uploads (default: 4)')
+    parser.add_argument('--min-workers', type=int, default=1, help='lowest concurrency under back-pressure (default: 1)')
+    parser.add_argument('--category', default=None, help='category for new uploads (server default if omitted)')
+    parser.add_argument('--queue-high', type=float, default=8,
+                        help='ingest queue depth above which concurrency is reduced (default: 8)')
+    parser.add_argument('--queue-low', type=float, default=2,
+                        help='ingest queue depth at or below which concurrency is raised again (default: 2)')
+    parser.add_argument('--journal', default=None, help=f'journal file (default: <folder>/{JOURNAL_NAME})')
+    parser.add_argument('--dry-run', action='store_true', help='hash and check the server, but upload nothing')
+    args = parser.parse_args(argv)
+
+    folder = os.path.abspath(args.folder)
+    if not os.path.isdir(folder):
+        say(f"❌ Folder not found: {args.folder}")
+        return 1
+    files = find_files(folder, extensions)
+    if not files:
+        say(f"❌ No supported video/image files found in {args.folder}")
+        return 1
+
+    base_url = args.url.rstrip('/')
+    say(f"📁 Found {len(files)} files in: {folder}")
+    say(f"🚀 Target: {base_url} (up to {args.workers} concurrent uploads)")
+    say()
+
+    journal = Journal(args.journal or os.path.join(folder, JOURNAL_NAME), base_url)
+    try:
+        summary = run(base_url, files, journal, workers=args.workers, min_workers=args.min_workers,
+                      category=args.category, queue_high=args.queue_high, queue_low=args.queue_low,
+                      dry_run=args.dry_run)
+    except KeyboardInterrupt:
+        say("\n⏸️  Interrupted — re-run the same command to continue where this left off")
+        return 130
+    finally:
+        journal.close()
+    print_summary(summary, base_url)
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
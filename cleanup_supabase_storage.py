@@ -11,70 +11,32 @@ Run:
     python cleanup_supabase_storage.py
 """
 
-import os
 import sys
-from dotenv import load_dotenv, dotenv_values
 
-load_dotenv()
+import storage_sync
 
-try:
-    from supabase import create_client
-except ImportError:
-    print("❌ supabase package not installed. Run: pip install supabase")
-    sys.exit(1)
-
-SUPABASE_URL         = os.getenv('SUPABASE_URL')
-SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_KEY')
-
-if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
-    sb_env = dotenv_values('.env.supabase')
-    SUPABASE_URL         = SUPABASE_URL         or sb_env.get('SUPABASE_URL')
-    SUPABASE_SERVICE_KEY = SUPABASE_SERVICE_KEY or sb_env.get('SUPABASE_SERVICE_KEY')
-
-if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
+if not storage_sync.SUPABASE_URL or not storage_sync.SUPABASE_SERVICE_KEY:
     print("❌ SUPABASE_URL and SUPABASE_SERVICE_KEY must be set (in .env or .env.supabase)")
     sys.exit(1)
 
-BUCKET_NAME = 'broll-videos'
-
-print("🔌 Connecting to Supabase...")
-sb = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
-print("✅ Connected\n")
-
-
-def list_all_files(folder):
-    """List all files in a Supabase Storage folder."""
-    try:
-        files = sb.storage.from_(BUCKET_NAME).list(folder)
-        return [f"{folder}/{f['name']}" for f in files if f.get('name') and not f['name'].startswith('.')]
-    except Exception as e:
-        print(f"  ⚠️  Could not list {folder}/: {e}")
-        return []
-
-
-def delete_in_batches(paths, batch_size=100):
-    """Delete files in batches (Supabase has a limit per request)."""
-    total_deleted = 0
-    for i in range(0, len(paths), batch_size):
-        batch = paths[i:i + batch_size]
-        try:
-            sb.storage.from_(BUCKET_NAME).remove(batch)
-            total_deleted += len(batch)
-            print(f"  🗑️  Deleted {total_deleted}/{len(paths)} files...", end='\r')
-        except Exception as e:
-            print(f"\n  ⚠️  Batch delete error: {e}")
-    return total_deleted
+FOLDERS = ['videos', 'thumbnails']
 
+client = storage_sync.StorageClient(storage_sync.SUPABASE_URL, storage_sync.SUPABASE_SERVICE_KEY,
+                                    storage_sync.BUCKET_NAME)
 
 # ── List files ────────────────────────────────────────────────────────────────
 
+# Paginated, so folders with more files than one list() page are fully covered
 print("📂 Listing files in Supabase Storage...")
-video_files     = list_all_files('videos')
-thumbnail_files = list_all_files('thumbnails')
-all_files       = video_files + thumbnail_files
-
-print(f"  Found {len(video_files)} video files")
-print(f"  Found {len(thumbnail_files)} thumbnail files")
+files = {}
+for folder in FOLDERS:
+    try:
+        files[folder] = [obj['path'] for obj in client.list(folder)]
+    except storage_sync.StorageError as e:
+        print(f"  ⚠️  Could not list {folder}/: {e}")
+        files[folder] = []
+    print(f"  Found {len(files[folder])} {folder} files")
+all_files = [path for folder in FOLDERS for path in files[folder]]
 print(f"  Total: {len(all_files)} files\n")
 
 if not all_files:
@@ -94,6 +56,9 @@ if confirm != 'YES':
 # ── Delete ────────────────────────────────────────────────────────────────────
 
 print(f"\n🗑️  Deleting {len(all_files)} files...")
-deleted = delete_in_batches(all_files)
-print(f"\n✅ Deleted {deleted} files from Supabase Storage.")
+failed = storage_sync.delete_paths(client, all_files)
+print(f"\n✅ Deleted {len(all_files) - len(failed)} files from Supabase Storage.")
+if failed:
+    print(f"⚠️  {len(failed)} files could not be deleted - run this script again.")
+    sys.exit(1)
 print("   Your Supabase storage usage is now free.")
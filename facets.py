@@ -0,0 +1,85 @@
+"""
+B-Roll Mapper - Facet index
+Emotions, genres, categories, actors and series with per-video counts for /filters.
+
+Each video's facet values are computed once from its frames when it is processed
+(`video_facets`) and stored with the video, so reprocessing or deleting it only
+applies the difference (`facet_deltas`) to the shared counts instead of anyone
+rescanning visual_frames. A count is the number of videos carrying the value.
+
+`filter_keys` gives the lowercased emotion / genres copies Mongo frames carry,
+so the /search emotion and genre filters match any spelling with an index lookup.
+
+Stdlib only; the storage (a Mongo collection, a SQLite table) lives in the apps.
+"""
+
+FACETS = ('emotions', 'genres', 'categories', 'actors', 'series')
+
+_EMPTY = {'', 'unknown', 'none', 'n/a', 'null', 'not identified'}
+
+
+def _clean(value):
+    value = str(value).strip().strip('[]').strip().strip('\'"').strip()
+    return '' if value.lower() in _EMPTY else value
+
+
+def _split(value):
+    if isinstance(value, (list, tuple)):
+        parts = value
+    else:
+        parts = str(value or '').split(',')
+    return [v for v in (_clean(p) for p in parts) if v]
+
+
+def video_facets(frames, category=None):
+    """{facet: sorted values} for one video, from its frame dicts."""
+    values = {facet: set() for facet in FACETS}
+    for frame in frames:
+        emotion = _clean(frame.get('emotion') or '')
+        if emotion:
+            values['emotions'].add(emotion)
+        values['genres'].update(_split(frame.get('genres')))
+        values['actors'].update(_split(frame.get('actors')))
+        series = _clean(frame.get('series_movie') or '')
+        if series:
+            values['series'].add(series)
+    if category:
+        values['categories'].add(category)
+    return {facet: sorted(vals) for facet, vals in values.items()}
+
+
+def filter_keys(frame):
+    """{'emotion_lc', 'genres_lc'}: lowercased copies of a frame's emotion and genres."""
+    genres = frame.get('genres')
+    parts = genres if isinstance(genres, (list, tuple)) else str(genres or '').split(',')
+    return {
+        'emotion_lc': str(frame.get('emotion') or '').strip().lower(),
+        'genres_lc':  sorted({str(g).strip().lower() for g in parts if str(g).strip()}),
+    }
+
+
+def facet_deltas(old, new):
+    """[(facet, value, +1/-1)] turning a video's `old` facets into `new` (either may be None)."""
+    old, new = old or {}, new or {}
+    deltas = []
+    for facet in FACETS:
+        before, after = set(old.get(facet) or ()), set(new.get(facet) or ())
+        deltas.extend((facet, value, 1) for value in sorted(after - before))
+        deltas.extend((facet, value, -1) for value in sorted(before - after))
+    return deltas
+
+
+def filters_payload(rows):
+    """/filters response from (facet, value, count) rows.
+
+    Keeps the original `emotions` / `genres` value lists and adds per-facet counts.
+    """
+    counts = {facet: [] for facet in FACETS}
+    for facet, value, count in rows:
+        if facet in counts and count > 0:
+            counts[facet].append({'value': value, 'count': count})
+    for items in counts.values():
+        items.sort(key=lambda item: item['value'].lower())
+    payload = {facet: [item['value'] for item in items] for facet, items in counts.items()}
+    payload['counts'] = counts
+    return payload
@@ -3,12 +3,20 @@ Gemini Vision API Analyzer for B-Roll
 Uses Pro-Level B-Roll Asset Manager Prompt with NEW google-genai package
 """
 
-from google import genai
-from google.genai import types
 from PIL import Image
 import json
 import os
 
+from model_providers import is_fake, fake_gemini_analysis
+
+try:
+    from google import genai
+    from google.genai import types
+except ImportError:
+    # Only needed for real Gemini calls; MODEL_PROVIDER=fake runs without it.
+    genai = None
+    types = None
+
 def analyze_frame_with_gemini(img, transcript_context='', filename_hint=''):
     """
     Analyze frame using Gemini Vision with Pro-Level B-Roll Asset Manager Prompt.
@@ -55,28 +63,31 @@ CRITICAL RULES:
 """
 
     try:
-        # Initialize Gemini client
-        client = genai.Client(api_key=os.getenv('GEMINI_API_KEY'))
-        
-        # Convert PIL Image to bytes for Gemini
-        import io
-        img_byte_arr = io.BytesIO()
-        img.save(img_byte_arr, format='JPEG')
-        img_bytes = img_byte_arr.getvalue()
-        
-        # Generate response using gemini-1.5-flash (fast and reliable)
-        response = client.models.generate_content(
-            model='gemini-1.5-flash',
-            contents=[
-                types.Part.from_bytes(
-                    data=img_bytes,
-                    mime_type='image/jpeg'
-                ),
-                prompt
-            ]
-        )
-        
-        result_text = response.text.strip()
+        if is_fake():
+            result_text = json.dumps(fake_gemini_analysis(img, transcript_context, filename_hint))
+        else:
+            # Initialize Gemini client
+            client = genai.Client(api_key=os.getenv('GEMINI_API_KEY'))
+            
+            # Convert PIL Image to bytes for Gemini
+            import io
+            img_byte_arr = io.BytesIO()
+            img.save(img_byte_arr, format='JPEG')
+            img_bytes = img_byte_arr.getvalue()
+            
+            # Generate response using gemini-1.5-flash (fast and reliable)
+            response = client.models.generate_content(
+                model='gemini-1.5-flash',
+                contents=[
+                    types.Part.from_bytes(
+                        data=img_bytes,
+                        mime_type='image/jpeg'
+                    ),
+                    prompt
+                ]
+            )
+            
+            result_text = response.text.strip()
         
         # Clean up response (remove markdown code blocks if present)
         if result_text.startswith('```'):
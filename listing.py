@@ -0,0 +1,192 @@
+"""
+B-Roll Mapper - Library listing helpers
+Query-string parsing, keyset cursors and ETags shared by the /videos endpoints.
+
+GET /videos accepts:
+- limit     page size (1-200); omitted = whole library in one response (old clients)
+- cursor    opaque `next_cursor` from the previous page
+- sort      upload_date (default) or filename, prefixed with "-" for descending
+            (default "-upload_date", newest first)
+- category  exact category, comma-separated for several
+- status    processing / complete / failed, comma-separated for several
+
+Pages are keyset-paginated on (sort field, id), so page N costs the same as
+page 1 and rows inserted while a client pages through do not shift the rest.
+
+The ETag is derived from a library version that every write bumps, plus the
+normalised query, so a poll with If-None-Match is answered with a 304 after
+a single version read.
+
+POST /videos/lookup answers "which of these already exist" without the full
+listing. Body: {"filenames": [...], "hashes": [...]} (SHA-256 hex of the file
+content; either list may be omitted, at most MAX_LOOKUP_KEYS keys in total).
+Response:
+    {"filenames": {name: record | null}, "hashes": {sha256: record | null},
+     "counts": {"requested", "found", "missing", "complete"}}
+with record = {id, filename, status, sha256, category, clip_count,
+frame_count, file_present, size}. When several videos share a filename, a
+complete one wins, then the newest.
+"""
+
+import re
+import json
+import base64
+import hashlib
+from datetime import datetime
+
+MAX_LIMIT = 200
+SORT_FIELDS = ('upload_date', 'filename')
+DEFAULT_SORT = '-upload_date'
+MAX_LOOKUP_KEYS = 1000
+
+_SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ListArgsError(ValueError):
+    pass
+
+
+def _split(value):
+    return [v.strip() for v in (value or '').split(',') if v.strip()]
+
+
+def parse_list_args(args):
+    """Validate request.args for /videos. Raises ListArgsError on bad input."""
+    sort = args.get('sort') or DEFAULT_SORT
+    field = sort.lstrip('-')
+    if field not in SORT_FIELDS:
+        raise ListArgsError(f"sort must be one of {', '.join(SORT_FIELDS)} (optionally prefixed with -)")
+
+    limit = args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ListArgsError('limit must be an integer')
+        limit = max(1, min(limit, MAX_LIMIT))
+
+    token = args.get('cursor') or None
+    cursor = None
+    if token:
+        cursor = decode_cursor(token)
+        if cursor.get('s') != sort or not isinstance(cursor['id'], int):
+            raise ListArgsError('cursor was issued for a different sort')
+
+    return {
+        'sort':       sort,
+        'field':      field,
+        'descending': sort.startswith('-'),
+        'limit':      limit,
+        'cursor':     cursor,
+        'token':      token,
+        'categories': _split(args.get('category')),
+        'statuses':   _split(args.get('status')),
+    }
+
+
+def parse_upload_date(value):
+    """upload_date as a datetime: stored ones pass through, ISO strings (PostgREST,
+    SQLite) are parsed. None for missing or unparseable values."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str) and value.strip():
+        try:
+            return datetime.fromisoformat(value.strip())
+        except ValueError:
+            return None
+    return None
+
+
+def encode_cursor(sort, value, last_id):
+    if isinstance(value, datetime):
+        value = {'$date': value.isoformat()}
+    raw = json.dumps({'s': sort, 'v': value, 'id': last_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        cursor = json.loads(raw)
+        value = cursor['v']
+        if isinstance(value, dict) and '$date' in value:
+            cursor['v'] = datetime.fromisoformat(value['$date'])
+        if not isinstance(cursor['id'], (int, str)):
+            raise TypeError(cursor['id'])
+        return cursor
+    except Exception:
+        raise ListArgsError('invalid cursor')
+
+
+def etag(version, params):
+    """Weak ETag for one listing query at one library version."""
+    key = json.dumps([params['sort'], params['limit'], params['token'],
+                      params['categories'], params['statuses']])
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+    return f'W/"lib-{version}-{digest}"'
+
+
+def is_not_modified(request, tag):
+    inm = request.headers.get('If-None-Match', '')
+    return tag in [t.strip() for t in inm.split(',')] or inm.strip() == '*'
+
+
+def revalidate_headers(response, tag):
+    """Let browsers keep the body but revalidate on every poll."""
+    if tag:
+        response.headers['ETag'] = tag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _unique(values):
+    return list(dict.fromkeys(values))
+
+
+def parse_lookup_body(data):
+    """(filenames, hashes) from a POST /videos/lookup body. Raises ListArgsError on bad input."""
+    if not isinstance(data, dict):
+        raise ListArgsError('expected a JSON object with "filenames" and/or "hashes"')
+    filenames = data.get('filenames') or []
+    hashes = data.get('hashes') or []
+    if not isinstance(filenames, list) or not all(isinstance(f, str) for f in filenames):
+        raise ListArgsError('filenames must be a list of strings')
+    if not isinstance(hashes, list) or not all(isinstance(h, str) for h in hashes):
+        raise ListArgsError('hashes must be a list of strings')
+    filenames = _unique(f for f in filenames if f)
+    hashes = _unique(h.strip().lower() for h in hashes if h)
+    bad = [h for h in hashes if not _SHA256_RE.match(h)]
+    if bad:
+        raise ListArgsError(f'not a SHA-256 hex digest: {bad[0][:80]}')
+    if not filenames and not hashes:
+        raise ListArgsError('filenames or hashes required')
+    if len(filenames) + len(hashes) > MAX_LOOKUP_KEYS:
+        raise ListArgsError(f'at most {MAX_LOOKUP_KEYS} filenames + hashes per request')
+    return filenames, hashes
+
+
+def _preference(record):
+    return record.get('status') == 'complete', record.get('id') or 0
+
+
+def lookup_payload(records, filenames, hashes):
+    """Response body for /videos/lookup: every requested key mapped to its record or None."""
+    by_name, by_hash = {}, {}
+    for record in records:
+        for index, key in ((by_name, record.get('filename')), (by_hash, record.get('sha256'))):
+            if key and (key not in index or _preference(record) > _preference(index[key])):
+                index[key] = record
+    found_names = {f: by_name.get(f) for f in filenames}
+    found_hashes = {h: by_hash.get(h) for h in hashes}
+    found = [r for r in list(found_names.values()) + list(found_hashes.values()) if r]
+    requested = len(filenames) + len(hashes)
+    return {
+        'filenames': found_names,
+        'hashes':    found_hashes,
+        'counts': {
+            'requested': requested,
+            'found':     len(found),
+            'missing':   requested - len(found),
+            'complete':  sum(1 for r in found if r.get('status') == 'complete'),
+        },
+    }
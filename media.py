@@ -0,0 +1,223 @@
+"""
+B-Roll Mapper - Media serving
+Range-aware, zero-copy file responses for /uploads and /thumbnails.
+
+- Range / 206: single byte ranges ("bytes=a-b", "bytes=a-", "bytes=-n"),
+  416 for unsatisfiable ones, If-Range honoured. Open-ended ranges are capped
+  at MEDIA_RANGE_CHUNK bytes, so a scrubbing <video> element pulls the file in
+  chunks instead of one request holding a worker for the whole MP4.
+- Zero copy: the body is the open file handed to the server's
+  wsgi.file_wrapper, positioned at the range start with an exact
+  Content-Length, which gunicorn turns into sendfile(2).
+- Strong ETags from size + mtime, 304 for If-None-Match.
+- URLs carrying ?v=<version> (see `version_tag`, `MediaIndex.url`) are
+  content-versioned and served as immutable for a year; plain URLs
+  revalidate (no-cache), which the ETag turns into a cheap 304.
+- MediaIndex maps filename -> path in memory, so serving a file that exists
+  locally never touches the database.
+
+Stdlib + Flask only.
+"""
+
+import os
+import re
+import threading
+from email.utils import formatdate
+from urllib.parse import quote
+
+from werkzeug.utils import safe_join
+from werkzeug.wsgi import wrap_file
+from flask import Response
+
+MEDIA_RANGE_CHUNK = int(os.getenv('MEDIA_RANGE_CHUNK', str(8 * 1024 * 1024)))
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+MIME_TYPES = {
+    '.mp4': 'video/mp4', '.mov': 'video/quicktime', '.webm': 'video/webm',
+    '.mkv': 'video/x-matroska', '.avi': 'video/x-msvideo', '.gif': 'image/gif',
+    '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png',
+    '.webp': 'image/webp', '.heic': 'image/heic', '.vtt': 'text/vtt',
+}
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def version_tag(st):
+    """Short content version for a stat result (changes whenever the file is replaced)."""
+    return f'{st.st_size:x}-{st.st_mtime_ns:x}'
+
+
+def strong_etag(st):
+    return f'"{version_tag(st)}"'
+
+
+def parse_range(header, size, chunk=MEDIA_RANGE_CHUNK):
+    """(start, end) inclusive for a single-range header, None to send the whole file.
+
+    Multi-range requests are answered with the whole file (allowed by RFC 9110).
+    Raises RangeNotSatisfiable when the range lies outside the file.
+    """
+    if not header:
+        return None
+    m = _RANGE_RE.match(header.strip())
+    if not m:
+        return None
+    first, last = m.groups()
+    if not first and not last:
+        return None
+    if not first:                       # bytes=-n: the last n bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - length), size - 1
+    start = int(first)
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if last:
+        end = min(int(last), size - 1)
+        if end < start:
+            raise RangeNotSatisfiable()
+        return start, end
+    return start, min(size - 1, start + chunk - 1) if chunk else size - 1
+
+
+def send_media(request, path):
+    """Response for `path` honouring Range, If-Range and If-None-Match.
+
+    The file is served as immutable when the URL's ?v= matches its current
+    version tag, so a replaced file is fetched again under its new URL.
+    """
+    st = os.stat(path)
+    size = st.st_size
+    tag = strong_etag(st)
+    headers = {
+        'ETag': tag,
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': IMMUTABLE if request.args.get('v') == version_tag(st) else REVALIDATE,
+        'Last-Modified': formatdate(st.st_mtime, usegmt=True),
+    }
+    mimetype = MIME_TYPES.get(os.path.splitext(path)[1].lower(), 'application/octet-stream')
+
+    inm = request.headers.get('If-None-Match')
+    if inm and (inm.strip() == '*' or tag in [t.strip() for t in inm.split(',')]):
+        return Response(status=304, headers=headers)
+
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if not if_range or if_range.strip() == tag:
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except RangeNotSatisfiable:
+            headers['Content-Range'] = f'bytes */{size}'
+            return Response(status=416, headers=headers)
+
+    start, end = byte_range or (0, size - 1)
+    length = max(0, end - start + 1)
+    headers['Content-Length'] = str(length)
+    if byte_range:
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    status = 206 if byte_range else 200
+    if request.method == 'HEAD':
+        return Response(status=status, headers=headers, mimetype=mimetype)
+
+    f = open(path, 'rb')
+    f.seek(start)
+    body = wrap_file(request.environ, _Limited(f, length))
+    return Response(body, status=status, headers=headers, mimetype=mimetype, direct_passthrough=True)
+
+
+class _Limited:
+    """File object that stops after `length` bytes when read in Python (dev server,
+    non-sendfile servers). fileno() exposes the real descriptor, so gunicorn's
+    sendfile path starts at the current offset and sends Content-Length bytes."""
+
+    def __init__(self, f, length):
+        self._f = f
+        self._left = length
+
+    def read(self, size=-1):
+        if self._left <= 0:
+            return b''
+        size = self._left if size is None or size < 0 else min(size, self._left)
+        data = self._f.read(size)
+        self._left -= len(data)
+        return data
+
+    def fileno(self):
+        return self._f.fileno()
+
+    def seek(self, *args):
+        return self._f.seek(*args)
+
+    def tell(self):
+        return self._f.tell()
+
+    def close(self):
+        self._f.close()
+
+
+class MediaIndex:
+    """In-memory filename -> absolute path for one media folder.
+
+    Filled by one directory scan on first use and kept current by the upload /
+    delete paths (`add` / `discard`). A miss re-checks the disk, so files written
+    by another worker are still found; a hit whose file disappeared is dropped.
+    """
+
+    def __init__(self, folder, url_prefix):
+        self.folder = folder
+        self.url_prefix = url_prefix
+        self._paths = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        paths = {}
+        try:
+            with os.scandir(self.folder) as it:
+                for entry in it:
+                    if entry.is_file():
+                        paths[entry.name] = entry.path
+        except FileNotFoundError:
+            pass
+        return paths
+
+    def lookup(self, filename):
+        if self._paths is None:
+            with self._lock:
+                if self._paths is None:
+                    self._paths = self._load()
+        path = self._paths.get(filename)
+        if path and os.path.isfile(path):
+            return path
+        path = safe_join(self.folder, filename)
+        if path and os.path.isfile(path):
+            self._paths[filename] = path
+            return path
+        self._paths.pop(filename, None)
+        return None
+
+    def url(self, filename):
+        """Serving URL for `filename`, content-versioned (?v=) when the file is local."""
+        base = f'{self.url_prefix}/{quote(filename)}'
+        path = self.lookup(filename)
+        if not path:
+            return base
+        try:
+            return f'{base}?v={version_tag(os.stat(path))}'
+        except OSError:
+            return base
+
+    def add(self, filename):
+        if self._paths is not None:
+            path = safe_join(self.folder, filename)
+            if path:
+                self._paths[filename] = path
+
+    def discard(self, filename):
+        if self._paths is not None:
+            self._paths.pop(filename, None)
@@ -0,0 +1,345 @@
+"""
+B-Roll Mapper - Metrics
+Lightweight in-process counters / histograms / gauges rendered in Prometheus
+text format at /metrics.
+
+Recording a sample is a dict lookup plus a lock; nothing touches disk on the
+hot path. Under gunicorn each worker is its own process, so every worker
+periodically snapshots its registry to METRICS_DIR/<pid>.json and /metrics
+merges the snapshots of all live workers. That keeps a scrape consistent no
+matter which worker answers it.
+
+Optional environment variables:
+- METRICS_DIR             snapshot directory (default: <tmp>/broll_metrics)
+- METRICS_FLUSH_SECONDS   snapshot interval per worker (default: 5)
+- METRICS_ENABLED=0       turn recording off entirely
+"""
+
+import os
+import json
+import time
+import bisect
+import tempfile
+import threading
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') != '0'
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'broll_metrics'))
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry[name] = self
+
+    def _key(self, labels):
+        return tuple(str(labels.get(l, '')) for l in self.labelnames)
+
+    def labels(self, **labels):
+        return _Bound(self, self._key(labels))
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(k), self._copy(v)] for k, v in self._values.items()]
+
+    def _copy(self, value):
+        return value
+
+
+class _Bound:
+    __slots__ = ('metric', 'key')
+
+    def __init__(self, metric, key):
+        self.metric = metric
+        self.key = key
+
+    def inc(self, amount=1):
+        self.metric._inc(self.key, amount)
+
+    def dec(self, amount=1):
+        self.metric._inc(self.key, -amount)
+
+    def set(self, value):
+        self.metric._set(self.key, value)
+
+    def observe(self, value):
+        self.metric._observe(self.key, value)
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.metric._observe(self.key, time.perf_counter() - start)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _inc(self, key, amount):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def inc(self, amount=1):
+        self._inc((), amount)
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def _set(self, key, value):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount=1):
+        self._inc((), -amount)
+
+    def set(self, value):
+        self._set((), value)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _observe(self, key, value):
+        if not METRICS_ENABLED:
+            return
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][idx] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def _copy(self, value):
+        return [list(value[0]), value[1], value[2]]
+
+    def observe(self, value):
+        self._observe((), value)
+
+    def time(self):
+        return _Bound(self, ()).time()
+
+
+@contextmanager
+def timer(histogram, errors=None, **labels):
+    """`with timer(FFMPEG_SECONDS, op='thumbnail'):` - observe elapsed seconds into a histogram.
+
+    If `errors` is a Counter with the same labels, it is incremented when the block raises.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        if errors is not None:
+            errors._inc(errors._key(labels), 1)
+        raise
+    finally:
+        histogram._observe(histogram._key(labels), time.perf_counter() - start)
+
+
+class StageClock:
+    """Lap timer for one request / job: mark(stage) records the time since the previous mark.
+
+    Laps go into a `stage`-labelled histogram and are kept for a Server-Timing header.
+    """
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.start = self.last = time.perf_counter()
+        self.laps = []
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        elapsed = now - self.last
+        self.last = now
+        self.laps.append((stage, elapsed))
+        self.histogram._observe(self.histogram._key({'stage': stage}), elapsed)
+
+    def finish(self, stage='total'):
+        elapsed = time.perf_counter() - self.start
+        self.laps.append((stage, elapsed))
+        self.histogram._observe(self.histogram._key({'stage': stage}), elapsed)
+
+    def server_timing(self):
+        return ', '.join(f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in self.laps)
+
+
+# ---------------------------------------------------------------------------
+# Shared metric definitions
+# ---------------------------------------------------------------------------
+
+HTTP_REQUEST_SECONDS = Histogram('broll_http_request_seconds', 'HTTP request latency', ['endpoint', 'method', 'status'])
+OPENAI_REQUEST_SECONDS = Histogram('broll_openai_request_seconds', 'OpenAI / model provider call latency', ['endpoint'])
+OPENAI_ERRORS = Counter('broll_openai_errors_total', 'OpenAI / model provider call failures', ['endpoint'])
+FFMPEG_SECONDS = Histogram('broll_ffmpeg_seconds', 'ffmpeg / ffprobe subprocess time', ['op'])
+SEARCH_STAGE_SECONDS = Histogram('broll_search_stage_seconds', 'Time per search stage', ['stage'])
+INGEST_STAGE_SECONDS = Histogram('broll_ingest_stage_seconds', 'Time per ingest stage', ['stage'],
+                                 buckets=DEFAULT_BUCKETS + (600.0, 1200.0))
+ITEMS_SCANNED = Counter('broll_search_items_scanned_total', 'Clips / frames scored by search', ['kind'])
+CACHE_LOOKUPS = Counter('broll_cache_lookups_total', 'Cache lookups', ['cache', 'result'])
+INGEST_QUEUE_DEPTH = Gauge('broll_ingest_queue_depth', 'Uploads accepted but not yet processed')
+INGEST_TOTAL = Counter('broll_ingest_total', 'Finished ingest jobs', ['status'])
+
+
+# ---------------------------------------------------------------------------
+# Multi-worker snapshots + Prometheus rendering
+# ---------------------------------------------------------------------------
+
+def _snapshot():
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return {m.name: m.snapshot() for m in metrics}
+
+
+def flush():
+    """Write this worker's snapshot atomically to METRICS_DIR/<pid>.json."""
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(_snapshot(), f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _collect():
+    """Merge snapshots from every live worker (dead workers' files are removed)."""
+    flush()
+    merged = {}
+    try:
+        names = os.listdir(METRICS_DIR)
+    except OSError:
+        names = []
+    snapshots = []
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        pid = int(name[:-5]) if name[:-5].isdigit() else None
+        path = os.path.join(METRICS_DIR, name)
+        if pid is not None and pid != os.getpid() and not _pid_alive(pid):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    if not snapshots:
+        snapshots = [_snapshot()]
+
+    for snap in snapshots:
+        for metric_name, series in snap.items():
+            metric = _registry.get(metric_name)
+            if metric is None:
+                continue
+            target = merged.setdefault(metric_name, {})
+            for key, value in series:
+                key = tuple(key)
+                if metric.kind == 'histogram':
+                    cur = target.get(key)
+                    if cur is None:
+                        target[key] = [list(value[0]), value[1], value[2]]
+                    else:
+                        cur[0] = [a + b for a, b in zip(cur[0], value[0])]
+                        cur[1] += value[1]
+                        cur[2] += value[2]
+                else:
+                    target[key] = target.get(key, 0) + value
+    return merged
+
+
+def _fmt_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def render():
+    """Prometheus text exposition (version 0.0.4) of all workers' metrics."""
+    merged = _collect()
+    lines = []
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda m: m.name)
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for key, value in sorted(merged.get(metric.name, {}).items()):
+            if metric.kind == 'histogram':
+                counts, total, count = value
+                cumulative = 0
+                for bound, n in zip(metric.buckets + (float('inf'),), counts):
+                    cumulative += n
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    labels = _fmt_labels(metric.labelnames, key, 'le="%s"' % le)
+                    lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+                lines.append(f"{metric.name}_sum{_fmt_labels(metric.labelnames, key)} {total}")
+                lines.append(f"{metric.name}_count{_fmt_labels(metric.labelnames, key)} {count}")
+            else:
+                lines.append(f"{metric.name}{_fmt_labels(metric.labelnames, key)} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+def _flusher():
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        flush()
+
+
+_flusher_started = False
+_flusher_pid = None
+
+
+def start_flusher():
+    """Start the background snapshot thread once per worker process (safe to call repeatedly)."""
+    global _flusher_started, _flusher_pid
+    if not METRICS_ENABLED:
+        return
+    if _flusher_started and _flusher_pid == os.getpid():
+        return
+    _flusher_started, _flusher_pid = True, os.getpid()
+    threading.Thread(target=_flusher, daemon=True).start()
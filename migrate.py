@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+B-Roll Mapper - Schema Migration CLI
+
+Apply or inspect schema migrations outside the web process, e.g. as a
+pre-deploy step, so gunicorn workers only compare one version number on boot.
+
+Usage:
+    python migrate.py sqlite [--db broll_semantic.db] [--to N] [--status]
+    python migrate.py mongo  [--to N] [--status]        (needs MONGODB_URI)
+"""
+
+import os
+import sys
+import sqlite3
+import argparse
+
+
+def run_sqlite(args):
+    import sqlite_migrations
+
+    conn = sqlite3.connect(args.db, timeout=30.0)
+    version = sqlite_migrations.current_version(conn)
+    print(f"📦 SQLite {args.db}: schema v{version} (latest v{sqlite_migrations.LATEST_VERSION})")
+    if args.status:
+        return 0 if version >= sqlite_migrations.LATEST_VERSION else 1
+    if version < sqlite_migrations.LATEST_VERSION:
+        conn.execute('PRAGMA journal_mode=WAL')
+    applied = sqlite_migrations.migrate(conn, args.to)
+    print(f"✅ Applied: {applied}" if applied else "✅ Nothing to apply")
+    conn.close()
+    return 0
+
+
+def run_mongo(args):
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+    import mongo_migrations
+
+    load_dotenv()
+    uri = os.getenv('MONGODB_URI')
+    if not uri:
+        print("❌ MONGODB_URI must be set in environment")
+        return 2
+    db = MongoClient(uri)[args.database]
+    version = mongo_migrations.current_version(db)
+    print(f"📦 MongoDB {args.database}: schema v{version} (latest v{mongo_migrations.LATEST_VERSION})")
+    if args.status:
+        return 0 if version >= mongo_migrations.LATEST_VERSION else 1
+    applied = mongo_migrations.migrate(db, args.to)
+    print(f"✅ Applied: {applied}" if applied else "✅ Nothing to apply")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='B-Roll Mapper schema migrations')
+    sub = parser.add_subparsers(dest='backend', required=True)
+
+    p_sqlite = sub.add_parser('sqlite', help='broll_semantic.db (app_semantic.py)')
+    p_sqlite.add_argument('--db', default='broll_semantic.db')
+
+    p_mongo = sub.add_parser('mongo', help='MongoDB (app_mongo.py)')
+    p_mongo.add_argument('--database', default='broll_mapper')
+
+    for p in (p_sqlite, p_mongo):
+        p.add_argument('--to', type=int, default=None, help='migrate up to this version (default: latest)')
+        p.add_argument('--status', action='store_true', help='only report the version; exit 1 if behind')
+
+    args = parser.parse_args()
+    return run_sqlite(args) if args.backend == 'sqlite' else run_mongo(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
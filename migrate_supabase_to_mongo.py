@@ -7,17 +7,53 @@ Copies all data from:
   - visual_frames table
 
 Maps supabase_video_url → video_url in MongoDB.
-Sets MongoDB ID counters to match the max Supabase IDs so new inserts don't conflict.
-
-Run this ONCE locally:
-    python migrate_supabase_to_mongo.py
+Sets MongoDB ID counters to at least the max Supabase IDs, so blocks the app
+reserves afterwards start above the migrated documents.
+
+Stop app_mongo (or at least uploads and reprocessing) while this runs: its
+workers hand out IDs from blocks already reserved in memory, which raising the
+counters does not invalidate, so an insert during the migration can reuse an ID
+a migrated document takes and fail on the unique index. Restart the app after.
+
+Streaming, so memory stays flat however big the tables are:
+  - each table is read page by page in id order (keyset pagination, PAGE_SIZE
+    rows), with the next page fetched while the current one is written
+  - each page goes to MongoDB in one unordered bulk write of upserts keyed on
+    `id` that only insert missing ids: documents already in MongoDB (app-side
+    edits, reprocessed frames, native docs in the same id range) are skipped
+    unless --overwrite is given
+  - pgvector embeddings arriving as "[0.1,0.2,...]" strings are converted to
+    float lists on the way through
+  - after every page the last migrated id is checkpointed in the
+    `migration_checkpoints` collection, so a rerun resumes from there
+  - the three tables are migrated concurrently
+  - afterwards clip_count / frame_count / facets are recomputed for every video
+    that gained a document, the `facets` counts adjusted and the library
+    version bumped, so /videos, /filters and polling clients see the new rows
+
+Run locally:
+    python migrate_supabase_to_mongo.py                 # resume / pick up new rows
+    python migrate_supabase_to_mongo.py --restart       # ignore checkpoints
+    python migrate_supabase_to_mongo.py --tables clips  # one table
+    python migrate_supabase_to_mongo.py --overwrite     # replace existing docs with Supabase values
 
 After migration, run cleanup_supabase_storage.py to delete video files from Supabase Storage.
 """
 
 import os
 import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
 from dotenv import load_dotenv
+from tags import to_list
+from listing import parse_upload_date
+import facets
 
 load_dotenv()
 
@@ -28,7 +64,7 @@ except ImportError:
     sys.exit(1)
 
 try:
-    from pymongo import MongoClient
+    from pymongo import MongoClient, UpdateOne
 except ImportError:
     print("❌ pymongo package not installed. Run: pip install pymongo")
     sys.exit(1)
@@ -46,201 +82,335 @@ if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
     SUPABASE_URL         = SUPABASE_URL         or sb_env.get('SUPABASE_URL')
     SUPABASE_SERVICE_KEY = SUPABASE_SERVICE_KEY or sb_env.get('SUPABASE_SERVICE_KEY')
 
-if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
-    print("❌ SUPABASE_URL and SUPABASE_SERVICE_KEY must be set (in .env or .env.supabase)")
-    sys.exit(1)
-
-if not MONGODB_URI:
-    print("❌ MONGODB_URI must be set in .env")
-    sys.exit(1)
-
-# ── Connect ──────────────────────────────────────────────────────────────────
-
-print("🔌 Connecting to Supabase...")
-sb = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
-print("✅ Supabase connected")
-
-print("🔌 Connecting to MongoDB...")
-mongo = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=10000)
-mongo.admin.command('ping')
-db = mongo['broll_mapper']
-print("✅ MongoDB connected")
-
-videos_col   = db['videos']
-clips_col    = db['clips']
-frames_col   = db['visual_frames']
-counters_col = db['counters']
-
-# ── Helpers ──────────────────────────────────────────────────────────────────
-
-def fetch_all(table, columns='*', batch=1000):
-    """Fetch all rows from a Supabase table using pagination."""
-    rows = []
-    offset = 0
+PAGE_SIZE  = 1000
+PREFETCH   = 2            # pages read ahead per table
+TABLES     = ('videos', 'clips', 'visual_frames')
+CHECKPOINT_PREFIX = 'supabase:'
+REFRESH_BATCH = 500       # videos per count / facet recompute
+LIBRARY_VERSION_ID = 'library_version'   # app_mongo's listing ETag counter
+
+_print_lock = threading.Lock()
+
+
+def say(*args, **kwargs):
+    with _print_lock:
+        print(*args, **kwargs, flush=True)
+
+
+# ── Row conversion ───────────────────────────────────────────────────────────
+
+def to_vector(value):
+    """Embedding as a list of floats: pgvector columns come back from PostgREST as
+    '[0.1,0.2,...]' strings, older float8[] columns as lists."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    try:
+        return [float(x) for x in value]
+    except (TypeError, ValueError):
+        return None
+
+
+def video_doc(v, categories):
+    return {
+        'id':          v['id'],
+        'filename':    v.get('filename', ''),
+        'title':       v.get('title', ''),
+        # PostgREST sends ISO strings; /videos keyset paging needs BSON dates
+        'upload_date': parse_upload_date(v.get('upload_date')) or datetime.now(timezone.utc),
+        'duration':    v.get('duration', 0),
+        'status':      v.get('status', 'complete'),
+        'thumbnail':   v.get('thumbnail', ''),
+        'custom_tags': to_list(v.get('custom_tags')),
+        'video_url':   v.get('supabase_video_url', ''),  # renamed field
+        'category':    v.get('category', 'Videos'),
+    }
+
+
+def clip_doc(c, categories):
+    return {
+        'id':              c['id'],
+        'video_id':        c.get('video_id'),
+        'category':        categories.get(c.get('video_id'), 'Videos'),
+        'start_time':      c.get('start_time', 0),
+        'end_time':        c.get('end_time', 0),
+        'transcript_text': c.get('transcript_text', ''),
+        'embedding':       to_vector(c.get('embedding')),
+    }
+
+
+def frame_doc(f, categories):
+    doc = {
+        'id':                 f['id'],
+        'video_id':           f.get('video_id'),
+        'category':           categories.get(f.get('video_id'), 'Videos'),
+        'timestamp':          f.get('timestamp', 0),
+        'visual_description': f.get('visual_description', ''),
+        'emotion':            f.get('emotion', ''),
+        'ocr_text':           f.get('ocr_text', ''),
+        'tags':               f.get('tags', ''),
+        'genres':             to_list(f.get('genres')),
+        'deep_emotions':      f.get('deep_emotions', ''),
+        'scene_context':      f.get('scene_context', ''),
+        'people_description': f.get('people_description', ''),
+        'environment':        f.get('environment', ''),
+        'dialogue_context':   f.get('dialogue_context', ''),
+        'series_movie':       f.get('series_movie', ''),
+        'target_audience':    f.get('target_audience', ''),
+        'scene_type':         f.get('scene_type', ''),
+        'actors':             f.get('actors', ''),
+        'media_type':         f.get('media_type', 'Unknown'),
+        'emotion_tags':       to_list(f.get('emotion_tags')),
+        'laugh_tags':         to_list(f.get('laugh_tags')),
+        'contextual_tags':    to_list(f.get('contextual_tags')),
+        'character_tags':     to_list(f.get('character_tags')),
+        'semantic_tags':      to_list(f.get('semantic_tags')),
+        'visual_embedding':   to_vector(f.get('visual_embedding')),
+    }
+    doc.update(facets.filter_keys(doc))
+    return doc
+
+
+CONVERTERS = {'videos': video_doc, 'clips': clip_doc, 'visual_frames': frame_doc}
+
+
+# ── Streaming ────────────────────────────────────────────────────────────────
+
+def iter_pages(sb, table, after_id=0, columns='*', page_size=PAGE_SIZE):
+    """Yield pages of rows with id > after_id in id order (keyset pagination)."""
+    while True:
+        rows = (sb.table(table).select(columns).gt('id', after_id)
+                .order('id').limit(page_size).execute().data) or []
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        after_id = rows[-1]['id']
+
+
+def prefetch(pages, depth=PREFETCH):
+    """Read `pages` in a background thread, at most `depth` pages ahead."""
+    buf = queue.Queue(maxsize=depth)
+    done = object()
+
+    def produce():
+        try:
+            for page in pages:
+                buf.put(page)
+        except BaseException as e:
+            buf.put(e)
+        buf.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
     while True:
-        resp = sb.table(table).select(columns).range(offset, offset + batch - 1).execute()
-        batch_data = resp.data or []
-        rows.extend(batch_data)
-        print(f"  Fetched {len(rows)} rows from {table}...", end='\r')
-        if len(batch_data) < batch:
-            break
-        offset += batch
-    print(f"  ✅ Total fetched from {table}: {len(rows)}")
-    return rows
-
-
-def set_counter(name, value):
-    """Set the auto-increment counter to a given value."""
-    counters_col.update_one(
-        {'_id': name},
-        {'$set': {'seq': value}},
-        upsert=True
-    )
-
-
-# ── Migrate videos ───────────────────────────────────────────────────────────
-
-print("\n📋 Fetching videos from Supabase...")
-sb_videos = fetch_all('videos')
-
-if not sb_videos:
-    print("⚠️  No videos found in Supabase. Nothing to migrate.")
-else:
-    print(f"\n💾 Inserting {len(sb_videos)} videos into MongoDB...")
-    inserted = 0
-    skipped  = 0
-    max_id   = 0
-
-    for v in sb_videos:
-        vid_id = v['id']
-        if vid_id > max_id:
-            max_id = vid_id
-
-        if videos_col.find_one({'id': vid_id}):
-            skipped += 1
-            continue
-
-        doc = {
-            'id':          vid_id,
-            'filename':    v.get('filename', ''),
-            'title':       v.get('title', ''),
-            'upload_date': v.get('upload_date'),   # kept as-is (ISO string or datetime)
-            'duration':    v.get('duration', 0),
-            'status':      v.get('status', 'complete'),
-            'thumbnail':   v.get('thumbnail', ''),
-            'custom_tags': v.get('custom_tags', ''),
-            'video_url':   v.get('supabase_video_url', ''),  # renamed field
-            'category':    v.get('category', 'Videos'),
-        }
-        videos_col.insert_one(doc)
-        inserted += 1
-
-    set_counter('videos', max_id)
-    print(f"  ✅ Videos: {inserted} inserted, {skipped} already existed (skipped)")
-    print(f"  🔢 Counter set to {max_id}")
-
-
-# ── Migrate clips ─────────────────────────────────────────────────────────────
-
-print("\n📋 Fetching clips from Supabase...")
-sb_clips = fetch_all('clips')
-
-if not sb_clips:
-    print("⚠️  No clips found.")
-else:
-    print(f"\n💾 Inserting {len(sb_clips)} clips into MongoDB...")
-    inserted = 0
-    skipped  = 0
-    max_id   = 0
-
-    for c in sb_clips:
-        clip_id = c['id']
-        if clip_id > max_id:
-            max_id = clip_id
-
-        if clips_col.find_one({'id': clip_id}):
-            skipped += 1
-            continue
-
-        doc = {
-            'id':              clip_id,
-            'video_id':        c.get('video_id'),
-            'start_time':      c.get('start_time', 0),
-            'end_time':        c.get('end_time', 0),
-            'transcript_text': c.get('transcript_text', ''),
-            'embedding':       c.get('embedding'),   # list or None
-        }
-        clips_col.insert_one(doc)
-        inserted += 1
-
-    set_counter('clips', max_id)
-    print(f"  ✅ Clips: {inserted} inserted, {skipped} already existed (skipped)")
-    print(f"  🔢 Counter set to {max_id}")
-
-
-# ── Migrate visual_frames ──────────────────────────────────────────────────────
-
-print("\n📋 Fetching visual_frames from Supabase...")
-sb_frames = fetch_all('visual_frames')
-
-if not sb_frames:
-    print("⚠️  No visual frames found.")
-else:
-    print(f"\n💾 Inserting {len(sb_frames)} visual frames into MongoDB...")
-    inserted = 0
-    skipped  = 0
-    max_id   = 0
-
-    for f in sb_frames:
-        frame_id = f['id']
-        if frame_id > max_id:
-            max_id = frame_id
-
-        if frames_col.find_one({'id': frame_id}):
-            skipped += 1
-            continue
-
-        doc = {
-            'id':                 frame_id,
-            'video_id':           f.get('video_id'),
-            'timestamp':          f.get('timestamp', 0),
-            'visual_description': f.get('visual_description', ''),
-            'emotion':            f.get('emotion', ''),
-            'ocr_text':           f.get('ocr_text', ''),
-            'tags':               f.get('tags', ''),
-            'genres':             f.get('genres', ''),
-            'deep_emotions':      f.get('deep_emotions', ''),
-            'scene_context':      f.get('scene_context', ''),
-            'people_description': f.get('people_description', ''),
-            'environment':        f.get('environment', ''),
-            'dialogue_context':   f.get('dialogue_context', ''),
-            'series_movie':       f.get('series_movie', ''),
-            'target_audience':    f.get('target_audience', ''),
-            'scene_type':         f.get('scene_type', ''),
-            'actors':             f.get('actors', ''),
-            'media_type':         f.get('media_type', 'Unknown'),
-            'emotion_tags':       f.get('emotion_tags', ''),
-            'laugh_tags':         f.get('laugh_tags', ''),
-            'contextual_tags':    f.get('contextual_tags', ''),
-            'character_tags':     f.get('character_tags', ''),
-            'semantic_tags':      f.get('semantic_tags', ''),
-            'visual_embedding':   f.get('visual_embedding'),  # list or None
-        }
-        frames_col.insert_one(doc)
-        inserted += 1
-
-    set_counter('visual_frames', max_id)
-    print(f"  ✅ Visual frames: {inserted} inserted, {skipped} already existed (skipped)")
-    print(f"  🔢 Counter set to {max_id}")
-
-
-# ── Summary ───────────────────────────────────────────────────────────────────
-
-print("\n" + "="*60)
-print("✅ MIGRATION COMPLETE")
-print("="*60)
-print(f"  Videos:        {videos_col.count_documents({})} in MongoDB")
-print(f"  Clips:         {clips_col.count_documents({})} in MongoDB")
-print(f"  Visual frames: {frames_col.count_documents({})} in MongoDB")
-print("\nNext step: run  python cleanup_supabase_storage.py  to delete")
-print("video files from Supabase Storage and free up space.")
+        item = buf.get()
+        if item is done:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+def video_categories(sb):
+    """video id → category, for stamping clips and frames (one small dict per video)."""
+    categories = {}
+    for page in iter_pages(sb, 'videos', columns='id, category'):
+        for v in page:
+            categories[v['id']] = v.get('category') or 'Videos'
+    return categories
+
+
+class Checkpoints:
+    """Last migrated Supabase id per table, stored next to the data in MongoDB."""
+
+    def __init__(self, db):
+        self.col = db['migration_checkpoints']
+
+    def last_id(self, table):
+        doc = self.col.find_one({'_id': CHECKPOINT_PREFIX + table}, {'last_id': 1})
+        return (doc or {}).get('last_id', 0)
+
+    def save(self, table, last_id, rows):
+        self.col.update_one(
+            {'_id': CHECKPOINT_PREFIX + table},
+            {'$max': {'last_id': last_id},
+             '$inc': {'rows': rows},
+             '$set': {'updated_at': datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+    def reset(self, table):
+        self.col.delete_one({'_id': CHECKPOINT_PREFIX + table})
+
+
+def set_counter(counters_col, name, value):
+    """Raise the auto-increment counter to at least `value` (never lowers it).
+
+    Only blocks reserved after this are affected - see the module docstring.
+    """
+    counters_col.update_one({'_id': name}, {'$max': {'seq': value}}, upsert=True)
+
+
+def migrate_table(table, db, categories, checkpoints, touched, page_size=PAGE_SIZE, overwrite=False):
+    """Stream one Supabase table into MongoDB. Returns (rows written, rows skipped, seconds).
+
+    Ids of the videos whose documents changed are added to `touched`.
+    """
+    started = time.time()
+    sb = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)   # one HTTP client per thread
+    col = db[table]
+    convert = CONVERTERS[table]
+    video_key = 'id' if table == 'videos' else 'video_id'
+    op = '$set' if overwrite else '$setOnInsert'
+    after_id = checkpoints.last_id(table)
+    if after_id:
+        say(f"  ↪️  {table}: resuming after id {after_id}")
+
+    written = skipped = 0
+    for page in prefetch(iter_pages(sb, table, after_id, page_size=page_size)):
+        docs = [convert(row, categories) for row in page]
+        result = col.bulk_write([UpdateOne({'id': d['id']}, {op: d}, upsert=True) for d in docs],
+                                ordered=False)
+        if overwrite:
+            changed = docs
+        else:
+            changed = [docs[i] for i in result.upserted_ids]
+        touched.update(d[video_key] for d in changed)
+        last_id = docs[-1]['id']
+        checkpoints.save(table, last_id, len(docs))
+        set_counter(db['counters'], table, last_id)
+        written += len(changed)
+        skipped += len(docs) - len(changed)
+        say(f"  💾 {table}: {written} rows written, {skipped} already in MongoDB (up to id {last_id})")
+    return written, skipped, time.time() - started
+
+
+def refresh_videos(db, video_ids):
+    """Recompute the denormalised clip_count / frame_count / facets of `video_ids`.
+
+    The listing and /filters read these from the video documents instead of
+    aggregating, so migrated rows only show up once they are set. Facet changes
+    are applied to the `facets` counts as deltas, like app_mongo.update_video_facets.
+    """
+    video_ids = sorted(v for v in video_ids if v is not None)
+    totals = {}
+    for i in range(0, len(video_ids), REFRESH_BATCH):
+        batch = video_ids[i:i + REFRESH_BATCH]
+        counts = {}
+        for col, field in (('clips', 'clip_count'), ('visual_frames', 'frame_count')):
+            for c in db[col].aggregate([{'$match': {'video_id': {'$in': batch}}},
+                                        {'$group': {'_id': '$video_id', 'n': {'$sum': 1}}}]):
+                counts.setdefault(c['_id'], {})[field] = c['n']
+        frames_by_video = {}
+        for f in db['visual_frames'].find({'video_id': {'$in': batch}},
+                                          {'_id': 0, 'video_id': 1, 'emotion': 1, 'genres': 1,
+                                           'actors': 1, 'series_movie': 1}):
+            frames_by_video.setdefault(f['video_id'], []).append(f)
+
+        ops = []
+        for v in db['videos'].find({'id': {'$in': batch}}, {'_id': 0, 'id': 1, 'category': 1, 'facets': 1}):
+            values = facets.video_facets(frames_by_video.get(v['id'], []), v.get('category'))
+            for facet, value, delta in facets.facet_deltas(v.get('facets'), values):
+                totals[(facet, value)] = totals.get((facet, value), 0) + delta
+            n = counts.get(v['id'], {})
+            ops.append(UpdateOne({'id': v['id']}, {'$set': {
+                'clip_count': n.get('clip_count', 0), 'frame_count': n.get('frame_count', 0), 'facets': values}}))
+        if ops:
+            db['videos'].bulk_write(ops, ordered=False)
+
+    facet_ops = [UpdateOne({'_id': f'{facet}:{value}'},
+                           {'$inc': {'count': delta}, '$setOnInsert': {'facet': facet, 'value': value}},
+                           upsert=True)
+                 for (facet, value), delta in totals.items() if delta]
+    if facet_ops:
+        db['facets'].bulk_write(facet_ops, ordered=False)
+        db['facets'].delete_many({'count': {'$lte': 0}})
+    # New ETag for /videos, so polling clients stop getting 304s for the old library
+    db['counters'].update_one({'_id': LIBRARY_VERSION_ID}, {'$inc': {'seq': 1}}, upsert=True)
+    return len(video_ids)
+
+
+# ── Main ─────────────────────────────────────────────────────────────────────
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stream Supabase tables into MongoDB (resumable).')
+    parser.add_argument('--tables', nargs='+', choices=TABLES, default=list(TABLES),
+                        help='tables to migrate (default: all)')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE,
+                        help=f'rows per Supabase page / MongoDB bulk write (default: {PAGE_SIZE})')
+    parser.add_argument('--restart', action='store_true',
+                        help='forget checkpoints and go through every row again (upserts, so no duplicates)')
+    parser.add_argument('--overwrite', action='store_true',
+                        help='replace documents that already exist in MongoDB with the Supabase values '
+                             '(default: skip them, keeping app-side edits)')
+    args = parser.parse_args(argv)
+
+    if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
+        print("❌ SUPABASE_URL and SUPABASE_SERVICE_KEY must be set (in .env or .env.supabase)")
+        return 1
+    if not MONGODB_URI:
+        print("❌ MONGODB_URI must be set in .env")
+        return 1
+
+    print("🔌 Connecting to Supabase...")
+    sb = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+    print("✅ Supabase connected")
+
+    print("🔌 Connecting to MongoDB...")
+    mongo = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=10000)
+    mongo.admin.command('ping')
+    db = mongo['broll_mapper']
+    print("✅ MongoDB connected")
+
+    print("⚠️  app_mongo must not be ingesting while this runs (ID blocks it already")
+    print("   reserved can collide with migrated ids) - restart it once migration is done")
+
+    checkpoints = Checkpoints(db)
+    if args.restart:
+        for table in args.tables:
+            checkpoints.reset(table)
+
+    # Clips and frames carry their video's category so search filters stay in the query
+    categories = video_categories(sb)
+    print(f"\n📋 {len(categories)} videos in Supabase; migrating {', '.join(args.tables)} concurrently...\n")
+
+    results, failed, touched = {}, {}, set()
+    with ThreadPoolExecutor(max_workers=len(args.tables)) as pool:
+        futures = {table: pool.submit(migrate_table, table, db, categories, checkpoints, touched,
+                                      args.page_size, args.overwrite)
+                   for table in args.tables}
+        for table, future in futures.items():
+            try:
+                results[table] = future.result()
+            except Exception as e:
+                failed[table] = e
+                say(f"  ❌ {table}: {e} (rerun to resume from the last checkpoint)")
+
+    # Rows written before a failure are past their checkpoint, so refresh them now too
+    if touched:
+        print(f"\n🔢 Recomputing clip/frame counts and facets for {len(touched)} videos...")
+        refresh_videos(db, touched)
+
+    print("\n" + "="*60)
+    print("✅ MIGRATION COMPLETE" if not failed else "⚠️  MIGRATION INCOMPLETE")
+    print("="*60)
+    for table in args.tables:
+        total = db[table].count_documents({})
+        if table in results:
+            written, skipped, seconds = results[table]
+            print(f"  {table:<14} {written} rows copied, {skipped} skipped in {seconds:.1f}s, "
+                  f"{total} in MongoDB (checkpoint id {checkpoints.last_id(table)})")
+        else:
+            print(f"  {table:<14} failed, {total} in MongoDB (checkpoint id {checkpoints.last_id(table)})")
+    if not failed:
+        print("\nNext step: run  python cleanup_supabase_storage.py  to delete")
+        print("video files from Supabase Storage and free up space.")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,14 +2,41 @@
 """
 Migration Script: SQLite → Supabase PostgreSQL
 Migrates all data from local SQLite to Supabase
+
+Batched and streaming, COPY-style:
+- rows are read with fetchmany(--batch-size), never the whole table
+- each batch is one PostgREST bulk upsert (on_conflict=id, merge duplicates),
+  with up to --workers batches in flight at once; failed batches are retried
+- embeddings are not decoded per row: the JSON blobs written by
+  create_embedding are spliced into the request body as-is (the columns are
+  JSONB), and legacy float32 blobs are unpacked in one array() call
+- tag columns are sent as arrays (text[] since ADD_TAG_ARRAYS.sql)
+
+--verify compares row counts and per-id-range checksums of a key text column
+with the `migration_checksums` function from ADD_MIGRATION_CHECKSUMS.sql, so
+nothing is fetched back row by row; without the function it compares counts.
+
+    python migrate_to_supabase.py                      # migrate, then verify
+    python migrate_to_supabase.py --verify             # verify only
+    python migrate_to_supabase.py --batch-size 1000 --workers 8
 """
 
-import sqlite3
-import json
-from supabase import create_client, Client
 import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
 from dotenv import load_dotenv
 
+from tags import to_list
+
 # Load environment variables
 load_dotenv()
 
@@ -17,299 +44,285 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL", "https://frfrevcsrissjgtyowtb.supabase.co")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 
-if not SUPABASE_KEY:
-    print("❌ ERROR: SUPABASE_SERVICE_KEY not found in environment variables!")
-    print("Please set it in .env.supabase or export it:")
-    print("export SUPABASE_SERVICE_KEY='your-service-role-key'")
-    exit(1)
-
 # SQLite database
 SQLITE_DB = "broll_semantic.db"
 
-# Initialize Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-def migrate_videos():
-    """Migrate videos table"""
-    print("\n" + "="*60)
-    print("📹 MIGRATING VIDEOS TABLE")
-    print("="*60)
-    
-    conn = sqlite3.connect(SQLITE_DB)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT id, filename, upload_date, duration, status, thumbnail, custom_tags FROM videos')
-    videos = cursor.fetchall()
-    
-    print(f"Found {len(videos)} videos to migrate...")
-    
-    migrated = 0
-    failed = 0
-    
-    for video in videos:
+BATCH_SIZE = 500
+WORKERS = 4
+RETRIES = 3
+CHECKSUM_BUCKET = 10000     # ids per verify bucket
+
+TAG_COLUMNS = {'custom_tags', 'genres', 'emotion_tags', 'laugh_tags', 'contextual_tags',
+               'character_tags', 'semantic_tags'}
+
+# table -> (columns read from SQLite, embedding column or None, checksum column)
+TABLES = {
+    'videos': (['id', 'filename', 'upload_date', 'duration', 'status', 'thumbnail', 'custom_tags'],
+               None, 'filename'),
+    'clips': (['id', 'video_id', 'filename', 'start_time', 'end_time', 'duration', 'transcript_text'],
+              'embedding', 'transcript_text'),
+    'visual_frames': (['id', 'video_id', 'filename', 'timestamp', 'frame_path', 'visual_description',
+                       'emotion', 'ocr_text', 'tags', 'genres', 'deep_emotions', 'scene_context',
+                       'people_description', 'environment', 'dialogue_context', 'series_movie',
+                       'target_audience', 'scene_type', 'actors', 'media_type', 'emotion_tags',
+                       'laugh_tags', 'contextual_tags', 'character_tags', 'semantic_tags'],
+                      'visual_embedding', 'visual_description'),
+}
+
+_local = threading.local()
+_print_lock = threading.Lock()
+
+
+def say(*args, **kwargs):
+    with _print_lock:
+        print(*args, **kwargs, flush=True)
+
+
+def _session():
+    if not hasattr(_local, 'session'):
+        _local.session = requests.Session()
+        _local.session.headers.update({
+            'apikey': SUPABASE_KEY,
+            'Authorization': f'Bearer {SUPABASE_KEY}',
+            'Content-Type': 'application/json',
+        })
+    return _local.session
+
+
+# ── Encoding ─────────────────────────────────────────────────────────────────
+
+def embedding_json(blob):
+    """JSON text for an embedding blob without a json.loads / json.dumps round trip."""
+    if not blob:
+        return 'null'
+    if isinstance(blob, str):
+        return blob
+    if blob[:1] == b'[':
+        return blob.decode('utf-8')                       # already JSON (create_embedding)
+    return json.dumps(array('f', blob[:len(blob) - len(blob) % 4]).tolist())  # legacy float32
+
+
+def encode_batch(rows, columns, embedding_column):
+    """Request body for one bulk upsert, built as text so embeddings are spliced in unparsed."""
+    parts = []
+    for row in rows:
+        record = {}
+        for name, value in zip(columns, row):
+            record[name] = to_list(value) if name in TAG_COLUMNS else value
+        text = json.dumps(record)
+        if embedding_column:
+            text = f'{text[:-1]}, "{embedding_column}": {embedding_json(row[len(columns)])}}}'
+        parts.append(text)
+    return ('[' + ','.join(parts) + ']').encode('utf-8')
+
+
+# ── Upload ───────────────────────────────────────────────────────────────────
+
+def upsert_batch(table, body):
+    """POST one batch to PostgREST as an upsert on id, retrying transient failures."""
+    url = f"{SUPABASE_URL}/rest/v1/{table}?on_conflict=id"
+    headers = {'Prefer': 'resolution=merge-duplicates,return=minimal'}
+    for attempt in range(RETRIES + 1):
         try:
-            video_id, filename, upload_date, duration, status, thumbnail, custom_tags = video
-            
-            data = {
-                'id': video_id,
-                'filename': filename,
-                'upload_date': upload_date,
-                'duration': duration,
-                'status': status,
-                'thumbnail': thumbnail,
-                'custom_tags': custom_tags
-            }
-            
-            # Insert into Supabase
-            result = supabase.table('videos').upsert(data).execute()
-            
-            migrated += 1
-            print(f"  ✅ Migrated video {migrated}/{len(videos)}: {filename}")
-            
-        except Exception as e:
-            failed += 1
-            print(f"  ❌ Failed to migrate {filename}: {str(e)}")
-    
-    conn.close()
-    
-    print(f"\n✅ Videos migration complete: {migrated} success, {failed} failed")
-    return migrated, failed
+            resp = _session().post(url, data=body, headers=headers, timeout=120)
+            if resp.status_code in (200, 201, 204):
+                return
+            error = f"HTTP {resp.status_code}: {resp.text[:200]}"
+            if resp.status_code < 500 and resp.status_code != 429:
+                raise RuntimeError(error)
+        except requests.exceptions.RequestException as e:
+            error = str(e)
+        if attempt < RETRIES:
+            time.sleep(2 ** attempt)
+    raise RuntimeError(error)
 
-def migrate_clips():
-    """Migrate clips table (audio transcripts)"""
-    print("\n" + "="*60)
-    print("🎤 MIGRATING CLIPS TABLE (Audio Transcripts)")
-    print("="*60)
-    
-    conn = sqlite3.connect(SQLITE_DB)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT id, video_id, filename, start_time, end_time, duration, transcript_text, embedding FROM clips')
-    clips = cursor.fetchall()
-    
-    print(f"Found {len(clips)} clips to migrate...")
-    
-    migrated = 0
-    failed = 0
-    batch_size = 100
-    
-    for i in range(0, len(clips), batch_size):
-        batch = clips[i:i + batch_size]
-        batch_data = []
-        
-        for clip in batch:
-            try:
-                clip_id, video_id, filename, start_time, end_time, duration, transcript_text, embedding_blob = clip
-                
-                # Convert embedding blob to list
-                if embedding_blob:
-                    import struct
-                    embedding_list = list(struct.unpack(f'{len(embedding_blob)//4}f', embedding_blob))
-                else:
-                    embedding_list = None
-                
-                data = {
-                    'id': clip_id,
-                    'video_id': video_id,
-                    'filename': filename,
-                    'start_time': start_time,
-                    'end_time': end_time,
-                    'duration': duration,
-                    'transcript_text': transcript_text,
-                    'embedding': embedding_list
-                }
-                
-                batch_data.append(data)
-                
-            except Exception as e:
-                failed += 1
-                print(f"  ❌ Failed to prepare clip {clip_id}: {str(e)}")
-        
-        # Insert batch into Supabase
-        if batch_data:
-            try:
-                result = supabase.table('clips').upsert(batch_data).execute()
-                migrated += len(batch_data)
-                print(f"  ✅ Migrated batch: {migrated}/{len(clips)} clips")
-            except Exception as e:
-                print(f"  ❌ Failed to migrate batch: {str(e)}")
-                failed += len(batch_data)
-    
-    conn.close()
-    
-    print(f"\n✅ Clips migration complete: {migrated} success, {failed} failed")
-    return migrated, failed
 
-def migrate_visual_frames():
-    """Migrate visual_frames table"""
-    print("\n" + "="*60)
-    print("🎨 MIGRATING VISUAL FRAMES TABLE")
-    print("="*60)
-    
-    conn = sqlite3.connect(SQLITE_DB)
-    cursor = conn.cursor()
-    
-    cursor.execute('''SELECT id, video_id, filename, timestamp, frame_path, visual_description, visual_embedding, emotion, ocr_text, 
-                      tags, genres, deep_emotions, scene_context, people_description, environment,
-                      dialogue_context, series_movie, target_audience, scene_type, actors, media_type,
-                      emotion_tags, laugh_tags, contextual_tags, character_tags, semantic_tags 
-                      FROM visual_frames''')
-    frames = cursor.fetchall()
-    
-    print(f"Found {len(frames)} visual frames to migrate...")
-    
-    migrated = 0
-    failed = 0
-    batch_size = 50  # Smaller batch for visual frames (more data per row)
-    
-    for i in range(0, len(frames), batch_size):
-        batch = frames[i:i + batch_size]
-        batch_data = []
-        
-        for frame in batch:
-            try:
-                (frame_id, video_id, filename, timestamp, frame_path, visual_description, visual_embedding_blob, emotion, ocr_text,
-                 tags, genres, deep_emotions, scene_context, people_description, environment,
-                 dialogue_context, series_movie, target_audience, scene_type, actors, media_type,
-                 emotion_tags, laugh_tags, contextual_tags, character_tags, semantic_tags) = frame
-                
-                # Convert embedding blob to list
-                if visual_embedding_blob:
-                    import struct
-                    embedding_list = list(struct.unpack(f'{len(visual_embedding_blob)//4}f', visual_embedding_blob))
-                else:
-                    embedding_list = None
-                
-                data = {
-                    'id': frame_id,
-                    'video_id': video_id,
-                    'filename': filename,
-                    'timestamp': timestamp,
-                    'frame_path': frame_path,
-                    'visual_description': visual_description,
-                    'visual_embedding': embedding_list,
-                    'emotion': emotion,
-                    'ocr_text': ocr_text,
-                    'tags': tags,
-                    'genres': genres,
-                    'deep_emotions': deep_emotions,
-                    'scene_context': scene_context,
-                    'people_description': people_description,
-                    'environment': environment,
-                    'dialogue_context': dialogue_context,
-                    'series_movie': series_movie,
-                    'target_audience': target_audience,
-                    'scene_type': scene_type,
-                    'actors': actors,
-                    'media_type': media_type,
-                    'emotion_tags': emotion_tags,
-                    'laugh_tags': laugh_tags,
-                    'contextual_tags': contextual_tags,
-                    'character_tags': character_tags,
-                    'semantic_tags': semantic_tags
-                }
-                
-                batch_data.append(data)
-                
-            except Exception as e:
-                failed += 1
-                print(f"  ❌ Failed to prepare frame {frame_id}: {str(e)}")
-        
-        # Insert batch into Supabase
-        if batch_data:
+def migrate_table(conn, table, batch_size=BATCH_SIZE, workers=WORKERS):
+    """Stream one SQLite table to Supabase. Returns (migrated, failed)."""
+    columns, embedding_column, _ = TABLES[table]
+    available = {r[1] for r in conn.execute(f'PRAGMA table_info({table})')}
+    select = [c if c in available else f'NULL AS {c}' for c in columns]
+    if embedding_column:
+        select.append(embedding_column)
+    total = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+    say("\n" + "="*60)
+    say(f"📤 MIGRATING {table.upper()} ({total} rows, batches of {batch_size}, {workers} in flight)")
+    say("="*60)
+
+    cursor = conn.execute(f'SELECT {", ".join(select)} FROM {table} ORDER BY id')
+    migrated, failed = 0, 0
+    started = time.time()
+    in_flight = {}
+
+    def settle(done):
+        nonlocal migrated, failed
+        for future in done:
+            first_id, count = in_flight.pop(future)
             try:
-                result = supabase.table('visual_frames').upsert(batch_data).execute()
-                migrated += len(batch_data)
-                print(f"  ✅ Migrated batch: {migrated}/{len(frames)} frames")
+                future.result()
+                migrated += count
             except Exception as e:
-                print(f"  ❌ Failed to migrate batch: {str(e)}")
-                failed += len(batch_data)
-    
-    conn.close()
-    
-    print(f"\n✅ Visual frames migration complete: {migrated} success, {failed} failed")
+                failed += count
+                say(f"  ❌ Batch from id {first_id} ({count} rows) failed: {e}")
+        say(f"  ✅ {table}: {migrated}/{total} rows", end='\r')
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            body = encode_batch(rows, columns, embedding_column)
+            in_flight[pool.submit(upsert_batch, table, body)] = (rows[0][0], len(rows))
+            if len(in_flight) >= workers:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                settle(done)
+        settle(list(in_flight))
+
+    elapsed = time.time() - started
+    say(f"\n✅ {table} migration complete: {migrated} success, {failed} failed in {elapsed:.1f}s")
     return migrated, failed
 
-def verify_migration():
-    """Verify migration counts"""
-    print("\n" + "="*60)
-    print("🔍 VERIFYING MIGRATION")
-    print("="*60)
-    
-    # Check SQLite counts
-    conn = sqlite3.connect(SQLITE_DB)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT COUNT(*) FROM videos')
-    sqlite_videos = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(*) FROM clips')
-    sqlite_clips = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(*) FROM visual_frames')
-    sqlite_frames = cursor.fetchone()[0]
-    
-    conn.close()
-    
-    # Check Supabase counts
-    supabase_videos = len(supabase.table('videos').select('id').execute().data)
-    supabase_clips = len(supabase.table('clips').select('id').execute().data)
-    supabase_frames = len(supabase.table('visual_frames').select('id').execute().data)
-    
-    print(f"\n📊 MIGRATION SUMMARY:")
-    print(f"  Videos:        SQLite: {sqlite_videos} → Supabase: {supabase_videos}")
-    print(f"  Clips:         SQLite: {sqlite_clips} → Supabase: {supabase_clips}")
-    print(f"  Visual Frames: SQLite: {sqlite_frames} → Supabase: {supabase_frames}")
-    
-    if (sqlite_videos == supabase_videos and 
-        sqlite_clips == supabase_clips and 
-        sqlite_frames == supabase_frames):
-        print(f"\n✅ MIGRATION SUCCESSFUL - All data migrated!")
-        return True
+
+# ── Verify ───────────────────────────────────────────────────────────────────
+
+def sqlite_checksums(conn, table, column, bucket=CHECKSUM_BUCKET):
+    """{bucket: (rows, md5)} over "id<TAB>column" lines in id order, the same text
+    migration_checksums() hashes on the Postgres side."""
+    sums = {}
+    current, digest, rows = None, None, 0
+    cursor = conn.execute(f'SELECT id, {column} FROM {table} ORDER BY id')
+    while True:
+        batch = cursor.fetchmany(BATCH_SIZE)
+        if not batch:
+            break
+        for row_id, value in batch:
+            b = row_id // bucket
+            if b != current:
+                if current is not None:
+                    sums[current] = (rows, digest.hexdigest())
+                current, digest, rows = b, hashlib.md5(), 0
+            digest.update(f"{'' if rows == 0 else chr(10)}{row_id}\t{value or ''}".encode('utf-8'))
+            rows += 1
+    if current is not None:
+        sums[current] = (rows, digest.hexdigest())
+    return sums
+
+
+def supabase_checksums(table, column, bucket=CHECKSUM_BUCKET):
+    """Same as sqlite_checksums, computed in Postgres. None if the function is missing."""
+    resp = _session().post(f"{SUPABASE_URL}/rest/v1/rpc/migration_checksums",
+                           json={'tbl': table, 'col': column, 'bucket_size': bucket}, timeout=300)
+    if resp.status_code == 404:
+        return None
+    if resp.status_code != 200:
+        raise RuntimeError(f"migration_checksums failed: HTTP {resp.status_code} {resp.text[:200]}")
+    return {r['bucket']: (r['rows'], r['digest']) for r in resp.json()}
+
+
+def supabase_count(table):
+    resp = _session().get(f"{SUPABASE_URL}/rest/v1/{table}?select=id&limit=1",
+                          headers={'Prefer': 'count=exact'}, timeout=60)
+    resp.raise_for_status()
+    return int(resp.headers['Content-Range'].rsplit('/', 1)[1])
+
+
+def verify_migration(conn, tables=tuple(TABLES)):
+    """Compare counts and per-bucket checksums. Returns True when everything matches."""
+    say("\n" + "="*60)
+    say("🔍 VERIFYING MIGRATION")
+    say("="*60)
+
+    ok = True
+    for table in tables:
+        column = TABLES[table][2]
+        local = sqlite_checksums(conn, table, column)
+        local_rows = sum(rows for rows, _ in local.values())
+        remote = supabase_checksums(table, column)
+        if remote is None:
+            remote_rows = supabase_count(table)
+            match = remote_rows == local_rows
+            say(f"  {'✅' if match else '⚠️ '} {table:<14} SQLite: {local_rows} → Supabase: {remote_rows} "
+                f"(counts only - run ADD_MIGRATION_CHECKSUMS.sql for checksums)")
+            ok = ok and match
+            continue
+        remote_rows = sum(rows for rows, _ in remote.values())
+        bad = sorted(b for b in set(local) | set(remote) if local.get(b) != remote.get(b))
+        match = not bad and remote_rows == local_rows
+        say(f"  {'✅' if match else '⚠️ '} {table:<14} SQLite: {local_rows} → Supabase: {remote_rows}, "
+            f"{len(local)} checksum bucket(s), {len(bad)} differ")
+        for b in bad[:10]:
+            local_n, remote_n = local.get(b, (0, '-'))[0], remote.get(b, (0, '-'))[0]
+            detail = 'content differs' if local_n == remote_n else f'SQLite {local_n} rows, Supabase {remote_n} rows'
+            say(f"       ids {b * CHECKSUM_BUCKET}-{(b + 1) * CHECKSUM_BUCKET - 1}: {detail}")
+        ok = ok and match
+
+    if ok:
+        say(f"\n✅ MIGRATION SUCCESSFUL - All data migrated!")
     else:
-        print(f"\n⚠️  WARNING - Count mismatch! Please review.")
-        return False
+        say(f"\n⚠️  WARNING - Count or checksum mismatch! Re-run the migration (upserts are idempotent).")
+    return ok
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Migrate broll_semantic.db to Supabase in batches.')
+    parser.add_argument('--db', default=SQLITE_DB, help=f'SQLite database (default: {SQLITE_DB})')
+    parser.add_argument('--tables', nargs='+', choices=list(TABLES), default=list(TABLES))
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help=f'rows per upsert request (default: {BATCH_SIZE})')
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help=f'upsert requests in flight (default: {WORKERS})')
+    parser.add_argument('--verify', action='store_true', help='only verify, do not migrate')
+    parser.add_argument('--no-verify', action='store_true', help='skip verification after migrating')
+    args = parser.parse_args()
+
     print("╔" + "="*58 + "╗")
     print("║" + " "*15 + "B-ROLL MAPPER MIGRATION" + " "*20 + "║")
     print("║" + " "*12 + "SQLite → Supabase PostgreSQL" + " "*17 + "║")
     print("╚" + "="*58 + "╝")
-    
+
+    if not SUPABASE_KEY:
+        print("❌ ERROR: SUPABASE_SERVICE_KEY not found in environment variables!")
+        print("Please set it in .env.supabase or export it:")
+        print("export SUPABASE_SERVICE_KEY='your-service-role-key'")
+        sys.exit(1)
+
     # Check if SQLite database exists
-    if not os.path.exists(SQLITE_DB):
-        print(f"\n❌ ERROR: SQLite database '{SQLITE_DB}' not found!")
-        exit(1)
-    
-    print(f"\n✅ Found SQLite database: {SQLITE_DB}")
+    if not os.path.exists(args.db):
+        print(f"\n❌ ERROR: SQLite database '{args.db}' not found!")
+        sys.exit(1)
+
+    print(f"\n✅ Found SQLite database: {args.db}")
     print(f"✅ Supabase URL: {SUPABASE_URL}")
-    print(f"\n🚀 Starting migration automatically...")
-    
+
+    conn = sqlite3.connect(args.db)
     try:
-        # Run migrations
-        videos_ok, videos_failed = migrate_videos()
-        clips_ok, clips_failed = migrate_clips()
-        frames_ok, frames_failed = migrate_visual_frames()
-        
-        # Verify
-        success = verify_migration()
-        
+        failed = 0
+        if not args.verify:
+            print(f"\n🚀 Starting migration automatically...")
+            # videos first: clips and frames reference them
+            for table in [t for t in TABLES if t in args.tables]:
+                failed += migrate_table(conn, table, args.batch_size, args.workers)[1]
+
+        success = args.no_verify or verify_migration(conn, args.tables)
+
         print("\n" + "="*60)
-        if success:
-            print("🎉 MIGRATION COMPLETE!")
+        if success and not failed:
+            print("🎉 MIGRATION COMPLETE!" if not args.verify else "🎉 VERIFIED!")
             print("="*60)
-            print("\nNext steps:")
-            print("1. Update Flask app to use Supabase")
-            print("2. Upload videos to Supabase Storage")
-            print("3. Deploy to Railway")
+            if not args.verify:
+                print("\nNext steps:")
+                print("1. Update Flask app to use Supabase")
+                print("2. Upload videos to Supabase Storage")
+                print("3. Deploy to Railway")
         else:
             print("⚠️  MIGRATION COMPLETED WITH WARNINGS")
             print("="*60)
             print("\nPlease review the counts above and check for errors.")
-        
+            sys.exit(1)
+
     except KeyboardInterrupt:
         print("\n\n❌ Migration cancelled by user")
-    except Exception as e:
-        print(f"\n\n❌ Migration failed: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        sys.exit(130)
+    finally:
+        conn.close()
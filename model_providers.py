@@ -0,0 +1,298 @@
+"""
+B-Roll Mapper - Model Providers
+Pluggable provider layer for the OpenAI / Gemini calls made during ingest and search.
+
+MODEL_PROVIDER=openai (default) uses the real OpenAI SDK.
+MODEL_PROVIDER=fake swaps in a deterministic local stand-in so the full
+process_video -> /search path runs with no network and no API keys:
+- embeddings are hash-seeded unit vectors (same text -> same vector)
+- Whisper returns canned segments derived from the audio bytes
+- vision / Gemini return canned JSON analyses
+
+Optional environment variables:
+- FAKE_MODEL_LATENCY   e.g. "50" (ms for every call) or
+                       "embeddings=5,transcriptions=400,chat=900,gemini=900"
+- FAKE_EMBEDDING_DIMS  defaults to 1536 (text-embedding-3-small)
+
+Run `python model_providers.py --port 5099` to serve the same fakes over HTTP,
+then point any OpenAI SDK client at it with OPENAI_BASE_URL=http://localhost:5099/v1.
+"""
+
+import os
+import io
+import sys
+import json
+import math
+import time
+import random
+import hashlib
+from types import SimpleNamespace
+
+MODEL_PROVIDER = os.getenv('MODEL_PROVIDER', 'openai').strip().lower()
+FAKE_EMBEDDING_DIMS = int(os.getenv('FAKE_EMBEDDING_DIMS', '1536'))
+
+FAKE_ENDPOINTS = ('embeddings', 'transcriptions', 'chat', 'gemini')
+
+
+def _parse_latency(spec):
+    """Parse FAKE_MODEL_LATENCY into {endpoint: seconds}."""
+    latency = {name: 0.0 for name in FAKE_ENDPOINTS}
+    spec = (spec or '').strip()
+    if not spec:
+        return latency
+    if '=' not in spec:
+        return {name: float(spec) / 1000.0 for name in FAKE_ENDPOINTS}
+    for part in spec.split(','):
+        if '=' not in part:
+            continue
+        name, ms = part.split('=', 1)
+        name = name.strip().lower()
+        if name in latency:
+            latency[name] = float(ms) / 1000.0
+    return latency
+
+
+FAKE_LATENCY = _parse_latency(os.getenv('FAKE_MODEL_LATENCY', ''))
+
+
+def set_fake_latency(spec):
+    """Override fake latency at runtime (benchmarks call this between runs)."""
+    FAKE_LATENCY.update(_parse_latency(spec) if isinstance(spec, str) else spec)
+
+
+def is_fake():
+    return MODEL_PROVIDER == 'fake'
+
+
+def _sleep(endpoint):
+    delay = FAKE_LATENCY.get(endpoint, 0.0)
+    if delay > 0:
+        time.sleep(delay)
+
+
+def _seed(data):
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return int.from_bytes(hashlib.sha256(data).digest()[:8], 'big')
+
+
+# ---------------------------------------------------------------------------
+# Deterministic fakes
+# ---------------------------------------------------------------------------
+
+def fake_embedding(text, dims=None):
+    """Hash-seeded unit vector: identical text always maps to the identical vector."""
+    dims = dims or FAKE_EMBEDDING_DIMS
+    rng = random.Random(_seed(text))
+    vec = [rng.gauss(0.0, 1.0) for _ in range(dims)]
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+CANNED_LINES = [
+    "We need to get this done before the deadline.",
+    "I told you this would happen, didn't I?",
+    "Paisa hi sab kuch nahi hota, yaar.",
+    "Let's go, everyone is waiting outside.",
+    "That was the best day of my life.",
+    "Why are you laughing? This is serious.",
+    "The market opens in five minutes.",
+    "All is well, all is well.",
+]
+
+
+def fake_transcript(audio_bytes, segment_length=5.0):
+    """Canned Whisper verbose_json response; segment count depends on the audio bytes."""
+    rng = random.Random(_seed(audio_bytes[:65536] if audio_bytes else b''))
+    count = rng.randint(2, 6)
+    segments = []
+    for i in range(count):
+        start = i * segment_length
+        segments.append(SimpleNamespace(
+            id=i,
+            start=start,
+            end=start + segment_length,
+            text=' ' + rng.choice(CANNED_LINES)
+        ))
+    return SimpleNamespace(
+        text=''.join(s.text for s in segments).strip(),
+        language='english',
+        duration=count * segment_length,
+        segments=segments
+    )
+
+
+CANNED_EMOTIONS = ['happy', 'sad', 'laughing', 'angry', 'surprised', 'contemplative', 'anxious', 'neutral']
+CANNED_SERIES   = ['Farzi', 'Scam 1992', '3 Idiots', 'The Office', '']
+CANNED_SETTINGS = ['modern office', 'crowded street market', 'dimly lit living room', 'college classroom', 'rooftop at dusk']
+
+
+def fake_analysis(image_bytes=b'', filename_hint=''):
+    """Canned vision JSON with every key the real prompts ask for."""
+    rng = random.Random(_seed((image_bytes or b'')[:65536] + filename_hint.encode('utf-8')))
+    emotion = rng.choice(CANNED_EMOTIONS)
+    setting = rng.choice(CANNED_SETTINGS)
+    hint_lower = filename_hint.lower().replace('_', ' ').replace('-', ' ')
+    series = next((s for s in CANNED_SERIES if s and s.lower() in hint_lower), '')
+    people = rng.choice(['young man', 'woman', 'two men', 'father and son', 'group of friends'])
+    return {
+        'visual_description': f"[CAMERA: Medium shot, eye-level angle, static] {people} in a {setting}, looking {emotion}. "
+                              f"[OBJECTS: desk, phone, stack of cash]. [SETTING: {setting}]. [LIGHTING: warm practical lights]",
+        'scene_summary': f"A {emotion} moment between {people}.",
+        'series_movie': series,
+        'characters': people,
+        'basic_emotion': emotion,
+        'emotion_tags': [emotion, 'under pressure', 'tense'] if emotion != 'happy' else ['happy', 'joy', 'relief'],
+        'laugh_tags': ['warm-laugh', 'genuine-laugh'] if emotion in ('happy', 'laughing') else [],
+        'contextual_tags': ['drama', setting.replace(' ', '-'), 'indoor'],
+        'character_tags': [people.replace(' ', '-')],
+        'semantic_tags': ['medium-shot', 'eye-level', 'stack-of-cash', 'phone', 'desk']
+    }
+
+
+# ---------------------------------------------------------------------------
+# In-process fake client mirroring the parts of the OpenAI SDK we use
+# ---------------------------------------------------------------------------
+
+class _FakeEmbeddings:
+    def create(self, model=None, input=None, **kwargs):
+        _sleep('embeddings')
+        inputs = input if isinstance(input, list) else [input]
+        return SimpleNamespace(
+            model=model,
+            data=[SimpleNamespace(index=i, embedding=fake_embedding(str(text))) for i, text in enumerate(inputs)]
+        )
+
+
+class _FakeTranscriptions:
+    def create(self, model=None, file=None, response_format=None, **kwargs):
+        _sleep('transcriptions')
+        audio_bytes = file.read() if hasattr(file, 'read') else (file or b'')
+        return fake_transcript(audio_bytes)
+
+
+class _FakeCompletions:
+    def create(self, model=None, messages=None, **kwargs):
+        _sleep('chat')
+        image_bytes = b''
+        hint = ''
+        for message in messages or []:
+            content = message.get('content')
+            parts = content if isinstance(content, list) else [{'type': 'text', 'text': content or ''}]
+            for part in parts:
+                if part.get('type') == 'image_url':
+                    image_bytes = part['image_url']['url'].encode('utf-8')
+                elif part.get('type') == 'text' and 'Filename Hint' in (part.get('text') or ''):
+                    hint = part['text'].split('Filename Hint', 1)[1].split('\n', 1)[0]
+        content = json.dumps(fake_analysis(image_bytes, hint))
+        return SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(index=0, message=SimpleNamespace(role='assistant', content=content))]
+        )
+
+
+class FakeOpenAI:
+    """Drop-in for openai.OpenAI covering embeddings, audio transcriptions and chat completions."""
+
+    def __init__(self, **kwargs):
+        self.embeddings = _FakeEmbeddings()
+        self.audio = SimpleNamespace(transcriptions=_FakeTranscriptions())
+        self.chat = SimpleNamespace(completions=_FakeCompletions())
+
+
+def make_openai_client():
+    """Return the OpenAI client for the configured MODEL_PROVIDER."""
+    if is_fake():
+        print("🧪 MODEL_PROVIDER=fake - using deterministic local model stand-ins")
+        return FakeOpenAI()
+    from openai import OpenAI
+    return OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+
+
+def fake_gemini_analysis(img, transcript_context='', filename_hint=''):
+    """Raw Gemini-shaped JSON used by gemini_analyzer when MODEL_PROVIDER=fake."""
+    _sleep('gemini')
+    buf = io.BytesIO()
+    try:
+        img.save(buf, format='JPEG')
+    except Exception:
+        pass
+    return fake_analysis(buf.getvalue(), filename_hint)
+
+
+# ---------------------------------------------------------------------------
+# HTTP stand-in server (OpenAI-compatible subset)
+# ---------------------------------------------------------------------------
+
+def serve(port=5099):
+    """Serve /v1/embeddings, /v1/audio/transcriptions and /v1/chat/completions locally."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    fake = FakeOpenAI()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, payload, status=200):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            raw = self.rfile.read(length)
+            path = self.path.rstrip('/')
+
+            if path.endswith('/embeddings'):
+                req = json.loads(raw or b'{}')
+                resp = fake.embeddings.create(model=req.get('model'), input=req.get('input'))
+                return self._send({
+                    'object': 'list',
+                    'model': resp.model,
+                    'data': [{'object': 'embedding', 'index': d.index, 'embedding': d.embedding} for d in resp.data],
+                    'usage': {'prompt_tokens': 0, 'total_tokens': 0}
+                })
+
+            if path.endswith('/audio/transcriptions'):
+                # Multipart body is hashed as-is; no need to parse out the file part.
+                resp = fake.audio.transcriptions.create(file=raw)
+                return self._send({
+                    'task': 'transcribe',
+                    'language': resp.language,
+                    'duration': resp.duration,
+                    'text': resp.text,
+                    'segments': [{'id': s.id, 'start': s.start, 'end': s.end, 'text': s.text} for s in resp.segments]
+                })
+
+            if path.endswith('/chat/completions'):
+                req = json.loads(raw or b'{}')
+                resp = fake.chat.completions.create(model=req.get('model'), messages=req.get('messages'))
+                return self._send({
+                    'id': 'chatcmpl-fake',
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': resp.model,
+                    'choices': [{'index': 0, 'finish_reason': 'stop',
+                                 'message': {'role': 'assistant', 'content': resp.choices[0].message.content}}],
+                    'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+                })
+
+            self._send({'error': {'message': f'Unknown endpoint {self.path}'}}, status=404)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    print(f"🧪 Fake model server on http://127.0.0.1:{port}/v1 (latency: {FAKE_LATENCY})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    port = 5099
+    if '--port' in sys.argv:
+        port = int(sys.argv[sys.argv.index('--port') + 1])
+    serve(port)
@@ -0,0 +1,197 @@
+"""
+B-Roll Mapper - MongoDB Schema Migrations
+Numbered, idempotent migrations for the broll_mapper database (app_mongo.py).
+
+The applied version lives in a single `schema_version` document, so a worker
+that finds the database current pays one find_one at start-up. Apply pending
+migrations ahead of a deploy with `python migrate.py mongo`.
+"""
+
+from datetime import datetime, timezone
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+import facets
+import listing
+import tags
+
+SCHEMA_DOC_ID = 'broll_mapper'
+
+
+# ---------------------------------------------------------------------------
+# Migrations
+# ---------------------------------------------------------------------------
+
+def _001_base_indexes(db):
+    db['videos'].create_index([('id', ASCENDING)], unique=True)
+    db['videos'].create_index([('filename', ASCENDING)])
+    db['videos'].create_index([('category', ASCENDING)])
+    db['videos'].create_index([('upload_date', DESCENDING)])
+    db['clips'].create_index([('id', ASCENDING)], unique=True)
+    db['clips'].create_index([('video_id', ASCENDING)])
+    db['clips'].create_index([('start_time', ASCENDING)])
+    db['visual_frames'].create_index([('id', ASCENDING)], unique=True)
+    db['visual_frames'].create_index([('video_id', ASCENDING)])
+    db['visual_frames'].create_index([('timestamp', ASCENDING)])
+
+
+def _002_video_counts_and_listing_indexes(db):
+    # clip_count / frame_count are kept on the video document by every write path,
+    # so /videos no longer aggregates clips per call. Backfill them here.
+    for col, field in (('clips', 'clip_count'), ('visual_frames', 'frame_count')):
+        counts = db[col].aggregate([{'$group': {'_id': '$video_id', 'n': {'$sum': 1}}}])
+        ops = [UpdateOne({'id': c['_id']}, {'$set': {field: c['n']}}) for c in counts]
+        if ops:
+            db['videos'].bulk_write(ops, ordered=False)
+        db['videos'].update_many({field: {'$exists': False}}, {'$set': {field: 0}})
+
+    # Keyset pagination on (sort field, id), optionally filtered by category / status
+    db['videos'].create_index([('upload_date', DESCENDING), ('id', DESCENDING)])
+    db['videos'].create_index([('category', ASCENDING), ('upload_date', DESCENDING), ('id', DESCENDING)])
+    db['videos'].create_index([('status', ASCENDING), ('upload_date', DESCENDING), ('id', DESCENDING)])
+    db['videos'].create_index([('filename', ASCENDING), ('id', ASCENDING)])
+
+
+def _003_facet_index(db):
+    # Per-video facet values on the video document plus materialised counts in
+    # `facets` for /filters, rebuilt from the existing frames.
+    frames_by_video = {}
+    for f in db['visual_frames'].find({}, {'_id': 0, 'video_id': 1, 'emotion': 1, 'genres': 1,
+                                           'actors': 1, 'series_movie': 1}):
+        frames_by_video.setdefault(f.get('video_id'), []).append(f)
+    totals, ops = {}, []
+    for v in db['videos'].find({}, {'_id': 0, 'id': 1, 'category': 1}):
+        values = facets.video_facets(frames_by_video.get(v['id'], []), v.get('category'))
+        ops.append(UpdateOne({'id': v['id']}, {'$set': {'facets': values}}))
+        for facet, value, delta in facets.facet_deltas(None, values):
+            totals[(facet, value)] = totals.get((facet, value), 0) + delta
+    if ops:
+        db['videos'].bulk_write(ops, ordered=False)
+    db['facets'].delete_many({})
+    if totals:
+        db['facets'].insert_many([{'_id': f'{facet}:{value}', 'facet': facet, 'value': value, 'count': count}
+                                  for (facet, value), count in totals.items()])
+
+
+def _split_to_array(field):
+    """Update-pipeline expression turning a comma-joined string field into a trimmed array."""
+    return {'$filter': {
+        'input': {'$map': {'input': {'$split': ['$' + field, ',']}, 'as': 't',
+                           'in': {'$trim': {'input': '$$t'}}}},
+        'as': 't',
+        'cond': {'$ne': ['$$t', '']}
+    }}
+
+
+def _004_tag_arrays(db):
+    # Converted server-side (no documents travel to the client); only string
+    # values match, so re-running skips documents that are already arrays.
+    for col, fields in (('visual_frames', tags.FRAME_TAG_FIELDS), ('videos', ('custom_tags',))):
+        for field in fields:
+            db[col].update_many({field: {'$type': 'string'}}, [{'$set': {field: _split_to_array(field)}}])
+            db[col].create_index([(field, ASCENDING)])  # multikey
+
+
+def _005_search_filter_fields(db):
+    # /search filters run against clips / frames directly, so each carries its
+    # video's category. One update_many per category keeps the backfill server-side.
+    by_category = {}
+    for v in db['videos'].find({}, {'_id': 0, 'id': 1, 'category': 1}):
+        by_category.setdefault(v.get('category') or 'Videos', []).append(v['id'])
+    for category, video_ids in by_category.items():
+        for col in ('clips', 'visual_frames'):
+            db[col].update_many({'video_id': {'$in': video_ids}}, {'$set': {'category': category}})
+
+    # Filter-only searches page through matching frames in id order
+    db['visual_frames'].create_index([('category', ASCENDING), ('id', ASCENDING)])
+    db['visual_frames'].create_index([('emotion', ASCENDING), ('id', ASCENDING)])
+    db['clips'].create_index([('category', ASCENDING)])
+
+
+def _006_search_cache(db):
+    # Stored rankings for /search paging; keys include the library version, so
+    # entries only need to outlive a client paging through one result set.
+    db['search_cache'].create_index([('created_at', ASCENDING)], expireAfterSeconds=600)
+
+
+def _007_content_hash_index(db):
+    # Uploads record the SHA-256 of their bytes (the blob store address)
+    db['videos'].create_index([('sha256', ASCENDING)], sparse=True)
+
+
+def _008_upload_date_as_date(db):
+    # /videos keyset pages compare upload_date with $lt / $gt, which only match
+    # BSON dates; videos copied from Supabase kept ISO strings or null. Missing
+    # or unparseable dates become the time the document was created (its ObjectId).
+    ops = []
+    for v in db['videos'].find({'upload_date': {'$not': {'$type': 'date'}}}, {'_id': 1, 'upload_date': 1}):
+        value = listing.parse_upload_date(v.get('upload_date'))
+        if value is None:
+            value = getattr(v['_id'], 'generation_time', None) or datetime.now(timezone.utc)
+        ops.append(UpdateOne({'_id': v['_id']}, {'$set': {'upload_date': value}}))
+        if len(ops) >= 1000:
+            db['videos'].bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        db['videos'].bulk_write(ops, ordered=False)
+
+
+def _009_filter_keys(db):
+    # /search emotion / genre filters match lowercased copies, so "Dark Comedy"
+    # and "dark Comedy" are the same value (see facets.filter_keys). Computed
+    # server-side; genres has been an array since migration 4.
+    db['visual_frames'].update_many({}, [{'$set': {
+        'emotion_lc': {'$toLower': {'$trim': {'input': {'$ifNull': ['$emotion', '']}}}},
+        'genres_lc':  {'$setUnion': [{'$map': {
+            'input': {'$cond': [{'$isArray': '$genres'}, '$genres', []]}, 'as': 'g',
+            'in': {'$toLower': {'$trim': {'input': '$$g'}}}}}, []]},
+    }}])
+    db['visual_frames'].create_index([('emotion_lc', ASCENDING), ('id', ASCENDING)])
+    db['visual_frames'].create_index([('genres_lc', ASCENDING)])  # multikey
+
+
+MIGRATIONS = [
+    (1, 'id / video_id / filename / category indexes', _001_base_indexes),
+    (2, 'video clip/frame counts and listing indexes', _002_video_counts_and_listing_indexes),
+    (3, 'facet index for /filters', _003_facet_index),
+    (4, 'tag fields as arrays with multikey indexes', _004_tag_arrays),
+    (5, 'category on clips / frames and search filter indexes', _005_search_filter_fields),
+    (6, 'search ranking cache with TTL', _006_search_cache),
+    (7, 'videos.sha256 index', _007_content_hash_index),
+    (8, 'videos.upload_date as a date', _008_upload_date_as_date),
+    (9, 'lowercased emotion / genres on frames for search filters', _009_filter_keys),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def current_version(db):
+    doc = db['schema_version'].find_one({'_id': SCHEMA_DOC_ID}, {'version': 1})
+    return (doc or {}).get('version', 0)
+
+
+def migrate(db, target=None):
+    """Apply pending migrations up to `target` (default: latest). Returns the versions applied.
+
+    Every migration is idempotent, so two processes racing here only repeat work;
+    the recorded version only ever moves forward ($max).
+    """
+    target = LATEST_VERSION if target is None else target
+    version = current_version(db)
+    applied = []
+    for number, description, apply in MIGRATIONS:
+        if version < number <= target:
+            apply(db)
+            db['schema_version'].update_one(
+                {'_id': SCHEMA_DOC_ID},
+                {'$max': {'version': number},
+                 '$push': {'history': {'version': number, 'description': description,
+                                       'applied_at': datetime.now(timezone.utc)}}},
+                upsert=True
+            )
+            applied.append(number)
+    return applied
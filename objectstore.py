@@ -0,0 +1,394 @@
+"""
+B-Roll Mapper - Pluggable object storage for media files
+One interface for wherever videos, thumbnails and previews are kept, chosen with
+STORAGE_DRIVER, so moving to another store is configuration instead of another
+app_*.py fork.
+
+    store = objectstore.from_env(local)            # local | s3 | supabase
+    store.put_file('videos/clip.mp4', path)
+    store.put_stream('videos/clip.mp4', fileobj, size)
+    for chunk in store.get_range('videos/clip.mp4', 0, 1023): ...
+    store.exists('videos/clip.mp4') / store.delete_many([...])
+    store.presign('videos/clip.mp4', expires=3600)
+
+Keys are '<prefix>/<name>' using the bucket layout of storage_sync.py
+(videos/, thumbnails/, previews/), so a bucket filled by `storage_sync.py push`
+is readable by the drivers and vice versa.
+
+Drivers:
+- LocalStore: each prefix is a folder under STORAGE_BASE (uploads/, thumbnails/,
+  previews/). Writes go to a temp file in the target folder and are renamed into
+  place, so a half-written file is never served. URLs are the app's own routes
+  (/uploads/<name>, ...), which serve Range requests from disk (media.py).
+- S3Store: any S3-compatible store - AWS, MinIO as a local stand-in
+  (S3_ENDPOINT_URL=http://localhost:9000), R2, or Supabase's S3 endpoint.
+  Files over MULTIPART_THRESHOLD_MB go up as multipart uploads, parts of
+  MULTIPART_CHUNK_MB sent by MULTIPART_CONCURRENCY threads (boto3 managed
+  transfer). Reads are ranged GetObject calls; presign() gives GET URLs.
+- SupabaseStore: the Storage REST API (storage_sync.StorageClient), signed URLs
+  from /object/sign. Uploads are one streamed request each; for parallel
+  multipart uploads of large files use the s3 driver against the project's S3
+  endpoint (https://<ref>.supabase.co/storage/v1/s3) instead.
+
+Stdlib + applog; boto3 (s3) and requests (supabase) are imported only when
+that driver is used.
+"""
+
+import os
+import shutil
+import mimetypes
+import tempfile
+from urllib.parse import quote
+
+import applog
+
+log = applog.get_logger('objectstore')
+
+CHUNK_SIZE      = 1024 * 1024
+PRESIGN_SECONDS = 3600
+DELETE_BATCH    = 1000
+MB = 1024 * 1024
+
+
+class StorageError(Exception):
+    pass
+
+
+class ObjectNotFound(StorageError):
+    pass
+
+
+def content_type_for(key):
+    return mimetypes.guess_type(key)[0] or 'application/octet-stream'
+
+
+def _range_header(start, end):
+    return f"bytes={start}-{'' if end is None else end}"
+
+
+class ObjectStore:
+    """Interface every driver implements. Byte ranges are inclusive, as in HTTP."""
+
+    driver = None
+    is_local = False
+
+    def put_stream(self, key, stream, size=None, content_type=None):
+        """Store everything read from the file object `stream` under `key`."""
+        raise NotImplementedError
+
+    def put_file(self, key, path, content_type=None):
+        with open(path, 'rb') as f:
+            self.put_stream(key, f, os.path.getsize(path), content_type or content_type_for(path))
+
+    def get_range(self, key, start=0, end=None):
+        """Iterator over the bytes start..end of `key` (end=None: to the end of the object).
+
+        Raises ObjectNotFound straight away, not on first iteration.
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        return self.delete_many([key])
+
+    def delete_many(self, keys):
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def presign(self, key, expires=PRESIGN_SECONDS):
+        """Time-limited GET URL for `key`."""
+        raise NotImplementedError
+
+    def url(self, key):
+        """Permanent URL for `key`, or None when it can only be reached through presign()."""
+        return None
+
+    def download(self, key, path):
+        """Copy `key` to the local file `path`."""
+        with open(path, 'wb') as f:
+            for chunk in self.get_range(key):
+                f.write(chunk)
+
+
+# ── Local filesystem ─────────────────────────────────────────────────────────
+
+class LocalStore(ObjectStore):
+    """Prefixes mapped to folders; served by the app's own media routes."""
+
+    driver = 'local'
+    is_local = True
+
+    def __init__(self, folders, routes=None):
+        self.folders = dict(folders)
+        # uploads/ is served at /uploads, thumbnails/ at /thumbnails, ...
+        self.routes = routes or {prefix: '/' + os.path.basename(os.path.normpath(folder))
+                                 for prefix, folder in self.folders.items()}
+
+    def local_path(self, key):
+        prefix, _, name = key.partition('/')
+        folder = self.folders.get(prefix)
+        if folder is None or not name:
+            raise StorageError(f"No local folder for '{key}'")
+        root = os.path.abspath(folder)
+        path = os.path.abspath(os.path.join(root, name))
+        if not path.startswith(root + os.sep):
+            raise StorageError(f"Key escapes its folder: '{key}'")
+        return path
+
+    def _write(self, key, fill):
+        """Write a temp file next to the destination with fill(f), then rename it into place."""
+        dest = self.local_path(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                fill(f)
+            os.replace(tmp, dest)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def put_stream(self, key, stream, size=None, content_type=None):
+        self._write(key, lambda f: shutil.copyfileobj(stream, f, CHUNK_SIZE))
+
+    def put_file(self, key, path, content_type=None):
+        if os.path.abspath(path) == self.local_path(key):
+            return
+        with open(path, 'rb') as src:
+            self._write(key, lambda f: shutil.copyfileobj(src, f, CHUNK_SIZE))
+        shutil.copystat(path, self.local_path(key))
+
+    def get_range(self, key, start=0, end=None):
+        try:
+            f = open(self.local_path(key), 'rb')
+        except FileNotFoundError:
+            raise ObjectNotFound(key) from None
+        return self._read(f, start, end)
+
+    @staticmethod
+    def _read(f, start, end):
+        with f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    return
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def delete_many(self, keys):
+        removed = 0
+        for key in keys:
+            try:
+                os.remove(self.local_path(key))
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except (OSError, StorageError) as e:
+                log.warning("⚠️  Could not delete %s: %s", key, e)
+        return removed
+
+    def exists(self, key):
+        return os.path.isfile(self.local_path(key))
+
+    def presign(self, key, expires=PRESIGN_SECONDS):
+        return self.url(key)
+
+    def url(self, key):
+        prefix, _, name = key.partition('/')
+        return f"{self.routes[prefix]}/{name}"
+
+
+# ── S3-compatible (AWS, MinIO, R2, Supabase S3 endpoint) ─────────────────────
+
+class S3Store(ObjectStore):
+    """Bucket on an S3-compatible endpoint, with parallel multipart uploads."""
+
+    driver = 's3'
+
+    def __init__(self, bucket, endpoint_url=None, region=None, access_key=None, secret_key=None,
+                 public_url=None, multipart_threshold=64 * MB, multipart_chunksize=16 * MB,
+                 max_concurrency=8):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config
+            from botocore.exceptions import ClientError
+        except ImportError:
+            raise StorageError("boto3 package not installed. Run: pip install boto3") from None
+
+        self.bucket = bucket
+        self.public_url = public_url.rstrip('/') if public_url else None
+        self._client_error = ClientError
+        self.client = boto3.client(
+            's3', endpoint_url=endpoint_url, region_name=region,
+            aws_access_key_id=access_key, aws_secret_access_key=secret_key,
+            config=Config(signature_version='s3v4',
+                          # MinIO and most self-hosted endpoints have no per-bucket DNS names
+                          s3={'addressing_style': 'path' if endpoint_url else 'auto'},
+                          max_pool_connections=max(10, max_concurrency * 2)))
+        self.transfer = TransferConfig(multipart_threshold=multipart_threshold,
+                                       multipart_chunksize=multipart_chunksize,
+                                       max_concurrency=max_concurrency, use_threads=True)
+
+    def _missing(self, error):
+        return error.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound')
+
+    def put_stream(self, key, stream, size=None, content_type=None):
+        self.client.upload_fileobj(stream, self.bucket, key, Config=self.transfer,
+                                   ExtraArgs={'ContentType': content_type or content_type_for(key)})
+
+    def put_file(self, key, path, content_type=None):
+        self.client.upload_file(path, self.bucket, key, Config=self.transfer,
+                                ExtraArgs={'ContentType': content_type or content_type_for(path)})
+
+    def get_range(self, key, start=0, end=None):
+        params = {'Bucket': self.bucket, 'Key': key}
+        if start or end is not None:
+            params['Range'] = _range_header(start, end)
+        try:
+            body = self.client.get_object(**params)['Body']
+        except self._client_error as e:
+            if self._missing(e):
+                raise ObjectNotFound(key) from None
+            raise StorageError(f"Reading {key} failed: {e}") from e
+        return body.iter_chunks(CHUNK_SIZE)
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        for i in range(0, len(keys), DELETE_BATCH):
+            batch = keys[i:i + DELETE_BATCH]
+            self.client.delete_objects(Bucket=self.bucket, Delete={
+                'Objects': [{'Key': k} for k in batch], 'Quiet': True})
+        return len(keys)
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except self._client_error as e:
+            if self._missing(e):
+                return False
+            raise StorageError(f"Checking {key} failed: {e}") from e
+
+    def presign(self, key, expires=PRESIGN_SECONDS):
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': key}, ExpiresIn=expires)
+
+    def url(self, key):
+        return f"{self.public_url}/{quote(key)}" if self.public_url else None
+
+
+# ── Supabase Storage ─────────────────────────────────────────────────────────
+
+class SupabaseStore(ObjectStore):
+    """Supabase Storage bucket through its REST API."""
+
+    driver = 'supabase'
+
+    def __init__(self, url, key, bucket='broll-videos', public=True):
+        try:
+            import storage_sync
+        except ImportError:
+            raise StorageError("requests package not installed. Run: pip install requests") from None
+        self._sync = storage_sync
+        self.client = storage_sync.StorageClient(url, key, bucket)
+        self.public = public
+
+    def _object_url(self, key, kind=None):
+        base = f"{self.client.url}/storage/v1/object"
+        if kind:
+            base += '/' + kind
+        return f"{base}/{self.client.bucket}/{quote(key)}"
+
+    def put_stream(self, key, stream, size=None, content_type=None):
+        # A stream can only be sent once, so unlike put_file there is no retry
+        headers = {'Content-Type': content_type or content_type_for(key), 'x-upsert': 'true'}
+        if size is not None:
+            headers['Content-Length'] = str(size)
+        resp = self.client.session.post(self._object_url(key), data=stream, headers=headers, timeout=600)
+        if resp.status_code >= 300:
+            raise StorageError(f"Uploading {key} failed: HTTP {resp.status_code}: {resp.text[:200]}")
+
+    def put_file(self, key, path, content_type=None):
+        self.client.upload(path, key, content_type)
+
+    @staticmethod
+    def _not_found(resp):
+        # Storage answers a missing object with 404, or 400 and an error body naming it
+        return resp.status_code == 404 or (resp.status_code == 400 and 'not found' in resp.text.lower())
+
+    def get_range(self, key, start=0, end=None):
+        headers = {}
+        if start or end is not None:
+            headers['Range'] = _range_header(start, end)
+        resp = self.client.session.get(self._object_url(key, 'authenticated'),
+                                       headers=headers, stream=True, timeout=60)
+        if self._not_found(resp):
+            raise ObjectNotFound(key)
+        if resp.status_code >= 300:
+            raise StorageError(f"Reading {key} failed: HTTP {resp.status_code}: {resp.text[:200]}")
+        return resp.iter_content(CHUNK_SIZE)
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        for i in range(0, len(keys), DELETE_BATCH):
+            self.client.delete(keys[i:i + DELETE_BATCH])
+        return len(keys)
+
+    def exists(self, key):
+        resp = self.client.session.head(self._object_url(key, 'authenticated'), timeout=30)
+        if resp.status_code < 300:
+            return True
+        if resp.status_code in (400, 404):
+            return False
+        raise StorageError(f"Checking {key} failed: HTTP {resp.status_code}")
+
+    def presign(self, key, expires=PRESIGN_SECONDS):
+        resp = self.client.session.post(self._object_url(key, 'sign'),
+                                        json={'expiresIn': int(expires)}, timeout=30)
+        if self._not_found(resp):
+            raise ObjectNotFound(key)
+        if resp.status_code >= 300:
+            raise StorageError(f"Signing {key} failed: HTTP {resp.status_code}: {resp.text[:200]}")
+        return f"{self.client.url}/storage/v1{resp.json()['signedURL']}"
+
+    def url(self, key):
+        return self.client.public_url(key) if self.public else None
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+
+def _mb(name, default):
+    return int(float(os.getenv(name, default)) * MB)
+
+
+def from_env(local_store):
+    """The store selected by STORAGE_DRIVER; `local_store` itself for the default 'local'."""
+    driver = os.getenv('STORAGE_DRIVER', 'local').strip().lower()
+    if driver == 'local':
+        return local_store
+    if driver == 's3':
+        bucket = os.getenv('S3_BUCKET')
+        if not bucket:
+            raise StorageError("S3_BUCKET must be set for STORAGE_DRIVER=s3")
+        return S3Store(bucket,
+                       endpoint_url=os.getenv('S3_ENDPOINT_URL') or None,
+                       region=os.getenv('S3_REGION') or None,
+                       access_key=os.getenv('S3_ACCESS_KEY_ID') or None,
+                       secret_key=os.getenv('S3_SECRET_ACCESS_KEY') or None,
+                       public_url=os.getenv('S3_PUBLIC_URL') or None,
+                       multipart_threshold=_mb('MULTIPART_THRESHOLD_MB', 64),
+                       multipart_chunksize=_mb('MULTIPART_CHUNK_MB', 16),
+                       max_concurrency=int(os.getenv('MULTIPART_CONCURRENCY', 8)))
+    if driver == 'supabase':
+        url, key = os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_KEY')
+        if not url or not key:
+            raise StorageError("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set for STORAGE_DRIVER=supabase")
+        return SupabaseStore(url, key, os.getenv('SUPABASE_BUCKET', 'broll-videos'),
+                             public=os.getenv('SUPABASE_BUCKET_PUBLIC', '1') != '0')
+    raise StorageError(f"Unknown STORAGE_DRIVER '{driver}' (expected local, s3 or supabase)")
@@ -0,0 +1,143 @@
+"""
+B-Roll Mapper - Preview renditions
+Small playback copies and hover-scrub sprite sheets for the library grid.
+
+For each uploaded video ingest writes, next to the original:
+- preview_<stem>.mp4  H.264 at PREVIEW_HEIGHT (360p), capped at PREVIEW_MAXRATE,
+                      mono AAC, faststart so playback begins before the file
+                      is fully downloaded
+- sprite_<stem>.jpg   up to SPRITE_MAX_TILES thumbnails (SPRITE_TILE_WIDTH x
+                      SPRITE_TILE_HEIGHT, letterboxed) in one JPEG grid
+- sprite_<stem>.vtt   WebVTT index: one cue per tile, "sprite.jpg#xywh=x,y,w,h"
+
+The grid uses the preview for hover playback instead of the original upload
+(up to 500 MB), and the sprite + VTT for scrubbing without any video request.
+
+Stdlib + applog/metrics; shells out to ffmpeg like the rest of the pipeline.
+"""
+
+import os
+import math
+import subprocess
+
+import applog
+import metrics
+from metrics import timer
+
+log = applog.get_logger('previews')
+
+PREVIEW_HEIGHT     = int(os.getenv('PREVIEW_HEIGHT', '360'))
+PREVIEW_MAXRATE    = os.getenv('PREVIEW_MAXRATE', '600k')
+SPRITE_TILE_WIDTH  = 160
+SPRITE_TILE_HEIGHT = 90
+SPRITE_COLUMNS     = 10
+SPRITE_MAX_TILES   = 100
+
+
+def find_ffmpeg():
+    for path in ['/opt/homebrew/bin/ffmpeg', '/usr/bin/ffmpeg']:
+        if os.path.exists(path):
+            return path
+    return 'ffmpeg'
+
+
+def names(filename):
+    """Preview / sprite / VTT filenames for an uploaded video."""
+    stem = os.path.splitext(filename)[0]
+    return {
+        'preview':    f'preview_{stem}.mp4',
+        'sprite':     f'sprite_{stem}.jpg',
+        'sprite_vtt': f'sprite_{stem}.vtt',
+    }
+
+
+def _bufsize(rate):
+    """Twice the max rate ('600k' -> '1200k'), the usual VBV buffer for capped CRF."""
+    number = rate.rstrip('kKmM')
+    return f'{int(float(number) * 2)}{rate[len(number):]}'
+
+
+def render_preview(video_path, dest):
+    """Encode the low-bitrate preview rendition. Raises RuntimeError if ffmpeg fails."""
+    cmd = [find_ffmpeg(), '-i', video_path,
+           '-vf', f"scale=-2:'min({PREVIEW_HEIGHT},ih)'",
+           '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '28',
+           '-maxrate', PREVIEW_MAXRATE, '-bufsize', _bufsize(PREVIEW_MAXRATE),
+           '-pix_fmt', 'yuv420p',
+           '-c:a', 'aac', '-b:a', '64k', '-ac', '1',
+           '-movflags', '+faststart', '-y', dest]
+    with timer(metrics.FFMPEG_SECONDS, op='preview'):
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Preview encode failed: {result.stderr[-300:]}")
+    return dest
+
+
+def sprite_layout(duration):
+    """(interval seconds, tile count) covering `duration` with at most SPRITE_MAX_TILES tiles."""
+    if duration <= 0:
+        return 1.0, 1
+    interval = float(max(1, math.ceil(duration / SPRITE_MAX_TILES)))
+    return interval, max(1, min(SPRITE_MAX_TILES, math.ceil(duration / interval)))
+
+
+def _vtt_time(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f'{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}'
+
+
+def sprite_vtt(duration, interval, count, sprite_name):
+    """WebVTT thumbnail track for a sprite laid out by `sprite_layout`."""
+    lines = ['WEBVTT', '']
+    for i in range(count):
+        start = i * interval
+        end = min((i + 1) * interval, duration) if duration > 0 else interval
+        x = (i % SPRITE_COLUMNS) * SPRITE_TILE_WIDTH
+        y = (i // SPRITE_COLUMNS) * SPRITE_TILE_HEIGHT
+        lines.append(f'{_vtt_time(start)} --> {_vtt_time(end)}')
+        lines.append(f'{sprite_name}#xywh={x},{y},{SPRITE_TILE_WIDTH},{SPRITE_TILE_HEIGHT}')
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def render_sprite(video_path, duration, sprite_path, vtt_path):
+    """Tile one frame every `interval` seconds into a JPEG grid and write its VTT index."""
+    interval, count = sprite_layout(duration)
+    rows = math.ceil(count / SPRITE_COLUMNS)
+    w, h = SPRITE_TILE_WIDTH, SPRITE_TILE_HEIGHT
+    vf = (f"fps=1/{interval:g},"
+          f"scale={w}:{h}:force_original_aspect_ratio=decrease,"
+          f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,"
+          f"tile={SPRITE_COLUMNS}x{rows}")
+    cmd = [find_ffmpeg(), '-i', video_path, '-vf', vf, '-frames:v', '1', '-q:v', '5', '-y', sprite_path]
+    with timer(metrics.FFMPEG_SECONDS, op='sprite'):
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Sprite sheet failed: {result.stderr[-300:]}")
+    with open(vtt_path, 'w') as f:
+        f.write(sprite_vtt(duration, interval, count, os.path.basename(sprite_path)))
+    return sprite_path, vtt_path
+
+
+def generate(video_path, filename, duration, folder):
+    """Write the preview, sprite sheet and VTT for `filename` into `folder`.
+
+    Returns {'preview': name, 'sprite': name, 'sprite_vtt': name} for the files
+    that were produced; a failed step is logged and left out.
+    """
+    out = {}
+    files = names(filename)
+    try:
+        render_preview(video_path, os.path.join(folder, files['preview']))
+        out['preview'] = files['preview']
+    except Exception as e:
+        log.warning("⚠️  Preview rendition failed for %s: %s", filename, e)
+    try:
+        render_sprite(video_path, duration,
+                      os.path.join(folder, files['sprite']), os.path.join(folder, files['sprite_vtt']))
+        out['sprite'] = files['sprite']
+        out['sprite_vtt'] = files['sprite_vtt']
+    except Exception as e:
+        log.warning("⚠️  Sprite sheet failed for %s: %s", filename, e)
+    return out
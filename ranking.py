@@ -0,0 +1,162 @@
+"""
+B-Roll Mapper - Search result paging
+Request parsing, stable ordering, cursors and field projection for POST /search.
+
+POST /search accepts, next to the query and filters:
+- limit     page size (1-200, default 50)
+- cursor    opaque `next_cursor` from the previous page
+- fields    result keys to return (list or comma-separated); `id` is always kept
+- stream    true to receive NDJSON (one result per line, then a trailer line
+            with `next_cursor`) instead of a single JSON body
+
+Ranked results are ordered by (similarity desc, source, row id), so ties always
+break the same way and a cursor holding the last (score, id) of a page identifies
+where the next page starts. The app keeps a query's full ranking for the
+current library version, which lets deep pages be sliced out of it instead of
+re-scoring the corpus. Only (score, kind, row_id) entries are kept (`compact`);
+the result dicts of a page are rebuilt from its rows.
+
+Scoring loops feed candidates into a `TopK` as (score, kind, row_id) plus a
+reference to the row they came from; result dicts are only built for the k
+survivors.
+"""
+
+import json
+import heapq
+import bisect
+import hashlib
+import itertools
+
+import listing
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = listing.MAX_LIMIT
+
+
+def _as_list(value):
+    if isinstance(value, str):
+        value = value.split(',')
+    return [str(v).strip() for v in (value or []) if str(v).strip()]
+
+
+def query_key(*parts):
+    """Short stable key for a normalised search (query text + filters)."""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def parse_search_args(data):
+    """Paging options from the /search body. Raises listing.ListArgsError on bad input."""
+    limit = data.get('limit')
+    if limit is None:
+        limit = DEFAULT_LIMIT
+    else:
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise listing.ListArgsError('limit must be an integer')
+        limit = max(1, min(limit, MAX_LIMIT))
+
+    token = data.get('cursor') or None
+    fields = _as_list(data.get('fields'))
+    if fields and 'id' not in fields:
+        fields.insert(0, 'id')
+    return {
+        'limit':  limit,
+        'cursor': listing.decode_cursor(token) if token else None,
+        'token':  token,
+        'fields': fields,
+        'stream': str(data.get('stream', '')).lower() in ('1', 'true', 'yes'),
+    }
+
+
+KIND_ORDER = {'audio': 0, 'visual': 1}
+
+
+def _id_key(result_id):
+    kind, _, row_id = str(result_id).partition('_')
+    return KIND_ORDER.get(kind, len(KIND_ORDER)), int(row_id) if row_id.isdigit() else 0
+
+
+def sort_key(result):
+    return (-result['similarity'],) + _id_key(result['id'])
+
+
+def compact(ranked):
+    """[(score, kind, row_id)] for ranked results - what the ranking cache stores."""
+    entries = []
+    for r in ranked:
+        kind, _, row_id = str(r['id']).partition('_')
+        entries.append((r['similarity'], kind, int(row_id)))
+    return entries
+
+
+def _entry_key(entry):
+    score, kind, row_id = entry
+    return -score, KIND_ORDER.get(kind, len(KIND_ORDER)), row_id
+
+
+class TopK:
+    """The k best candidates seen, kept in a bounded min-heap (O(n log k)).
+
+    push() takes the score, the result kind ('audio' / 'visual'), the row id and
+    whatever the caller needs to build the result later (the fetched row).
+    Ties break like `sort_key`, so the survivors match a full sort's first k.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self.seen = 0
+        self._heap = []
+        self._seq = itertools.count()
+
+    def push(self, score, kind, row_id, row=None):
+        self.seen += 1
+        entry = (score, -KIND_ORDER[kind], -row_id, next(self._seq), kind, row_id, row)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:3] > self._heap[0][:3]:
+            heapq.heapreplace(self._heap, entry)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def best(self):
+        """[(score, kind, row_id, row)] best first."""
+        return [(e[0], e[4], e[5], e[6]) for e in sorted(self._heap, key=lambda e: e[:3], reverse=True)]
+
+
+def rank(results):
+    """Results in their stable page order."""
+    return sorted(results, key=sort_key)
+
+
+def encode_cursor(key, entry):
+    score, kind, row_id = entry
+    return listing.encode_cursor('search:' + key, score, f'{kind}_{row_id}')
+
+
+def page(entries, key, cursor, limit):
+    """(page, next_cursor) of the compact ranking `entries` starting after `cursor`."""
+    start = 0
+    if cursor:
+        if cursor.get('s') != 'search:' + key:
+            raise listing.ListArgsError('cursor was issued for a different search')
+        after = (-float(cursor['v']),) + _id_key(cursor['id'])
+        start = bisect.bisect_right([_entry_key(e) for e in entries], after)
+    items = entries[start:start + limit]
+    more = start + limit < len(entries)
+    return items, (encode_cursor(key, items[-1]) if more and items else None)
+
+
+def project(results, fields):
+    if not fields:
+        return results
+    return [{f: r[f] for f in fields if f in r} for r in results]
+
+
+def ndjson_lines(results, trailer):
+    """One JSON document per line, then `trailer` (next_cursor etc.)."""
+    for r in results:
+        yield json.dumps(r, separators=(',', ':')) + '\n'
+    yield json.dumps(trailer, separators=(',', ':')) + '\n'
@@ -0,0 +1,183 @@
+"""
+B-Roll Mapper - Resumable uploads
+tus-style chunked upload sessions: a dropped connection resumes from the last
+byte the server has instead of restarting a 500 MB multipart POST.
+
+Protocol (JSON bodies, offsets in the Upload-Offset header):
+  POST   /upload/sessions                {"filename", "size", "category"?}
+         -> 201 {"upload_id", "offset": 0, "size", "chunk_size"}, Location
+  HEAD   /upload/sessions/<id>           -> 200, Upload-Offset + Upload-Length
+  PATCH  /upload/sessions/<id>           raw bytes, Upload-Offset: <n>
+         -> 204, Upload-Offset: <n + bytes written>
+         -> 409 + Upload-Offset: <server offset> when <n> is not the end of the file
+  POST   /upload/sessions/<id>/complete  -> the same response as POST /upload;
+                                            processing starts here
+  DELETE /upload/sessions/<id>           abandon the session
+
+State lives on disk (<id>.json + <id>.part in one folder on the upload volume),
+so any gunicorn worker can take any chunk. The .part file's size *is* the
+offset; a chunk cut off mid-request keeps the bytes that arrived and the client
+resumes from there (HEAD, then PATCH). One writer per session at a time
+(flock); sessions untouched for SESSION_TTL seconds are removed.
+
+Completing claims the .part file (renamed to .part.done) and the caller closes
+the session only once the file is safely stored; if storing fails the caller
+reopens it, so the client can retry POST .../complete.
+
+Stdlib only.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import fcntl
+
+CHUNK_SIZE = 8 * 1024 * 1024          # what clients are told to send per PATCH
+SESSION_TTL = 24 * 3600
+_READ_SIZE = 1024 * 1024
+_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+class SessionError(Exception):
+    """Request-level problem with a session; carries the HTTP status to return."""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class SessionStore:
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def _paths(self, upload_id):
+        if not _ID_RE.match(upload_id or ''):
+            raise SessionError('Unknown upload session', 404)
+        base = os.path.join(self.folder, upload_id)
+        return base + '.json', base + '.part'
+
+    def claimed_path(self, upload_id):
+        return self._paths(upload_id)[1] + '.done'
+
+    def create(self, filename, size, category=None):
+        """New empty session for `size` bytes of `filename`. Returns its state."""
+        if size < 0:
+            raise SessionError('size must be a non-negative integer')
+        self.expire()
+        upload_id = uuid.uuid4().hex
+        meta_path, part_path = self._paths(upload_id)
+        meta = {'upload_id': upload_id, 'filename': filename, 'size': size,
+                'category': category, 'created_at': time.time()}
+        open(part_path, 'wb').close()
+        tmp = meta_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+        return dict(meta, offset=0)
+
+    def get(self, upload_id):
+        """Session state including the current offset. Raises SessionError(404)."""
+        meta_path, part_path = self._paths(upload_id)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            meta['offset'] = os.path.getsize(part_path)
+        except (FileNotFoundError, ValueError):
+            if os.path.exists(part_path + '.done'):
+                raise SessionError('Upload session is being completed', 409)
+            raise SessionError('Unknown upload session', 404)
+        return meta
+
+    def append(self, upload_id, offset, stream):
+        """Write `stream` at `offset` (which must be the current end). Returns the new offset.
+
+        Bytes are flushed as they arrive, so a client that disconnects mid-chunk
+        still advances the offset by whatever was received.
+        """
+        meta = self.get(upload_id)
+        _, part_path = self._paths(upload_id)
+        with open(part_path, 'ab') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise SessionError('Another request is writing to this upload', 409, meta['offset'])
+            current = f.seek(0, os.SEEK_END)
+            if offset != current:
+                raise SessionError('Upload-Offset does not match the server offset', 409, current)
+            try:
+                while True:
+                    chunk = stream.read(_READ_SIZE)
+                    if not chunk:
+                        break
+                    if current + len(chunk) > meta['size']:
+                        raise SessionError('Chunk runs past the declared upload size', 413, current)
+                    f.write(chunk)
+                    current += len(chunk)
+            finally:
+                f.flush()
+                os.utime(part_path)
+        return current
+
+    def finish(self, upload_id):
+        """(meta, path of the assembled file) for a fully received session.
+
+        The file is claimed for the caller - only one of several concurrent
+        `complete` requests gets it - who then either `close`s the session once
+        the file is stored, or `reopen`s it after putting the file back.
+        """
+        meta = self.get(upload_id)
+        if meta['offset'] != meta['size']:
+            raise SessionError(f"Upload incomplete: {meta['offset']} of {meta['size']} bytes", 409, meta['offset'])
+        _, part_path = self._paths(upload_id)
+        claimed = self.claimed_path(upload_id)
+        try:
+            os.rename(part_path, claimed)
+        except FileNotFoundError:
+            raise SessionError('Upload session already completed', 409)
+        return meta, claimed
+
+    def reopen(self, upload_id):
+        """Undo `finish` after the caller failed to store the file (which must be back at its path)."""
+        _, part_path = self._paths(upload_id)
+        try:
+            os.rename(self.claimed_path(upload_id), part_path)
+        except FileNotFoundError:
+            pass
+
+    def close(self, upload_id):
+        """Remove a finished session once its file has been stored."""
+        meta_path, _ = self._paths(upload_id)
+        for path in (meta_path, self.claimed_path(upload_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def discard(self, upload_id):
+        for path in self._paths(upload_id) + (self.claimed_path(upload_id),):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def expire(self, now=None):
+        """Remove sessions, and files claimed by completions that never closed,
+        with no writes for SESSION_TTL seconds."""
+        cutoff = (now or time.time()) - SESSION_TTL
+        last = {}
+        for entry in os.scandir(self.folder):
+            upload_id, _, ext = entry.name.partition('.')
+            if ext not in ('json', 'part', 'part.done') or not _ID_RE.match(upload_id):
+                continue
+            try:
+                mtime = entry.stat().st_mtime
+            except FileNotFoundError:
+                continue                       # finished or discarded meanwhile
+            last[upload_id] = max(last.get(upload_id, 0), mtime)
+        for upload_id, mtime in last.items():
+            if mtime < cutoff:
+                self.discard(upload_id)
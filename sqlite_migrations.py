@@ -0,0 +1,242 @@
+"""
+B-Roll Mapper - SQLite Schema Migrations
+Numbered, idempotent migrations for broll_semantic.db (app_semantic.py).
+
+Applied migrations are recorded in a `schema_version` table, so a database
+that is already current costs a single SELECT at start-up. Every migration
+can safely re-run against a database that was built by the old ad-hoc
+PRAGMA table_info / ALTER TABLE code in init_db().
+
+Stdlib only (plus the stdlib-only facets.py / tags.py), so it can be imported by tests
+and tooling without the app's dependencies.
+"""
+
+import json
+import sqlite3
+
+import facets
+import tags
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def _add_columns(conn, table, columns):
+    existing = _columns(conn, table)
+    for name, decl in columns:
+        if name not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {decl}')
+
+
+def _indexed_columns(conn, table):
+    """Leading column of every index on `table` (includes UNIQUE autoindexes)."""
+    leading = set()
+    for index in conn.execute(f'PRAGMA index_list({table})'):
+        cols = conn.execute(f'PRAGMA index_info({index[1]})').fetchall()
+        if cols:
+            leading.add(cols[0][2])
+    return leading
+
+
+# ---------------------------------------------------------------------------
+# Migrations
+# ---------------------------------------------------------------------------
+
+def _001_base_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS videos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL UNIQUE,
+            upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duration REAL NOT NULL,
+            status TEXT DEFAULT 'processing',
+            thumbnail TEXT,
+            custom_tags TEXT DEFAULT ''
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS clips (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            video_id INTEGER NOT NULL,
+            filename TEXT NOT NULL,
+            start_time REAL NOT NULL,
+            end_time REAL NOT NULL,
+            duration REAL NOT NULL,
+            transcript_text TEXT NOT NULL,
+            embedding BLOB NOT NULL,
+            FOREIGN KEY (video_id) REFERENCES videos (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS visual_frames (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            video_id INTEGER NOT NULL,
+            filename TEXT NOT NULL,
+            timestamp REAL NOT NULL,
+            frame_path TEXT NOT NULL,
+            visual_description TEXT NOT NULL,
+            visual_embedding BLOB NOT NULL,
+            FOREIGN KEY (video_id) REFERENCES videos (id)
+        )
+    ''')
+
+
+def _002_analysis_columns(conn):
+    # Emotion / OCR / genre, advanced tagging and actor recognition columns.
+    _add_columns(conn, 'visual_frames', [(name, 'TEXT') for name in (
+        'emotion', 'ocr_text', 'tags', 'genres', 'actors', 'media_type',
+        'deep_emotions', 'scene_context', 'people_description', 'environment',
+        'dialogue_context', 'series_movie', 'target_audience', 'scene_type',
+    )])
+    _add_columns(conn, 'videos', [('custom_tags', "TEXT DEFAULT ''")])
+
+
+def _003_categorised_tag_columns(conn):
+    # process_video has always written these, but init_db never created them.
+    _add_columns(conn, 'visual_frames', [(name, 'TEXT') for name in (
+        'emotion_tags', 'laugh_tags', 'contextual_tags', 'character_tags', 'semantic_tags',
+    )])
+
+
+def _004_video_id_indexes(conn):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_clips_video_start ON clips (video_id, start_time)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_frames_video_ts ON visual_frames (video_id, timestamp)')
+    # videos.filename is UNIQUE on every DB created by init_db, which already gives an
+    # autoindex; only add one for databases where that constraint is missing.
+    if 'filename' not in _indexed_columns(conn, 'videos'):
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_videos_filename ON videos (filename)')
+
+
+def _005_facet_index(conn):
+    # Per-video facet values (JSON) plus materialised counts for /filters, rebuilt
+    # here from the existing frames; the app keeps both current on every write.
+    _add_columns(conn, 'videos', [('facets', 'TEXT')])
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS facet_counts (
+            facet TEXT NOT NULL,
+            value TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (facet, value)
+        )
+    ''')
+    conn.execute('DELETE FROM facet_counts')
+    frames_by_video = {}
+    for video_id, emotion, genres, actors, series_movie in conn.execute(
+            'SELECT video_id, emotion, genres, actors, series_movie FROM visual_frames'):
+        frames_by_video.setdefault(video_id, []).append(
+            {'emotion': emotion, 'genres': genres, 'actors': actors, 'series_movie': series_movie})
+    has_category = 'category' in _columns(conn, 'videos')
+    totals = {}
+    for video_id, category in conn.execute(
+            f"SELECT id, {'category' if has_category else 'NULL'} FROM videos").fetchall():
+        values = facets.video_facets(frames_by_video.get(video_id, []), category)
+        conn.execute('UPDATE videos SET facets = ? WHERE id = ?', (json.dumps(values), video_id))
+        for facet, value, delta in facets.facet_deltas(None, values):
+            totals[(facet, value)] = totals.get((facet, value), 0) + delta
+    conn.executemany('INSERT INTO facet_counts (facet, value, count) VALUES (?, ?, ?)',
+                     [(facet, value, count) for (facet, value), count in totals.items()])
+
+
+def _006_tag_junction_tables(conn):
+    # One row per (frame, field, tag) and per (video, custom tag), so tag equality and
+    # prefix filters are index lookups instead of splitting comma strings per row. The
+    # comma-joined columns stay as the display copy; the app writes both together.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS frame_tags (
+            frame_id INTEGER NOT NULL,
+            video_id INTEGER NOT NULL,
+            field TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            PRIMARY KEY (frame_id, field, tag)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_frame_tags_tag ON frame_tags (tag, field)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_frame_tags_video ON frame_tags (video_id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS video_tags (
+            video_id INTEGER NOT NULL,
+            tag TEXT NOT NULL COLLATE NOCASE,
+            PRIMARY KEY (video_id, tag)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_video_tags_tag ON video_tags (tag)')
+
+    conn.execute('DELETE FROM frame_tags')
+    conn.execute('DELETE FROM video_tags')
+    fields = tags.FRAME_TAG_FIELDS
+    rows = conn.execute(f"SELECT id, video_id, {', '.join(fields)} FROM visual_frames").fetchall()
+    conn.executemany('INSERT OR IGNORE INTO frame_tags (frame_id, video_id, field, tag) VALUES (?, ?, ?, ?)',
+                     [(row[0], row[1], field, tag)
+                      for row in rows
+                      for field, value in zip(fields, row[2:])
+                      for tag in tags.to_list(value)])
+    conn.executemany('INSERT OR IGNORE INTO video_tags (video_id, tag) VALUES (?, ?)',
+                     [(video_id, tag)
+                      for video_id, custom in conn.execute('SELECT id, custom_tags FROM videos').fetchall()
+                      for tag in tags.to_list(custom)])
+
+
+MIGRATIONS = [
+    (1, 'base tables', _001_base_tables),
+    (2, 'analysis and custom tag columns', _002_analysis_columns),
+    (3, 'categorised tag columns', _003_categorised_tag_columns),
+    (4, 'video_id / filename indexes', _004_video_id_indexes),
+    (5, 'facet index for /filters', _005_facet_index),
+    (6, 'frame_tags / video_tags junction tables', _006_tag_junction_tables),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def _ensure_version_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def current_version(conn):
+    """Highest applied migration number (0 for a database without schema_version)."""
+    try:
+        row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+
+def migrate(conn, target=None):
+    """Apply pending migrations up to `target` (default: latest). Returns the versions applied.
+
+    Runs under BEGIN IMMEDIATE so concurrent workers serialise on the write lock,
+    and the version is re-read once the lock is held.
+    """
+    target = LATEST_VERSION if target is None else target
+    if current_version(conn) >= target:
+        return []
+
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute('BEGIN IMMEDIATE')
+    applied = []
+    try:
+        _ensure_version_table(conn)
+        version = current_version(conn)
+        for number, description, apply in MIGRATIONS:
+            if version < number <= target:
+                apply(conn)
+                conn.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                             (number, description))
+                applied.append(number)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return applied
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+B-Roll Mapper - Supabase Storage sync
+Makes the storage bucket match local folders by transferring only the differences.
+
+    python storage_sync.py push                     # uploads/ → videos/, thumbnails/ → thumbnails/
+    python storage_sync.py push --delete            # also remove remote files with no local copy
+    python storage_sync.py push --dry-run           # print the plan only
+    python storage_sync.py clean videos thumbnails  # delete everything under these prefixes
+
+1. Manifests: the remote side is listed page by page (LIST_PAGE objects per
+   request, so folders are never cut off at the API's default page size) into
+   path → (size, eTag). The local side is path → (size, md5); md5s are only
+   computed when a remote file of the same size has to be compared, and are
+   cached in .storage-manifest.json by size + mtime.
+2. Diff: a file is uploaded when it is missing remotely, its size differs, or
+   its md5 differs from a plain (non-multipart) eTag. With --delete, remote
+   files without a local counterpart are removed.
+3. Transfers run in a pool of --workers threads, each upload streamed from disk
+   and retried with backoff on 429 / 5xx / connection errors; deletes go in
+   batches of DELETE_BATCH paths.
+4. With --update-db, videos.supabase_video_url / thumbnail are pointed at the
+   synced objects: rows are read by id pages and only changed rows are written
+   back, DB_BATCH rows per bulk upsert.
+
+Stdlib + requests (Storage REST API, like app_supabase.upload_to_supabase_storage).
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import mimetypes
+import threading
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from dotenv import load_dotenv, dotenv_values
+from objectstore import StorageError
+
+load_dotenv()
+
+SUPABASE_URL         = os.getenv('SUPABASE_URL')
+SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_KEY')
+
+if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
+    # Try loading from .env.supabase if not in .env
+    sb_env = dotenv_values('.env.supabase')
+    SUPABASE_URL         = SUPABASE_URL         or sb_env.get('SUPABASE_URL')
+    SUPABASE_SERVICE_KEY = SUPABASE_SERVICE_KEY or sb_env.get('SUPABASE_SERVICE_KEY')
+
+BUCKET_NAME   = 'broll-videos'
+LIST_PAGE     = 1000
+DELETE_BATCH  = 1000
+DB_BATCH      = 500
+WORKERS       = 8
+RETRIES       = 3
+HASH_CHUNK    = 1024 * 1024
+MANIFEST_NAME = '.storage-manifest.json'
+
+# remote prefix -> local folder
+DEFAULT_FOLDERS = {'videos': 'uploads', 'thumbnails': 'thumbnails'}
+FOLDER_EXTENSIONS = {
+    'videos':     {'.mp4', '.mov', '.avi', '.mkv', '.webm', '.gif'},
+    'thumbnails': {'.jpg', '.png'},
+}
+
+_print_lock = threading.Lock()
+
+
+def say(*args, **kwargs):
+    with _print_lock:
+        print(*args, **kwargs, flush=True)
+
+
+def _retrying(call, what):
+    """Run call() (returning a Response) until it succeeds, retrying transient failures."""
+    error = None
+    for attempt in range(RETRIES + 1):
+        try:
+            resp = call()
+            if resp.status_code < 300:
+                return resp
+            error = f"HTTP {resp.status_code}: {resp.text[:200]}"
+            if resp.status_code < 500 and resp.status_code != 429:
+                break
+        except requests.exceptions.RequestException as e:
+            error = str(e)
+        if attempt < RETRIES:
+            time.sleep(2 ** attempt)
+    raise StorageError(f"{what} failed: {error}")
+
+
+class StorageClient:
+    """Minimal Supabase Storage + PostgREST client with one HTTP session per thread."""
+
+    def __init__(self, url, key, bucket=BUCKET_NAME):
+        self.url = url.rstrip('/')
+        self.key = key
+        self.bucket = bucket
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        if not hasattr(self._local, 'session'):
+            s = requests.Session()
+            s.headers.update({'apikey': self.key, 'Authorization': f'Bearer {self.key}'})
+            self._local.session = s
+        return self._local.session
+
+    def public_url(self, path):
+        return f"{self.url}/storage/v1/object/public/{self.bucket}/{quote(path)}"
+
+    def ensure_bucket(self):
+        resp = self.session.get(f"{self.url}/storage/v1/bucket/{self.bucket}", timeout=30)
+        if resp.status_code == 200:
+            return False
+        _retrying(lambda: self.session.post(f"{self.url}/storage/v1/bucket", timeout=30,
+                                            json={'id': self.bucket, 'name': self.bucket, 'public': True}),
+                  f"Creating bucket {self.bucket}")
+        return True
+
+    def list(self, prefix):
+        """Yield {'path', 'size', 'etag'} for every object under `prefix`, page by page."""
+        folders = [prefix.strip('/')]
+        while folders:
+            folder = folders.pop()
+            offset = 0
+            while True:
+                body = {'prefix': folder, 'limit': LIST_PAGE, 'offset': offset,
+                        'sortBy': {'column': 'name', 'order': 'asc'}}
+                page = _retrying(lambda: self.session.post(
+                    f"{self.url}/storage/v1/object/list/{self.bucket}", json=body, timeout=60),
+                    f"Listing {folder}/").json()
+                for item in page:
+                    name = item.get('name')
+                    if not name or name.startswith('.'):
+                        continue
+                    path = f"{folder}/{name}" if folder else name
+                    if item.get('id') is None:          # a sub-folder
+                        folders.append(path)
+                        continue
+                    meta = item.get('metadata') or {}
+                    yield {'path': path, 'size': meta.get('size'), 'etag': (meta.get('eTag') or '').strip('"')}
+                if len(page) < LIST_PAGE:
+                    break
+                offset += LIST_PAGE
+
+    def upload(self, local_path, remote_path, content_type=None):
+        content_type = content_type or mimetypes.guess_type(local_path)[0] or 'application/octet-stream'
+
+        def send():
+            with open(local_path, 'rb') as f:
+                return self.session.post(
+                    f"{self.url}/storage/v1/object/{self.bucket}/{quote(remote_path)}",
+                    data=f, headers={'Content-Type': content_type, 'x-upsert': 'true'}, timeout=600)
+
+        _retrying(send, f"Uploading {remote_path}")
+
+    def delete(self, paths):
+        _retrying(lambda: self.session.delete(f"{self.url}/storage/v1/object/{self.bucket}",
+                                              json={'prefixes': list(paths)}, timeout=120),
+                  f"Deleting {len(paths)} objects")
+
+    def select_pages(self, table, columns, page=1000):
+        """Yield pages of rows in id order (keyset pagination)."""
+        after = 0
+        while True:
+            rows = _retrying(lambda: self.session.get(
+                f"{self.url}/rest/v1/{table}",
+                params={'select': columns, 'id': f'gt.{after}', 'order': 'id', 'limit': page},
+                timeout=60), f"Reading {table}").json()
+            if rows:
+                yield rows
+            if len(rows) < page:
+                return
+            after = rows[-1]['id']
+
+    def upsert(self, table, rows):
+        _retrying(lambda: self.session.post(
+            f"{self.url}/rest/v1/{table}?on_conflict=id", json=rows, timeout=120,
+            headers={'Prefer': 'resolution=merge-duplicates,return=minimal'}),
+            f"Updating {len(rows)} {table} rows")
+
+
+# ── Manifests ─────────────────────────────────────────────────────────────────
+
+def file_md5(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class HashCache:
+    """md5 per local file, reused while size and mtime are unchanged."""
+
+    def __init__(self, path=MANIFEST_NAME):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self._entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._entries = {}
+
+    def md5(self, entry):
+        key = os.path.abspath(entry['local'])
+        cached = self._entries.get(key)
+        if cached and cached['size'] == entry['size'] and cached['mtime_ns'] == entry['mtime_ns']:
+            return cached['md5']
+        digest = file_md5(entry['local'])
+        with self._lock:
+            self._entries[key] = {'size': entry['size'], 'mtime_ns': entry['mtime_ns'], 'md5': digest}
+        return digest
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self._entries, f)
+        os.replace(tmp, self.path)
+
+
+def local_manifest(folder, prefix, extensions=None):
+    """remote path → {'local', 'size', 'mtime_ns'} for the files in `folder`."""
+    manifest = {}
+    if not os.path.isdir(folder):
+        return manifest
+    with os.scandir(folder) as it:
+        for entry in it:
+            if not entry.is_file() or entry.name.startswith('.'):
+                continue
+            if extensions and os.path.splitext(entry.name)[1].lower() not in extensions:
+                continue
+            st = entry.stat()
+            manifest[f"{prefix}/{entry.name}"] = {'local': entry.path, 'size': st.st_size,
+                                                  'mtime_ns': st.st_mtime_ns}
+    return manifest
+
+
+def remote_manifest(client, prefix):
+    return {obj['path']: obj for obj in client.list(prefix)}
+
+
+def diff(local, remote, hashes, delete=False, workers=WORKERS):
+    """(paths to upload, paths to delete, number unchanged)."""
+    uploads, compare = [], []
+    for path, entry in local.items():
+        obj = remote.get(path)
+        if obj is None or obj['size'] != entry['size']:
+            uploads.append(path)
+        elif obj['etag'] and '-' not in obj['etag']:     # plain md5 eTag: compare content
+            compare.append(path)
+    if compare:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            digests = pool.map(lambda p: hashes.md5(local[p]), compare)
+            uploads += [p for p, d in zip(compare, digests) if d != remote[p]['etag']]
+    deletes = sorted(set(remote) - set(local)) if delete else []
+    return sorted(uploads), deletes, len(local) - len(uploads)
+
+
+# ── Transfers ─────────────────────────────────────────────────────────────────
+
+def run_pool(fn, items, workers, label):
+    """Apply fn to every item in a thread pool. Returns [(item, error)] for failures."""
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(fn, item): item for item in items}
+        for n, future in enumerate(as_completed(futures), 1):
+            item = futures[future]
+            try:
+                future.result()
+                say(f"  ✅ [{n}/{len(items)}] {label} {item}")
+            except Exception as e:
+                failed.append((item, str(e)))
+                say(f"  ❌ [{n}/{len(items)}] {label} {item}: {str(e)[:120]}")
+    return failed
+
+
+def delete_paths(client, paths, workers=WORKERS):
+    batches = [paths[i:i + DELETE_BATCH] for i in range(0, len(paths), DELETE_BATCH)]
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(client.delete, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                failed += [(p, str(e)) for p in futures[future]]
+                say(f"  ⚠️  Batch delete error: {e}")
+    return failed
+
+
+def update_video_urls(client, remote_paths, dry_run=False):
+    """Point videos.supabase_video_url / thumbnail at synced objects. Returns rows changed."""
+    changed = []
+    for page in client.select_pages('videos', 'id,filename,supabase_video_url,thumbnail'):
+        for v in page:
+            filename = v['filename']
+            update = {}
+            video_path = f"videos/{filename}"
+            if video_path in remote_paths:
+                update['supabase_video_url'] = client.public_url(video_path)
+            stem = os.path.splitext(filename)[0]
+            for thumb in (f"thumbnails/thumb_{stem}.jpg", f"thumbnails/{filename}.jpg"):
+                if thumb in remote_paths:
+                    update['thumbnail'] = client.public_url(thumb)
+                    break
+            if any(v.get(k) != url for k, url in update.items()):
+                changed.append({'id': v['id'], 'filename': filename,
+                                'supabase_video_url': update.get('supabase_video_url', v.get('supabase_video_url')),
+                                'thumbnail': update.get('thumbnail', v.get('thumbnail'))})
+    if not dry_run:
+        for i in range(0, len(changed), DB_BATCH):
+            client.upsert('videos', changed[i:i + DB_BATCH])
+    return len(changed)
+
+
+# ── Commands ──────────────────────────────────────────────────────────────────
+
+def push(client, folders, delete=False, dry_run=False, workers=WORKERS, update_db=False, manifest=MANIFEST_NAME):
+    """Sync local folders to their prefixes. Returns a summary dict."""
+    started = time.time()
+    hashes = HashCache(manifest)
+    summary = {'uploaded': 0, 'deleted': 0, 'unchanged': 0, 'failed': [], 'bytes': 0, 'db_rows': 0}
+    remote_paths = set()
+
+    if not dry_run and client.ensure_bucket():
+        say(f"✅ Created bucket '{client.bucket}'")
+
+    for prefix, folder in folders.items():
+        local = local_manifest(folder, prefix, FOLDER_EXTENSIONS.get(prefix))
+        remote = remote_manifest(client, prefix)
+        uploads, deletes, unchanged = diff(local, remote, hashes, delete, workers)
+        size = sum(local[p]['size'] for p in uploads)
+        say(f"\n📂 {folder}/ → {prefix}/: {len(local)} local, {len(remote)} remote — "
+            f"{len(uploads)} to upload ({size / 1024 / 1024:.1f} MB), {len(deletes)} to delete, {unchanged} unchanged")
+        summary['unchanged'] += unchanged
+        remote_paths |= set(remote) - set(deletes)
+
+        if dry_run:
+            for p in uploads:
+                say(f"  ⬆️  {p}")
+            for p in deletes:
+                say(f"  🗑️  {p}")
+            remote_paths |= set(uploads)
+            continue
+
+        failed = run_pool(lambda p: client.upload(local[p]['local'], p), uploads, workers, 'uploaded')
+        failed_paths = {p for p, _ in failed}
+        summary['uploaded'] += len(uploads) - len(failed)
+        summary['bytes'] += sum(local[p]['size'] for p in uploads if p not in failed_paths)
+        remote_paths |= set(uploads) - failed_paths
+        summary['failed'] += failed
+
+        if deletes:
+            failed = delete_paths(client, deletes, workers)
+            summary['deleted'] += len(deletes) - len(failed)
+            summary['failed'] += failed
+    hashes.save()
+
+    if update_db:
+        summary['db_rows'] = update_video_urls(client, remote_paths, dry_run)
+        say(f"\n🔄 {summary['db_rows']} video row(s) {'would be ' if dry_run else ''}updated with storage URLs")
+
+    summary['elapsed'] = time.time() - started
+    return summary
+
+
+def clean(client, prefixes, workers=WORKERS):
+    """Delete every object under `prefixes`. Returns (deleted, failed)."""
+    paths = [obj['path'] for prefix in prefixes for obj in client.list(prefix)]
+    failed = delete_paths(client, paths, workers) if paths else []
+    return len(paths) - len(failed), failed
+
+
+def print_summary(summary):
+    rate = summary['bytes'] / 1024 / 1024 / summary['elapsed'] if summary.get('elapsed') else 0
+    say("\n" + "="*60)
+    say("✅ SYNC COMPLETE" if not summary['failed'] else "⚠️  SYNC FINISHED WITH ERRORS")
+    say("="*60)
+    say(f"  ⬆️  Uploaded:  {summary['uploaded']} ({summary['bytes'] / 1024 / 1024:.1f} MB, {rate:.1f} MB/s)")
+    say(f"  🗑️  Deleted:   {summary['deleted']}")
+    say(f"  ⏭️  Unchanged: {summary['unchanged']}")
+    say(f"  ❌ Failed:    {len(summary['failed'])}")
+    for path, error in summary['failed'][:20]:
+        say(f"     - {path}: {error[:120]}")
+    if summary['failed']:
+        say("  Re-run the same command to retry; finished files are skipped.")
+
+
+def parse_folders(values):
+    """['videos=uploads', ...] → {'videos': 'uploads', ...}."""
+    folders = {}
+    for value in values:
+        prefix, _, folder = value.partition('=')
+        folders[prefix.strip('/')] = folder or prefix
+    return folders
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sync local media folders with Supabase Storage.')
+    parser.add_argument('--bucket', default=BUCKET_NAME, help=f'storage bucket (default: {BUCKET_NAME})')
+    parser.add_argument('--workers', type=int, default=WORKERS, help=f'concurrent transfers (default: {WORKERS})')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('push', help='upload new / changed local files')
+    p.add_argument('--folder', action='append', metavar='PREFIX=DIR',
+                   help='remote prefix and local folder (default: videos=uploads thumbnails=thumbnails)')
+    p.add_argument('--delete', action='store_true', help='delete remote files that have no local copy')
+    p.add_argument('--dry-run', action='store_true', help='show the diff without changing anything')
+    p.add_argument('--update-db', action='store_true', help='point videos rows at the synced objects')
+    p.add_argument('--manifest', default=MANIFEST_NAME, help=f'local hash cache (default: {MANIFEST_NAME})')
+
+    c = sub.add_parser('clean', help='delete everything under the given prefixes')
+    c.add_argument('prefixes', nargs='+')
+    c.add_argument('--yes', action='store_true', help='do not ask for confirmation')
+
+    args = parser.parse_args(argv)
+
+    if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
+        print("❌ SUPABASE_URL and SUPABASE_SERVICE_KEY must be set (in .env or .env.supabase)")
+        return 1
+    client = StorageClient(SUPABASE_URL, SUPABASE_SERVICE_KEY, args.bucket)
+
+    if args.command == 'clean':
+        if not args.yes:
+            confirm = input(f"Type  YES  to delete everything under {', '.join(args.prefixes)}: ").strip()
+            if confirm != 'YES':
+                print("❌ Aborted. No files deleted.")
+                return 0
+        deleted, failed = clean(client, args.prefixes, args.workers)
+        print(f"\n✅ Deleted {deleted} files from Supabase Storage ({len(failed)} failed).")
+        return 1 if failed else 0
+
+    folders = parse_folders(args.folder) if args.folder else DEFAULT_FOLDERS
+    summary = push(client, folders, delete=args.delete, dry_run=args.dry_run, workers=args.workers,
+                   update_db=args.update_db, manifest=args.manifest)
+    if not args.dry_run:
+        print_summary(summary)
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""
+B-Roll Mapper - Tag arrays
+Categorised frame tags, genres and video custom tags are stored as native arrays
+(Mongo arrays with multikey indexes, Postgres text[] with GIN, SQLite junction
+tables). API responses keep the comma-joined strings the frontend renders, so
+conversion happens at the edges with `to_list` / `to_text`.
+
+Both helpers also accept the legacy comma-joined strings, so documents written
+before the array migration read the same way.
+"""
+
+import re
+
+FRAME_TAG_FIELDS = ('emotion_tags', 'laugh_tags', 'contextual_tags', 'character_tags', 'semantic_tags', 'genres')
+
+
+def to_list(value):
+    """Tag list from a list or a comma-joined string (trimmed, empties and repeats dropped)."""
+    if value is None:
+        return []
+    parts = value if isinstance(value, (list, tuple)) else str(value).split(',')
+    out, seen = [], set()
+    for part in parts:
+        tag = str(part).strip()
+        if tag and tag.lower() not in seen:
+            seen.add(tag.lower())
+            out.append(tag)
+    return out
+
+
+def to_text(value):
+    """Comma-joined display string from a list (strings pass through)."""
+    if isinstance(value, (list, tuple)):
+        return ', '.join(str(v) for v in value if v)
+    return value or ''
+
+
+def exact_ci(tag):
+    """Case-insensitive whole-tag pattern (custom tag de-duplication and removal)."""
+    return re.compile('^' + re.escape(tag) + '$', re.IGNORECASE)
+
+
+def mongo_filter(fields, equals=None, prefix=None):
+    """Frame query matching any of `equals` or any tag starting with `prefix` in `fields`.
+
+    Equality uses the multikey indexes directly; a case-sensitive anchored regex
+    is answered from the same index as a range scan.
+    """
+    clauses = []
+    for field in fields:
+        if equals:
+            clauses.append({field: {'$in': list(equals)}})
+        if prefix:
+            clauses.append({field: {'$regex': '^' + re.escape(prefix)}})
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {'$or': clauses}
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Test content-addressed upload storage: dedup on commit, hard links and release.
+
+Run with `python -m pytest test_blobstore.py` or `python test_blobstore.py`.
+"""
+
+import io
+import os
+import hashlib
+import tempfile
+
+from blobstore import BlobStore
+
+
+def _receive(store, data):
+    return store.commit(store.receive(io.BytesIO(data)))
+
+
+def test_commit_dedups_identical_uploads():
+    with tempfile.TemporaryDirectory() as root:
+        store = BlobStore(root)
+        first = _receive(store, b'same bytes')
+        second = _receive(store, b'same bytes')
+
+        assert first == second == store.path_for(hashlib.sha256(b'same bytes').hexdigest())
+        assert os.listdir(store.staging) == []
+
+
+def test_commit_file_dedups_assembled_file():
+    with tempfile.TemporaryDirectory() as root:
+        store = BlobStore(root)
+        existing = _receive(store, b'chunked upload')
+        assembled = os.path.join(root, 'session.part.done')
+        with open(assembled, 'wb') as f:
+            f.write(b'chunked upload')
+
+        path, sha256, size = store.commit_file(assembled)
+        assert path == existing and size == len(b'chunked upload')
+        assert sha256 == hashlib.sha256(b'chunked upload').hexdigest()
+        assert not os.path.exists(assembled)
+
+
+def test_link_shares_the_blob_and_release_keeps_it_while_linked():
+    with tempfile.TemporaryDirectory() as root:
+        store = BlobStore(os.path.join(root, 'blobs'))
+        uploads = os.path.join(root, 'uploads')
+        os.makedirs(uploads)
+        blob = _receive(store, b'video')
+        sha256 = os.path.basename(blob)
+
+        dest = store.link(blob, os.path.join(uploads, 'clip.mp4'))
+        store.link(blob, dest)                 # re-linking the same file leaves no temp link
+        assert os.listdir(uploads) == ['clip.mp4']
+        assert os.path.samefile(blob, dest)
+
+        assert store.release(sha256) is False
+        os.remove(dest)
+        assert store.release(sha256) is True
+        assert not os.path.exists(blob)
+
+
+def test_prune_removes_only_unreferenced_blobs():
+    with tempfile.TemporaryDirectory() as root:
+        store = BlobStore(os.path.join(root, 'blobs'))
+        kept = _receive(store, b'kept')
+        orphan = _receive(store, b'orphan')
+        store.link(kept, os.path.join(root, 'kept.mp4'))
+
+        assert store.prune() == 1
+        assert os.path.exists(kept) and not os.path.exists(orphan)
+
+
+if __name__ == '__main__':
+    for name, fn in sorted(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Test that block-reserved MongoDB IDs stay unique across a library reset (/delete-all).
+
+Runs app_mongo on the in-memory collections of bench_search.py, so no MongoDB is needed.
+Run with `python -m pytest test_id_allocator.py` or `python test_id_allocator.py`.
+"""
+
+import os
+import tempfile
+
+import bench_search
+
+
+def _load(workdir):
+    cwd = os.getcwd()
+    try:
+        app = bench_search.load_app('memory', workdir)
+    finally:
+        os.chdir(cwd)
+    app.facets_col = bench_search.MemoryCollection()
+    return app
+
+
+def test_ids_stay_unique_across_delete_all():
+    with tempfile.TemporaryDirectory() as workdir:
+        app = _load(workdir)
+        other_worker = app.IdAllocator(app.counters_col)
+        issued = app.id_allocator.take('clips', 5) + other_worker.take('clips', 5)
+
+        resp = app.app.test_client().delete('/delete-all')
+        assert resp.status_code == 200, resp.get_json()
+
+        # Both workers still hold part of their blocks; new blocks must not overlap them
+        issued += app.id_allocator.take('clips', 150) + other_worker.take('clips', 150)
+        issued += app.IdAllocator(app.counters_col).take('clips', 10)
+        assert len(issued) == len(set(issued))
+
+
+if __name__ == '__main__':
+    test_ids_stay_unique_across_delete_all()
+    print('✅ ID allocator tests passed')
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Test Range header parsing for media responses (single, suffix, open-ended, 416).
+
+Run with `python -m pytest test_media.py` or `python test_media.py`.
+"""
+
+import os
+import tempfile
+
+from flask import Flask
+
+import media
+from media import RangeNotSatisfiable, parse_range
+
+
+def _unsatisfiable(header, size):
+    try:
+        parse_range(header, size)
+    except RangeNotSatisfiable:
+        return True
+    return False
+
+
+def test_single_range():
+    assert parse_range('bytes=0-99', 1000) == (0, 99)
+    assert parse_range('bytes=900-5000', 1000) == (900, 999)      # end clamped to the file
+
+
+def test_suffix_range():
+    assert parse_range('bytes=-100', 1000) == (900, 999)
+    assert parse_range('bytes=-5000', 1000) == (0, 999)           # longer than the file
+
+
+def test_open_ended_range_is_capped_at_chunk():
+    assert parse_range('bytes=100-', 1000, chunk=0) == (100, 999)
+    assert parse_range('bytes=100-', 1000, chunk=50) == (100, 149)
+    assert parse_range('bytes=990-', 1000, chunk=50) == (990, 999)
+
+
+def test_out_of_range_is_unsatisfiable():
+    assert _unsatisfiable('bytes=1000-', 1000)
+    assert _unsatisfiable('bytes=1000-1200', 1000)
+    assert _unsatisfiable('bytes=-0', 1000)
+    assert _unsatisfiable('bytes=500-100', 1000)
+
+
+def test_multi_range_and_unparsable_headers_send_the_whole_file():
+    assert parse_range('bytes=0-10,20-30', 1000) is None
+    assert parse_range('bytes=-', 1000) is None
+    assert parse_range('items=0-10', 1000) is None
+    assert parse_range('', 1000) is None
+    assert parse_range(None, 1000) is None
+
+
+def test_send_media_answers_416_with_content_range():
+    app = Flask(__name__)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'clip.mp4')
+        with open(path, 'wb') as f:
+            f.write(b'x' * 100)
+
+        with app.test_request_context(headers={'Range': 'bytes=100-'}) as ctx:
+            resp = media.send_media(ctx.request, path)
+        assert resp.status_code == 416
+        assert resp.headers['Content-Range'] == 'bytes */100'
+
+        with app.test_request_context(headers={'Range': 'bytes=-10'}) as ctx:
+            resp = media.send_media(ctx.request, path)
+            assert resp.status_code == 206
+            assert resp.headers['Content-Range'] == 'bytes 90-99/100'
+            resp.close()
+
+
+if __name__ == '__main__':
+    for name, fn in sorted(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✅ {name}")
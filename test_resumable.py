@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Test resumable upload sessions: offset checks, size limits, completion and expiry.
+
+Run with `python -m pytest test_resumable.py` or `python test_resumable.py`.
+"""
+
+import io
+import os
+import tempfile
+
+import resumable
+from resumable import SessionError, SessionStore
+
+
+def _raises(fn, status):
+    try:
+        fn()
+    except SessionError as e:
+        assert e.status == status, (e.status, str(e))
+        return e
+    raise AssertionError(f'expected SessionError({status})')
+
+
+def test_offset_mismatch_is_409_with_server_offset():
+    with tempfile.TemporaryDirectory() as folder:
+        store = SessionStore(folder)
+        upload_id = store.create('clip.mp4', 10)['upload_id']
+        assert store.append(upload_id, 0, io.BytesIO(b'abcd')) == 4
+
+        e = _raises(lambda: store.append(upload_id, 0, io.BytesIO(b'abcd')), 409)
+        assert e.offset == 4
+        assert store.get(upload_id)['offset'] == 4
+
+
+def test_chunk_past_declared_size_is_413():
+    with tempfile.TemporaryDirectory() as folder:
+        store = SessionStore(folder)
+        upload_id = store.create('clip.mp4', 6)['upload_id']
+        store.append(upload_id, 0, io.BytesIO(b'abc'))
+
+        e = _raises(lambda: store.append(upload_id, 3, io.BytesIO(b'defgh')), 413)
+        assert e.offset == 3
+        assert store.get(upload_id)['offset'] == 3
+
+
+def test_finish_reopen_then_complete_again():
+    with tempfile.TemporaryDirectory() as folder:
+        store = SessionStore(folder)
+        upload_id = store.create('clip.mp4', 5)['upload_id']
+        store.append(upload_id, 0, io.BytesIO(b'hello'))
+
+        meta, claimed = store.finish(upload_id)
+        assert meta['filename'] == 'clip.mp4' and os.path.exists(claimed)
+        # A concurrent complete sees the claim, not a second copy of the file
+        _raises(lambda: store.finish(upload_id), 409)
+
+        # Storing failed: the caller reopens and the client retries complete
+        store.reopen(upload_id)
+        assert store.get(upload_id)['offset'] == 5
+        _, claimed = store.finish(upload_id)
+        with open(claimed, 'rb') as f:
+            assert f.read() == b'hello'
+
+        store.close(upload_id)
+        assert os.listdir(folder) == []
+        _raises(lambda: store.get(upload_id), 404)
+
+
+def test_expire_sweeps_stale_sessions_and_claimed_files():
+    with tempfile.TemporaryDirectory() as folder:
+        store = SessionStore(folder)
+        stale = store.create('old.mp4', 3)['upload_id']
+        store.append(stale, 0, io.BytesIO(b'abc'))
+        store.finish(stale)                    # claimed but never closed
+        fresh = store.create('new.mp4', 3)['upload_id']
+
+        old = os.path.getmtime(store.claimed_path(stale)) - resumable.SESSION_TTL - 60
+        for name in os.listdir(folder):
+            if name.startswith(stale):
+                os.utime(os.path.join(folder, name), (old, old))
+
+        store.expire()
+        assert sorted(os.listdir(folder)) == [fresh + '.json', fresh + '.part']
+
+
+if __name__ == '__main__':
+    for name, fn in sorted(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Test SQLite schema migrations and that hot queries use the video_id / filename indexes.
+
+Run with `python -m pytest test_sqlite_migrations.py` or `python test_sqlite_migrations.py`.
+"""
+
+import sqlite3
+
+import sqlite_migrations
+
+
+# The statements app_semantic.py runs per video (ingest, reprocess, delete, upload, list)
+CLIPS_FOR_VIDEO = 'SELECT start_time, end_time, transcript_text FROM clips WHERE video_id = ?'
+FRAMES_FOR_VIDEO = 'SELECT id, emotion_tags FROM visual_frames WHERE video_id = ?'
+DELETE_CLIPS = 'DELETE FROM clips WHERE video_id = ?'
+DELETE_FRAMES = 'DELETE FROM visual_frames WHERE video_id = ?'
+VIDEO_BY_FILENAME = 'SELECT id FROM videos WHERE filename = ?'
+LIST_VIDEOS = '''
+    SELECT v.id, v.filename, COUNT(c.id) as clip_count
+    FROM videos v
+    LEFT JOIN clips c ON v.id = c.video_id
+    GROUP BY v.id
+    ORDER BY v.upload_date DESC
+'''
+
+
+def _migrated():
+    conn = sqlite3.connect(':memory:')
+    sqlite_migrations.migrate(conn)
+    return conn
+
+
+def _plan(conn, sql, params=()):
+    return ' | '.join(row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params))
+
+
+def _legacy_db():
+    """Schema as left by the old init_db(): no indexes, no categorised tag columns."""
+    conn = sqlite3.connect(':memory:')
+    conn.executescript('''
+        CREATE TABLE videos (id INTEGER PRIMARY KEY AUTOINCREMENT, filename TEXT NOT NULL UNIQUE,
+            upload_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP, duration REAL NOT NULL,
+            status TEXT DEFAULT 'processing', thumbnail TEXT, custom_tags TEXT DEFAULT '');
+        CREATE TABLE clips (id INTEGER PRIMARY KEY AUTOINCREMENT, video_id INTEGER NOT NULL,
+            filename TEXT NOT NULL, start_time REAL NOT NULL, end_time REAL NOT NULL,
+            duration REAL NOT NULL, transcript_text TEXT NOT NULL, embedding BLOB NOT NULL);
+        CREATE TABLE visual_frames (id INTEGER PRIMARY KEY AUTOINCREMENT, video_id INTEGER NOT NULL,
+            filename TEXT NOT NULL, timestamp REAL NOT NULL, frame_path TEXT NOT NULL,
+            visual_description TEXT NOT NULL, visual_embedding BLOB NOT NULL,
+            emotion TEXT, ocr_text TEXT, tags TEXT, genres TEXT, actors TEXT, media_type TEXT);
+        INSERT INTO videos (filename, duration) VALUES ('farzi.mp4', 30);
+        INSERT INTO videos (filename, duration) VALUES ('panchayat.mp4', 40);
+        INSERT INTO visual_frames (video_id, filename, timestamp, frame_path, visual_description,
+            visual_embedding, emotion, genres, actors) VALUES
+            (1, 'farzi.mp4', 0, 'f0.jpg', 'd', x'00', 'tense', 'Thriller, Crime', 'Shahid Kapoor'),
+            (1, 'farzi.mp4', 10, 'f1.jpg', 'd', x'00', 'tense', 'Thriller', 'Unknown'),
+            (2, 'panchayat.mp4', 0, 'p0.jpg', 'd', x'00', 'happy', 'Comedy, Drama', '');
+    ''')
+    return conn
+
+
+def test_fresh_database_reaches_latest_version():
+    conn = _migrated()
+    assert sqlite_migrations.current_version(conn) == sqlite_migrations.LATEST_VERSION
+    frame_cols = {row[1] for row in conn.execute('PRAGMA table_info(visual_frames)')}
+    for col in ('emotion_tags', 'laugh_tags', 'contextual_tags', 'character_tags', 'semantic_tags',
+                'actors', 'media_type', 'series_movie'):
+        assert col in frame_cols
+
+
+def test_migrate_is_idempotent():
+    conn = _migrated()
+    assert sqlite_migrations.migrate(conn) == []
+    # Re-running every migration body against a current schema must not fail either
+    for _, _, apply in sqlite_migrations.MIGRATIONS:
+        apply(conn)
+
+
+def test_legacy_database_is_upgraded_in_place():
+    conn = _legacy_db()
+    applied = sqlite_migrations.migrate(conn)
+    assert applied == [number for number, _, _ in sqlite_migrations.MIGRATIONS]
+    assert conn.execute('SELECT filename FROM videos').fetchone()[0] == 'farzi.mp4'
+    assert 'USING INDEX idx_clips_video_start' in _plan(conn, CLIPS_FOR_VIDEO, (1,))
+
+
+def test_facet_counts_are_built_from_existing_frames():
+    conn = _legacy_db()
+    sqlite_migrations.migrate(conn)
+    counts = {(facet, value): count for facet, value, count in
+              conn.execute('SELECT facet, value, count FROM facet_counts')}
+    # Counts are per video, not per frame
+    assert counts[('emotions', 'tense')] == 1
+    assert counts[('genres', 'Thriller')] == 1
+    assert counts[('genres', 'Drama')] == 1
+    assert counts[('actors', 'Shahid Kapoor')] == 1
+    assert ('actors', 'Unknown') not in counts
+    stored = conn.execute('SELECT facets FROM videos WHERE id = 2').fetchone()[0]
+    assert '"Comedy"' in stored
+
+
+def test_per_video_lookups_use_video_id_indexes():
+    conn = _migrated()
+    # Reprocessing loads a video's clips once for all of its frames
+    assert 'USING INDEX idx_clips_video_start (video_id=?)' in _plan(conn, CLIPS_FOR_VIDEO, (1,))
+    # frame_tags are rebuilt from one video's frames
+    assert 'USING INDEX idx_frames_video_ts (video_id=?)' in _plan(conn, FRAMES_FOR_VIDEO, (1,))
+
+
+def test_deletes_by_video_use_indexes():
+    conn = _migrated()
+    # "USING INDEX" or "USING COVERING INDEX" depending on the SQLite version
+    assert 'INDEX idx_clips_video_start (video_id=?)' in _plan(conn, DELETE_CLIPS, (1,))
+    assert 'INDEX idx_frames_video_ts (video_id=?)' in _plan(conn, DELETE_FRAMES, (1,))
+
+
+def test_filename_lookup_uses_index():
+    conn = _migrated()
+    plan = _plan(conn, VIDEO_BY_FILENAME, ('farzi.mp4',))
+    assert 'SEARCH videos USING' in plan and 'INDEX' in plan and '(filename=?)' in plan
+
+
+def test_list_videos_join_uses_clips_index():
+    conn = _migrated()
+    plan = _plan(conn, LIST_VIDEOS)
+    assert 'SEARCH c USING' in plan and 'INDEX idx_clips_video_start (video_id=?)' in plan
+
+
+if __name__ == '__main__':
+    for name, fn in sorted(globals().items()):
+        if name.startswith('test_') and callable(fn):
+            fn()
+            print(f"✅ {name}")
@@ -0,0 +1,126 @@
+"""
+B-Roll Mapper - Resumable upload client
+Sends a file through /upload/sessions (see resumable.py) in chunks, resuming
+from the server's offset after a dropped connection or timeout instead of
+starting the whole file again.
+
+    from upload_client import resumable_upload
+    result = resumable_upload('https://host', 'clip.mp4', category='Videos')
+
+`result` is the server's /upload response ({'success', 'restored', ...}).
+Raises UploadError once a chunk has failed `retries` times in a row.
+For whole folders see bulk_upload.py.
+"""
+
+import os
+import time
+import requests
+
+CHUNK_SIZE = 8 * 1024 * 1024
+RETRIES = 5
+TIMEOUT = 120
+
+
+class UploadError(Exception):
+    pass
+
+
+def _server_offset(session, url):
+    resp = session.head(url, timeout=30)
+    if resp.status_code != 200:
+        raise UploadError(f"Upload session lost (HTTP {resp.status_code})")
+    return int(resp.headers['Upload-Offset'])
+
+
+def resumable_upload(base_url, path, category=None, filename=None, chunk_size=None,
+                     retries=RETRIES, progress=None, session=None, upload_id=None, on_created=None):
+    """Upload `path` chunk by chunk and finalise it. Returns the /upload JSON response.
+
+    progress(sent_bytes, total_bytes) is called after every chunk.
+    upload_id continues a session started earlier (e.g. by a crashed run) from the
+    server's offset; a new session is started if it has expired. on_created(upload_id)
+    is called when a new session is started, so callers can record it.
+    """
+    session  = session or requests.Session()
+    filename = filename or os.path.basename(path)
+    size     = os.path.getsize(path)
+
+    url, offset = None, 0
+    if upload_id:
+        url = f"{base_url}/upload/sessions/{upload_id}"
+        try:
+            offset = _server_offset(session, url)
+        except (UploadError, requests.exceptions.RequestException):
+            url, offset = None, 0
+
+    if url is None:
+        resp = session.post(f"{base_url}/upload/sessions",
+                            json={'filename': filename, 'size': size, 'category': category},
+                            timeout=30)
+        if resp.status_code != 201:
+            raise UploadError(f"Could not start upload: HTTP {resp.status_code} {resp.text[:100]}")
+        created    = resp.json()
+        url        = f"{base_url}/upload/sessions/{created['upload_id']}"
+        chunk_size = chunk_size or created.get('chunk_size')
+        if on_created:
+            on_created(created['upload_id'])
+    chunk_size = chunk_size or CHUNK_SIZE
+
+    failures = 0
+    with open(path, 'rb') as f:
+        while offset < size:
+            f.seek(offset)
+            chunk = f.read(chunk_size)
+            try:
+                resp = session.patch(url, data=chunk, headers={
+                    'Upload-Offset': str(offset),
+                    'Content-Type': 'application/offset+octet-stream',
+                }, timeout=TIMEOUT)
+                if resp.status_code == 204:
+                    offset = int(resp.headers['Upload-Offset'])
+                    failures = 0
+                    if progress:
+                        progress(offset, size)
+                    continue
+                if resp.status_code == 409 and 'Upload-Offset' in resp.headers:
+                    server_offset = int(resp.headers['Upload-Offset'])
+                    if server_offset != offset:
+                        offset = server_offset     # resend from where the server actually is
+                        continue
+                    # Same offset: another request (e.g. a timed-out PATCH still
+                    # streaming) holds the session, so back off like any failure
+                    error = 'HTTP 409 (session busy)'
+                elif resp.status_code < 500:
+                    raise UploadError(f"Chunk rejected: HTTP {resp.status_code} {resp.text[:100]}")
+                else:
+                    error = f"HTTP {resp.status_code}"
+            except requests.exceptions.RequestException as e:
+                error = str(e)
+
+            failures += 1
+            if failures > retries:
+                raise UploadError(f"Giving up after {retries} retries at byte {offset}: {error}")
+            time.sleep(min(30, 2 ** failures))
+            try:
+                offset = _server_offset(session, url)
+            except requests.exceptions.RequestException:
+                pass                       # keep our offset; the next PATCH will be corrected by a 409
+
+    for attempt in range(retries + 1):
+        try:
+            resp = session.post(f"{url}/complete", timeout=TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            if attempt == retries:
+                raise UploadError(f"Finalising failed: {e}")
+            time.sleep(min(30, 2 ** (attempt + 1)))
+            continue
+        if resp.status_code == 200:
+            return resp.json()
+        if resp.status_code >= 500 and attempt < retries:
+            # The server reopens the session when storing the file fails
+            time.sleep(min(30, 2 ** (attempt + 1)))
+            continue
+        if resp.status_code == 409 and attempt > 0 and 'Upload-Offset' not in resp.headers:
+            # An earlier attempt completed it but its response was lost
+            return {'success': True, 'filename': filename, 'message': 'Upload completed'}
+        raise UploadError(f"Finalising failed: HTTP {resp.status_code} {resp.text[:100]}")